@@ -0,0 +1,540 @@
+# -*- coding: utf-8 -*-
+"""
+Консольный интерфейс GameModManager (без wx) для пакетной работы на серверах без графики.
+
+Примеры:
+    python cli.py games
+    python cli.py scan 294100 --json
+    python cli.py usage 294100
+    python cli.py load-order 294100 --write
+    python cli.py conflicts 294100 --mod 2009463077
+    python cli.py profile 294100 activate vanilla
+    python cli.py snapshot 294100 rollback 20261019-153012
+    python cli.py duplicates 294100 --reclaim
+    python cli.py refresh 294100
+    python cli.py check-updates "RimWorld" --enqueue
+    python cli.py download 294100 --mods 2009463077,1541721856
+    python cli.py queue --json
+
+Результат команды выводится в stdout (с --json - одним JSON-объектом),
+ход выполнения и журнал - в stderr.
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from typing import List, Optional
+
+from loguru import logger
+
+from src.data.config import DATA_DIR
+from src.core.settings_manager import SettingsManager
+from src.core.language_manager import LanguageManager
+from src.core.i18n import i18n
+from src.core.game_manager import GameManager
+from src.core.mod_manager import ModManager
+from src.core.mod_size_service import ModSizeService
+from src.core.steam_handler import SteamHandler
+from src.core.steam_workshop_service import SteamWorkshopService
+from src.core.download_manager import DownloadManager
+from src.core.content_store import ContentStore
+from src.core.update_pipeline import UpdatePipeline
+from src.core.conflict_index import ConflictIndex
+from src.core.profile_manager import ProfileManager
+from src.core.snapshot_manager import SnapshotManager
+from src.core.duplicate_analyzer import DuplicateAnalyzer
+from src.core.load_order import LoadOrderSolver, default_mods_config_path, read_mods_config, write_mods_config
+from src.models.game import Game
+from src.models.mod import Mod, format_size
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+class CLIError(Exception):
+    """Ошибка использования (неизвестная игра, не настроен SteamCMD и т.п.)"""
+
+
+class CLIContext:
+    """Менеджеры приложения, создаются по мере необходимости"""
+
+    def __init__(self, args):
+        self.args = args
+        self.settings_manager = SettingsManager()
+        self.game_manager = GameManager()
+        self.mod_manager = ModManager()
+        self._workshop_service = None
+        self._download_manager = None
+
+    @property
+    def workshop_service(self) -> SteamWorkshopService:
+        if self._workshop_service is None:
+            self._workshop_service = SteamWorkshopService()
+        return self._workshop_service
+
+    @property
+    def download_manager(self) -> DownloadManager:
+        if self._download_manager is None:
+            steam_handler = SteamHandler(self.settings_manager.get("steamcmd_path", ""))
+            self._download_manager = DownloadManager(
+                steam_handler,
+                max_workers=self.settings_manager.get("max_concurrent_downloads", 3),
+                steam_workshop_service=self.workshop_service,
+                content_store=ContentStore() if self.settings_manager.get("use_content_store", False) else None
+            )
+        return self._download_manager
+
+    def close(self):
+        """Очередь загрузки сохраняется с задержкой - записываем изменения до выхода"""
+        if self._download_manager is not None:
+            self._download_manager.flush()
+
+    def find_game(self, key: str) -> Game:
+        """Игра по Steam ID или названию (без учета регистра)"""
+        game = self.game_manager.get_game_by_steam_id(key) or self.game_manager.get_game_by_name(key)
+        if game:
+            return game
+        for candidate in self.game_manager.get_games():
+            if candidate.name.lower() == key.lower():
+                return candidate
+        raise CLIError(f"Игра не найдена: {key}")
+
+    def load_mods(self, game: Game) -> List[Mod]:
+        progress(f"Сканирование модов '{game.name}'...")
+        mods = self.mod_manager.load_mods_for_game(game)
+        progress(f"Найдено модов: {len(mods)}")
+        return mods
+
+    def output(self, data, text_lines: List[str]):
+        """Вывод результата: JSON или текст"""
+        if self.args.json:
+            json.dump(data, sys.stdout, ensure_ascii=False, indent=2, default=_json_default)
+            sys.stdout.write("\n")
+        else:
+            for line in text_lines:
+                print(line)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def progress(message: str):
+    """Ход выполнения - в stderr, чтобы не смешивать с результатом"""
+    sys.stderr.write(message + "\n")
+    sys.stderr.flush()
+
+
+def mod_summary(mod: Mod) -> dict:
+    return {
+        'mod_id': mod.mod_id,
+        'name': mod.name,
+        'enabled': mod.is_enabled,
+        'local_path': mod.local_path,
+        'file_size': mod.file_size,
+        'local_update_date': mod.local_update_date,
+        'dependencies': [dep.mod_id for dep in mod.dependencies],
+    }
+
+
+# --- Команды ---
+def cmd_games(ctx: CLIContext) -> int:
+    games = ctx.game_manager.get_games()
+    ctx.output(
+        {'games': [game.to_dict() for game in games]},
+        [f"{game.steam_id:>10}  {game.name}  ({game.mods_path})" for game in games] or ["Игры не добавлены"]
+    )
+    return EXIT_OK
+
+
+def cmd_scan(ctx: CLIContext) -> int:
+    game = ctx.find_game(ctx.args.game)
+    mods = ctx.load_mods(game)
+    ctx.output(
+        {'game': game.steam_id, 'mods': [mod_summary(mod) for mod in mods]},
+        [f"{'+' if mod.is_enabled else '-'} {mod.mod_id:>12}  {mod.name}" for mod in mods]
+    )
+    return EXIT_OK
+
+
+def cmd_usage(ctx: CLIContext) -> int:
+    """Место на диске, занимаемое модами игры"""
+    game = ctx.find_game(ctx.args.game)
+    mods = ctx.load_mods(game)
+    progress("Подсчет размеров модов...")
+    usage = ModSizeService().get_disk_usage(game, mods, force=ctx.args.force)
+    largest = sorted(mods, key=lambda mod: mod.file_size, reverse=True)[:ctx.args.top]
+    ctx.output(
+        {'game': game.steam_id, 'usage': vars(usage), 'total_bytes': usage.total_bytes,
+         'sizes': {mod.mod_id: mod.file_size for mod in mods}},
+        [f"{format_size(mod.file_size):>10}  {mod.mod_id:>12}  {mod.name}" for mod in largest] + [
+            f"Включенные: {usage.enabled_count} модов, {format_size(usage.enabled_bytes)}",
+            f"Отключенные: {usage.disabled_count} модов, {format_size(usage.disabled_bytes)} "
+            f"(папка archive: {format_size(usage.archive_bytes)})",
+            f"Всего: {format_size(usage.total_bytes)}",
+        ]
+    )
+    return EXIT_OK
+
+
+def cmd_load_order(ctx: CLIContext) -> int:
+    """Порядок загрузки включенных модов (RimWorld: ModsConfig.xml)"""
+    game = ctx.find_game(ctx.args.game)
+    config_path = ctx.args.config or default_mods_config_path(game)
+    if not config_path:
+        raise CLIError(f"Путь к ModsConfig.xml для '{game.name}' неизвестен: укажите --config")
+    if ctx.args.write and not os.path.exists(config_path):
+        raise CLIError(f"ModsConfig.xml не найден: {config_path}")
+    mods = [mod for mod in ctx.load_mods(game) if mod.is_enabled]
+    result = LoadOrderSolver().solve(mods, read_mods_config(config_path))
+    if ctx.args.write:
+        write_mods_config(config_path, [mod.package_id for mod in result.order if mod.package_id])
+        progress(f"Порядок записан: {config_path}")
+    ctx.output(
+        {
+            'game': game.steam_id,
+            'config': config_path,
+            'order': [{'mod_id': mod.mod_id, 'package_id': mod.package_id, 'name': mod.name} for mod in result.order],
+            'cycles': result.cycles,
+            'missing': result.missing,
+            'unordered': [mod.mod_id for mod in result.unordered],
+            'written': ctx.args.write,
+        },
+        [f"{index + 1:>4}. {mod.package_id or '-':<40} {mod.name}" for index, mod in enumerate(result.order)]
+        + [f"Цикл: {' -> '.join(cycle + cycle[:1])}" for cycle in result.cycles]
+        + [f"Нет зависимостей у {mod_id}: {', '.join(package_ids)}" for mod_id, package_ids in result.missing.items()]
+    )
+    return EXIT_OK if result.is_clean else EXIT_FAILED
+
+
+def cmd_conflicts(ctx: CLIContext) -> int:
+    """Файлы с одинаковым относительным путем у нескольких включенных модов"""
+    game = ctx.find_game(ctx.args.game)
+    mods = [mod for mod in ctx.load_mods(game) if mod.is_enabled]
+    index = ConflictIndex(game.steam_id)
+    index.update(mods)
+    names = {mod.mod_id: mod.name for mod in mods}
+    if ctx.args.mod:
+        colliding = index.colliding_mods(ctx.args.mod)
+        ctx.output(
+            {'game': game.steam_id, 'mod_id': ctx.args.mod, 'colliding': colliding},
+            [f"{mod_id:>12}  {names.get(mod_id, '')}  ({len(paths)}): {', '.join(paths[:5])}"
+             for mod_id, paths in sorted(colliding.items(), key=lambda item: -len(item[1]))]
+            or [f"Мод {ctx.args.mod} не пересекается по файлам с включенными модами"]
+        )
+        return EXIT_OK
+    conflicts = index.conflicts()
+    ctx.output(
+        {'game': game.steam_id, 'conflicts': conflicts},
+        [f"{rel_path}: {', '.join(owners)}" for rel_path, owners in sorted(conflicts.items())]
+        + [f"Конфликтующих путей: {len(conflicts)}"]
+    )
+    return EXIT_OK
+
+
+def cmd_profile(ctx: CLIContext) -> int:
+    """Профили модов: список, включение/отключение, создание, переключение, удаление"""
+    game = ctx.find_game(ctx.args.game)
+    profiles = ProfileManager(game)
+    action, name = ctx.args.action, ctx.args.name
+    if action in ("create", "activate", "delete") and not name:
+        raise CLIError(f"Для '{action}' нужно имя профиля")
+    try:
+        if action == "enable":
+            profiles.enable(name or ProfileManager.DEFAULT_PROFILE)
+        elif action == "disable":
+            profiles.disable()
+        elif action == "create":
+            profiles.create_profile(name, copy_from=ctx.args.copy_from or profiles.active_profile_name())
+        elif action == "activate":
+            profiles.activate(name)
+        elif action == "delete":
+            profiles.delete_profile(name)
+        elif action == "sync":
+            progress(f"Синхронизация: {profiles.sync()}")
+    except ValueError as e:
+        raise CLIError(str(e))
+
+    items = profiles.list_profiles()
+    ctx.output(
+        {'game': game.steam_id, 'enabled': profiles.is_enabled, 'store': profiles.store_path,
+         'profiles': [{'name': p.name, 'active': p.is_active, 'enabled_mods': p.enabled} for p in items]},
+        [f"{'*' if p.is_active else ' '} {p.name:<24} включено модов: {len(p.enabled)}" for p in items]
+        or ["Профили не включены (python cli.py profile <игра> enable)"]
+    )
+    return EXIT_OK
+
+
+def cmd_snapshot(ctx: CLIContext) -> int:
+    """Снимки состояния модов: список, создание, откат, удаление"""
+    game = ctx.find_game(ctx.args.game)
+    snapshots = SnapshotManager(ctx.mod_manager)
+    action, snapshot_id = ctx.args.action, ctx.args.snapshot_id
+    if action in ("rollback", "delete") and not snapshot_id:
+        raise CLIError(f"Для '{action}' нужен ID снимка")
+    if action == "create":
+        progress(f"Создание снимка '{game.name}'...")
+        snapshot = snapshots.create_snapshot(game, label=ctx.args.label or "")
+        progress(f"Снимок {snapshot.snapshot_id}: модов {len(snapshot.mods)}, файлов {snapshot.files}")
+    elif action == "rollback":
+        try:
+            result = snapshots.rollback(game, snapshot_id, remove_new=ctx.args.remove_new)
+        except ValueError as e:
+            raise CLIError(str(e))
+        ctx.output(
+            {'game': game.steam_id, 'snapshot_id': snapshot_id, 'restored': result.restored,
+             'toggled': result.toggled, 'new_mods': result.new_mods, 'failed': result.failed,
+             'load_order_written': result.load_order_written},
+            [f"Восстановлено модов: {len(result.restored)}", f"Включено/отключено: {len(result.toggled)}",
+             f"Новых модов ({'удалены' if ctx.args.remove_new else 'отключены'}): {len(result.new_mods)}"]
+            + [f"Ошибка {key}: {error}" for key, error in result.failed.items()]
+        )
+        return EXIT_OK if result.success else EXIT_FAILED
+    elif action == "delete":
+        if snapshots.get_snapshot(game, snapshot_id) is None:
+            raise CLIError(f"Снимок не найден: {snapshot_id}")
+        snapshots.delete_snapshot(game, snapshot_id)
+
+    items = snapshots.list_snapshots(game)
+    ctx.output(
+        {'game': game.steam_id, 'snapshots': [snapshot.to_dict() for snapshot in items]},
+        [f"{snapshot.snapshot_id:<20}  {snapshot.created_at[:19].replace('T', ' ')}  "
+         f"включено {snapshot.enabled_count}/{len(snapshot.mods)}  {'[авто] ' if snapshot.auto else ''}{snapshot.label}"
+         for snapshot in items] or ["Снимков нет"]
+    )
+    return EXIT_OK
+
+
+def cmd_duplicates(ctx: CLIContext) -> int:
+    """Дубликаты модов по содержимому и моды в archive без элемента Workshop; --reclaim удаляет копии"""
+    game = ctx.find_game(ctx.args.game)
+    mods = ctx.load_mods(game)
+    analyzer = DuplicateAnalyzer(ctx.mod_manager, ctx.workshop_service)
+    progress("Построение отпечатков модов...")
+    plan = analyzer.analyze(mods)
+    result = None
+    if ctx.args.reclaim:
+        to_remove = plan.duplicate_mods + (plan.orphans if ctx.args.include_orphans else [])
+        result = analyzer.reclaim(to_remove, plan)
+    ctx.output(
+        {
+            'game': game.steam_id,
+            'groups': [{'keep': group.keep.local_path, 'duplicates': [mod.local_path for mod in group.duplicates],
+                        'size': group.size, 'reclaimable': group.reclaimable} for group in plan.groups],
+            'orphans': [mod.local_path for mod in plan.orphans],
+            'duplicate_bytes': plan.duplicate_bytes,
+            'orphan_bytes': plan.orphan_bytes,
+            'removed': [mod.local_path for mod in result.removed] if result else [],
+            'skipped': result.skipped if result else {},
+            'freed': result.freed if result else 0,
+        },
+        [line for group in plan.groups for line in
+         [f"{group.keep.local_path}  ({format_size(group.size)})"] + [f"    копия: {mod.local_path}" for mod in group.duplicates]]
+        + [f"Без Workshop: {mod.local_path}" for mod in plan.orphans]
+        + [f"Дубликатов: {len(plan.duplicate_mods)} ({format_size(plan.duplicate_bytes)}), "
+           f"без Workshop: {len(plan.orphans)} ({format_size(plan.orphan_bytes)})"]
+        + ([f"Пропущено {path}: {reason}" for path, reason in result.skipped.items()] if result else [])
+        + ([f"Удалено: {len(result.removed)}, освобождено {format_size(result.freed)}"] if result else [])
+    )
+    return EXIT_OK
+
+
+def cmd_refresh(ctx: CLIContext) -> int:
+    """Пакетное обновление метаданных модов через Steam Web API"""
+    game = ctx.find_game(ctx.args.game)
+    mods = ctx.load_mods(game)
+    mod_ids = [mod.mod_id for mod in mods if mod.mod_id.isdigit()]
+    details = {}
+    for start in range(0, len(mod_ids), SteamWorkshopService.PUBLISHED_FILE_DETAILS_BATCH):
+        batch = mod_ids[start:start + SteamWorkshopService.PUBLISHED_FILE_DETAILS_BATCH]
+        details.update(ctx.workshop_service.get_published_file_details(batch, force_refresh=ctx.args.force))
+        progress(f"[{min(start + len(batch), len(mod_ids))}/{len(mod_ids)}] метаданные получены")
+    missing = [mod_id for mod_id in mod_ids if mod_id not in details]
+    ctx.output(
+        {'game': game.steam_id, 'details': details, 'missing': missing},
+        [f"{mod_id:>12}  {data.get('title', '')}  {format_size(data.get('file_size', 0))}"
+         for mod_id, data in details.items()] + ([f"Нет данных: {', '.join(missing)}"] if missing else [])
+    )
+    return EXIT_OK if not missing else EXIT_FAILED
+
+
+def cmd_check_updates(ctx: CLIContext) -> int:
+    game = ctx.find_game(ctx.args.game)
+    mods = ctx.load_mods(game)
+    pipeline = UpdatePipeline(ctx.workshop_service, ctx.download_manager if ctx.args.enqueue else None)
+    progress("Сравнение с Workshop...")
+    plan = pipeline.build_plan(game, mods)
+    added = pipeline.enqueue(plan) if ctx.args.enqueue else 0
+    ctx.output(
+        {
+            'game': game.steam_id,
+            'stale': [mod.mod_id for mod in plan.stale],
+            'unknown': plan.unknown,
+            'statuses': {mod_id: vars(status) for mod_id, status in plan.statuses.items()},
+            'bytes_to_download': plan.bytes_to_download,
+            'bytes_saved': plan.bytes_saved,
+            'enqueued': added,
+        },
+        [f"{mod.mod_id:>12}  {mod.name}" for mod in plan.stale] + [
+            f"Устарело: {len(plan.stale)} из {len(plan.statuses)}, без данных: {len(plan.unknown)}, "
+            f"загрузка: {format_size(plan.bytes_to_download)}"
+            + (f", добавлено в очередь: {added}" if ctx.args.enqueue else "")
+        ]
+    )
+    return EXIT_OK
+
+
+def cmd_download(ctx: CLIContext) -> int:
+    game = ctx.find_game(ctx.args.game)
+    manager = ctx.download_manager
+    if not manager.steam_handler.is_initialized:
+        raise CLIError("SteamCMD не настроен: укажите steamcmd_path в настройках")
+    if ctx.args.mods:
+        mod_ids = [mod_id.strip() for mod_id in ctx.args.mods.split(",") if mod_id.strip()]
+        manager.add_many_to_queue([Mod(mod_id=mod_id, name=mod_id) for mod_id in mod_ids])
+    if ctx.args.retry_failed:
+        manager.retry_failed()
+
+    progress(f"Загрузка очереди ({len(manager.queue)} модов) для '{game.name}'")
+    success = manager.download_mods_queue(game, log_callback=progress if ctx.args.verbose else _download_progress)
+    items = manager.get_queue_items()
+    ctx.output(
+        {
+            'game': game.steam_id,
+            'success': success,
+            'remaining': [item.to_dict() for item in items],
+            'states': manager.get_state_counts(),
+        },
+        [f"{item.mod_id:>12}  {item.state}  {item.last_error}" for item in items]
+        + ["Успешно" if success else "Завершено с ошибками"]
+    )
+    return EXIT_OK if success else EXIT_FAILED
+
+
+def _download_progress(line: str):
+    """Без --verbose показываются только строки результата и сообщения менеджера"""
+    if line.startswith(("->", "!!!", "===")) or DownloadManager._SUCCESS_PATTERN.search(line) \
+            or DownloadManager._ERROR_PATTERN.search(line):
+        progress(line)
+
+
+def cmd_queue(ctx: CLIContext) -> int:
+    manager = ctx.download_manager
+    if ctx.args.clear:
+        manager.clear_queue()
+    items = manager.get_queue_items()
+    ctx.output(
+        {'items': [item.to_dict() for item in items], 'states': manager.get_state_counts()},
+        [f"{item.mod_id:>12}  {item.state:<11}  {item.mod.name}" for item in items] or ["Очередь пуста"]
+    )
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="GameModManager без графического интерфейса")
+    parser.add_argument("--json", action="store_true", help="Вывод результата в JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Подробный журнал в stderr")
+    # Те же флаги принимаются и после команды; SUPPRESS не дает подкоманде затереть значение, заданное до нее
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="Вывод результата в JSON")
+    common.add_argument("-v", "--verbose", action="store_true", default=argparse.SUPPRESS,
+                        help="Подробный журнал в stderr")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("games", parents=[common], help="Список игр").set_defaults(handler=cmd_games)
+
+    scan = subparsers.add_parser("scan", parents=[common], help="Сканирование установленных модов")
+    scan.add_argument("game", help="Steam ID или название игры")
+    scan.set_defaults(handler=cmd_scan)
+
+    usage = subparsers.add_parser("usage", parents=[common], help="Место на диске, занимаемое модами")
+    usage.add_argument("game", help="Steam ID или название игры")
+    usage.add_argument("--top", type=int, default=10, help="Сколько самых больших модов показать")
+    usage.add_argument("--force", action="store_true", help="Пересчитать без кэша размеров")
+    usage.set_defaults(handler=cmd_usage)
+
+    load_order = subparsers.add_parser("load-order", parents=[common], help="Порядок загрузки модов (RimWorld)")
+    load_order.add_argument("game", help="Steam ID или название игры")
+    load_order.add_argument("--config", help="Путь к ModsConfig.xml (по умолчанию - стандартный для игры)")
+    load_order.add_argument("--write", action="store_true", help="Записать порядок в ModsConfig.xml")
+    load_order.set_defaults(handler=cmd_load_order)
+
+    conflicts = subparsers.add_parser("conflicts", parents=[common], help="Конфликты файлов между включенными модами")
+    conflicts.add_argument("game", help="Steam ID или название игры")
+    conflicts.add_argument("--mod", help="Показать только моды, пересекающиеся с этим модом")
+    conflicts.set_defaults(handler=cmd_conflicts)
+
+    profile = subparsers.add_parser("profile", parents=[common], help="Профили модов (переключение наборов через ссылки)")
+    profile.add_argument("game", help="Steam ID или название игры")
+    profile.add_argument("action", nargs="?", default="list",
+                         choices=["list", "enable", "disable", "create", "activate", "delete", "sync"])
+    profile.add_argument("name", nargs="?", help="Имя профиля")
+    profile.add_argument("--from", dest="copy_from", help="create: скопировать набор модов этого профиля (по умолчанию - активного)")
+    profile.set_defaults(handler=cmd_profile)
+
+    snapshot = subparsers.add_parser("snapshot", parents=[common], help="Снимки состояния модов и откат к ним")
+    snapshot.add_argument("game", help="Steam ID или название игры")
+    snapshot.add_argument("action", nargs="?", default="list", choices=["list", "create", "rollback", "delete"])
+    snapshot.add_argument("snapshot_id", nargs="?", help="ID снимка")
+    snapshot.add_argument("--label", help="create: описание снимка")
+    snapshot.add_argument("--remove-new", action="store_true", help="rollback: удалить моды, установленные после снимка")
+    snapshot.set_defaults(handler=cmd_snapshot)
+
+    duplicates = subparsers.add_parser("duplicates", parents=[common], help="Дубликаты модов и моды в archive без Workshop")
+    duplicates.add_argument("game", help="Steam ID или название игры")
+    duplicates.add_argument("--reclaim", action="store_true", help="Удалить найденные копии")
+    duplicates.add_argument("--include-orphans", action="store_true", help="--reclaim: удалить и моды без Workshop")
+    duplicates.set_defaults(handler=cmd_duplicates)
+
+    refresh = subparsers.add_parser("refresh", parents=[common], help="Пакетное обновление метаданных модов")
+    refresh.add_argument("game", help="Steam ID или название игры")
+    refresh.add_argument("--force", action="store_true", help="Не использовать кэш")
+    refresh.set_defaults(handler=cmd_refresh)
+
+    check = subparsers.add_parser("check-updates", parents=[common], help="Проверка обновлений модов")
+    check.add_argument("game", help="Steam ID или название игры")
+    check.add_argument("--enqueue", action="store_true", help="Добавить устаревшие моды в очередь загрузки")
+    check.set_defaults(handler=cmd_check_updates)
+
+    download = subparsers.add_parser("download", parents=[common], help="Загрузка очереди модов")
+    download.add_argument("game", help="Steam ID или название игры")
+    download.add_argument("--mods", help="ID модов через запятую для добавления в очередь")
+    download.add_argument("--retry-failed", action="store_true", help="Повторить неудачные без ожидания")
+    download.set_defaults(handler=cmd_download)
+
+    queue = subparsers.add_parser("queue", parents=[common], help="Состояние очереди загрузки")
+    queue.add_argument("--clear", action="store_true", help="Очистить очередь")
+    queue.set_defaults(handler=cmd_queue)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="DEBUG" if args.verbose else "WARNING")
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    language_manager = LanguageManager()
+    i18n.set_language_manager(language_manager)
+    ctx = CLIContext(args)
+    language_manager.set_language(ctx.settings_manager.get("language", "en"))
+
+    try:
+        return args.handler(ctx)
+    except CLIError as e:
+        progress(f"Ошибка: {e}")
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        progress("Прервано")
+        return EXIT_FAILED
+    finally:
+        ctx.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
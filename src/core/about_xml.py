@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковое чтение About/About.xml модов RimWorld.
+Файл разбирается через ElementTree.iterparse без построения полного дерева; чтение прекращается,
+как только собраны запрошенные поля (например, только packageId).
+"""
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, IO, Iterable, List, Optional, Union
+
+
+# Ссылка на мод в Workshop (steamWorkshopUrl зависимости): ...filedetails/?id=<ID> или steam://url/CommunityFilePage/<ID>
+_WORKSHOP_ID_PATTERN = re.compile(r"(?:[?&]id=|CommunityFilePage/)(\d+)")
+
+# Списки <li>, которые переносятся в AboutXml как есть (тег в нижнем регистре -> поле)
+_LIST_FIELDS = {
+    'supportedversions': 'supported_versions',
+    'loadafter': 'load_after',
+    'loadbefore': 'load_before',
+    'forceloadafter': 'force_load_after',
+    'forceloadbefore': 'force_load_before',
+    'incompatiblewith': 'incompatible_with',
+}
+
+# Простые текстовые поля (тег в нижнем регистре -> поле)
+_TEXT_FIELDS = {
+    'name': 'name',
+    'author': 'author',
+    'description': 'description',
+    'packageid': 'package_id',
+    'publishedfileid': 'published_file_id',
+}
+
+
+@dataclass
+class AboutDependency:
+    """Зависимость из <modDependencies>"""
+    package_id: str
+    display_name: str = ""
+    steam_id: str = ""          # ID Workshop из steamWorkshopUrl, если указан
+    download_url: str = ""
+
+    def to_dict(self) -> Dict[str, str]:
+        return {'package_id': self.package_id, 'display_name': self.display_name,
+                'steam_id': self.steam_id, 'download_url': self.download_url}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> 'AboutDependency':
+        return cls(package_id=data.get('package_id', ''), display_name=data.get('display_name', ''),
+                   steam_id=data.get('steam_id', ''), download_url=data.get('download_url', ''))
+
+
+@dataclass
+class AboutXml:
+    """Метаданные мода из About.xml"""
+    name: str = ""
+    author: str = ""
+    description: str = ""
+    package_id: str = ""
+    published_file_id: str = ""
+    supported_versions: List[str] = field(default_factory=list)
+    dependencies: List[AboutDependency] = field(default_factory=list)
+    load_after: List[str] = field(default_factory=list)
+    load_before: List[str] = field(default_factory=list)
+    force_load_after: List[str] = field(default_factory=list)
+    force_load_before: List[str] = field(default_factory=list)
+    incompatible_with: List[str] = field(default_factory=list)
+
+
+# Все поля, которые можно запросить у parse_about_xml
+ABOUT_FIELDS = frozenset(list(_TEXT_FIELDS.values()) + list(_LIST_FIELDS.values()) + ['dependencies'])
+
+
+def _field_for(tag: str) -> Optional[str]:
+    if tag in _TEXT_FIELDS:
+        return _TEXT_FIELDS[tag]
+    if tag in _LIST_FIELDS:
+        return _LIST_FIELDS[tag]
+    if tag in ('authors', 'moddependencies'):
+        return 'author' if tag == 'authors' else 'dependencies'
+    return None
+
+
+def parse_about_xml(source: Union[str, IO[bytes]], fields: Optional[Iterable[str]] = None) -> AboutXml:
+    """
+    Разбирает About.xml. Учитываются только элементы верхнего уровня <ModMetaData>;
+    имена тегов сравниваются без учета регистра (packageId / packageID).
+    :param source: Путь к файлу или открытый двоичный файл.
+    :param fields: Нужные поля AboutXml; чтение прекращается, когда все они прочитаны.
+        По умолчанию читается весь файл.
+    :raises ET.ParseError: Файл не является корректным XML.
+    """
+    about = AboutXml()
+    wanted = set(fields) & ABOUT_FIELDS if fields is not None else None
+    if wanted is not None and not wanted:
+        return about
+    authors: List[str] = []
+    path: List[str] = []
+    dependency: Optional[AboutDependency] = None
+    root = None
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        tag = elem.tag.lower() if isinstance(elem.tag, str) else ""
+        if event == "start":
+            if root is None:
+                root = elem
+            path.append(tag)
+            if len(path) == 3 and path[1] == 'moddependencies' and tag == 'li':
+                dependency = AboutDependency(package_id="")
+            continue
+
+        path.pop()
+        depth = len(path)   # Глубина закрытого элемента: 1 - дочерний элемент корня
+        text = (elem.text or "").strip()
+        if depth == 1:
+            name = _field_for(tag)
+            if tag == 'authors':
+                about.author = about.author or ", ".join(authors)
+            elif tag in _TEXT_FIELDS:
+                setattr(about, name, text)
+            if wanted is not None and name in wanted:
+                wanted.discard(name)
+                if not wanted:
+                    break
+            # Закрытые элементы верхнего уровня больше не нужны - освобождаем память
+            root.clear()
+        elif depth == 2 and tag == 'li':
+            parent = path[1]
+            if parent in _LIST_FIELDS and text:
+                getattr(about, _LIST_FIELDS[parent]).append(text)
+            elif parent == 'authors' and text:
+                authors.append(text)
+            elif parent == 'moddependencies' and dependency is not None:
+                if dependency.package_id:
+                    about.dependencies.append(dependency)
+                dependency = None
+        elif depth == 3 and dependency is not None and path[1] == 'moddependencies':
+            if tag == 'packageid':
+                dependency.package_id = text
+            elif tag == 'displayname':
+                dependency.display_name = text
+            elif tag == 'steamworkshopurl':
+                match = _WORKSHOP_ID_PATTERN.search(text)
+                dependency.steam_id = match.group(1) if match else ""
+            elif tag == 'downloadurl':
+                dependency.download_url = text
+    return about
+
+
+def read_published_file_id(mod_path: str) -> str:
+    """ID Workshop из About/PublishedFileId.txt (его создает игра при публикации мода)"""
+    try:
+        with open(os.path.join(mod_path, "About", "PublishedFileId.txt"), 'r', encoding='utf-8-sig') as f:
+            steam_id = f.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return ""
+    return steam_id if steam_id.isdigit() else ""
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Чтение appworkshop_<app>.acf - манифеста Workshop, который ведут Steam и SteamCMD.
+Для каждого установленного элемента в нем записаны размер, время обновления и ID манифеста контента,
+поэтому состояние всех модов игры получается одним чтением файла, без запросов к Steam.
+
+SteamHandler удаляет ACF SteamCMD перед каждым сеансом, поэтому после сеанса его элементы
+переносятся в WorkshopStateStore - накопленное состояние всех установок игры.
+"""
+import os
+import json
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional
+from loguru import logger
+from src.data.config import WORKSHOP_STATE_DIR
+from src.models.game import Game
+
+try:
+    import vdf
+    HAS_VDF = True
+except ImportError:  # vdf ставится вместе с пакетом steam
+    HAS_VDF = False
+
+
+@dataclass
+class AcfItem:
+    """Установленный элемент Workshop по данным ACF"""
+    mod_id: str
+    size: int = 0                  # Байт на диске
+    time_updated: int = 0          # Unix timestamp установленной версии
+    manifest: str = ""             # ID манифеста контента (совпадает с hcontent_file в Web API)
+    time_touched: int = 0          # Последнее обращение клиента к элементу
+    latest_time_updated: int = 0   # Последняя версия, о которой уже знает клиент Steam
+    latest_manifest: str = ""
+
+    @property
+    def update_pending(self) -> bool:
+        """Клиент Steam уже знает о более новой версии, но еще не загрузил ее"""
+        if self.latest_manifest and self.manifest:
+            return self.latest_manifest != self.manifest
+        return self.latest_time_updated > self.time_updated
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _find_key(data: dict, key: str) -> dict:
+    """Ключи VDF в разных версиях клиента пишутся в разном регистре"""
+    if key in data:
+        return data[key] or {}
+    key = key.lower()
+    for name, value in data.items():
+        if name.lower() == key:
+            return value or {}
+    return {}
+
+
+def parse_appworkshop(data: dict) -> Dict[str, AcfItem]:
+    """Разбирает уже загруженный VDF: WorkshopItemsInstalled дополняется данными WorkshopItemDetails"""
+    root = _find_key(data, 'AppWorkshop')
+    items: Dict[str, AcfItem] = {}
+    for mod_id, entry in _find_key(root, 'WorkshopItemsInstalled').items():
+        if not isinstance(entry, dict):
+            continue
+        items[mod_id] = AcfItem(
+            mod_id=mod_id,
+            size=_to_int(entry.get('size')),
+            time_updated=_to_int(entry.get('timeupdated')),
+            manifest=str(entry.get('manifest') or "")
+        )
+    for mod_id, entry in _find_key(root, 'WorkshopItemDetails').items():
+        item = items.get(mod_id)
+        if item is None or not isinstance(entry, dict):
+            continue  # Подписка без установленных файлов
+        item.time_touched = _to_int(entry.get('timetouched'))
+        item.latest_time_updated = _to_int(entry.get('latest_timeupdated'))
+        item.latest_manifest = str(entry.get('latest_manifest') or "")
+        if not item.manifest:
+            item.manifest = str(entry.get('manifest') or "")
+        if not item.time_updated:
+            item.time_updated = _to_int(entry.get('timeupdated'))
+    return items
+
+
+def read_appworkshop_acf(path: str) -> Dict[str, AcfItem]:
+    """
+    Установленные элементы из одного ACF-файла.
+    :return: {ID мода: AcfItem}; пустой словарь, если файла нет, он не читается или vdf не установлен.
+    """
+    if not HAS_VDF:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            data = vdf.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"[AcfReader] Не удалось прочитать {path}: {e}")
+        return {}
+    items = parse_appworkshop(data)
+    logger.debug(f"[AcfReader] Прочитано {len(items)} элементов из {path}")
+    return items
+
+
+def appworkshop_acf_paths(game: Game, steamcmd_path: str = "") -> List[str]:
+    """Возможные расположения appworkshop_<app>.acf: SteamCMD и библиотека Steam, если моды лежат в ней"""
+    acf_name = f"appworkshop_{game.steam_id}.acf"
+    paths = []
+    if steamcmd_path:
+        paths.append(os.path.join(os.path.dirname(steamcmd_path), "steamapps", "workshop", acf_name))
+    # mods_path вида .../steamapps/workshop/content/<app>
+    content_dir = os.path.dirname(os.path.normpath(game.mods_path))
+    if os.path.basename(content_dir) == "content":
+        paths.append(os.path.join(os.path.dirname(content_dir), acf_name))
+    return list(dict.fromkeys(paths))
+
+
+def load_installed_items(paths: Iterable[str], base: Optional[Dict[str, AcfItem]] = None) -> Dict[str, AcfItem]:
+    """
+    Объединяет элементы из нескольких ACF; при повторе берется более свежая установка.
+    :param base: Уже известные элементы (например, из WorkshopStateStore), дополняются данными ACF.
+    """
+    items: Dict[str, AcfItem] = dict(base or {})
+    for path in paths:
+        for mod_id, item in read_appworkshop_acf(path).items():
+            current = items.get(mod_id)
+            if current is None or item.time_updated >= current.time_updated:
+                items[mod_id] = item
+    return items
+
+
+class WorkshopStateStore:
+    """
+    Накопленное состояние установленных элементов по играм (<state_dir>/<app_id>.json).
+    Элементы каждого сеанса SteamCMD заменяют прежние записи тех же модов.
+    """
+
+    VERSION = 1
+
+    def __init__(self, state_dir: str = None):
+        self.state_dir = state_dir or WORKSHOP_STATE_DIR
+        self._lock = threading.Lock()
+
+    def state_path(self, app_id: str) -> str:
+        return os.path.join(self.state_dir, f"{app_id}.json")
+
+    def load(self, app_id: str) -> Dict[str, AcfItem]:
+        path = self.state_path(app_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"[AcfReader] Ошибка чтения состояния {path}: {e}")
+            return {}
+        if data.get('version') != self.VERSION:
+            return {}
+        return {mod_id: AcfItem(**entry) for mod_id, entry in data.get('items', {}).items()}
+
+    def _save(self, app_id: str, items: Dict[str, AcfItem]):
+        path = self.state_path(app_id)
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'items': {mod_id: asdict(item) for mod_id, item in items.items()}},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"[AcfReader] Ошибка сохранения состояния {path}: {e}")
+
+    def merge_acf(self, app_id: str, acf_path: str) -> int:
+        """Переносит элементы ACF в состояние игры. Возвращает количество перенесенных элементов."""
+        session_items = read_appworkshop_acf(acf_path)
+        if not session_items:
+            return 0
+        with self._lock:
+            items = self.load(app_id)
+            items.update(session_items)
+            self._save(app_id, items)
+        logger.debug(f"[AcfReader] В состояние игры {app_id} перенесено {len(session_items)} элементов из {acf_path}")
+        return len(session_items)
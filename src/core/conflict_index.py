@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс файловых конфликтов: какие моды содержат файлы с одинаковым относительным путем
+(Defs, Textures, Patches и т.п.) и поэтому перекрывают друг друга.
+Списки файлов хранятся по папкам с отпечатком (mtime, inode), поэтому повторное построение
+перечитывает только изменившиеся папки, а остальные проверяются одним stat.
+"""
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+from src.data.config import CONFLICT_INDEX_DIR
+from src.models.mod import Mod
+
+
+class ConflictIndex:
+    """
+    Карта "относительный путь -> моды" для модов одной игры (<index_dir>/<steam_id игры>.json).
+
+    Пути сравниваются без учета регистра, через '/'. Папка версии в начале пути
+    (RimWorld: 1.5/Defs/... или Common/...) отбрасывается - такие файлы загружаются как корневые.
+    Служебные файлы, которые есть у каждого мода (About.xml, Preview.png и т.п.), не учитываются.
+    """
+
+    VERSION = 1
+    DEFAULT_WORKERS = 8
+    IGNORED_PATHS = frozenset({
+        "about/about.xml", "about/preview.png", "about/publishedfileid.txt", "about/manifest.xml",
+        "about/modicon.png", "loadfolders.xml", "manifest.json", "readme.md", "readme.txt",
+        "license", "license.txt", "license.md", "changelog.txt", "changelog.md",
+    })
+    _VERSION_PREFIX = re.compile(r"^(?:v?\d+(?:\.\d+)+|common)/")
+
+    def __init__(self, game_id: str, index_dir: str = None, max_workers: Optional[int] = None):
+        self.game_id = game_id
+        self.index_dir = index_dir or CONFLICT_INDEX_DIR
+        self.max_workers = max_workers or self.DEFAULT_WORKERS
+        self._lock = threading.Lock()
+        self._dirty = False
+        # Папка -> (mtime_ns, inode, имена файлов, имена подпапок)
+        self._dirs: Dict[str, Tuple[int, int, List[str], List[str]]] = self._load()
+        self._files_by_mod: Dict[str, Set[str]] = {}
+        self._mods_by_file: Dict[str, Set[str]] = {}
+
+    # --- Хранение ---
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.index_dir, f"{self.game_id}.json")
+
+    def _load(self) -> Dict[str, Tuple[int, int, List[str], List[str]]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"[ConflictIndex] Ошибка чтения индекса {self.index_path}: {e}")
+            return {}
+        if data.get('version') != self.VERSION:
+            return {}
+        return {path: tuple(node) for path, node in data.get('dirs', {}).items()}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': self.VERSION, 'dirs': dict(self._dirs)}
+            self._dirty = False
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"[ConflictIndex] Ошибка сохранения индекса {self.index_path}: {e}")
+
+    # --- Сканирование ---
+    def _list_files(self, path: str, rel_prefix: str, out: List[str]):
+        """Добавляет в out относительные пути файлов папки и подпапок (неизменившиеся папки - из кэша)"""
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return
+        fingerprint = (stat_result.st_mtime_ns, stat_result.st_ino)
+        with self._lock:
+            node = self._dirs.get(path)
+        if node is None or (node[0], node[1]) != fingerprint:
+            files, subdirs = [], []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.name)
+                            else:
+                                files.append(entry.name)
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.debug(f"[ConflictIndex] Не удалось прочитать папку {path}: {e}")
+                return
+            node = (fingerprint[0], fingerprint[1], files, subdirs)
+            with self._lock:
+                self._dirs[path] = node
+                self._dirty = True
+        out.extend(rel_prefix + name for name in node[2])
+        for name in node[3]:
+            self._list_files(os.path.join(path, name), rel_prefix + name + "/", out)
+
+    @classmethod
+    def normalize(cls, rel_path: str) -> str:
+        """Ключ конфликта для относительного пути файла мода"""
+        key = rel_path.replace("\\", "/").lower()
+        return cls._VERSION_PREFIX.sub("", key, count=1)
+
+    def _mod_files(self, mod: Mod) -> Set[str]:
+        files: List[str] = []
+        self._list_files(mod.local_path, "", files)
+        keys = {self.normalize(rel_path) for rel_path in files}
+        return keys - self.IGNORED_PATHS
+
+    def update(self, mods: Iterable[Mod]) -> int:
+        """
+        Приводит индекс к списку модов: новые и изменившиеся моды пересканируются
+        (через кэш папок), отсутствующие в списке - удаляются из карты.
+        :return: Количество модов, у которых изменился набор файлов (включая удаленные из списка).
+        """
+        mods = [mod for mod in mods if mod.local_path]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(mods))),
+                                thread_name_prefix="ConflictIndex") as executor:
+            file_sets = list(executor.map(self._mod_files, mods))
+
+        changed = 0
+        current = {mod.mod_id for mod in mods}
+        with self._lock:
+            for mod_id in [mod_id for mod_id in self._files_by_mod if mod_id not in current]:
+                self._set_mod_files(mod_id, set())
+                changed += 1
+            for mod, files in zip(mods, file_sets):
+                if self._files_by_mod.get(mod.mod_id) != files:
+                    self._set_mod_files(mod.mod_id, files)
+                    changed += 1
+            self._prune_dirs({mod.local_path for mod in mods})
+        self.save()
+        logger.info(f"[ConflictIndex] Индекс обновлен: модов {len(mods)}, изменилось {changed}, "
+                    f"файлов {len(self._mods_by_file)}, конфликтующих путей {len(self.conflicts())}")
+        return changed
+
+    def _set_mod_files(self, mod_id: str, files: Set[str]):
+        """Заменяет набор файлов мода с обновлением обратной карты. Вызывается под блокировкой."""
+        old_files = self._files_by_mod.pop(mod_id, set())
+        for rel_path in old_files - files:
+            owners = self._mods_by_file.get(rel_path)
+            if owners is not None:
+                owners.discard(mod_id)
+                if not owners:
+                    del self._mods_by_file[rel_path]
+        for rel_path in files - old_files:
+            self._mods_by_file.setdefault(rel_path, set()).add(mod_id)
+        if files:
+            self._files_by_mod[mod_id] = files
+
+    def _prune_dirs(self, roots: Set[str]):
+        """Удаляет из кэша папки, не относящиеся к текущим модам. Вызывается под блокировкой."""
+        prefixes = tuple(os.path.join(root, "") for root in roots)
+        stale = [path for path in self._dirs if path not in roots and not path.startswith(prefixes)]
+        for path in stale:
+            del self._dirs[path]
+        if stale:
+            self._dirty = True
+
+    # --- Запросы ---
+    def conflicts(self) -> Dict[str, List[str]]:
+        """Пути, которые есть более чем у одного мода: {путь: [ID модов]}"""
+        with self._lock:
+            return {rel_path: sorted(owners) for rel_path, owners in self._mods_by_file.items() if len(owners) > 1}
+
+    def colliding_mods(self, mod_id: str) -> Dict[str, List[str]]:
+        """Моды, пересекающиеся с данным по файлам: {ID мода: [общие пути]}"""
+        result: Dict[str, List[str]] = {}
+        with self._lock:
+            for rel_path in self._files_by_mod.get(mod_id, ()):
+                for other in self._mods_by_file.get(rel_path, ()):
+                    if other != mod_id:
+                        result.setdefault(other, []).append(rel_path)
+        for paths in result.values():
+            paths.sort()
+        return result
+
+    def providers(self, rel_path: str) -> List[str]:
+        """Моды, содержащие файл с данным относительным путем"""
+        with self._lock:
+            return sorted(self._mods_by_file.get(self.normalize(rel_path), ()))
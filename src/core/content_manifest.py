@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Манифесты содержимого модов: относительный путь, размер, время изменения и хэш каждого файла.
+Позволяют проверять целостность установленных модов локально, без повторной проверки через SteamCMD.
+"""
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Callable
+from loguru import logger
+from src.data.config import CONTENT_MANIFEST_DIR
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ManifestStatus:
+    """Результат проверки мода по манифесту"""
+    OK = "ok"
+    DAMAGED = "damaged"             # Файлы отсутствуют или изменены
+    NO_MANIFEST = "no_manifest"     # Манифест еще не создан
+    MISSING = "missing"             # Папка мода не найдена
+
+
+@dataclass
+class ManifestCheck:
+    """Результат проверки одного мода"""
+    mod_id: str
+    status: str
+    missing: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    extra: List[str] = field(default_factory=list)     # Новые файлы (не считаются повреждением)
+    hashed: int = 0                                    # Сколько файлов пришлось перехэшировать
+
+    @property
+    def ok(self) -> bool:
+        return self.status == ManifestStatus.OK
+
+
+def hash_file(path: str) -> str:
+    """Быстрый хэш файла (BLAKE2b, 128 бит)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_files(mod_path: str) -> Dict[str, Tuple[int, int]]:
+    """Файлы мода: {относительный путь через '/': (размер, mtime_ns)}"""
+    files = {}
+    stack = [mod_path]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    rel_path = os.path.relpath(entry.path, mod_path).replace(os.sep, '/')
+                    files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+class ContentManifestService:
+    """
+    Хранит манифесты по одному файлу на мод (<manifest_dir>/<app_id>/<mod_id>.json)
+    и проверяет моды по ним. Хэширование выполняется в пуле потоков (hashlib освобождает GIL),
+    при обычной проверке перехэшируются только файлы с изменившимся временем изменения.
+    """
+
+    def __init__(self, manifest_dir: str = None, max_workers: Optional[int] = None):
+        self.manifest_dir = manifest_dir or CONTENT_MANIFEST_DIR
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 2) * 2)
+
+    # --- Хранение ---
+    def manifest_path(self, app_id: str, mod_id: str) -> str:
+        return os.path.join(self.manifest_dir, app_id, f"{mod_id}.json")
+
+    def load(self, app_id: str, mod_id: str) -> Optional[Dict]:
+        """Манифест мода или None, если его нет"""
+        path = self.manifest_path(app_id, mod_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"[ContentManifest] Не удалось прочитать манифест {path}: {e}")
+            return None
+
+    def save(self, app_id: str, mod_id: str, manifest: Dict):
+        path = self.manifest_path(app_id, mod_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"[ContentManifest] Ошибка сохранения манифеста {path}: {e}")
+
+    def delete(self, app_id: str, mod_id: str):
+        path = self.manifest_path(app_id, mod_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _hash_many(self, paths: List[str],
+                   on_hashed: Optional[Callable[[str], None]] = None) -> Dict[str, Optional[str]]:
+        """
+        Хэши файлов в пуле потоков; None - файл не удалось прочитать.
+        :param on_hashed: Вызывается в вызывающем потоке для каждого готового файла, в порядке завершения.
+        """
+        def safe_hash(path: str) -> Optional[str]:
+            try:
+                return hash_file(path)
+            except OSError as e:
+                logger.warning(f"[ContentManifest] Не удалось прочитать {path}: {e}")
+                return None
+
+        hashes: Dict[str, Optional[str]] = {}
+        if len(paths) <= 1:
+            for path in paths:
+                hashes[path] = safe_hash(path)
+                if on_hashed:
+                    on_hashed(path)
+            return hashes
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(safe_hash, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                hashes[path] = future.result()
+                if on_hashed:
+                    on_hashed(path)
+        return hashes
+
+    # --- Создание ---
+    def build(self, app_id: str, mod_id: str, mod_path: str) -> Optional[Dict]:
+        """Создает и сохраняет манифест мода по текущему содержимому папки"""
+        return self.build_many(app_id, {mod_id: mod_path}).get(mod_id)
+
+    def build_many(self, app_id: str, mod_paths: Dict[str, str]) -> Dict[str, Dict]:
+        """Создает манифесты нескольких модов; файлы всех модов хэшируются одним пулом"""
+        scans = {}
+        for mod_id, mod_path in mod_paths.items():
+            try:
+                scans[mod_id] = scan_files(mod_path)
+            except OSError as e:
+                logger.warning(f"[ContentManifest] Не удалось просканировать {mod_path}: {e}")
+        hashes = self._hash_many([os.path.join(mod_paths[mod_id], rel_path)
+                                  for mod_id, files in scans.items() for rel_path in files])
+        manifests = {}
+        for mod_id, files in scans.items():
+            manifest = {'mod_id': mod_id, 'created_at': time.time(), 'files': {}}
+            for rel_path, (size, mtime_ns) in files.items():
+                file_hash = hashes.get(os.path.join(mod_paths[mod_id], rel_path))
+                if file_hash:
+                    manifest['files'][rel_path] = {'size': size, 'mtime_ns': mtime_ns, 'hash': file_hash}
+            self.save(app_id, mod_id, manifest)
+            manifests[mod_id] = manifest
+        logger.debug(f"[ContentManifest] Создано манифестов: {len(manifests)} (файлов: {len(hashes)})")
+        return manifests
+
+    # --- Проверка ---
+    def verify(self, app_id: str, mod_id: str, mod_path: str, full: bool = False) -> ManifestCheck:
+        """Проверяет один мод. См. verify_many."""
+        return self.verify_many(app_id, {mod_id: mod_path}, full=full)[mod_id]
+
+    def verify_many(self, app_id: str, mod_paths: Dict[str, str], full: bool = False,
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, ManifestCheck]:
+        """
+        Проверяет моды по манифестам. Файл с тем же размером и временем изменения считается
+        неизмененным; остальные (или все при full=True) перехэшируются. Если хэш совпал,
+        в манифесте обновляется время изменения, чтобы следующая проверка его не хэшировала.
+        :param progress_callback: Вызывается как progress_callback(проверено, всего) по мере того,
+            как у модов заканчивается хэширование файлов.
+        """
+        results: Dict[str, ManifestCheck] = {}
+        pending: Dict[str, Tuple[Dict, Dict[str, Tuple[int, int]], List[str]]] = {}
+        for mod_id, mod_path in mod_paths.items():
+            manifest = self.load(app_id, mod_id)
+            if manifest is None:
+                results[mod_id] = ManifestCheck(mod_id, ManifestStatus.NO_MANIFEST)
+                continue
+            if not os.path.isdir(mod_path):
+                results[mod_id] = ManifestCheck(mod_id, ManifestStatus.MISSING)
+                continue
+            try:
+                files = scan_files(mod_path)
+            except OSError as e:
+                logger.warning(f"[ContentManifest] Не удалось просканировать {mod_path}: {e}")
+                results[mod_id] = ManifestCheck(mod_id, ManifestStatus.MISSING)
+                continue
+
+            check = ManifestCheck(mod_id, ManifestStatus.OK)
+            to_hash = []
+            for rel_path, entry in manifest['files'].items():
+                current = files.get(rel_path)
+                if current is None:
+                    check.missing.append(rel_path)
+                elif current[0] != entry['size']:
+                    check.changed.append(rel_path)
+                elif full or current[1] != entry['mtime_ns']:
+                    to_hash.append(rel_path)
+            check.extra = sorted(set(files) - set(manifest['files']))
+            results[mod_id] = check
+            pending[mod_id] = (manifest, files, to_hash)
+
+        # Прогресс по модам: мод проверен, когда готовы хэши всех его файлов
+        owners = {os.path.join(mod_paths[mod_id], rel_path): mod_id
+                  for mod_id, (_manifest, _files, to_hash) in pending.items() for rel_path in to_hash}
+        remaining = dict.fromkeys(pending, 0)
+        for mod_id in owners.values():
+            remaining[mod_id] += 1
+        done = sum(1 for count in remaining.values() if count == 0)
+        if progress_callback and done:
+            progress_callback(done, len(pending))
+
+        def on_hashed(path: str):
+            nonlocal done
+            mod_id = owners[path]
+            remaining[mod_id] -= 1
+            if remaining[mod_id] == 0:
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(pending))
+
+        hashes = self._hash_many(list(owners), on_hashed)
+
+        for mod_id, (manifest, files, to_hash) in pending.items():
+            check = results[mod_id]
+            check.hashed = len(to_hash)
+            touched = False
+            for rel_path in to_hash:
+                entry = manifest['files'][rel_path]
+                if hashes.get(os.path.join(mod_paths[mod_id], rel_path)) != entry['hash']:
+                    check.changed.append(rel_path)
+                elif entry['mtime_ns'] != files[rel_path][1]:
+                    entry['mtime_ns'] = files[rel_path][1]
+                    touched = True
+            if check.missing or check.changed:
+                check.status = ManifestStatus.DAMAGED
+                logger.warning(f"[ContentManifest] Мод {mod_id} поврежден: отсутствует {len(check.missing)}, "
+                               f"изменено {len(check.changed)} файлов")
+            if touched:
+                self.save(app_id, mod_id, manifest)
+        return results
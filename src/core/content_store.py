@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Общее хранилище содержимого модов с адресацией по хэшу.
+Одинаковые файлы (один мод у нескольких игр или профилей) хранятся один раз,
+а в папках модов заменяются жесткими ссылками (или символическими, если жесткие невозможны).
+Файлы хранилища доступны только для чтения: правка на месте в одной папке мода изменила бы его во всех.
+"""
+import os
+import stat
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+from src.data.config import CONTENT_STORE_DIR
+from src.core.content_manifest import hash_file, scan_files
+from src.core.profile_manager import ProfileManager
+from src.models.game import Game
+
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+def _make_writable(func, path, exc_info):
+    """onerror для shutil.rmtree: в Windows файлы только для чтения не удаляются"""
+    os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+    func(path)
+
+
+def remove_tree(path: str):
+    """Удаляет папку мода вместе с файлами хранилища только для чтения"""
+    shutil.rmtree(path, onerror=_make_writable)
+
+
+def store_roots(games: Iterable[Game]) -> List[str]:
+    """Папки, файлы которых могут ссылаться на хранилище: моды игр и хранилища их профилей"""
+    roots = []
+    for game in games:
+        if game.mods_path:
+            profiles = ProfileManager(game)
+            roots.extend([profiles.mods_path, profiles.store_path])
+    return roots
+
+
+class LinkResult:
+    """Что произошло с файлом при добавлении в хранилище"""
+    STORED = "stored"           # Файл стал первой копией в хранилище
+    LINKED = "linked"           # Заменен жесткой ссылкой на уже хранящийся файл
+    SYMLINKED = "symlinked"     # Заменен символической ссылкой
+    ALREADY = "already"         # Уже ссылается на хранилище
+    SKIPPED = "skipped"         # Не удалось обработать
+
+
+@dataclass
+class IngestStats:
+    """Итог добавления папки мода в хранилище"""
+    files: int = 0
+    stored: int = 0
+    linked: int = 0
+    symlinked: int = 0
+    already: int = 0
+    skipped: int = 0
+    bytes_deduplicated: int = 0     # Место, освобожденное заменой копий ссылками
+
+    def add(self, result: str, size: int):
+        self.files += 1
+        setattr(self, result, getattr(self, result) + 1)
+        if result in (LinkResult.LINKED, LinkResult.SYMLINKED):
+            self.bytes_deduplicated += size
+
+
+@dataclass
+class StoreReport:
+    """Использование места хранилищем"""
+    blobs: int = 0
+    references: int = 0
+    store_bytes: int = 0            # Фактически занято на диске
+    logical_bytes: int = 0          # Занимали бы отдельные копии
+    garbage_blobs: int = 0          # Файлы, на которые больше никто не ссылается
+    garbage_bytes: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return max(self.logical_bytes - (self.store_bytes - self.garbage_bytes), 0)
+
+
+class ContentStore:
+    """
+    Хранилище файлов по хэшу: <store_dir>/objects/<2 символа>/<остаток хэша>.
+    Файл хранилища общий для всех ссылок на него, поэтому у него снимаются права на запись.
+    Используется ли файл, определяется обходом папок модов (store_roots), а не счетчиком
+    жестких ссылок: снимки и другие копии тоже держат ссылки на те же данные.
+    """
+
+    LINK_SUFFIX = ".gmm-link"
+
+    def __init__(self, store_dir: str = None):
+        self.store_dir = store_dir or CONTENT_STORE_DIR
+        self.objects_dir = os.path.join(self.store_dir, "objects")
+        self._lock = threading.Lock()
+
+    # --- Добавление ---
+    def _blob_path(self, file_hash: str) -> str:
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash[2:])
+
+    @staticmethod
+    def _protect(blob_path: str):
+        """Снимает права на запись: изменить общий файл можно только заменив его в папке мода"""
+        mode = stat.S_IMODE(os.stat(blob_path).st_mode)
+        if mode & _WRITE_BITS:
+            os.chmod(blob_path, mode & ~_WRITE_BITS)
+
+    def _replace_with_link(self, blob_path: str, path: str) -> str:
+        """Заменяет файл ссылкой на blob (атомарно, через временное имя)"""
+        tmp_path = path + self.LINK_SUFFIX
+        try:
+            os.link(blob_path, tmp_path)
+            os.replace(tmp_path, path)
+            return LinkResult.LINKED
+        except OSError:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+        # Хранилище на другом диске - остается символическая ссылка
+        try:
+            os.symlink(os.path.abspath(blob_path), tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            logger.debug(f"[ContentStore] Не удалось создать ссылку для {path}: {e}")
+            return LinkResult.SKIPPED
+        return LinkResult.SYMLINKED
+
+    def ingest_file(self, path: str, file_hash: str) -> str:
+        """Добавляет файл в хранилище и при наличии копии заменяет его ссылкой"""
+        if os.path.islink(path):
+            return LinkResult.SKIPPED
+        blob_path = self._blob_path(file_hash)
+        file_stat = os.stat(path)
+        try:
+            blob_stat = os.stat(blob_path)
+        except FileNotFoundError:
+            blob_stat = None
+
+        if blob_stat is not None:
+            # Файлы, добавленные до появления защиты, тоже становятся только для чтения
+            self._protect(blob_path)
+            if (blob_stat.st_dev, blob_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino):
+                return LinkResult.ALREADY
+            if blob_stat.st_size != file_stat.st_size:
+                logger.warning(f"[ContentStore] Размер {path} не совпадает с хранимым файлом {file_hash}")
+                return LinkResult.SKIPPED
+            return self._replace_with_link(blob_path, path)
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            # Первая копия сама становится файлом хранилища - без копирования данных
+            os.link(path, blob_path)
+            self._protect(blob_path)
+            return LinkResult.STORED
+        except FileExistsError:
+            return self.ingest_file(path, file_hash)
+        except OSError:
+            shutil.copy2(path, blob_path)
+            self._protect(blob_path)
+            result = self._replace_with_link(blob_path, path)
+            return LinkResult.STORED if result != LinkResult.SKIPPED else result
+
+    def ingest_mod(self, mod_path: str, manifest: Optional[Dict] = None) -> IngestStats:
+        """
+        Добавляет все файлы мода в хранилище. Хэши берутся из манифеста (content_manifest),
+        если размер и время изменения файла совпадают, иначе файл хэшируется заново.
+        """
+        stats = IngestStats()
+        manifest_files = (manifest or {}).get('files', {})
+        try:
+            files = scan_files(mod_path)
+        except OSError as e:
+            logger.warning(f"[ContentStore] Не удалось просканировать {mod_path}: {e}")
+            return stats
+        for rel_path, (size, mtime_ns) in files.items():
+            path = os.path.join(mod_path, *rel_path.split('/'))
+            entry = manifest_files.get(rel_path)
+            try:
+                if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+                    file_hash = entry['hash']
+                else:
+                    file_hash = hash_file(path)
+                stats.add(self.ingest_file(path, file_hash), size)
+            except OSError as e:
+                logger.warning(f"[ContentStore] Ошибка обработки {path}: {e}")
+                stats.add(LinkResult.SKIPPED, size)
+        logger.debug(f"[ContentStore] {mod_path}: {stats}")
+        return stats
+
+    # --- Обслуживание ---
+    def _iter_blobs(self):
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                yield prefix + name, os.path.join(prefix_dir, name)
+
+    def has_blobs(self) -> bool:
+        """Есть ли в хранилище хотя бы один файл (без обхода всего хранилища)"""
+        return next(self._iter_blobs(), None) is not None
+
+    def _collect_references(self, roots: Iterable[str]) -> Tuple[Dict[Tuple[int, int], int], Dict[str, int]]:
+        """
+        Обходит папки модов, переходя по ссылкам на папки (представления профилей).
+        Файлы сравниваются по (st_dev, st_ino): номера inode на разных дисках могут совпадать.
+        :return: ({(устройство, inode) файла: число путей}, {путь blob: число символических ссылок на него})
+        """
+        inodes: Dict[Tuple[int, int], int] = {}
+        symlinks: Dict[str, int] = {}
+        objects_dir = os.path.realpath(self.objects_dir) + os.sep
+        visited: Set[str] = set()
+        stack = [os.path.realpath(root) for root in roots if os.path.isdir(root)]
+        while stack:
+            folder = stack.pop()
+            if folder in visited:
+                continue
+            visited.add(folder)
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_symlink():
+                                target = os.path.realpath(entry.path)
+                                if os.path.isdir(target):
+                                    stack.append(target)
+                                elif target.startswith(objects_dir):
+                                    symlinks[target] = symlinks.get(target, 0) + 1
+                            elif entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                # DirEntry.stat() в Windows не заполняет st_dev и st_ino
+                                file_stat = os.stat(entry.path, follow_symlinks=False)
+                                key = (file_stat.st_dev, file_stat.st_ino)
+                                inodes[key] = inodes.get(key, 0) + 1
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.warning(f"[ContentStore] Не удалось просканировать {folder}: {e}")
+        return inodes, symlinks
+
+    def _reference_counts(self, roots: Iterable[str]):
+        """Число ссылок из папок модов на каждый файл хранилища: (хэш, путь, stat, ссылки)"""
+        inodes, symlinks = self._collect_references(roots)
+        for file_hash, blob_path in list(self._iter_blobs()):
+            try:
+                blob_stat = os.stat(blob_path)
+            except OSError:
+                continue
+            references = (inodes.get((blob_stat.st_dev, blob_stat.st_ino), 0)
+                          + symlinks.get(os.path.realpath(blob_path), 0))
+            yield file_hash, blob_path, blob_stat, references
+
+    def space_report(self, roots: Iterable[str]) -> StoreReport:
+        """Сколько места занимает хранилище и сколько сэкономлено (roots - см. store_roots)"""
+        report = StoreReport()
+        with self._lock:
+            for _, _, blob_stat, references in self._reference_counts(roots):
+                report.blobs += 1
+                report.references += references
+                report.store_bytes += blob_stat.st_size
+                report.logical_bytes += blob_stat.st_size * references
+                if references == 0:
+                    report.garbage_blobs += 1
+                    report.garbage_bytes += blob_stat.st_size
+        return report
+
+    def collect_garbage(self, roots: Iterable[str]) -> Tuple[int, int]:
+        """
+        Удаляет файлы, на которые не ссылается ни одна папка мода из roots (см. store_roots).
+        Копии в снимках и других папках вне roots сохраняют свои данные - удаляется только запись хранилища.
+        Возвращает (количество, байты).
+        """
+        removed = 0
+        freed = 0
+        with self._lock:
+            for _, blob_path, blob_stat, references in self._reference_counts(roots):
+                if references > 0:
+                    continue
+                try:
+                    try:
+                        os.remove(blob_path)
+                    except PermissionError:
+                        _make_writable(os.remove, blob_path, None)
+                    removed += 1
+                    freed += blob_stat.st_size
+                except OSError as e:
+                    logger.warning(f"[ContentStore] Не удалось удалить {blob_path}: {e}")
+        logger.info(f"[ContentStore] Очистка хранилища: удалено {removed} файлов, освобождено {freed} байт")
+        return removed, freed
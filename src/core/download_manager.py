@@ -1,49 +1,231 @@
 # src/core/download_manager.py
 import os
+import re
+import json
+import time
 import shutil
-from typing import List, Callable, Optional # Добавлены Callable, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Callable, Optional, Dict, Set # Добавлены Callable, Optional
 from loguru import logger
-from src.models.mod import Mod
+import networkx as nx
+from src.models.mod import Mod, format_size
 from src.models.game import Game
+from src.models.download_item import DownloadItem, DownloadState
 from src.core.steam_handler import SteamHandler
+from src.core.download_queue import DownloadQueue
+from src.core.download_telemetry import DownloadTelemetry, ItemTiming
+from src.core.content_manifest import ContentManifestService
+from src.core.content_store import ContentStore, remove_tree
+from src.data.config import DOWNLOAD_QUEUE_FILE
 
 class DownloadManager:
     """Менеджер загрузок"""
 
-    def __init__(self, steam_handler: SteamHandler):
+    # Повторы неудачных загрузок: задержка растет экспоненциально до RETRY_MAX_DELAY
+    RETRY_BASE_DELAY = 30.0
+    RETRY_MAX_DELAY = 3600.0
+    MAX_ATTEMPTS = 5
+
+    # Контроль свободного места: запас, который всегда остается свободным, и множитель
+    # для SteamCMD (данные сначала скачиваются в downloads, затем распаковываются в content)
+    DISK_SPACE_RESERVE = 512 * 1024 * 1024
+    STEAMCMD_SPACE_FACTOR = 2.0
+
+    # Строки вывода SteamCMD с результатом по отдельному моду
+    _SUCCESS_PATTERN = re.compile(r'Success\. Downloaded item (\d+)')
+    _ERROR_PATTERN = re.compile(r'(?:ERROR!|Failure\.|Failed to) Download item (\d+)', re.I)
+
+    # Изменения очереди за это время записываются на диск одним сохранением
+    SAVE_DELAY = 1.0
+
+    def __init__(self, steam_handler: SteamHandler, queue_file: str = None, max_workers: int = 3,
+                 steam_workshop_service=None, telemetry: Optional[DownloadTelemetry] = None,
+                 manifests: Optional[ContentManifestService] = None,
+                 content_store: Optional[ContentStore] = None):
         self.steam_handler = steam_handler
-        self._download_queue: List[Mod] = []
+        self.steam_workshop_service = steam_workshop_service  # Размеры модов для проверки места
+        self.telemetry = telemetry or DownloadTelemetry()
+        # Время скачивания модов, ожидающих установки (запись в телеметрию после перемещения)
+        self._item_timings: Dict[str, ItemTiming] = {}
+        # Манифесты установленных модов для локальной проверки целостности
+        self.manifests = manifests or ContentManifestService()
+        # Общее хранилище для дедупликации файлов модов (необязательно, включается в настройках)
+        self.content_store = content_store
+        self.max_workers = max_workers  # Параллельные установки внутри одного этапа
+        self.queue_file = queue_file or DOWNLOAD_QUEUE_FILE
+        self.queue = DownloadQueue()
+        self._load_queue()
+        # Любое изменение очереди сохраняется на диск (с задержкой SAVE_DELAY, см. flush)
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self.queue.subscribe(self._on_queue_changed)
+
+    # --- Сохранение очереди ---
+    def _load_queue(self):
+        """Загрузка сохраненной очереди из файла"""
+        try:
+            if not os.path.exists(self.queue_file):
+                return
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            items = [DownloadItem.from_dict(item_data) for item_data in data.get('items', [])]
+            for item in items:
+                # Загрузка прервана закрытием приложения - начинаем этот элемент заново
+                if item.state == DownloadState.DOWNLOADING:
+                    item.set_state(DownloadState.PENDING)
+            self.queue.add_many(item for item in items if item.state != DownloadState.INSTALLED)
+            logger.info(f"[DownloadManager] Восстановлена очередь загрузки: {len(self.queue)} модов.")
+        except Exception as e:
+            logger.error(f"[DownloadManager] Ошибка загрузки очереди из {self.queue_file}: {e}")
+            self.queue.clear()
+
+    def _save_queue(self):
+        """Сохранение очереди в файл (через временный файл, чтобы не повредить очередь при сбое)"""
+        try:
+            os.makedirs(os.path.dirname(self.queue_file), exist_ok=True)
+            tmp_path = self.queue_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'items': [item.to_dict() for item in self.queue.items()]}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.queue_file)
+        except Exception as e:
+            logger.error(f"[DownloadManager] Ошибка сохранения очереди: {e}")
 
+    def _on_queue_changed(self, event: str, items: List[DownloadItem]):
+        """
+        Планирует сохранение очереди после изменения. Серия изменений (этапы загрузки,
+        добавление модов по одному) записывается одним сохранением, а не файлом на каждое.
+        """
+        with self._save_lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Немедленно сохраняет отложенные изменения очереди (после партии загрузки и при закрытии приложения)"""
+        with self._save_lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            self._save_queue()
+
+    def _commit_states(self, items: List[DownloadItem]):
+        """Сообщает подписчикам об изменении состояния элементов (и планирует сохранение очереди)"""
+        self.queue.notify_changed(items)
+
+    # --- Работа с очередью ---
     def add_to_queue(self, mod: Mod):
         """Добавление мода в очередь загрузки"""
-        if not any(m.mod_id == mod.mod_id for m in self._download_queue):
-            self._download_queue.append(mod)
+        if self.queue.add(DownloadItem(mod=mod, updated_at=time.time())):
             logger.info(f"[DownloadManager] Мод {mod.name} ({mod.mod_id}) добавлен в очередь.")
         else:
             logger.warning(f"[DownloadManager] Мод {mod.mod_id} уже находится в очереди.")
 
+    def add_many_to_queue(self, mods: List[Mod], validate: bool = False) -> List[Mod]:
+        """
+        Добавление нескольких модов одной операцией. Возвращает добавленные (без дубликатов).
+        validate=True - при загрузке запросить у SteamCMD проверку файлов (для поврежденных модов).
+        """
+        now = time.time()
+        added = self.queue.add_many(DownloadItem(mod=mod, updated_at=now, validate=validate) for mod in mods)
+        if validate:
+            # Моды, которые уже были в очереди, тоже загружаются с проверкой
+            flagged = [item for item in (self.queue.get(mod.mod_id) for mod in mods) if item and not item.validate]
+            for item in flagged:
+                item.validate = True
+            self._commit_states(flagged)
+        logger.info(f"[DownloadManager] В очередь добавлено {len(added)} из {len(mods)} модов.")
+        return [item.mod for item in added]
+
     def remove_from_queue(self, mod_id: str):
         """Удаление мода из очереди загрузки"""
-        self._download_queue = [mod for mod in self._download_queue if mod.mod_id != mod_id]
+        self.queue.remove(mod_id)
         logger.debug(f"Мод с ID {mod_id} удален из очереди загрузки")
 
+    def remove_many_from_queue(self, mod_ids: List[str]) -> int:
+        """Удаление нескольких модов из очереди. Возвращает количество удаленных."""
+        removed = self.queue.remove_many(mod_ids)
+        logger.debug(f"Из очереди загрузки удалено {len(removed)} модов")
+        return len(removed)
+
     def clear_queue(self):
         """Очистка всей очереди загрузки"""
-        count = len(self._download_queue)
-        self._download_queue.clear()
+        count = self.queue.clear()
         logger.info(f"Очередь загрузки очищена. Удалено {count} модов.")
 
     def get_queue(self) -> List[Mod]:
         """Получение копии очереди загрузки"""
-        return self._download_queue.copy()
+        return self.queue.mods()
+
+    def get_queue_items(self) -> List[DownloadItem]:
+        """Получение копии очереди вместе с состоянием каждого элемента"""
+        return self.queue.items()
+
+    def _ready_items(self, queue_items: List[DownloadItem], now: float) -> List[DownloadItem]:
+        """Элементы, которые можно скачивать сейчас: ожидающие и неудачные, у которых наступило время повтора"""
+        return [item for item in queue_items if item.is_ready(now) and item.attempts < self.MAX_ATTEMPTS]
+
+    def get_run_items(self) -> List[DownloadItem]:
+        """
+        Моды, которые скачает следующий запуск download_mods_queue (например, для счетчика прогресса).
+        Не учитываются отложенные до повтора и моды, которые будут заблокированы из-за них.
+        """
+        queue_items = self.queue.items()
+        ready = self._ready_items(queue_items, time.time())
+        ready_ids = {item.mod_id for item in ready}
+        waiting = {item.mod_id for item in queue_items
+                   if item.state == DownloadState.FAILED and item.mod_id not in ready_ids}
+        # Блокировка передается по цепочке зависимостей
+        while True:
+            blocked = [item for item in ready if self._get_prerequisites(item) & waiting]
+            if not blocked:
+                return ready
+            waiting.update(item.mod_id for item in blocked)
+            ready = [item for item in ready if item.mod_id not in waiting]
+
+    def get_item(self, mod_id: str) -> Optional[DownloadItem]:
+        """Получение элемента очереди по ID мода"""
+        return self.queue.get(mod_id)
 
     def is_in_queue(self, mod_id: str) -> bool:
         """Проверяет, находится ли мод с заданным ID в очереди."""
-        return any(mod.mod_id == mod_id for mod in self._download_queue)
+        return mod_id in self.queue
+
+    def retry_failed(self):
+        """Сбрасывает счетчики попыток у неудачных и заблокированных элементов, чтобы повторить их сразу."""
+        reset = []
+        for item in self.queue.items():
+            if item.state in (DownloadState.FAILED, DownloadState.BLOCKED):
+                item.attempts = 0
+                item.next_retry_at = 0.0
+                item.set_state(DownloadState.PENDING)
+                reset.append(item)
+        self._commit_states(reset)
+        logger.info(f"[DownloadManager] {len(reset)} неудачных загрузок возвращены в очередь.")
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Задержка перед следующей попыткой (экспоненциальная, с ограничением сверху)"""
+        return min(self.RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), self.RETRY_MAX_DELAY)
+
+    def _mark_failed(self, item: DownloadItem, error: str):
+        """Перевод элемента в состояние ошибки с расчетом времени следующей попытки"""
+        item.attempts += 1
+        item.next_retry_at = time.time() + self._retry_delay(item.attempts)
+        item.set_state(DownloadState.FAILED, error)
+        logger.warning(f"[DownloadManager] Мод {item.mod_id}: {error} (попытка {item.attempts}/{self.MAX_ATTEMPTS})")
 
     # Модифицируем download_mods_queue для поддержки log_callback
     def download_mods_queue(self, game: Game, log_callback: Optional[Callable[[str], None]] = None) -> bool:
-        """Загрузка модов из очереди. Блокирует вызывающий поток."""
+        """
+        Загрузка модов из очереди. Блокирует вызывающий поток.
+        Загружаются только ожидающие элементы и неудачные, у которых истекла задержка повтора;
+        уже скачанные, но не установленные моды устанавливаются без повторной загрузки.
+        Моды загружаются этапами в порядке зависимостей; если зависимость не установилась,
+        зависящие от нее моды помечаются заблокированными.
+        Установленные моды удаляются из очереди, неудачные остаются в ней.
+        """
         if not self.steam_handler.is_initialized:
             logger.error("SteamCMD не инициализирован")
             if log_callback:
@@ -59,75 +241,432 @@ class DownloadManager:
                     log_callback(f"!!! ОШИБКА: Не удалось создать папку модов: {e}")
                 return False
 
-        mods_to_download = self._download_queue
-        if not mods_to_download:
+        if not self.queue:
             logger.info("Очередь загрузки пуста")
             if log_callback:
                 log_callback("-> Очередь загрузки пуста.")
             return True
 
         app_id = game.steam_id
-        login_cmd = self.steam_handler.get_login_command() # Проверено, что метод существует
+        content_path = self._get_content_path(game)
 
-        mod_ids = [mod.mod_id for mod in mods_to_download]
-        logger.info(f"Начинается загрузка {len(mod_ids)} модов для игры {game.name} (AppID: {app_id})")
-        if log_callback:
-            log_callback(f"-> Начинается загрузка {len(mod_ids)} модов для игры {game.name} (AppID: {app_id})")
+        # 1. Моды, скачанные в прошлом запуске, но не перемещенные - только устанавливаем
+        queue_items = self.queue.items()
+        downloaded = [item for item in queue_items if item.state == DownloadState.DOWNLOADED]
+        if downloaded:
+            logger.info(f"[DownloadManager] Установка {len(downloaded)} ранее скачанных модов.")
+            if log_callback:
+                log_callback(f"-> Установка {len(downloaded)} ранее скачанных модов")
+            self._install_items(downloaded, game, content_path)
 
-        # Передаем log_callback в SteamHandler
-        success = self.steam_handler.download_mods(app_id, mod_ids, log_callback=log_callback)
-        if success:
-            success = self._move_downloaded_mods(game)
-            if success:
-                logger.info("Все моды успешно загружены и перемещены.")
-                if log_callback:
-                    log_callback("=== Все моды успешно загружены и перемещены! ===")
-                self._download_queue.clear()
-                return True
-            else:
-                logger.error("Ошибка при перемещении модов")
+        # 2. Ожидающие и неудачные моды, для которых наступило время повтора
+        now = time.time()
+        to_download = self._ready_items(queue_items, now)
+        postponed = [item for item in queue_items
+                     if item.state == DownloadState.FAILED and not item.is_ready(now)]
+        if postponed:
+            logger.info(f"[DownloadManager] Отложено до следующей попытки: {[item.mod_id for item in postponed]}")
+            if log_callback:
+                log_callback(f"-> Отложено до следующей попытки: {len(postponed)} модов")
+
+        out_of_space = False
+        if to_download and not self._check_disk_space(to_download, game, content_path, log_callback):
+            to_download = []
+            out_of_space = True
+
+        if to_download:
+            logger.info(f"Начинается загрузка {len(to_download)} модов для игры {game.name} (AppID: {app_id})")
+            if log_callback:
+                log_callback(f"-> Начинается загрузка {len(to_download)} модов для игры {game.name} (AppID: {app_id})")
+            same_volume = self._get_device(content_path) == self._get_device(game.mods_path)
+            remaining_bytes = sum(item.mod.file_size for item in to_download)
+
+            waves = self._build_waves(to_download)
+            # Кэш SteamCMD очищается только перед первым запуском; этапы и партии одной загрузки его не трогают
+            first_session = True
+            pending_ids = {item.mod_id for item in to_download}
+            if len(waves) > 1:
+                logger.info(f"[DownloadManager] Загрузка с учетом зависимостей: {len(waves)} этапов")
                 if log_callback:
-                    log_callback("!!! ОШИБКА: Ошибка при перемещении модов.")
+                    log_callback(f"-> Загрузка с учетом зависимостей: {len(waves)} этапов")
+            for wave_index, wave in enumerate(waves, start=1):
+                ready = self._block_items_with_failed_prerequisites(wave, pending_ids)
+                pending_ids.difference_update(item.mod_id for item in wave)
+                # Заблокированные моды скачиваться не будут - место под них не резервируется
+                remaining_bytes -= sum(item.mod.file_size for item in wave if item not in ready)
+                wave = ready
+                if not wave:
+                    continue
+                if len(waves) > 1 and log_callback:
+                    log_callback(f"-> Этап {wave_index}/{len(waves)}: {len(wave)} модов")
+                # Этап скачивается партиями, которые помещаются на диск SteamCMD;
+                # установка партии освобождает место для следующей
+                pending = list(wave)
+                while pending:
+                    batch = self._take_disk_batch(pending, content_path, same_volume, remaining_bytes)
+                    if not batch:
+                        out_of_space = True
+                        break
+                    pending = pending[len(batch):]
+                    if pending:
+                        logger.info(f"[DownloadManager] Партия из {len(batch)} модов, "
+                                    f"{format_size(sum(item.mod.file_size for item in batch))}")
+                        if log_callback:
+                            log_callback(f"-> Партия из {len(batch)} модов (ограничение по свободному месту)")
+                    self._download_items(batch, game, content_path, log_callback, clean_cache=first_session)
+                    first_session = False
+                    self._install_items([item for item in batch if item.state == DownloadState.DOWNLOADED],
+                                        game, content_path)
+                    remaining_bytes -= sum(item.mod.file_size for item in batch)
+                    # Результат партии сохраняется сразу: при сбое установленные моды не скачиваются заново
+                    self.flush()
+                if out_of_space:
+                    break
+
+        # Установленные моды больше не нужны в очереди
+        installed_count = len(self.queue.remove_many(
+            [item.mod_id for item in self.queue.items() if item.state == DownloadState.INSTALLED]))
+        self.flush()
+        self.telemetry.save()
+
+        queue_items = self.queue.items()
+        failed = [item for item in queue_items if item.state == DownloadState.FAILED]
+        blocked = [item for item in queue_items if item.state == DownloadState.BLOCKED]
+        logger.info(f"[DownloadManager] Загрузка завершена. Установлено: {installed_count}, ошибок: {len(failed)}, "
+                    f"заблокировано: {len(blocked)}, осталось в очереди: {len(self.queue)}")
+        if blocked and log_callback:
+            log_callback(f"!!! Не установлено из-за ошибок в зависимостях: {len(blocked)} модов.")
+        if out_of_space:
+            if log_callback:
+                log_callback("!!! ОШИБКА: Недостаточно свободного места. Оставшиеся моды остались в очереди.")
+            return False
+        if failed or blocked:
+            if log_callback:
+                log_callback(f"!!! ОШИБКА: Не удалось загрузить {len(failed) + len(blocked)} модов. Они останутся в очереди для повтора.")
+            return False
+        if log_callback:
+            log_callback("=== Все моды успешно загружены и перемещены! ===")
+        return True
+
+    # --- Контроль свободного места ---
+    @staticmethod
+    def _get_existing_path(path: str) -> str:
+        """Ближайшая существующая папка на пути (папка загрузок может быть еще не создана)"""
+        path = os.path.abspath(path)
+        while not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        return path
+
+    def _get_free_space(self, path: str) -> int:
+        return shutil.disk_usage(self._get_existing_path(path)).free
+
+    def _get_device(self, path: str) -> int:
+        return os.stat(self._get_existing_path(path)).st_dev
+
+    def _resolve_sizes(self, items: List[DownloadItem]):
+        """Заполняет неизвестные размеры модов из метаданных Workshop (один пакетный запрос)"""
+        unknown = [item for item in items if not item.mod.file_size]
+        if not unknown or not self.steam_workshop_service:
+            return
+        try:
+            details = self.steam_workshop_service.get_published_file_details([item.mod_id for item in unknown])
+        except Exception as e:
+            logger.warning(f"[DownloadManager] Не удалось получить размеры модов: {e}")
+            return
+        for item in unknown:
+            item.mod.file_size = details.get(item.mod_id, {}).get('file_size', 0) or 0
+
+    def _check_disk_space(self, items: List[DownloadItem], game: Game, content_path: str,
+                          log_callback: Optional[Callable[[str], None]] = None) -> bool:
+        """
+        Предварительная проверка места: все моды должны поместиться в папку модов,
+        а самый крупный мод - в папку SteamCMD вместе с временными файлами.
+        Если недостаточно, загрузка не начинается и элементы остаются в очереди.
+        Моды с неизвестным размером не учитываются.
+        """
+        self._resolve_sizes(items)
+        sizes = [item.mod.file_size for item in items]
+        total = sum(sizes)
+        unknown_count = sizes.count(0)
+        if unknown_count:
+            logger.info(f"[DownloadManager] Размер неизвестен для {unknown_count} модов, они не учитываются в проверке места")
+        if not total:
+            return True
+
+        try:
+            mods_free = self._get_free_space(game.mods_path)
+            steamcmd_free = self._get_free_space(content_path)
+        except OSError as e:
+            logger.warning(f"[DownloadManager] Не удалось проверить свободное место: {e}")
+            return True
+
+        logger.info(f"[DownloadManager] Требуется {format_size(total)}, свободно: "
+                    f"папка модов {format_size(mods_free)}, SteamCMD {format_size(steamcmd_free)}")
+        errors = []
+        largest = max(sizes) * self.STEAMCMD_SPACE_FACTOR
+        if self._get_device(content_path) == self._get_device(game.mods_path):
+            # Один диск: итоговый объем модов плюс временные файлы самого крупного мода
+            required = total + largest - max(sizes)
+            if required + self.DISK_SPACE_RESERVE > mods_free:
+                errors.append(f"нужно {format_size(required)}, свободно {format_size(mods_free)}")
         else:
-            logger.error("Ошибка при скачивании модов через SteamCMD")
-            # Сообщение об ошибке уже должно быть передано через log_callback из SteamHandler
-        return False
+            if total + self.DISK_SPACE_RESERVE > mods_free:
+                errors.append(f"в папке модов нужно {format_size(total)}, свободно {format_size(mods_free)}")
+            if largest + self.DISK_SPACE_RESERVE > steamcmd_free:
+                errors.append(f"SteamCMD нужно не меньше {format_size(largest)}, свободно {format_size(steamcmd_free)}")
+        if errors:
+            message = "Недостаточно места на диске: " + "; ".join(errors)
+            logger.error(f"[DownloadManager] {message}")
+            if log_callback:
+                log_callback(f"!!! ОШИБКА: {message}")
+            return False
+        return True
 
-    def _move_downloaded_mods(self, game: Game) -> bool:
-        """Перемещение скачанных модов в папку игры"""
+    def _take_disk_batch(self, pending: List[DownloadItem], content_path: str, same_volume: bool,
+                         remaining_bytes: int) -> List[DownloadItem]:
+        """
+        Первые моды из pending, которые помещаются в текущее свободное место SteamCMD.
+        Если SteamCMD и моды на одном диске, место под еще не скачанные моды не занимается.
+        Пустой список - даже первый мод не помещается.
+        """
         try:
-            steamcmd_base_path = os.path.dirname(self.steam_handler.steamcmd_path)
-            steamcmd_content_path = os.path.join(steamcmd_base_path, "steamapps", "workshop", "content", game.steam_id)
-
-            logger.debug(f"Путь к скачанным модам: {steamcmd_content_path}")
-            if os.path.exists(steamcmd_content_path):
-                success_count = 0
-                error_count = 0
-                for mod in self._download_queue:
-                    mod_source_path = os.path.join(steamcmd_content_path, mod.mod_id)
-                    mod_dest_path = os.path.join(game.mods_path, mod.mod_id)
-                    if os.path.exists(mod_source_path):
-                        try:
-                            if os.path.exists(mod_dest_path):
-                                shutil.rmtree(mod_dest_path)
-                            shutil.move(mod_source_path, mod_dest_path)
-                            mod.local_path = mod_dest_path
-                            success_count += 1
-                            logger.debug(f"Мод {mod.mod_id} перемещен в {mod_dest_path}")
-                        except Exception as e:
-                            logger.error(f"Ошибка перемещения мода '{mod.name}' (ID: {mod.mod_id}): {e}")
-                            error_count += 1
-                    else:
-                        logger.warning(f"Папка исходного мода не найдена: {mod_source_path}")
-                        error_count += 1
-                logger.info(f"Перемещение модов завершено. Успешно: {success_count}, Ошибок: {error_count}")
-                return error_count == 0
+            budget = self._get_free_space(content_path) - self.DISK_SPACE_RESERVE
+        except OSError:
+            return list(pending)
+        if same_volume:
+            # Установленный мод остается на том же диске: партии доступна только разница
+            # между свободным местом и итоговым размером всех оставшихся модов
+            budget -= remaining_bytes
+            factor = self.STEAMCMD_SPACE_FACTOR - 1
+        else:
+            factor = self.STEAMCMD_SPACE_FACTOR
+
+        batch = []
+        used = 0
+        for item in pending:
+            need = item.mod.file_size * factor
+            if batch and used + need > budget:
+                break
+            if not batch and need > budget:
+                logger.error(f"[DownloadManager] Недостаточно места для загрузки мода {item.mod_id} "
+                             f"({format_size(item.mod.file_size)})")
+                return []
+            batch.append(item)
+            used += need
+        return batch
+
+    # --- Планирование с учетом зависимостей ---
+    def _get_prerequisites(self, item: DownloadItem) -> Set[str]:
+        """ID зависимостей мода, которые сами находятся в очереди"""
+        return {dep.mod_id for dep in item.mod.dependencies
+                if dep.mod_id != item.mod_id and self.is_in_queue(dep.mod_id)}
+
+    def _build_waves(self, items: List[DownloadItem]) -> List[List[DownloadItem]]:
+        """
+        Разбивает моды на этапы по графу зависимостей: моды этапа зависят только от модов
+        предыдущих этапов. Моды одного цикла зависимостей попадают в один этап, а зависящие
+        от цикла - в следующие. Внутри этапа сохраняется порядок очереди.
+        """
+        order = {item.mod_id: index for index, item in enumerate(items)}
+        graph = nx.DiGraph()
+        graph.add_nodes_from(order)
+        for item in items:
+            graph.add_edges_from((dep_id, item.mod_id) for dep_id in self._get_prerequisites(item) if dep_id in order)
+        # Граф компонент сильной связности ацикличен: каждый цикл сжимается в одну вершину
+        condensed = nx.condensation(graph)
+        by_id = {item.mod_id: item for item in items}
+        waves: List[List[DownloadItem]] = []
+        for generation in nx.topological_generations(condensed):
+            wave_ids = set()
+            for component in generation:
+                members = condensed.nodes[component]['members']
+                if len(members) > 1:
+                    logger.warning(f"[DownloadManager] Циклические зависимости в очереди: {sorted(members)}")
+                wave_ids.update(members)
+            waves.append([by_id[mod_id] for mod_id in sorted(wave_ids, key=order.__getitem__)])
+        return waves
+
+    def _block_items_with_failed_prerequisites(self, wave: List[DownloadItem],
+                                               pending_ids: Set[str]) -> List[DownloadItem]:
+        """
+        Помечает заблокированными моды, у которых зависимость не установилась. Возвращает остальные.
+        :param pending_ids: Моды этого запуска, которые еще не скачивались (текущий и следующие этапы).
+            Их прошлые ошибки не блокируют зависимые моды: в том числе так скачиваются моды одного цикла.
+        """
+        ready = []
+        for item in wave:
+            failed_deps = [dep_id for dep_id in self._get_prerequisites(item)
+                           if dep_id not in pending_ids
+                           and self.get_item(dep_id).state in (DownloadState.FAILED, DownloadState.BLOCKED)]
+            if failed_deps:
+                item.set_state(DownloadState.BLOCKED, f"Не установлены зависимости: {', '.join(failed_deps)}")
+                logger.warning(f"[DownloadManager] Мод {item.mod_id} заблокирован: не установлены зависимости {failed_deps}")
             else:
-                logger.warning(f"Папка с контентом не найдена: {steamcmd_content_path}")
-                return False
+                ready.append(item)
+        self._commit_states(wave)
+        return ready
+
+    def _download_items(self, items: List[DownloadItem], game: Game, content_path: str,
+                        log_callback: Optional[Callable[[str], None]] = None, clean_cache: bool = True):
+        """
+        Скачивает моды одним запуском SteamCMD и отмечает результат для каждого мода.
+        :param clean_cache: Очистить кэш SteamCMD перед запуском (достаточно одного раза за загрузку очереди).
+        """
+        app_id = game.steam_id
+        mod_ids = [item.mod_id for item in items]
+        for item in items:
+            item.set_state(DownloadState.DOWNLOADING)
+        self._commit_states(items)
+
+        # Результат по каждому моду берем из вывода SteamCMD
+        reported_failed = set()
+
+        def parse_line(line: str):
+            error_match = self._ERROR_PATTERN.search(line)
+            if error_match:
+                reported_failed.add(error_match.group(1))
+            if log_callback:
+                log_callback(line)
+
+        # Очередь сама отслеживает завершенные загрузки - кэш результата SteamHandler не нужен
+        self.steam_handler.invalidate_cache(app_id, mod_ids)
+        # Передаем log_callback в SteamHandler
+        # validate нужен только для модов, проверка которых не прошла, и для повторных попыток
+        validate_ids = [item.mod_id for item in items if item.validate or item.attempts]
+        self.steam_handler.download_mods(app_id, mod_ids, log_callback=parse_line, validate_ids=validate_ids,
+                                         clean_cache=clean_cache)
+        session = getattr(self.steam_handler, 'last_session', None)
+        if session:
+            self.telemetry.record_session(session)
+            self._item_timings.update(session.items)
+
+        for item in items:
+            source_path = os.path.join(content_path, item.mod_id)
+            if item.mod_id in reported_failed or not os.path.isdir(source_path):
+                self._mark_failed(item, "SteamCMD не скачал мод")
+                self._record_item(app_id, item, success=False)
+            else:
+                item.set_state(DownloadState.DOWNLOADED)
+        self._commit_states(items)
+
+    def _record_item(self, app_id: str, item: DownloadItem, success: bool, install: Optional[float] = None):
+        """Запись результата по моду в телеметрию"""
+        timing = self._item_timings.pop(item.mod_id, None)
+        self.telemetry.record_item(
+            app_id, item.mod_id,
+            size=(timing.bytes if timing and timing.bytes else item.mod.file_size),
+            download=timing.download if timing else None,
+            validate=timing.validate if timing else None,
+            install=install,
+            success=success
+        )
+
+    def _get_content_path(self, game: Game) -> str:
+        """Путь к папке, куда SteamCMD скачивает моды игры"""
+        steamcmd_base_path = os.path.dirname(self.steam_handler.steamcmd_path)
+        return os.path.join(steamcmd_base_path, "steamapps", "workshop", "content", game.steam_id)
+
+    def _get_install_path(self, mod: Mod, game: Game) -> str:
+        """
+        Папка установки мода. Обновляемый мод заменяется на месте (в том числе в archive
+        или в папке с нестандартным именем), новый - ставится в mods_path/<mod_id>.
+        """
+        if mod.local_path:
+            mods_root = os.path.normcase(os.path.abspath(game.mods_path))
+            local_path = os.path.normcase(os.path.abspath(mod.local_path))
+            if os.path.dirname(local_path) in (mods_root, os.path.join(mods_root, "archive")):
+                return mod.local_path
+        return os.path.join(game.mods_path, mod.mod_id)
+
+    def _move_mod(self, source_path: str, dest_path: str) -> float:
+        """Перемещение одного мода на место установки. Возвращает длительность в секундах."""
+        started = time.monotonic()
+        if os.path.islink(dest_path):
+            # Мод из хранилища профилей: обновляется общая папка, ссылки остаются верными
+            dest_path = os.path.realpath(dest_path)
+        if os.path.exists(dest_path):
+            remove_tree(dest_path)
+        shutil.move(source_path, dest_path)
+        return time.monotonic() - started
+
+    def _install_items(self, items: List[DownloadItem], game: Game, content_path: str):
+        """
+        Перемещение скачанных модов в папку игры. Моды одного этапа независимы,
+        поэтому перемещаются параллельно; состояние обновляется для каждого мода отдельно.
+        """
+        if not items:
+            return
+        logger.debug(f"Путь к скачанным модам: {content_path}")
+        success_count = 0
+        error_count = 0
+        moves = {}
+        for item in items:
+            mod_source_path = os.path.join(content_path, item.mod_id)
+            if not os.path.exists(mod_source_path):
+                logger.warning(f"Папка исходного мода не найдена: {mod_source_path}")
+                self._mark_failed(item, "Скачанная папка мода не найдена")
+                self._record_item(game.steam_id, item, success=False)
+                error_count += 1
+                continue
+            moves[item.mod_id] = (item, mod_source_path, self._get_install_path(item.mod, game))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(moves) or 1))) as executor:
+            futures = {executor.submit(self._move_mod, source, dest): mod_id
+                       for mod_id, (item, source, dest) in moves.items()}
+            for future in as_completed(futures):
+                item, _source, mod_dest_path = moves[futures[future]]
+                mod = item.mod
+                try:
+                    elapsed = future.result()
+                    mod.local_path = mod_dest_path
+                    item.set_state(DownloadState.INSTALLED)
+                    self._record_item(game.steam_id, item, success=True, install=elapsed)
+                    success_count += 1
+                    logger.debug(f"Мод {mod.mod_id} перемещен в {mod_dest_path}")
+                except Exception as e:
+                    logger.error(f"Ошибка перемещения мода '{mod.name}' (ID: {mod.mod_id}): {e}")
+                    self._mark_failed(item, f"Ошибка перемещения: {e}")
+                    self._record_item(game.steam_id, item, success=False)
+                    error_count += 1
+        self._build_manifests(game, [item for item in items if item.state == DownloadState.INSTALLED])
+        # Состояние сохраняется один раз на этап, а не после каждого мода
+        self._commit_states(items)
+        logger.info(f"Перемещение модов завершено. Успешно: {success_count}, Ошибок: {error_count}")
+
+    def _build_manifests(self, game: Game, items: List[DownloadItem]):
+        """
+        Манифесты только что установленных модов - эталон для последующих проверок.
+        Если включено общее хранилище, файлы модов заменяются ссылками на него (хэши берутся из манифестов).
+        """
+        if not items:
+            return
+        manifests = {}
+        try:
+            manifests = self.manifests.build_many(game.steam_id, {item.mod_id: item.mod.local_path for item in items})
         except Exception as e:
-            logger.error(f"Ошибка перемещения модов: {e}")
-            return False
+            logger.error(f"[DownloadManager] Ошибка создания манифестов: {e}")
+        if self.content_store:
+            deduplicated = 0
+            for item in items:
+                try:
+                    deduplicated += self.content_store.ingest_mod(item.mod.local_path,
+                                                                  manifests.get(item.mod_id)).bytes_deduplicated
+                except Exception as e:
+                    logger.error(f"[DownloadManager] Ошибка добавления мода {item.mod_id} в хранилище: {e}")
+            if deduplicated:
+                logger.info(f"[DownloadManager] Общее хранилище: сэкономлено {format_size(deduplicated)}")
+        for item in items:
+            item.validate = False
+
+    def get_state_counts(self) -> Dict[str, int]:
+        """Количество элементов очереди в каждом состоянии"""
+        counts = {state: 0 for state in DownloadState.ALL}
+        for item in self.queue.items():
+            counts[item.state] += 1
+        return counts
 
     @property
     def download_queue(self) -> List[Mod]:
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Очередь загрузки с индексом по ID мода
+"""
+import threading
+from typing import Dict, List, Callable, Iterable, Optional
+from loguru import logger
+from src.models.mod import Mod
+from src.models.download_item import DownloadItem
+
+
+class QueueEvents:
+    """Типы уведомлений об изменении очереди"""
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"     # Изменилось состояние элементов
+    CLEARED = "cleared"
+
+
+class DownloadQueue:
+    """
+    Упорядоченная очередь элементов загрузки.
+    Словарь сохраняет порядок добавления и дает O(1) поиск, проверку и удаление по ID мода.
+    Подписчики получают уведомления вида callback(event, items) из потока, изменившего очередь.
+    """
+
+    def __init__(self, items: Iterable[DownloadItem] = ()):
+        self._items: Dict[str, DownloadItem] = {}
+        self._listeners: List[Callable[[str, List[DownloadItem]], None]] = []
+        self._lock = threading.RLock()
+        for item in items:
+            self._items.setdefault(item.mod_id, item)
+
+    # --- Подписка на изменения ---
+    def subscribe(self, callback: Callable[[str, List[DownloadItem]], None]):
+        """Подписаться на изменения очереди"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, List[DownloadItem]], None]):
+        """Отписаться от изменений очереди"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event: str, items: List[DownloadItem]):
+        if not items and event != QueueEvents.CLEARED:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(event, items)
+            except Exception as e:
+                logger.error(f"[DownloadQueue] Ошибка в обработчике события {event}: {e}")
+
+    # --- Чтение ---
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __contains__(self, mod_id: str) -> bool:
+        return mod_id in self._items
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def get(self, mod_id: str) -> Optional[DownloadItem]:
+        return self._items.get(mod_id)
+
+    def items(self) -> List[DownloadItem]:
+        """Копия элементов в порядке очереди"""
+        with self._lock:
+            return list(self._items.values())
+
+    def mods(self) -> List[Mod]:
+        """Моды в порядке очереди"""
+        with self._lock:
+            return [item.mod for item in self._items.values()]
+
+    # --- Изменение ---
+    def add(self, item: DownloadItem) -> bool:
+        """Добавляет элемент, если мода еще нет в очереди"""
+        return bool(self.add_many([item]))
+
+    def add_many(self, items: Iterable[DownloadItem]) -> List[DownloadItem]:
+        """Добавляет элементы, пропуская уже находящиеся в очереди. Возвращает добавленные."""
+        added = []
+        with self._lock:
+            for item in items:
+                if item.mod_id not in self._items:
+                    self._items[item.mod_id] = item
+                    added.append(item)
+        self._notify(QueueEvents.ADDED, added)
+        return added
+
+    def remove(self, mod_id: str) -> Optional[DownloadItem]:
+        """Удаляет элемент по ID мода"""
+        removed = self.remove_many([mod_id])
+        return removed[0] if removed else None
+
+    def remove_many(self, mod_ids: Iterable[str]) -> List[DownloadItem]:
+        """Удаляет элементы по ID модов. Возвращает удаленные."""
+        removed = []
+        with self._lock:
+            for mod_id in mod_ids:
+                item = self._items.pop(mod_id, None)
+                if item is not None:
+                    removed.append(item)
+        self._notify(QueueEvents.REMOVED, removed)
+        return removed
+
+    def clear(self) -> int:
+        """Очищает очередь. Возвращает количество удаленных элементов."""
+        with self._lock:
+            count = len(self._items)
+            self._items.clear()
+        self._notify(QueueEvents.CLEARED, [])
+        return count
+
+    def notify_changed(self, items: List[DownloadItem]):
+        """Сообщает подписчикам об изменении состояния элементов"""
+        self._notify(QueueEvents.CHANGED, [item for item in items if item.mod_id in self._items])
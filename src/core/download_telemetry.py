@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Телеметрия загрузок: длительность фаз SteamCMD, установки и объем скачанных данных
+"""
+import os
+import re
+import csv
+import json
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Iterable
+from loguru import logger
+from src.data.config import DOWNLOAD_TELEMETRY_FILE
+
+
+class DownloadPhases:
+    """Фазы загрузки, для которых ведется статистика"""
+    STARTUP = "startup"     # Запуск SteamCMD до начала входа
+    LOGIN = "login"         # Вход в Steam
+    DOWNLOAD = "download"   # Скачивание одного мода
+    VALIDATE = "validate"   # Проверка файлов мода
+    INSTALL = "install"     # Перемещение мода в папку игры
+
+    SESSION = (STARTUP, LOGIN)
+    ITEM = (DOWNLOAD, VALIDATE, INSTALL)
+
+
+@dataclass
+class ItemTiming:
+    """Время загрузки одного мода в сессии SteamCMD (секунды)"""
+    download: float = 0.0
+    validate: float = 0.0
+    bytes: int = 0
+    success: bool = False
+
+
+@dataclass
+class SessionTimings:
+    """Время фаз одного запуска SteamCMD (секунды)"""
+    app_id: str
+    started_at: float = 0.0
+    startup: Optional[float] = None
+    login: Optional[float] = None
+    total: float = 0.0
+    items: Dict[str, ItemTiming] = field(default_factory=dict)
+
+
+class SteamCMDSessionTimer:
+    """
+    Засекает фазы сессии SteamCMD по строкам вывода. Строки обрабатываются в момент
+    получения, поэтому время каждой фазы - это время между соответствующими строками.
+    """
+
+    _LOGIN_START = re.compile(r'Logging in user')
+    _LOGIN_DONE = re.compile(r'Waiting for user info\.\.\.OK|Logged in OK')
+    _ITEM_START = re.compile(r'Downloading item (\d+)')
+    _VALIDATE = re.compile(r'Validating|Verifying', re.I)
+    _ITEM_SUCCESS = re.compile(r'Success\. Downloaded item (\d+)(?:.*\((\d+) bytes\))?')
+    _ITEM_ERROR = re.compile(r'(?:ERROR!|Failure\.|Failed to) Download item (\d+)', re.I)
+
+    def __init__(self, app_id: str):
+        self.timings = SessionTimings(app_id=app_id)
+        self._start = 0.0
+        self._login_start: Optional[float] = None
+        self._item_id: Optional[str] = None
+        self._item_start = 0.0
+        self._validate_start: Optional[float] = None
+        self._last_mark = 0.0   # Конец входа или предыдущего мода
+
+    def start(self):
+        self._start = self._last_mark = time.monotonic()
+        self.timings.started_at = time.time()
+
+    def feed(self, line: str):
+        now = time.monotonic()
+        if self._login_start is None and self._LOGIN_START.search(line):
+            self._login_start = now
+            self.timings.startup = now - self._start
+            return
+        if self._login_start is not None and self.timings.login is None and self._LOGIN_DONE.search(line):
+            self._finish_login(now)
+            return
+
+        match = self._ITEM_START.search(line)
+        if match:
+            self._begin_item(match.group(1), now)
+            return
+        if self._item_id and self._validate_start is None and self._VALIDATE.search(line):
+            self._validate_start = now
+            return
+
+        match = self._ITEM_SUCCESS.search(line)
+        if match:
+            self._end_item(match.group(1), now, True, int(match.group(2) or 0))
+            return
+        match = self._ITEM_ERROR.search(line)
+        if match:
+            self._end_item(match.group(1), now, False, 0)
+
+    def finish(self) -> SessionTimings:
+        self.timings.total = time.monotonic() - self._start
+        return self.timings
+
+    def _finish_login(self, now: float):
+        self.timings.login = now - self._login_start
+        self._last_mark = now
+
+    def _begin_item(self, mod_id: str, now: float):
+        if self._login_start is not None and self.timings.login is None:
+            self._finish_login(now)
+        self._item_id = mod_id
+        self._item_start = now
+        self._validate_start = None
+
+    def _end_item(self, mod_id: str, now: float, success: bool, size: int):
+        if self._item_id != mod_id:
+            # SteamCMD не сообщил о начале загрузки - считаем от предыдущей отметки
+            self._begin_item(mod_id, self._last_mark)
+        validate_start = self._validate_start if self._validate_start is not None else now
+        self.timings.items[mod_id] = ItemTiming(
+            download=validate_start - self._item_start,
+            validate=now - validate_start,
+            bytes=size,
+            success=success
+        )
+        self._item_id = None
+        self._validate_start = None
+        self._last_mark = now
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Перцентиль с линейной интерполяцией; values должен быть отсортирован"""
+    if len(values) == 1:
+        return values[0]
+    position = (len(values) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class DownloadTelemetry:
+    """
+    Скользящая история загрузок: записи о сессиях SteamCMD и об отдельных модах.
+    Хранится в JSON; старые записи отбрасываются при превышении лимитов.
+    """
+
+    MAX_SESSIONS = 1000
+    MAX_ITEMS = 5000
+    THROUGHPUT_WINDOW = 24 * 3600   # Окно для оценки текущей скорости (секунды)
+
+    ITEM_FIELDS = ['timestamp', 'app_id', 'mod_id', 'bytes', 'download', 'validate', 'install', 'success']
+
+    def __init__(self, history_file: str = None):
+        self.history_file = history_file or DOWNLOAD_TELEMETRY_FILE
+        self.sessions: List[Dict[str, Any]] = []
+        self.items: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    # --- Хранение ---
+    def load(self):
+        """Загрузка истории из файла"""
+        if not os.path.exists(self.history_file):
+            return
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.sessions = data.get('sessions', [])[-self.MAX_SESSIONS:]
+            self.items = data.get('items', [])[-self.MAX_ITEMS:]
+        except Exception as e:
+            logger.error(f"[DownloadTelemetry] Ошибка загрузки истории: {e}")
+
+    def save(self):
+        """Сохранение истории, если она изменилась"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'sessions': list(self.sessions), 'items': list(self.items)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            tmp_file = self.history_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.history_file)
+        except Exception as e:
+            logger.error(f"[DownloadTelemetry] Ошибка сохранения истории: {e}")
+
+    # --- Запись ---
+    def record_session(self, timings: SessionTimings):
+        """Добавляет запись о запуске SteamCMD"""
+        with self._lock:
+            self.sessions.append({
+                'timestamp': timings.started_at,
+                'app_id': timings.app_id,
+                'items': len(timings.items),
+                'startup': timings.startup,
+                'login': timings.login,
+                'total': timings.total
+            })
+            del self.sessions[:-self.MAX_SESSIONS]
+            self._dirty = True
+
+    def record_item(self, app_id: str, mod_id: str, size: int = 0, download: Optional[float] = None,
+                    validate: Optional[float] = None, install: Optional[float] = None, success: bool = True):
+        """Добавляет запись о моде. Неизвестные фазы передаются как None."""
+        with self._lock:
+            self.items.append({
+                'timestamp': time.time(),
+                'app_id': app_id,
+                'mod_id': mod_id,
+                'bytes': size,
+                'download': download,
+                'validate': validate,
+                'install': install,
+                'success': success
+            })
+            del self.items[:-self.MAX_ITEMS]
+            self._dirty = True
+
+    # --- Запросы ---
+    def _select(self, records: List[Dict[str, Any]], app_id: Optional[str],
+                since: Optional[float]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r for r in records
+                    if (app_id is None or r.get('app_id') == app_id)
+                    and (since is None or r.get('timestamp', 0) >= since)]
+
+    def percentiles(self, phase: str, app_id: Optional[str] = None, points: Iterable[float] = (50, 90, 99),
+                    since: Optional[float] = None) -> Dict[float, float]:
+        """
+        Перцентили длительности фазы (секунды) для игры или всех игр.
+        Пустой словарь, если данных нет.
+        """
+        if phase in DownloadPhases.SESSION:
+            records = self._select(self.sessions, app_id, since)
+        elif phase in DownloadPhases.ITEM:
+            records = [r for r in self._select(self.items, app_id, since) if r.get('success')]
+        else:
+            raise ValueError(f"Неизвестная фаза: {phase}")
+        values = sorted(r[phase] for r in records if r.get(phase) is not None)
+        if not values:
+            return {}
+        return {point: _percentile(values, point) for point in points}
+
+    def recent_throughput(self, app_id: Optional[str] = None, window: Optional[float] = None) -> Optional[float]:
+        """Средняя скорость скачивания (байт/с) успешных модов за последние window секунд"""
+        since = time.time() - (window or self.THROUGHPUT_WINDOW)
+        total_bytes = 0
+        total_time = 0.0
+        for record in self._select(self.items, app_id, since):
+            if record.get('success') and record.get('bytes') and record.get('download') is not None:
+                total_bytes += record['bytes']
+                total_time += record['download'] + (record.get('validate') or 0.0)
+        if not total_bytes or total_time <= 0:
+            return None
+        return total_bytes / total_time
+
+    def summary(self, app_id: Optional[str] = None) -> Dict[str, Any]:
+        """Сводка для отображения: медиана и p90 каждой фазы и текущая скорость"""
+        result: Dict[str, Any] = {}
+        for phase in DownloadPhases.SESSION + DownloadPhases.ITEM:
+            values = self.percentiles(phase, app_id, points=(50, 90))
+            if values:
+                result[phase] = values
+        result['throughput'] = self.recent_throughput(app_id)
+        return result
+
+    # --- Экспорт ---
+    def export(self, path: str):
+        """Экспорт истории: .json - вся история, иначе CSV с записями о модах"""
+        with self._lock:
+            sessions = list(self.sessions)
+            items = list(self.items)
+        if path.lower().endswith('.json'):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'sessions': sessions, 'items': items}, f, ensure_ascii=False, indent=2)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.ITEM_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(items)
+        logger.info(f"[DownloadTelemetry] История загрузок экспортирована в {path}")
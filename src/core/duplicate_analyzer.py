@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск дубликатов и "осиротевших" модов по отпечатку содержимого.
+Дубликаты появляются при переименовании папок, копировании модов Workshop в папки с произвольным
+именем и при остатках в archive. Сравнение идет в два этапа: сначала по списку файлов и их размерам
+(только stat), затем для совпавших деревьев - по выборочным хэшам фрагментов файлов.
+Выборочных хэшей достаточно для группировки, но перед удалением копия побайтно сравнивается
+с оставляемым модом.
+"""
+import os
+import filecmp
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from src.models.mod import Mod
+
+
+@dataclass
+class ModFingerprint:
+    """Отпечаток дерева файлов мода"""
+    mod: Mod
+    real_path: str
+    files: List[Tuple[str, int]] = field(default_factory=list)  # (относительный путь, размер), по порядку
+    total_size: int = 0
+    # Байт, которые освободятся при удалении: файлы с другими жесткими ссылками (снимки, ContentStore) не считаются
+    reclaimable: int = 0
+    tree_digest: str = ""       # Список файлов и размеры
+    content_digest: str = ""    # Выборочные хэши содержимого (считается только для кандидатов)
+
+
+@dataclass
+class DuplicateGroup:
+    """Моды с одинаковым содержимым: keep остается, duplicates предлагаются к удалению"""
+    keep: Mod
+    duplicates: List[Mod] = field(default_factory=list)
+    size: int = 0                   # Размер одной копии
+    reclaimable: int = 0
+
+
+@dataclass
+class ReclaimPlan:
+    """План освобождения места"""
+    groups: List[DuplicateGroup] = field(default_factory=list)
+    # Отключенные моды (archive) без соответствия в Workshop: нет ID Workshop или элемент удален из Workshop
+    orphans: List[Mod] = field(default_factory=list)
+    reclaimable: Dict[str, int] = field(default_factory=dict)   # local_path -> байт
+    scanned: int = 0
+
+    @property
+    def duplicate_mods(self) -> List[Mod]:
+        return [mod for group in self.groups for mod in group.duplicates]
+
+    @property
+    def duplicate_bytes(self) -> int:
+        return sum(group.reclaimable for group in self.groups)
+
+    @property
+    def orphan_bytes(self) -> int:
+        return sum(self.reclaimable.get(mod.local_path, 0) for mod in self.orphans)
+
+    def bytes_for(self, mods: List[Mod]) -> int:
+        return sum(self.reclaimable.get(mod.local_path, 0) for mod in mods)
+
+
+@dataclass
+class ReclaimResult:
+    """Итог удаления"""
+    removed: List[Mod] = field(default_factory=list)
+    freed: int = 0
+    skipped: Dict[str, str] = field(default_factory=dict)    # local_path -> причина
+
+
+class DuplicateAnalyzer:
+    """Строит ReclaimPlan для модов игры и удаляет выбранные копии"""
+
+    DEFAULT_WORKERS = 8
+    SAMPLE_SIZE = 64 * 1024     # Размер фрагмента; файлы до 3 фрагментов хэшируются целиком
+
+    def __init__(self, mod_manager, steam_workshop_service=None, max_workers: Optional[int] = None):
+        self.mod_manager = mod_manager
+        # Если задан, архивные моды с ID Workshop проверяются на существование одним пакетным запросом
+        self.steam_workshop_service = steam_workshop_service
+        self.max_workers = max_workers or self.DEFAULT_WORKERS
+
+    # --- Отпечатки ---
+    def _tree_fingerprint(self, mod: Mod) -> Optional[ModFingerprint]:
+        """Этап 1: список файлов и размеры (только stat)"""
+        real_path = os.path.realpath(mod.local_path)
+        fingerprint = ModFingerprint(mod=mod, real_path=real_path)
+        stack = [(real_path, "")]
+        try:
+            while stack:
+                path, prefix = stack.pop()
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, prefix + entry.name + "/"))
+                        elif entry.is_file(follow_symlinks=False):
+                            stat_result = entry.stat(follow_symlinks=False)
+                            fingerprint.files.append((prefix + entry.name, stat_result.st_size))
+                            fingerprint.total_size += stat_result.st_size
+                            if stat_result.st_nlink <= 1:
+                                fingerprint.reclaimable += stat_result.st_size
+        except OSError as e:
+            logger.debug(f"[DuplicateAnalyzer] Не удалось прочитать {real_path}: {e}")
+            return None
+        fingerprint.files.sort()
+        digest = hashlib.blake2b(digest_size=16)
+        for rel_path, size in fingerprint.files:
+            digest.update(f"{rel_path}\0{size}\n".encode('utf-8', 'surrogateescape'))
+        fingerprint.tree_digest = digest.hexdigest()
+        return fingerprint
+
+    def _content_fingerprint(self, fingerprint: ModFingerprint) -> ModFingerprint:
+        """Этап 2: хэш начала, середины и конца каждого файла"""
+        digest = hashlib.blake2b(digest_size=16)
+        sample = self.SAMPLE_SIZE
+        try:
+            for rel_path, size in fingerprint.files:
+                with open(os.path.join(fingerprint.real_path, rel_path), 'rb') as f:
+                    if size <= sample * 3:
+                        digest.update(f.read())
+                        continue
+                    for offset in (0, size // 2 - sample // 2, size - sample):
+                        f.seek(offset)
+                        digest.update(f.read(sample))
+        except OSError as e:
+            logger.debug(f"[DuplicateAnalyzer] Не удалось прочитать файлы {fingerprint.real_path}: {e}")
+            return fingerprint
+        fingerprint.content_digest = digest.hexdigest()
+        return fingerprint
+
+    @staticmethod
+    def _keep_rank(mod: Mod) -> Tuple:
+        """Какую копию оставить: включенную, в папке Workshop (имя папки = ID), затем более новую"""
+        folder_is_workshop = os.path.basename(os.path.normpath(mod.local_path)) == mod.mod_id and mod.mod_id.isdigit()
+        updated = mod.local_update_date.timestamp() if mod.local_update_date else 0
+        return (not mod.is_enabled, not folder_is_workshop, -updated, mod.local_path)
+
+    # --- Анализ ---
+    def analyze(self, mods: List[Mod], progress_callback: Optional[Callable[[int, int], None]] = None) -> ReclaimPlan:
+        """
+        :param mods: Моды игры (включенные и из archive).
+        :param progress_callback: (обработано, всего) по мере построения отпечатков.
+        """
+        plan = ReclaimPlan()
+        # Разные ссылки на одну папку (профили) - не дубликаты
+        unique: Dict[str, Mod] = {}
+        for mod in mods:
+            if mod.local_path:
+                unique.setdefault(os.path.realpath(mod.local_path), mod)
+        candidates = list(unique.values())
+        total = len(candidates)
+
+        workers = max(1, min(self.max_workers, total))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DuplicateAnalyzer") as executor:
+            fingerprints = []
+            for index, fingerprint in enumerate(executor.map(self._tree_fingerprint, candidates), 1):
+                if fingerprint is not None and fingerprint.files:
+                    fingerprints.append(fingerprint)
+                    plan.reclaimable[fingerprint.mod.local_path] = fingerprint.reclaimable
+                if progress_callback:
+                    progress_callback(index, total)
+            plan.scanned = len(fingerprints)
+
+            by_tree: Dict[str, List[ModFingerprint]] = {}
+            for fingerprint in fingerprints:
+                by_tree.setdefault(fingerprint.tree_digest, []).append(fingerprint)
+            # Содержимое читается только у деревьев, совпавших по файлам и размерам
+            to_hash = [fingerprint for same_tree in by_tree.values() if len(same_tree) > 1 for fingerprint in same_tree]
+            hashed = list(executor.map(self._content_fingerprint, to_hash))
+
+        by_content: Dict[Tuple[str, str], List[ModFingerprint]] = {}
+        for fingerprint in hashed:
+            if fingerprint.content_digest:
+                by_content.setdefault((fingerprint.tree_digest, fingerprint.content_digest), []).append(fingerprint)
+        for same in by_content.values():
+            if len(same) < 2:
+                continue
+            same.sort(key=lambda fingerprint: self._keep_rank(fingerprint.mod))
+            plan.groups.append(DuplicateGroup(
+                keep=same[0].mod,
+                duplicates=[fingerprint.mod for fingerprint in same[1:]],
+                size=same[0].total_size,
+                reclaimable=sum(fingerprint.reclaimable for fingerprint in same[1:])
+            ))
+        plan.groups.sort(key=lambda group: group.reclaimable, reverse=True)
+
+        plan.orphans = self._find_orphans([fingerprint.mod for fingerprint in fingerprints],
+                                          {id(mod) for mod in plan.duplicate_mods})
+        logger.info(f"[DuplicateAnalyzer] Проверено {plan.scanned} модов (хэшировано {len(hashed)}): "
+                    f"групп дубликатов {len(plan.groups)}, освободится {plan.duplicate_bytes} байт; "
+                    f"модов без Workshop в archive {len(plan.orphans)} ({plan.orphan_bytes} байт)")
+        return plan
+
+    def _find_orphans(self, mods: List[Mod], planned: set) -> List[Mod]:
+        """Отключенные моды без ID Workshop или с ID, которого больше нет в Workshop"""
+        archived = [mod for mod in mods if not mod.is_enabled and id(mod) not in planned]
+        orphans = [mod for mod in archived if not mod.mod_id.isdigit()]
+        workshop_ids = [mod.mod_id for mod in archived if mod.mod_id.isdigit()]
+        if workshop_ids and self.steam_workshop_service:
+            try:
+                found = self.steam_workshop_service.get_published_file_details(workshop_ids)
+            except Exception as e:
+                logger.warning(f"[DuplicateAnalyzer] Не удалось проверить моды в Workshop: {e}")
+            else:
+                # Пустой ответ - скорее всего нет сети, а не удаление всех модов
+                if found:
+                    orphans.extend(mod for mod in archived if mod.mod_id.isdigit() and mod.mod_id not in found)
+        return orphans
+
+    # --- Освобождение места ---
+    def _verify_duplicate(self, duplicate: Mod, keep: Mod) -> Optional[str]:
+        """Полное сравнение копии с оставляемым модом. :return: Причина отказа или None, если содержимое совпадает."""
+        duplicate_tree = self._tree_fingerprint(duplicate)
+        keep_tree = self._tree_fingerprint(keep)
+        if duplicate_tree is None or keep_tree is None:
+            return "folder is not readable"
+        if duplicate_tree.files != keep_tree.files:
+            return "file list differs"
+        for rel_path, _size in duplicate_tree.files:
+            try:
+                same = filecmp.cmp(os.path.join(duplicate_tree.real_path, rel_path),
+                                   os.path.join(keep_tree.real_path, rel_path), shallow=False)
+            except OSError as e:
+                return f"{rel_path}: {e}"
+            if not same:
+                return f"content differs: {rel_path}"
+        return None
+
+    def reclaim(self, mods: List[Mod], plan: ReclaimPlan) -> ReclaimResult:
+        """
+        Удаляет папки выбранных модов (оставляемые копии групп никогда не удаляются).
+        Копия из группы удаляется, только если она побайтно совпадает с оставляемым модом.
+        """
+        result = ReclaimResult()
+        kept = {id(group.keep) for group in plan.groups}
+        keep_for = {id(mod): group.keep for group in plan.groups for mod in group.duplicates}
+        to_check = [mod for mod in mods if id(mod) in keep_for and id(mod) not in kept]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(to_check))),
+                                thread_name_prefix="DuplicateAnalyzer") as executor:
+            reasons = dict(zip((id(mod) for mod in to_check),
+                               executor.map(lambda mod: self._verify_duplicate(mod, keep_for[id(mod)]), to_check)))
+        for mod in mods:
+            if id(mod) in kept:
+                result.skipped[mod.local_path] = "kept copy"
+                continue
+            reason = reasons.get(id(mod))
+            if reason:
+                logger.warning(f"[DuplicateAnalyzer] Пропущен {mod.local_path}: {reason}")
+                result.skipped[mod.local_path] = reason
+                continue
+            if self.mod_manager.remove_mod_folder(mod):
+                result.removed.append(mod)
+                result.freed += plan.reclaimable.get(mod.local_path, 0)
+            else:
+                result.skipped[mod.local_path] = "remove failed"
+        logger.info(f"[DuplicateAnalyzer] Удалено {len(result.removed)} из {len(mods)} модов, "
+                    f"освобождено {result.freed} байт, пропущено {len(result.skipped)}")
+        return result
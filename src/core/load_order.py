@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Порядок загрузки модов для игр в стиле RimWorld.
+Ограничения (modDependencies, loadAfter, loadBefore из About.xml) собираются в граф,
+порядок строится устойчивой топологической сортировкой: при прочих равных сохраняется
+текущий порядок из ModsConfig.xml. Результат записывается в ModsConfig.xml игры.
+"""
+import os
+import sys
+import shutil
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import networkx as nx
+from loguru import logger
+from src.models.game import Game
+from src.models.mod import Mod
+
+RIMWORLD_APP_ID = "294100"
+# Игра и официальные дополнения (ludeon.rimworld, ludeon.rimworld.royalty, ...) лежат не в папке модов,
+# но указываются в зависимостях и в ModsConfig.xml
+CORE_PACKAGE_PREFIX = "ludeon."
+
+
+@dataclass
+class LoadOrderResult:
+    """Итог построения порядка загрузки"""
+    order: List[Mod] = field(default_factory=list)
+    # Циклы ограничений (packageId модов); внутри цикла порядок взят из текущего
+    cycles: List[List[str]] = field(default_factory=list)
+    # ID мода -> packageId обязательных зависимостей, которых нет среди включенных модов
+    missing: Dict[str, List[str]] = field(default_factory=dict)
+    # Включенные моды без packageId (About.xml не прочитан) - ставятся в конец
+    unordered: List[Mod] = field(default_factory=list)
+
+    @property
+    def is_clean(self) -> bool:
+        return not self.cycles and not self.missing
+
+    @property
+    def package_ids(self) -> List[str]:
+        return [mod.package_id.lower() for mod in self.order]
+
+
+class LoadOrderSolver:
+    """Строит порядок загрузки включенных модов"""
+
+    HARD = "dependency"     # modDependencies: нарушать нельзя
+    SOFT = "load_order"     # loadAfter/loadBefore: при цикле отбрасываются первыми
+
+    def build_graph(self, mods: List[Mod]) -> Tuple[nx.DiGraph, Dict[str, List[str]]]:
+        """
+        Граф ограничений: ребро a -> b означает "a загружается раньше b".
+        Узлы - packageId в нижнем регистре (RimWorld сравнивает их без учета регистра).
+        :return: (граф, отсутствующие зависимости по ID мода)
+        """
+        graph = nx.DiGraph()
+        present = {mod.package_id.lower(): mod for mod in mods if mod.package_id}
+        graph.add_nodes_from(present)
+        missing: Dict[str, List[str]] = {}
+
+        def add_edge(before: str, after: str, kind: str):
+            if before == after or before not in present or after not in present:
+                return
+            if graph.has_edge(before, after) and kind == self.SOFT:
+                return  # Жесткое ограничение не ослабляем
+            graph.add_edge(before, after, kind=kind)
+
+        for key, mod in present.items():
+            for dep in mod.dependencies:
+                dep_key = dep.package_id.lower()
+                if not dep_key:
+                    continue
+                if dep_key in present:
+                    add_edge(dep_key, key, self.HARD)
+                elif not dep_key.startswith(CORE_PACKAGE_PREFIX):
+                    missing.setdefault(mod.mod_id, []).append(dep.package_id)
+            for other in mod.load_after:
+                add_edge(other.lower(), key, self.SOFT)
+            for other in mod.load_before:
+                add_edge(key, other.lower(), self.SOFT)
+        return graph, missing
+
+    def _break_cycles(self, graph: nx.DiGraph, rank: Dict[str, int]) -> List[List[str]]:
+        """
+        Разрывает циклы, пока граф не станет ациклическим. Из каждого найденного цикла удаляется
+        одно ребро: loadAfter/loadBefore раньше зависимостей, и прежде всего то, которое
+        противоречит текущему порядку.
+        :return: Найденные циклы (packageId по порядку обхода).
+        """
+        cycles = []
+        for component in list(nx.strongly_connected_components(graph)):
+            if len(component) < 2:
+                continue
+            subgraph = graph.subgraph(component)   # Представление: отражает удаленные ребра
+            while True:
+                try:
+                    cycle = nx.find_cycle(subgraph)
+                except nx.NetworkXNoCycle:
+                    break
+                cycles.append([before for before, _after in cycle])
+                soft = [edge for edge in cycle if graph.edges[edge]["kind"] == self.SOFT]
+                candidates = soft or cycle
+                graph.remove_edge(*max(candidates, key=lambda edge: rank[edge[0]] - rank[edge[1]]))
+        return cycles
+
+    def solve(self, mods: List[Mod], current_order: Optional[List[str]] = None) -> LoadOrderResult:
+        """
+        :param mods: Включенные моды (в порядке сканирования).
+        :param current_order: Текущий порядок packageId (например, из ModsConfig.xml);
+            моды, которых в нем нет, идут после в порядке сканирования.
+        """
+        result = LoadOrderResult(unordered=[mod for mod in mods if not mod.package_id])
+        graph, result.missing = self.build_graph(mods)
+        present = {mod.package_id.lower(): mod for mod in mods if mod.package_id}
+
+        rank: Dict[str, int] = {}
+        for key in (current_order or []):
+            key = key.lower()
+            if key in present and key not in rank:
+                rank[key] = len(rank)
+        for key in present:
+            rank.setdefault(key, len(rank))
+
+        result.cycles = self._break_cycles(graph, rank)
+        # O((V + E) log V): среди доступных узлов всегда берется узел с наименьшим текущим местом
+        ordered = nx.lexicographical_topological_sort(graph, key=rank.__getitem__)
+        result.order = [present[key] for key in ordered] + result.unordered
+        if result.cycles:
+            logger.warning(f"[LoadOrder] Циклы ограничений: {result.cycles}")
+        if result.missing:
+            logger.warning(f"[LoadOrder] Отсутствуют зависимости: {result.missing}")
+        logger.info(f"[LoadOrder] Порядок построен: {len(result.order)} модов, {graph.number_of_edges()} ограничений")
+        return result
+
+
+# --- ModsConfig.xml ---
+def default_mods_config_path(game: Game) -> Optional[str]:
+    """Стандартный путь к ModsConfig.xml (только для RimWorld)"""
+    if game.steam_id != RIMWORLD_APP_ID:
+        return None
+    home = os.path.expanduser("~")
+    if sys.platform.startswith("win"):
+        base = os.path.join(os.environ.get("USERPROFILE", home), "AppData", "LocalLow",
+                            "Ludeon Studios", "RimWorld by Ludeon Studios")
+    elif sys.platform == "darwin":
+        base = os.path.join(home, "Library", "Application Support", "RimWorld")
+    else:
+        base = os.path.join(home, ".config", "unity3d", "Ludeon Studios", "RimWorld by Ludeon Studios")
+    return os.path.join(base, "Config", "ModsConfig.xml")
+
+
+def read_mods_config(path: str) -> List[str]:
+    """packageId из <activeMods> в порядке загрузки (в нижнем регистре); пустой список, если файла нет"""
+    try:
+        root = ET.parse(path).getroot()
+    except FileNotFoundError:
+        return []
+    except ET.ParseError as e:
+        logger.error(f"[LoadOrder] Ошибка чтения {path}: {e}")
+        return []
+    return [li.text.strip().lower() for li in root.findall("activeMods/li") if li.text and li.text.strip()]
+
+
+def merge_active_mods(current: List[str], package_ids: List[str]) -> List[str]:
+    """
+    Новый список <activeMods>: packageId из package_ids идут в заданном порядке, а остальные активные
+    записи (игра и дополнения, моды из папки Steam Workshop, моды без packageId в приложении)
+    остаются на прежних местах - каждая следует за тем же упорядочиваемым модом, что и раньше.
+    """
+    ordered = list(dict.fromkeys(package_id.lower() for package_id in package_ids))
+    managed = set(ordered)
+    anchored: Dict[Optional[str], List[str]] = {}
+    anchor: Optional[str] = None
+    seen = set()
+    for package_id in current:
+        package_id = package_id.lower()
+        if package_id in seen:
+            continue
+        seen.add(package_id)
+        if package_id in managed:
+            anchor = package_id
+        else:
+            anchored.setdefault(anchor, []).append(package_id)
+    result = list(anchored.get(None, []))
+    for package_id in ordered:
+        result.append(package_id)
+        result.extend(anchored.get(package_id, []))
+    return result
+
+
+def write_mods_config(path: str, package_ids: List[str]):
+    """
+    Записывает порядок в <activeMods> существующего ModsConfig.xml (остальные элементы не меняются).
+    Переупорядочиваются только package_ids; активные записи, которых в нем нет, сохраняются
+    на прежних местах (merge_active_mods), поэтому моды вне приложения не отключаются.
+    Предыдущий файл сохраняется как ModsConfig.xml.bak, запись атомарная (через временный файл).
+    :raises FileNotFoundError: ModsConfig.xml не найден (игра еще не запускалась).
+    """
+    tree = ET.parse(path)
+    root = tree.getroot()
+    active = root.find("activeMods")
+    if active is None:
+        active = ET.SubElement(root, "activeMods")
+    current = [li.text.strip() for li in active.findall("li") if li.text and li.text.strip()]
+    merged = merge_active_mods(current, package_ids)
+    tail = active.tail
+    active.clear()
+    active.text = "\n    "
+    active.tail = tail
+    for package_id in merged:
+        li = ET.SubElement(active, "li")
+        li.text = package_id
+        li.tail = "\n    "
+    if len(active):
+        active[-1].tail = "\n  "
+
+    shutil.copy2(path, path + ".bak")
+    tmp_path = path + ".tmp"
+    tree.write(tmp_path, encoding="utf-8", xml_declaration=True)
+    os.replace(tmp_path, path)
+    logger.info(f"[LoadOrder] Записан порядок загрузки ({len(merged)} модов): {path}")
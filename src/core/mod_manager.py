@@ -5,34 +5,144 @@
 """
 import os
 import re
+import json
 import shutil
-import xml.etree.ElementTree as ET
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from loguru import logger
-from src.models.mod import Mod
+from src.models.mod import Mod, ModDependency
 from src.models.game import Game
-# from src.event_bus import event_bus # Закомментировано, так как не используется напрямую
+from src.core.scan_index import ScanIndex, ScanIndexEntry
+from src.core.about_xml import parse_about_xml, read_published_file_id
+from src.core.content_store import remove_tree
+from src.data.config import MOD_TOGGLE_JOURNAL_FILE
+from src.event_bus import event_bus
+
+
+@dataclass
+class ModDelta:
+    """Изменения списка модов после точечного пересканирования папок"""
+    added: List[Mod] = field(default_factory=list)
+    removed: List[Mod] = field(default_factory=list)
+    modified: List[Mod] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.modified)
+
+
+@dataclass
+class BulkToggleResult:
+    """Итог массового включения/отключения модов (set_mods_enabled)"""
+    enabled: bool
+    changed: List[Mod] = field(default_factory=list)        # Перемещены (или только отмечены) в новое состояние
+    skipped: List[str] = field(default_factory=list)        # Уже были в нужном состоянии
+    failed: Dict[str, str] = field(default_factory=dict)    # ID мода -> ошибка
+    rolled_back: bool = False                               # Из-за ошибки все перемещения отменены
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+
+@dataclass
+class GameLibrarySnapshot:
+    """
+    Состояние модов игры, сохраненное при переключении на другую игру: моды, разделы
+    включенных/отключенных и индексы к ним (объекты Mod с метаданными About.xml сохраняются как есть)
+    """
+    game: Game
+    mods: Dict[int, Mod]
+    enabled: Dict[int, Mod]
+    disabled: Dict[int, Mod]
+    by_id: Dict[str, Mod]
+    by_path: Dict[str, Mod]
+    by_package_id: Dict[str, Mod]
+    duplicates: Dict[str, List[Mod]]
+    # Отпечатки (mtime_ns, inode) mods_path и archive на момент последнего перечисления папок
+    root_fingerprints: Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]
 
 
 class ModManager:
     """Менеджер модов"""
 
-    def __init__(self):
-        self._mods: List[Mod] = []
+    # Сколько папок обрабатывает одна задача пула: меньше накладных расходов на задачу,
+    # и вызывающий получает моды пачками, а не по одному
+    SCAN_CHUNK_SIZE = 64
+    # Проверка папки мода - это в основном ожидание диска (stat, чтение About.xml), а не работа процессора,
+    # поэтому число потоков не привязано к количеству ядер
+    DEFAULT_SCAN_WORKERS = 16
+    # Сколько последних игр (кроме текущей) остаются в памяти для мгновенного переключения
+    DEFAULT_CACHED_GAMES = 3
+    # Поля About.xml, которые попадают в запись индекса; чтение файла прекращается, когда все они прочитаны.
+    # ID Workshop нужен только папкам с нечисловым именем - у остальных он берется из имени папки
+    SCAN_ABOUT_FIELDS = frozenset(['name', 'author', 'description', 'package_id', 'supported_versions', 'dependencies',
+                                   'load_after', 'load_before', 'force_load_after', 'force_load_before'])
+
+    def __init__(self, max_scan_workers: Optional[int] = None, scan_index: Optional[ScanIndex] = None,
+                 journal_file: Optional[str] = None, max_cached_games: Optional[int] = None):
+        # Моды текущей игры в порядке сканирования и индексы к ним; все обновляются вместе
+        # (_index_add/_index_remove/_index_set_enabled), поэтому поиск и выборка не перебирают весь список.
+        # Ключ упорядоченных словарей - id() объекта: добавление и удаление за O(1) с сохранением порядка
+        self._mods: Dict[int, Mod] = {}
+        self._enabled: Dict[int, Mod] = {}
+        self._disabled: Dict[int, Mod] = {}
+        self._by_id: Dict[str, Mod] = {}
+        self._by_path: Dict[str, Mod] = {}
+        self._by_package_id: Dict[str, Mod] = {}    # packageId из About.xml в нижнем регистре
+        # Моды с тем же mod_id, что у уже проиндексированного (одна папка в mods и в archive)
+        self._duplicates: Dict[str, List[Mod]] = {}
         self.current_game: Optional[Game] = None # Сохраняем ссылку на текущую игру
+        # Метаданные неизменившихся папок берутся из индекса, а не из About.xml
+        self.scan_index = scan_index or ScanIndex()
+        # Список модов меняется и из потока наблюдения за папкой (apply_folder_changes)
+        self._lock = threading.RLock()
+        self.max_scan_workers = max_scan_workers or self.DEFAULT_SCAN_WORKERS
+        # Журнал массового перемещения папок: по нему незавершенная операция откатывается после сбоя
+        self.journal_file = journal_file or MOD_TOGGLE_JOURNAL_FILE
+        # Снимки ранее загруженных игр (LRU по steam_id): при возврате к игре список модов
+        # восстанавливается из памяти и только сверяется с диском
+        self.max_cached_games = self.DEFAULT_CACHED_GAMES if max_cached_games is None else max_cached_games
+        self._snapshots: 'OrderedDict[str, GameLibrarySnapshot]' = OrderedDict()
+        self._root_fingerprints: Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]] = (None, None)
+        # Последняя загрузка взята из снимка без изменений на диске (интерфейс может не пересчитывать данные)
+        self.last_load_from_snapshot = False
 
-    def load_mods_for_game(self, game: Game) -> List[Mod]:
+    def load_mods_for_game(self, game: Game,
+                           progress_callback: Optional[Callable[[List[Mod]], None]] = None,
+                           force_rescan: bool = False) -> List[Mod]:
         """
         Загрузка всех модов (включённых и отключённых) для игры.
         Ожидается, что game.mods_path указывает на папку, где лежат моды напрямую.
         Отключенные моды находятся в подпапке 'archive'.
+        Папки модов обрабатываются в пуле потоков (max_scan_workers); итоговый список
+        не зависит от порядка завершения задач: сначала включённые, затем отключённые моды,
+        в порядке перечисления папок.
+        :param progress_callback: Вызывается в потоке сканирования с каждой готовой пачкой модов
+            (в порядке готовности), чтобы интерфейс мог показывать моды до окончания сканирования.
+        :param force_rescan: Не использовать снимок игры, даже если он есть.
+        Если игра загружалась недавно (снимок в LRU), список восстанавливается из памяти и сверяется
+        с диском по отпечаткам папок; полное сканирование не выполняется. Повторная загрузка
+        текущей игры всегда сканирует папки заново.
         """
+        # Папки могли остаться наполовину перемещенными после сбоя во время set_mods_enabled
+        self.recover_toggle_journal()
+        with self._lock:
+            if self.current_game and self.current_game.steam_id != game.steam_id:
+                self._stash_current_game()
+            snapshot = self._snapshots.pop(game.steam_id, None)
+        self.last_load_from_snapshot = False
+        if snapshot is not None and not force_rescan and snapshot.game.mods_path == game.mods_path:
+            return self._restore_snapshot(game, snapshot)
+
         # --- ВАЖНО: Сохраняем ссылку на текущую игру ---
         self.current_game = game
         # -----------------------------------------------
 
-        mods = []
         mods_path = game.mods_path
         archive_path = os.path.join(mods_path, "archive")
 
@@ -40,169 +150,456 @@ class ModManager:
         logger.debug(f"[ModManager/load_mods_for_game] mods_path: '{mods_path}'")
         logger.debug(f"[ModManager/load_mods_for_game] archive_path: '{archive_path}'")
 
-        # Проверяем существование основной папки модов
-        if not os.path.exists(mods_path):
-            logger.warning(f"[ModManager/load_mods_for_game] Папка модов не существует: '{mods_path}'")
-        elif not os.path.isdir(mods_path):
-            logger.error(f"[ModManager/load_mods_for_game] mods_path '{mods_path}' не является папкой.")
-        else:
-            logger.debug(f"[ModManager/load_mods_for_game] Папка модов существует: '{mods_path}'")
+        # Отпечатки берутся до перечисления: изменения во время сканирования будут видны при следующей сверке
+        root_fingerprints = self._get_root_fingerprints(game)
+        # Включённые моды (в основной папке), затем отключённые (в папке archive)
+        self.scan_index.begin_scan(game.steam_id)
+        entries = self._list_mod_folders(mods_path, is_enabled=True)
+        entries.extend(self._list_mod_folders(archive_path, is_enabled=False))
+        mods = self._create_mods(entries, progress_callback)
+        from_index, reread = self.scan_index.finish_scan(game.steam_id, (entry.path for entry, _ in entries))
+        logger.debug(f"[ModManager/load_mods_for_game] Индекс сканирования: без изменений {from_index}, перечитано {reread}")
+
+        with self._lock:
+            self._index_reset(mods)
+            self._root_fingerprints = root_fingerprints
+        logger.info(f"[ModManager/load_mods_for_game] Загрузка модов завершена. Найдено {len(mods)} модов (включая отключённые) для игры: '{game.name}' (ID: {game.steam_id})")
+        if mods:
+            logger.debug(f"[ModManager/load_mods_for_game] Список загруженных модов: {[m.mod_id for m in mods]}")
+        return mods
+
+    # --- Снимки игр ---
+    @staticmethod
+    def _get_root_fingerprints(game: Game) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """(mtime_ns, inode) папки модов и archive; время папки меняется при добавлении, удалении и переименовании модов"""
+        fingerprints = []
+        for path in (game.mods_path, os.path.join(game.mods_path, "archive")):
             try:
-                # Загружаем включённые моды (в основной папке)
-                items_in_mods_path = os.listdir(mods_path)
-                logger.debug(f"[ModManager/load_mods_for_game] Содержимое mods_path: {items_in_mods_path}")
-
-                for item in items_in_mods_path:
-                    item_path = os.path.join(mods_path, item)
-                    # Проверяем, что это папка, она не 'archive' и не скрытая системная (для Windows)
-                    if os.path.isdir(item_path) and item != "archive":
-                        # Дополнительная проверка: исключаем очевидно системные папки/файлы
-                        # Можно добавить больше условий, если нужно
-                        if item.startswith('.'):
-                            logger.debug(f"[ModManager/load_mods_for_game] Пропущена скрытая папка/файл: '{item}'")
-                            continue
-
-                        mod = self._create_mod(item, item_path, is_enabled=True)
-                        if mod:
-                            mods.append(mod)
-                            logger.debug(f"[ModManager/load_mods_for_game] Найден включённый мод: ID={mod.mod_id}, Путь={mod.local_path}")
-                        else:
-                            logger.warning(f"[ModManager/load_mods_for_game] Не удалось создать мод для папки: '{item_path}'")
-                    elif item == "archive":
-                        logger.debug(f"[ModManager/load_mods_for_game] Найдена папка 'archive'.")
-                    else:
-                        logger.debug(f"[ModManager/load_mods_for_game] Пропущен элемент (не папка или 'archive'): '{item}'")
+                stat_result = os.stat(path)
+                fingerprints.append((stat_result.st_mtime_ns, stat_result.st_ino))
+            except OSError:
+                fingerprints.append(None)
+        return fingerprints[0], fingerprints[1]
 
-            except PermissionError as e:
-                logger.error(f"[ModManager/load_mods_for_game] Ошибка доступа к папке модов '{mods_path}': {e}")
-            except Exception as e:
-                logger.error(f"[ModManager/load_mods_for_game] Неожиданная ошибка при сканировании папки модов '{mods_path}': {e}")
+    def _stash_current_game(self):
+        """Сохраняет состояние текущей игры в LRU снимков. Вызывается под блокировкой."""
+        if self.max_cached_games <= 0:
+            return
+        game = self.current_game
+        self._snapshots[game.steam_id] = GameLibrarySnapshot(
+            game=game, mods=self._mods, enabled=self._enabled, disabled=self._disabled,
+            by_id=self._by_id, by_path=self._by_path, by_package_id=self._by_package_id,
+            duplicates=self._duplicates, root_fingerprints=self._root_fingerprints)
+        self._snapshots.move_to_end(game.steam_id)
+        while len(self._snapshots) > self.max_cached_games:
+            evicted, _snapshot = self._snapshots.popitem(last=False)
+            logger.debug(f"[ModManager/Snapshots] Снимок игры {evicted} вытеснен из памяти")
+
+    def _restore_snapshot(self, game: Game, snapshot: GameLibrarySnapshot) -> List[Mod]:
+        """
+        Делает снимок текущим состоянием и сверяет его с диском: если отпечаток mods_path или archive
+        изменился, папки перечисляются заново (без чтения модов); каждая известная папка проверяется
+        по индексу сканирования (stat папки и файла метаданных). Изменившиеся папки
+        пересканируются точечно через apply_folder_changes.
+        """
+        root_fingerprints = self._get_root_fingerprints(game)
+        with self._lock:
+            self.current_game = game
+            self._mods, self._enabled, self._disabled = snapshot.mods, snapshot.enabled, snapshot.disabled
+            self._by_id, self._by_path = snapshot.by_id, snapshot.by_path
+            self._by_package_id, self._duplicates = snapshot.by_package_id, snapshot.duplicates
+            known_paths = [mod.local_path for mod in self._mods.values() if mod.local_path]
+
+        changed: Dict[str, bool] = {}
+        if root_fingerprints != snapshot.root_fingerprints:
+            entries = self._list_mod_folders(game.mods_path, is_enabled=True)
+            entries.extend(self._list_mod_folders(os.path.join(game.mods_path, "archive"), is_enabled=False))
+            on_disk = {self._path_key(entry.path): entry.path for entry, _ in entries}
+            known = {self._path_key(path) for path in known_paths}
+            changed.update({path: True for key, path in on_disk.items() if key not in known})
+            changed.update({path: False for path in known_paths if self._path_key(path) not in on_disk})
+        for path in known_paths:
+            if path in changed:
+                continue
+            try:
+                if self.scan_index.lookup(game.steam_id, path, os.stat(path)) is None:
+                    changed[path] = True
+            except OSError:
+                changed[path] = False
+
+        delta = self.apply_folder_changes(game, changed) if changed else ModDelta()
+        with self._lock:
+            self._root_fingerprints = root_fingerprints
+            mods = list(self._mods.values())
+        self.last_load_from_snapshot = delta.is_empty
+        logger.info(f"[ModManager/Snapshots] Игра '{game.name}' восстановлена из памяти: модов {len(mods)}, "
+                    f"добавлено {len(delta.added)}, удалено {len(delta.removed)}, изменено {len(delta.modified)}")
+        return mods
 
-        # Загружаем отключённые моды (в папке archive)
-        if not os.path.exists(archive_path):
-            logger.debug(f"[ModManager/load_mods_for_game] Папка отключённых модов (archive) не существует: '{archive_path}'")
-        elif not os.path.isdir(archive_path):
-            logger.error(f"[ModManager/load_mods_for_game] archive_path '{archive_path}' не является папкой.")
+    def drop_snapshot(self, steam_id: str):
+        """Удаляет снимок игры (например, после изменения ее настроек)"""
+        with self._lock:
+            self._snapshots.pop(steam_id, None)
+
+    # --- Индексы ---
+    @staticmethod
+    def _path_key(path: str) -> str:
+        return os.path.normcase(os.path.normpath(path))
+
+    def _index_reset(self, mods: List[Mod]):
+        self._mods = {}
+        self._enabled = {}
+        self._disabled = {}
+        self._by_id = {}
+        self._by_path = {}
+        self._by_package_id = {}
+        self._duplicates = {}
+        for mod in mods:
+            self._index_add(mod)
+
+    def _index_add(self, mod: Mod):
+        key = id(mod)
+        self._mods[key] = mod
+        (self._enabled if mod.is_enabled else self._disabled)[key] = mod
+        if mod.mod_id in self._by_id:
+            self._duplicates.setdefault(mod.mod_id, []).append(mod)
         else:
-            logger.debug(f"[ModManager/load_mods_for_game] Папка отключённых модов существует: '{archive_path}'")
+            self._by_id[mod.mod_id] = mod
+        if mod.local_path:
+            self._by_path[self._path_key(mod.local_path)] = mod
+        if mod.package_id:
+            self._by_package_id.setdefault(mod.package_id.lower(), mod)
+
+    def _index_remove(self, mod: Mod):
+        key = id(mod)
+        self._mods.pop(key, None)
+        self._enabled.pop(key, None)
+        self._disabled.pop(key, None)
+        duplicates = self._duplicates.get(mod.mod_id)
+        if self._by_id.get(mod.mod_id) is mod:
+            del self._by_id[mod.mod_id]
+            if duplicates:
+                self._by_id[mod.mod_id] = duplicates.pop(0)
+        elif duplicates and mod in duplicates:
+            duplicates.remove(mod)
+        if duplicates is not None and not duplicates:
+            del self._duplicates[mod.mod_id]
+        path_key = self._path_key(mod.local_path) if mod.local_path else None
+        if path_key and self._by_path.get(path_key) is mod:
+            del self._by_path[path_key]
+        package_key = mod.package_id.lower()
+        if package_key and self._by_package_id.get(package_key) is mod:
+            del self._by_package_id[package_key]
+            replacement = next((m for m in self._mods.values() if m.package_id.lower() == package_key), None)
+            if replacement is not None:
+                self._by_package_id[package_key] = replacement
+
+    def _index_set_enabled(self, mod: Mod, is_enabled: bool, local_path: Optional[str] = None):
+        """Меняет состояние и путь мода, перенося его между разделами"""
+        with self._lock:
+            key = id(mod)
+            if local_path is not None and local_path != mod.local_path:
+                if mod.local_path and self._by_path.get(self._path_key(mod.local_path)) is mod:
+                    del self._by_path[self._path_key(mod.local_path)]
+                mod.local_path = local_path
+                self._by_path[self._path_key(local_path)] = mod
+            if mod.is_enabled != is_enabled and key in self._mods:
+                (self._enabled if mod.is_enabled else self._disabled).pop(key, None)
+                (self._enabled if is_enabled else self._disabled)[key] = mod
+            mod.is_enabled = is_enabled
+
+    def _index_update(self, existing: Mod, mod: Mod):
+        """Переносит данные пересканированного мода в существующий объект (ссылки на него остаются верными)"""
+        self._index_remove(existing)
+        existing.__dict__.update(vars(mod))
+        self._index_add(existing)
+
+    def apply_folder_changes(self, game: Game, folders: Dict[str, bool]) -> ModDelta:
+        """
+        Точечно пересканирует папки модов и применяет изменения к списку модов.
+        :param game: Игра; если загружена другая игра, изменения не применяются.
+        :param folders: {путь к папке мода: изменились ли файлы внутри папки}. Папка может быть
+            в mods_path или в archive; отсутствующая папка означает удаление мода.
+        :return: Добавленные, удаленные и измененные моды.
+        """
+        delta = ModDelta()
+        if not self.current_game or self.current_game.steam_id != game.steam_id:
+            return delta
+        archive_path = os.path.normcase(os.path.join(game.mods_path, "archive"))
+        scanned: Dict[str, Optional[Mod]] = {}
+        for path, content_changed in folders.items():
+            name = os.path.basename(path)
+            if not name or name.startswith('.') or os.path.normcase(path) == archive_path:
+                continue
             try:
-                items_in_archive_path = os.listdir(archive_path)
-                logger.debug(f"[ModManager/load_mods_for_game] Содержимое archive_path: {items_in_archive_path}")
-
-                for item in items_in_archive_path:
-                    item_path = os.path.join(archive_path, item)
-                    if os.path.isdir(item_path):
-                        # Дополнительная проверка: исключаем очевидно системные папки/файлы
-                        if item.startswith('.'):
-                            logger.debug(f"[ModManager/load_mods_for_game] Пропущена скрытая папка/файл в archive: '{item}'")
-                            continue
-
-                        mod = self._create_mod(item, item_path, is_enabled=False)
-                        if mod:
-                            mods.append(mod)
-                            logger.debug(f"[ModManager/load_mods_for_game] Найден отключённый мод: ID={mod.mod_id}, Путь={mod.local_path}")
-                        else:
-                            logger.warning(f"[ModManager/load_mods_for_game] Не удалось создать мод для папки в archive: '{item_path}'")
-                    else:
-                        logger.debug(f"[ModManager/load_mods_for_game] Пропущен элемент в archive (не папка): '{item}'")
-
-            except PermissionError as e:
-                logger.error(f"[ModManager/load_mods_for_game] Ошибка доступа к папке архива '{archive_path}': {e}")
-            except Exception as e:
-                logger.error(f"[ModManager/load_mods_for_game] Неожиданная ошибка при сканировании папки архива '{archive_path}': {e}")
+                folder_stat = os.stat(path)
+                is_dir = os.path.isdir(path)
+            except OSError:
+                folder_stat, is_dir = None, False
+            if not is_dir:
+                scanned[path] = None
+                continue
+            is_enabled = os.path.normcase(os.path.dirname(path)) != archive_path
+            scanned[path] = self._create_mod(name, path, is_enabled=is_enabled, stat_result=folder_stat)
 
-        self._mods = mods
-        logger.info(f"[ModManager/load_mods_for_game] Загрузка модов завершена. Найдено {len(mods)} модов (включая отключённые) для игры: '{game.name}' (ID: {game.steam_id})")
-        if mods:
-            logger.debug(f"[ModManager/load_mods_for_game] Список загруженных модов: {[m.mod_id for m in mods]}")
-        return self._mods.copy()
+        with self._lock:
+            for path, mod in scanned.items():
+                existing = self._by_path.get(self._path_key(path))
+                if mod is None:
+                    if existing is not None:
+                        self._index_remove(existing)
+                        delta.removed.append(existing)
+                    continue
+                if existing is None:
+                    self._index_add(mod)
+                    delta.added.append(mod)
+                    continue
+                unchanged = (existing.mod_id, existing.is_enabled, existing.local_update_date) == \
+                            (mod.mod_id, mod.is_enabled, mod.local_update_date)
+                if unchanged and not folders[path]:
+                    continue  # Например, папка перемещена самим приложением (включение/отключение)
+                self._index_update(existing, mod)
+                delta.modified.append(existing)
+        self.scan_index.save(game.steam_id)
+        return delta
 
-    def _extract_steam_id_from_mod_folder(self, path: str) -> Optional[str]:
+    def _list_mod_folders(self, folder_path: str, is_enabled: bool) -> List[Tuple[os.DirEntry, bool]]:
         """
-        Извлекает Steam ID из файлов мода (About.xml для RimWorld).
+        Перечисляет папки модов через os.scandir. Тип элемента берется из DirEntry без отдельного
+        системного вызова; сам DirEntry передается дальше, чтобы stat папки не запрашивался повторно
+        (на сетевых дисках каждый stat - это задержка сети).
+        :param folder_path: Основная папка модов или папка archive.
+        :param is_enabled: Моды из этой папки включены (основная папка) или отключены (archive).
+        :return: Список (DirEntry, is_enabled).
+        """
+        folder_kind = "модов" if is_enabled else "отключённых модов (archive)"
+        folders = []
+        try:
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        logger.debug(f"[ModManager/load_mods_for_game] Пропущен элемент (не папка): '{entry.name}'")
+                        continue
+                    if is_enabled and entry.name == "archive":
+                        logger.debug(f"[ModManager/load_mods_for_game] Найдена папка 'archive'.")
+                        continue
+                    # Исключаем скрытые и системные папки
+                    if entry.name.startswith('.'):
+                        logger.debug(f"[ModManager/load_mods_for_game] Пропущена скрытая папка: '{entry.name}'")
+                        continue
+                    folders.append((entry, is_enabled))
+        except FileNotFoundError:
+            log = logger.warning if is_enabled else logger.debug
+            log(f"[ModManager/load_mods_for_game] Папка {folder_kind} не существует: '{folder_path}'")
+        except NotADirectoryError:
+            logger.error(f"[ModManager/load_mods_for_game] Путь '{folder_path}' не является папкой.")
+        except PermissionError as e:
+            logger.error(f"[ModManager/load_mods_for_game] Ошибка доступа к папке {folder_kind} '{folder_path}': {e}")
+        except Exception as e:
+            logger.error(f"[ModManager/load_mods_for_game] Неожиданная ошибка при сканировании папки {folder_kind} '{folder_path}': {e}")
+        return folders
+
+    def _create_mods_chunk(self, chunk: List[Tuple[os.DirEntry, bool]]) -> List[Mod]:
+        """Создает моды для пачки папок (выполняется в потоке пула)"""
+        mods = []
+        for entry, is_enabled in chunk:
+            try:
+                entry_stat = entry.stat()
+            except OSError:
+                entry_stat = None
+            mod = self._create_mod(entry.name, entry.path, is_enabled=is_enabled, stat_result=entry_stat)
+            if mod:
+                mods.append(mod)
+                logger.debug(f"[ModManager/load_mods_for_game] Найден мод: ID={mod.mod_id}, Включен={is_enabled}, Путь={mod.local_path}")
+            else:
+                logger.warning(f"[ModManager/load_mods_for_game] Не удалось создать мод для папки: '{entry.path}'")
+        return mods
+
+    def _create_mods(self, folders: List[Tuple[os.DirEntry, bool]],
+                     progress_callback: Optional[Callable[[List[Mod]], None]] = None) -> List[Mod]:
+        """
+        Создает моды для папок в пуле потоков. Результаты собираются по индексу пачки,
+        поэтому порядок модов совпадает с порядком папок независимо от порядка завершения.
+        """
+        chunks = [folders[start:start + self.SCAN_CHUNK_SIZE]
+                  for start in range(0, len(folders), self.SCAN_CHUNK_SIZE)]
+        results: List[List[Mod]] = [[] for _ in chunks]
+
+        def collect(index: int, mods: List[Mod]):
+            results[index] = mods
+            if progress_callback and mods:
+                try:
+                    progress_callback(mods)
+                except Exception as e:
+                    logger.error(f"[ModManager/load_mods_for_game] Ошибка в обработчике прогресса: {e}")
+
+        if len(chunks) <= 1 or self.max_scan_workers <= 1:
+            for index, chunk in enumerate(chunks):
+                collect(index, self._create_mods_chunk(chunk))
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_scan_workers, len(chunks)),
+                                    thread_name_prefix="ModScan") as executor:
+                futures = {executor.submit(self._create_mods_chunk, chunk): index
+                           for index, chunk in enumerate(chunks)}
+                for future in as_completed(futures):
+                    try:
+                        mods = future.result()
+                    except Exception as e:
+                        logger.error(f"[ModManager/load_mods_for_game] Ошибка при обработке пачки папок: {e}")
+                        mods = []
+                    collect(futures[future], mods)
+        return [mod for chunk_mods in results for mod in chunk_mods]
+
+    def _read_mod_metadata(self, path: str, need_steam_id: bool = True) -> ScanIndexEntry:
+        """
+        Читает метаданные мода из его файлов: About.xml (RimWorld) или manifest.json.
         :param path: Путь к папке мода.
-        :return: Steam ID или None.
-        """
-        # Пробуем найти About.xml (для RimWorld)
-        about_xml_path = os.path.join(path, "About", "About.xml")
-        if not os.path.exists(about_xml_path):
-            # Пробуем без папки About
-            about_xml_path = os.path.join(path, "About.xml")
-        
-        if os.path.exists(about_xml_path):
+        :param need_steam_id: Искать ID Workshop (False - ID известен из имени папки).
+        :return: Запись индекса без отпечатка папки; steam_id пустой, если ID не найден.
+        """
+        entry = ScanIndexEntry(path=path)
+        fields = self.SCAN_ABOUT_FIELDS | {'published_file_id'} if need_steam_id else self.SCAN_ABOUT_FIELDS
+        # About.xml (RimWorld) - About/About.xml или About.xml в корне мода.
+        # Файлы открываются сразу, без предварительной проверки os.path.exists
+        for about_xml_path in (os.path.join(path, "About", "About.xml"), os.path.join(path, "About.xml")):
             try:
-                tree = ET.parse(about_xml_path)
-                root = tree.getroot()
-                
-                # Ищем publishedFileId в разных возможных форматах
-                # RimWorld: <publishedFileId>123456789</publishedFileId>
-                for elem in root.iter():
-                    if elem.tag == 'publishedFileId' and elem.text:
-                        steam_id = elem.text.strip()
-                        if steam_id.isdigit():
-                            logger.debug(f"[ModManager/ExtractID] Найден Steam ID {steam_id} в {about_xml_path}")
-                            return steam_id
-                
-                logger.debug(f"[ModManager/ExtractID] publishedFileId не найден в {about_xml_path}")
+                with open(about_xml_path, 'rb') as f:
+                    about_mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                    about = parse_about_xml(f, fields)
+            except FileNotFoundError:
+                continue
             except Exception as e:
                 logger.debug(f"[ModManager/ExtractID] Ошибка чтения {about_xml_path}: {e}")
-        
+                break
+
+            entry.metadata_path = about_xml_path
+            entry.metadata_mtime_ns = about_mtime_ns
+            entry.name = about.name
+            entry.author = about.author
+            entry.description = about.description
+            entry.package_id = about.package_id
+            entry.supported_versions = about.supported_versions
+            entry.dependencies = [dep.to_dict() for dep in about.dependencies]
+            entry.load_after = about.load_after + about.force_load_after
+            entry.load_before = about.load_before + about.force_load_before
+
+            if not need_steam_id:
+                return entry
+            # RimWorld: ID Workshop в About/PublishedFileId.txt, у некоторых модов - <publishedFileId> в About.xml
+            steam_id = about.published_file_id or read_published_file_id(path)
+            if steam_id.isdigit():
+                logger.debug(f"[ModManager/ExtractID] Найден Steam ID {steam_id} для {path}")
+                entry.steam_id = steam_id
+                return entry
+
+            logger.debug(f"[ModManager/ExtractID] publishedFileId не найден в {about_xml_path}")
+            break
+
         # Если не нашли About.xml, пробуем другие форматы
         # Например, manifest.json для некоторых игр
         manifest_path = os.path.join(path, "manifest.json")
-        if os.path.exists(manifest_path):
-            try:
-                import json
-                with open(manifest_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Пробуем разные возможные ключи
-                    for key in ['publishedFileId', 'steamId', 'workshopId', 'id']:
-                        if key in data:
-                            steam_id = str(data[key]).strip()
-                            if steam_id.isdigit():
-                                logger.debug(f"[ModManager/ExtractID] Найден Steam ID {steam_id} в {manifest_path}")
-                                return steam_id
-            except Exception as e:
-                logger.debug(f"[ModManager/ExtractID] Ошибка чтения {manifest_path}: {e}")
-        
-        return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest_mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                data = json.load(f)
+            if not entry.metadata_path:
+                entry.metadata_path = manifest_path
+                entry.metadata_mtime_ns = manifest_mtime_ns
+            # Пробуем разные возможные ключи
+            for key in ['publishedFileId', 'steamId', 'workshopId', 'id']:
+                if key in data:
+                    steam_id = str(data[key]).strip()
+                    if steam_id.isdigit():
+                        logger.debug(f"[ModManager/ExtractID] Найден Steam ID {steam_id} в {manifest_path}")
+                        entry.steam_id = steam_id
+                        return entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"[ModManager/ExtractID] Ошибка чтения {manifest_path}: {e}")
+
+        return entry
 
-    def _create_mod(self, mod_id: str, path: str, is_enabled: bool) -> Optional[Mod]:
-        """Создаёт объект Mod с датой установки"""
+    def _get_mod_metadata(self, folder_name: str, path: str,
+                          stat_result: Optional[os.stat_result]) -> Optional[ScanIndexEntry]:
+        """
+        Метаданные папки мода: из индекса сканирования, если папка не изменилась, иначе из файлов мода.
+        Для папок с числовым именем (ID Workshop) ID берется из имени папки.
+        :return: Запись индекса или None, если для нечисловой папки метаданные не найдены.
+        """
+        game_id = self.current_game.steam_id if self.current_game else ""
+        if game_id and stat_result is not None:
+            entry = self.scan_index.lookup(game_id, path, stat_result)
+            if entry is not None:
+                return entry
+
+        # Метаданные читаются и для папок с ID Workshop: название, описание и зависимости
+        # из About.xml доступны без запроса к Steam
+        entry = self._read_mod_metadata(path, need_steam_id=not folder_name.isdigit())
+        if folder_name.isdigit():
+            entry.steam_id = folder_name
+        else:
+            logger.info(f"[ModManager/_create_mod] Найден мод с нечисловым ID (возможно, кастомная папка): '{folder_name}' (Путь: {path})")
+        if game_id and stat_result is not None:
+            entry.set_fingerprint(stat_result)
+            self.scan_index.store(game_id, entry)
+        return entry
+
+    def _create_mod(self, mod_id: str, path: str, is_enabled: bool,
+                    stat_result: Optional[os.stat_result] = None) -> Optional[Mod]:
+        """
+        Создаёт объект Mod с датой установки.
+        :param stat_result: Уже полученный stat папки (например, из os.DirEntry); если не передан, запрашивается.
+        """
         # Базовая валидация ID мода (не должен быть пустым)
         if not mod_id or not mod_id.strip():
             logger.warning(f"[ModManager/_create_mod] Пропущен мод с пустым ID (Путь: {path})")
             return None
-        
-        # Если ID не числовой, пробуем найти настоящий Steam ID в файлах мода
-        actual_mod_id = mod_id
-        if not mod_id.isdigit():
-            logger.info(f"[ModManager/_create_mod] Найден мод с нечисловым ID (возможно, кастомная папка): '{mod_id}' (Путь: {path})")
-            extracted_id = self._extract_steam_id_from_mod_folder(path)
-            if extracted_id:
-                actual_mod_id = extracted_id
-                logger.info(f"[ModManager/_create_mod] Использован Steam ID из файла: '{actual_mod_id}' вместо '{mod_id}'")
-            else:
-                logger.warning(f"[ModManager/_create_mod] Не удалось найти Steam ID для мода '{mod_id}', используем имя папки как ID")
 
         try:
-            install_date = datetime.fromtimestamp(os.path.getctime(path))
+            if stat_result is None:
+                stat_result = os.stat(path)
+            install_date = datetime.fromtimestamp(stat_result.st_ctime)
             # Добавляем локальную дату обновления (время последнего изменения папки)
-            local_update_date = datetime.fromtimestamp(os.path.getmtime(path))
+            local_update_date = datetime.fromtimestamp(stat_result.st_mtime)
         except (OSError, ValueError, OverflowError) as e: # Расширяем обработку ошибок
-            logger.warning(f"[ModManager/_create_mod] Не удалось получить дату создания для папки '{path}' (ID: {actual_mod_id}): {e}. Установлена None.")
+            logger.warning(f"[ModManager/_create_mod] Не удалось получить дату создания для папки '{path}' (ID: {mod_id}): {e}. Установлена None.")
             install_date = None
             local_update_date = None
 
+        # Если ID не числовой, пробуем найти настоящий Steam ID в файлах мода (или в индексе сканирования)
+        metadata = self._get_mod_metadata(mod_id, path, stat_result)
+        actual_mod_id = mod_id
+        if not mod_id.isdigit():
+            if metadata.steam_id:
+                actual_mod_id = metadata.steam_id
+                logger.debug(f"[ModManager/_create_mod] Использован Steam ID из файла: '{actual_mod_id}' вместо '{mod_id}'")
+            else:
+                logger.debug(f"[ModManager/_create_mod] Не удалось найти Steam ID для мода '{mod_id}', используем имя папки как ID")
+
         mod = Mod(
             mod_id=actual_mod_id,
-            name=mod_id, # Имя папки как начальное имя (будет обновлено через Steam API)
-            author="Неизвестен", # Автор может быть обновлён позже через Steam API
+            # Имя из About.xml или имя папки как начальное имя (будет обновлено через Steam API)
+            name=metadata.name or mod_id,
+            author=metadata.author or "Неизвестен", # Автор может быть обновлён позже через Steam API
             local_path=path,
             is_enabled=is_enabled,
             workshop_url=f"https://steamcommunity.com/sharedfiles/filedetails/?id={actual_mod_id}" if actual_mod_id.isdigit() else "",
             install_date=install_date,
-            local_update_date=local_update_date
+            local_update_date=local_update_date,
+            description=metadata.description,
+            package_id=metadata.package_id,
+            supported_versions=list(metadata.supported_versions),
+            load_after=list(metadata.load_after),
+            load_before=list(metadata.load_before),
+            dependencies=[ModDependency(mod_id=dep.get('steam_id') or dep.get('package_id', ''),
+                                        name=dep.get('display_name', ''),
+                                        package_id=dep.get('package_id', ''))
+                          for dep in metadata.dependencies]
         )
         logger.debug(f"[ModManager/_create_mod] Создан объект Mod: ID={mod.mod_id}, Включен={mod.is_enabled}, Путь={mod.local_path}")
         return mod
@@ -218,16 +615,18 @@ class ModManager:
         # В текущей реализации, self._mods уже содержит моды для нужной игры
         # после вызова load_mods_for_game. Этот метод просто возвращает их.
         # Если потребуется фильтрация по steam_id, логика должна быть изменена.
-        logger.debug(f"[ModManager] get_installed_mods вызван для steam_id={steam_id}, возвращаем {len(self._mods)} модов.")
-        return self._mods.copy()
+        with self._lock:
+            mods = list(self._mods.values())
+        logger.debug(f"[ModManager] get_installed_mods вызван для steam_id={steam_id}, возвращаем {len(mods)} модов.")
+        return mods
 
     def get_enabled_mods(self, steam_id: str) -> List[Mod]:
         """
         Получение списка включённых модов для текущей загруженной игры.
         Предполагается, что load_mods_for_game уже был вызван.
         """
-        # Фильтруем текущий список self._mods
-        enabled_mods = [mod for mod in self._mods if mod.is_enabled]
+        with self._lock:
+            enabled_mods = list(self._enabled.values())
         logger.debug(f"[ModManager] get_enabled_mods вызван для steam_id={steam_id}, возвращаем {len(enabled_mods)} модов.")
         return enabled_mods
 
@@ -236,16 +635,38 @@ class ModManager:
         Получение списка отключённых модов для текущей загруженной игры.
         Предполагается, что load_mods_for_game уже был вызван.
         """
-        # Фильтруем текущий список self._mods
-        disabled_mods = [mod for mod in self._mods if not mod.is_enabled]
+        with self._lock:
+            disabled_mods = list(self._disabled.values())
         logger.debug(f"[ModManager] get_disabled_mods вызван для steam_id={steam_id}, возвращаем {len(disabled_mods)} модов.")
         return disabled_mods
+
+    def get_installed_mod_ids(self) -> Set[str]:
+        """ID всех модов текущей игры (включённых и отключённых)"""
+        with self._lock:
+            return set(self._by_id)
     # --- Конец добавленных методов ---
 
+    def get_mod_by_package_id(self, package_id: str) -> Optional[Mod]:
+        """Установленный мод по packageId из About.xml (без учета регистра, как в RimWorld)"""
+        with self._lock:
+            return self._by_package_id.get(package_id.lower()) if package_id else None
+
+    def get_dependency_ids(self, mod: Mod) -> List[str]:
+        """
+        ID зависимостей мода из About.xml: ID установленного мода с тем же packageId,
+        иначе ID Workshop из ссылки зависимости, иначе сам packageId.
+        Заодно обновляет ModDependency.is_installed.
+        """
+        dependency_ids = []
+        for dep in mod.dependencies:
+            installed = self.get_mod_by_package_id(dep.package_id) if dep.package_id else self.get_mod_by_id(dep.mod_id)
+            dep.is_installed = installed is not None
+            dependency_ids.append(installed.mod_id if installed else dep.mod_id)
+        return dependency_ids
+
     def get_mod_by_id(self, mod_id: str) -> Optional[Mod]:
         """Получение мода по ID"""
-        # Используем next с генератором для эффективности
-        found_mod = next((mod for mod in self._mods if mod.mod_id == mod_id), None)
+        found_mod = self._by_id.get(mod_id)
         if found_mod:
             logger.debug(f"[ModManager/get_mod_by_id] Найден мод с ID {mod_id}.")
         else:
@@ -282,8 +703,7 @@ class ModManager:
                     shutil.move(mod.local_path, target_path)
                     logger.info(f"[ModManager/Enable] Мод {mod.mod_id} перемещен из '{mod.local_path}' в '{target_path}'.")
                     # 4. Обновляем путь и флаг в объекте Mod
-                    mod.local_path = target_path
-                    mod.is_enabled = True
+                    self._index_set_enabled(mod, True, target_path)
                     # event_bus.emit("mod_enabled", mod_id) # Опционально
                     logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) включен.")
                     return True
@@ -292,7 +712,7 @@ class ModManager:
                     return False
             elif os.path.exists(mod.local_path) and mod.local_path == target_path:
                 # Мод уже в нужном месте, просто включаем
-                mod.is_enabled = True
+                self._index_set_enabled(mod, True)
                 logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) уже находится в основной папке, флаг установлен.")
                 return True
             else:
@@ -337,8 +757,7 @@ class ModManager:
                     shutil.move(mod.local_path, target_path)
                     logger.info(f"[ModManager/Disable] Мод {mod.mod_id} перемещен из '{mod.local_path}' в '{target_path}'.")
                     # 4. Обновляем путь и флаг в объекте Mod
-                    mod.local_path = target_path
-                    mod.is_enabled = False
+                    self._index_set_enabled(mod, False, target_path)
                     # event_bus.emit("mod_disabled", mod_id) # Опционально
                     logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) отключен.")
                     return True
@@ -347,7 +766,7 @@ class ModManager:
                     return False
             elif os.path.exists(mod.local_path) and mod.local_path == target_path:
                 # Мод уже в архиве, просто отключаем
-                mod.is_enabled = False
+                self._index_set_enabled(mod, False)
                 logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) уже находится в архиве, флаг установлен.")
                 return True
             else:
@@ -363,6 +782,189 @@ class ModManager:
             return False
     # --- КОНЕЦ ИСПРАВЛЕНИЙ ---
 
+    # --- Массовое включение/отключение ---
+    def set_mods_enabled(self, mod_ids: List[str], enabled: bool) -> BulkToggleResult:
+        """
+        Включает или отключает несколько модов одной операцией "все или ничего".
+        Сначала планируются все перемещения (и проверяются конфликты), план записывается в журнал,
+        затем папки переименовываются параллельно. При любой ошибке выполненные перемещения
+        откатываются. После успешной операции отправляется одно событие "mods_state_changed".
+        """
+        result = BulkToggleResult(enabled=enabled)
+        game = self.current_game
+        if not game:
+            logger.error("[ModManager/Bulk] Неизвестна текущая игра.")
+            result.failed = {mod_id: "game not loaded" for mod_id in mod_ids}
+            return result
+        target_dir = game.mods_path if enabled else os.path.join(game.mods_path, "archive")
+
+        with self._lock:
+            moves: List[Tuple[Mod, str, str]] = []
+            flag_only: List[Mod] = []
+            planned_targets = set()
+            for mod_id in dict.fromkeys(mod_ids):
+                mod = self._by_id.get(mod_id)
+                if mod is None:
+                    result.failed[mod_id] = "mod not found"
+                    continue
+                if mod.is_enabled == enabled:
+                    result.skipped.append(mod_id)
+                    continue
+                target_path = os.path.join(target_dir, mod.mod_id)
+                if self._path_key(mod.local_path) == self._path_key(target_path):
+                    flag_only.append(mod)  # Папка уже на месте, меняется только флаг
+                elif not os.path.isdir(mod.local_path):
+                    result.failed[mod_id] = f"folder not found: {mod.local_path}"
+                elif os.path.exists(target_path) or self._path_key(target_path) in planned_targets:
+                    result.failed[mod_id] = f"target already exists: {target_path}"
+                else:
+                    planned_targets.add(self._path_key(target_path))
+                    moves.append((mod, mod.local_path, target_path))
+            if result.failed:
+                logger.error(f"[ModManager/Bulk] Операция отменена до перемещения: {result.failed}")
+                return result
+
+            done = self._execute_moves(game, moves, result)
+            if result.failed:
+                self._rollback_moves(done)
+                result.rolled_back = True
+                self._clear_toggle_journal()
+                logger.error(f"[ModManager/Bulk] Ошибка перемещения, выполнено и отменено {len(done)} из {len(moves)}: {result.failed}")
+                return result
+            self._clear_toggle_journal()
+            self.scan_index.move(game.steam_id, [(src, dst) for _mod, src, dst in moves])
+            self.scan_index.save(game.steam_id)
+
+            for mod, _src, dst in moves:
+                self._index_set_enabled(mod, enabled, dst)
+            for mod in flag_only:
+                self._index_set_enabled(mod, enabled)
+            result.changed = [mod for mod, _src, _dst in moves] + flag_only
+
+        logger.info(f"[ModManager/Bulk] {'Включено' if enabled else 'Отключено'} модов: {len(result.changed)} "
+                    f"(перемещено папок: {len(moves)}, уже в нужном состоянии: {len(result.skipped)})")
+        if result.changed:
+            event_bus.emit("mods_state_changed", {
+                'game_id': game.steam_id,
+                'enabled': enabled,
+                'mod_ids': [mod.mod_id for mod in result.changed],
+            })
+        return result
+
+    @staticmethod
+    def _move_folder(src: str, dst: str):
+        try:
+            os.rename(src, dst)  # archive - подпапка mods_path, обычно это один диск: переименование мгновенно
+        except OSError:
+            if os.path.exists(dst) or not os.path.exists(src):
+                raise
+            shutil.move(src, dst)
+
+    def _execute_moves(self, game: Game, moves: List[Tuple[Mod, str, str]],
+                       result: BulkToggleResult) -> List[Tuple[str, str]]:
+        """Записывает журнал и выполняет перемещения в пуле потоков. Возвращает выполненные (src, dst)."""
+        if not moves:
+            return []
+        try:
+            self._write_toggle_journal(game, [(src, dst) for _mod, src, dst in moves])
+            for target_parent in {os.path.dirname(dst) for _mod, _src, dst in moves}:
+                os.makedirs(target_parent, exist_ok=True)
+        except OSError as e:
+            result.failed.update({mod.mod_id: str(e) for mod, _src, _dst in moves})
+            return []
+
+        def move(item: Tuple[Mod, str, str]) -> Optional[str]:
+            _mod, src, dst = item
+            try:
+                self._move_folder(src, dst)
+                return None
+            except Exception as e:
+                return str(e)
+
+        done = []
+        with ThreadPoolExecutor(max_workers=min(self.max_scan_workers, len(moves)),
+                                thread_name_prefix="ModMove") as executor:
+            for (mod, src, dst), error in zip(moves, executor.map(move, moves)):
+                if error:
+                    result.failed[mod.mod_id] = error
+                else:
+                    done.append((src, dst))
+        return done
+
+    def _rollback_moves(self, done: List[Tuple[str, str]]) -> int:
+        """Возвращает папки на исходные места. Возвращает количество неудачных откатов."""
+        errors = 0
+        for src, dst in reversed(done):
+            try:
+                if os.path.exists(dst) and not os.path.exists(src):
+                    self._move_folder(dst, src)
+            except Exception as e:
+                errors += 1
+                logger.error(f"[ModManager/Bulk] Не удалось вернуть '{dst}' в '{src}': {e}")
+        return errors
+
+    # --- Журнал ---
+    def _write_toggle_journal(self, game: Game, moves: List[Tuple[str, str]]):
+        data = {'game_id': game.steam_id, 'moves': [{'src': src, 'dst': dst} for src, dst in moves]}
+        os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        tmp_path = self.journal_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_file)
+
+    def _clear_toggle_journal(self):
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"[ModManager/Bulk] Не удалось удалить журнал {self.journal_file}: {e}")
+
+    def recover_toggle_journal(self, replay: bool = False) -> int:
+        """
+        Восстанавливает состояние после сбоя во время set_mods_enabled: по умолчанию возвращает
+        уже перемещенные папки на исходные места, при replay=True - завершает оставшиеся перемещения.
+        Выполняется под self._lock: журнал выполняющейся set_mods_enabled (она держит блокировку
+        до его удаления) не принимается за журнал прерванной операции.
+        :return: Количество восстановленных папок.
+        """
+        with self._lock:
+            return self._recover_toggle_journal(replay)
+
+    def _recover_toggle_journal(self, replay: bool) -> int:
+        if not os.path.exists(self.journal_file):
+            return 0
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                moves = [(item['src'], item['dst']) for item in json.load(f).get('moves', [])]
+        except Exception as e:
+            logger.error(f"[ModManager/Bulk] Журнал {self.journal_file} поврежден и будет удален: {e}")
+            self._clear_toggle_journal()
+            return 0
+
+        if replay:
+            pending = [(src, dst) for src, dst in moves if os.path.exists(src) and not os.path.exists(dst)]
+            failed = 0
+            for src, dst in pending:
+                try:
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    self._move_folder(src, dst)
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"[ModManager/Bulk] Не удалось переместить '{src}' в '{dst}': {e}")
+            recovered = len(pending) - failed
+        else:
+            done = [(src, dst) for src, dst in moves if os.path.exists(dst) and not os.path.exists(src)]
+            failed = self._rollback_moves(done)
+            recovered = len(done) - failed
+        if not failed:
+            self._clear_toggle_journal()
+        logger.warning(f"[ModManager/Bulk] Незавершенная операция из журнала {'завершена' if replay else 'отменена'}: "
+                       f"{recovered} папок")
+        return recovered
+
     def remove_mod(self, game_steam_id: str, mod_id: str) -> bool:
         """
         Удаление мода.
@@ -370,23 +972,37 @@ class ModManager:
         """
         mod = self.get_mod_by_id(mod_id)
         if mod:
-            logger.info(f"[ModManager] Попытка удаления мода {mod.name} ({mod.mod_id})...")
-            try:
-                path_to_remove = mod.local_path
-                if os.path.exists(path_to_remove):
-                    shutil.rmtree(path_to_remove)
-                    logger.info(f"[ModManager] Папка мода '{path_to_remove}' удалена.")
-                else:
-                    logger.warning(f"[ModManager] Папка мода '{path_to_remove}' не существует при попытке удаления.")
+            return self.remove_mod_folder(mod)
+        logger.warning(f"[ModManager] Попытка удаления несуществующего мода {mod_id}.")
+        return False
 
-                self._mods.remove(mod)
-                # event_bus.emit("mod_removed", mod_id) # Опционально, если нужно событие
-                logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) удален из списка и с диска.")
-                return True
-            except Exception as e:
-                logger.error(f"[ModManager] Ошибка удаления мода {mod.name} ({mod.mod_id}) по пути '{mod.local_path}': {e}")
-        else:
-            logger.warning(f"[ModManager] Попытка удаления несуществующего мода {mod_id}.")
+    def remove_mod_folder(self, mod: Mod) -> bool:
+        """
+        Удаляет папку конкретного мода и убирает его из списка.
+        В отличие от remove_mod, подходит для копий с одинаковым ID (папка в mods и в archive).
+        """
+        logger.info(f"[ModManager] Попытка удаления мода {mod.name} ({mod.mod_id})...")
+        try:
+            path_to_remove = mod.local_path
+            if os.path.islink(path_to_remove):
+                # Профили (ProfileManager): удаляется содержимое в хранилище, ссылки в других профилях
+                # убираются при их синхронизации
+                real_path = os.path.realpath(path_to_remove)
+                os.unlink(path_to_remove)
+                path_to_remove = real_path
+            if os.path.exists(path_to_remove):
+                remove_tree(path_to_remove)
+                logger.info(f"[ModManager] Папка мода '{path_to_remove}' удалена.")
+            else:
+                logger.warning(f"[ModManager] Папка мода '{path_to_remove}' не существует при попытке удаления.")
+
+            with self._lock:
+                self._index_remove(mod)
+            # event_bus.emit("mod_removed", mod_id) # Опционально, если нужно событие
+            logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) удален из списка и с диска.")
+            return True
+        except Exception as e:
+            logger.error(f"[ModManager] Ошибка удаления мода {mod.name} ({mod.mod_id}) по пути '{mod.local_path}': {e}")
         return False
 
     def check_for_updates(self) -> List[str]:
@@ -403,14 +1019,14 @@ class ModManager:
             existing = self.get_mod_by_id(mod.mod_id)
             if existing:
                 logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) уже существует, обновляем путь и статус.")
-                existing.is_enabled = True # Или оставляем как есть?
-                existing.local_path = mod.local_path
+                self._index_set_enabled(existing, True, mod.local_path) # Или оставляем как есть?
                 # Можно обновить и другие поля, если они важны
                 # existing.author = mod.author
                 # existing.workshop_url = mod.workshop_url
                 # existing.install_date = mod.install_date # Обновлять дату?
             else:
-                self._mods.append(mod)
+                with self._lock:
+                    self._index_add(mod)
                 logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) добавлен в список.")
             # event_bus.emit("mod_installed", mod.mod_id) # Опционально, если нужно событие
             logger.info(f"[ModManager] Мод {mod.name} ({mod.mod_id}) 'установлен' для игры {game.name}")
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Подсчет размера папок модов на диске.
+Размер считается по дереву папок с кэшем на каждую подпапку: для папки запоминается ее отпечаток
+(mtime, inode), суммарный размер файлов в ней и список подпапок, поэтому при повторном подсчете
+заново читаются только изменившиеся поддеревья.
+"""
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from loguru import logger
+from src.data.config import MOD_SIZE_CACHE_FILE
+from src.models.game import Game
+from src.models.mod import Mod
+
+
+@dataclass
+class GameDiskUsage:
+    """Место, занимаемое модами игры"""
+    enabled_bytes: int = 0
+    disabled_bytes: int = 0
+    archive_bytes: int = 0          # Вся папка archive, включая файлы, не распознанные как моды
+    enabled_count: int = 0
+    disabled_count: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self.enabled_bytes + max(self.disabled_bytes, self.archive_bytes)
+
+
+class ModSizeService:
+    """
+    Размеры папок модов с кэшем по отпечаткам папок (<data>/mod_size_cache.json).
+
+    Время изменения папки меняется при добавлении, удалении и переименовании файлов в ней -
+    так Steam и SteamCMD обновляют моды. Перезапись файла на месте его не меняет:
+    для полного пересчета используется force=True.
+    Символические ссылки не раскрываются; файлы с жесткими ссылками (общее хранилище)
+    учитываются в каждой папке полным размером.
+    """
+
+    VERSION = 1
+    DEFAULT_WORKERS = 8
+    # Сколько готовых модов передается в on_result за раз
+    RESULT_BATCH_SIZE = 128
+
+    def __init__(self, cache_file: str = None, max_workers: Optional[int] = None):
+        self.cache_file = cache_file or MOD_SIZE_CACHE_FILE
+        self.max_workers = max_workers or self.DEFAULT_WORKERS
+        self._lock = threading.Lock()
+        self._dirty = False
+        # Путь папки -> (mtime_ns, inode, размер файлов в папке, имена подпапок)
+        self._dirs: Dict[str, Tuple[int, int, int, List[str]]] = self._load_cache()
+
+    # --- Кэш ---
+    def _load_cache(self) -> Dict[str, Tuple[int, int, int, List[str]]]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION:
+                logger.info("[ModSizeService] Устаревшая версия кэша размеров, кэш будет создан заново")
+                return {}
+            return {path: tuple(node) for path, node in data.get('dirs', {}).items()}
+        except Exception as e:
+            logger.error(f"[ModSizeService] Ошибка чтения кэша размеров: {e}")
+            return {}
+
+    def save(self):
+        """Сохраняет кэш, если он изменился"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': self.VERSION, 'dirs': dict(self._dirs)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_path = self.cache_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.error(f"[ModSizeService] Ошибка сохранения кэша размеров: {e}")
+
+    def _forget_subtree(self, path: str):
+        """Удаляет из кэша папку и все ее подпапки. Вызывается под блокировкой."""
+        node = self._dirs.pop(path, None)
+        if node is None:
+            return
+        self._dirty = True
+        for name in node[3]:
+            self._forget_subtree(os.path.join(path, name))
+
+    # --- Подсчет ---
+    def get_size(self, path: str, force: bool = False) -> int:
+        """Размер папки в байтах (0, если папки нет)"""
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._forget_subtree(path)
+            return 0
+        return self._dir_size(path, stat_result, force)
+
+    def _dir_size(self, path: str, stat_result: os.stat_result, force: bool) -> int:
+        fingerprint = (stat_result.st_mtime_ns, stat_result.st_ino)
+        with self._lock:
+            node = self._dirs.get(path)
+        if node is not None and not force and (node[0], node[1]) == fingerprint:
+            # Список файлов папки не менялся - проверяем только подпапки
+            total = node[2]
+            for name in node[3]:
+                child = os.path.join(path, name)
+                try:
+                    total += self._dir_size(child, os.stat(child), force)
+                except OSError:
+                    # Подпапка исчезла, а время изменения родителя совпало (например, при копировании с сохранением дат)
+                    return self._rescan_dir(path, fingerprint, force)
+            return total
+        return self._rescan_dir(path, fingerprint, force)
+
+    def _rescan_dir(self, path: str, fingerprint: Tuple[int, int], force: bool) -> int:
+        files_bytes = 0
+        subdirs: List[Tuple[str, os.stat_result]] = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append((entry.name, entry.stat(follow_symlinks=False)))
+                        else:
+                            files_bytes += entry.stat(follow_symlinks=False).st_size
+                    except OSError as e:
+                        logger.debug(f"[ModSizeService] Пропущен {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"[ModSizeService] Не удалось прочитать папку {path}: {e}")
+            return 0
+
+        names = [name for name, _stat in subdirs]
+        with self._lock:
+            old_node = self._dirs.get(path)
+            if old_node is not None:
+                for name in set(old_node[3]) - set(names):
+                    self._forget_subtree(os.path.join(path, name))
+            self._dirs[path] = (fingerprint[0], fingerprint[1], files_bytes, names)
+            self._dirty = True
+        return files_bytes + sum(self._dir_size(os.path.join(path, name), child_stat, force)
+                                 for name, child_stat in subdirs)
+
+    def compute_sizes(self, mods: List[Mod], on_result: Callable[[List[Tuple[Mod, int]]], None] = None,
+                      force: bool = False) -> Dict[str, int]:
+        """
+        Считает размеры папок модов в пуле потоков и записывает их в Mod.file_size.
+        on_result вызывается в вызывающем потоке с каждой пачкой готовых (мод, размер).
+        :return: Словарь {путь папки мода: размер}
+        """
+        mods = [mod for mod in mods if mod.local_path]
+        sizes: Dict[str, int] = {}
+        if not mods:
+            return sizes
+        batch: List[Tuple[Mod, int]] = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(mods)),
+                                thread_name_prefix="ModSize") as executor:
+            futures = {executor.submit(self.get_size, mod.local_path, force): mod for mod in mods}
+            for future in as_completed(futures):
+                mod = futures[future]
+                try:
+                    size = future.result()
+                except Exception as e:
+                    logger.error(f"[ModSizeService] Ошибка подсчета размера {mod.local_path}: {e}")
+                    continue
+                mod.file_size = size
+                sizes[mod.local_path] = size
+                batch.append((mod, size))
+                if on_result and len(batch) >= self.RESULT_BATCH_SIZE:
+                    on_result(batch)
+                    batch = []
+        if on_result and batch:
+            on_result(batch)
+        self.save()
+        return sizes
+
+    def get_disk_usage(self, game: Game, mods: List[Mod],
+                       on_result: Callable[[List[Tuple[Mod, int]]], None] = None,
+                       force: bool = False) -> GameDiskUsage:
+        """
+        Место, занимаемое включенными, отключенными модами и папкой archive игры.
+        Размеры модов считаются через compute_sizes (on_result - как там).
+        """
+        sizes = self.compute_sizes(mods, on_result=on_result, force=force)
+        usage = GameDiskUsage()
+        for mod in mods:
+            size = sizes.get(mod.local_path, 0)
+            if mod.is_enabled:
+                usage.enabled_bytes += size
+                usage.enabled_count += 1
+            else:
+                usage.disabled_bytes += size
+                usage.disabled_count += 1
+        # Подпапки archive уже в кэше после подсчета отключенных модов
+        usage.archive_bytes = self.get_size(os.path.join(game.mods_path, "archive"), force)
+        self.prune([game.mods_path], {mod.local_path for mod in mods})
+        self.save()
+        return usage
+
+    def prune(self, roots: List[str], keep: Set[str]):
+        """Удаляет из кэша папки модов внутри roots, которых нет в keep (удаленные и перемещенные моды)"""
+        keep_norm = {os.path.normpath(path) for path in keep}
+        root_norm = [os.path.normpath(root) for root in roots]
+        archive_norm = [os.path.join(root, "archive") for root in root_norm]
+        with self._lock:
+            for path in list(self._dirs):
+                parent = os.path.dirname(os.path.normpath(path))
+                # Только папки модов (непосредственно в mods_path или archive); подпапки удаляются вместе с ними
+                if (parent in root_norm or parent in archive_norm) and os.path.normpath(path) not in keep_norm \
+                        and os.path.normpath(path) not in archive_norm and path in self._dirs:
+                    self._forget_subtree(path)
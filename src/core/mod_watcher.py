@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Наблюдение за папкой модов игры (watchdog): внешние изменения (обновление мода клиентом Steam,
+ручное копирование или удаление папки) применяются к ModManager точечно, без полного пересканирования.
+"""
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional
+from loguru import logger
+from src.core.mod_manager import ModManager, ModDelta
+from src.models.game import Game
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    HAS_WATCHDOG = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    HAS_WATCHDOG = False
+
+
+class _ModsFolderHandler(FileSystemEventHandler):
+    """Передает пути событий watchdog в ModWatcher"""
+
+    def __init__(self, watcher: 'ModWatcher'):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed", "closed_no_write"):
+            return
+        self.watcher._on_path_changed(event.src_path)
+        dest_path = getattr(event, 'dest_path', '')
+        if dest_path:
+            self.watcher._on_path_changed(dest_path)
+
+
+class ModWatcher:
+    """
+    Следит за mods_path текущей игры (вместе с подпапкой archive) и после паузы в событиях
+    (debounce) передает измененные папки модов в ModManager.apply_folder_changes.
+    Пакет изменений отправляется в on_delta из потока наблюдателя.
+    """
+
+    DEBOUNCE_SECONDS = 1.0
+    # Во время долгого копирования события идут непрерывно - не откладываем применение дольше этого
+    MAX_DELAY_SECONDS = 5.0
+
+    def __init__(self, mod_manager: ModManager, debounce: float = None):
+        self.mod_manager = mod_manager
+        self.debounce = self.DEBOUNCE_SECONDS if debounce is None else debounce
+        self._lock = threading.Lock()
+        self._observer = None
+        self._game: Optional[Game] = None
+        self._on_delta: Optional[Callable[[Game, ModDelta], None]] = None
+        self._pending: Dict[str, bool] = {}     # Папка мода -> изменилось ли содержимое внутри
+        self._first_event_at = 0.0
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def available(self) -> bool:
+        return HAS_WATCHDOG
+
+    @property
+    def game(self) -> Optional[Game]:
+        return self._game
+
+    def watch(self, game: Game, on_delta: Callable[[Game, ModDelta], None]):
+        """Начинает наблюдение за папкой модов игры (предыдущее наблюдение останавливается)"""
+        self.stop()
+        if not HAS_WATCHDOG:
+            logger.warning("[ModWatcher] Модуль watchdog не установлен, отслеживание изменений отключено")
+            return
+        if not os.path.isdir(game.mods_path):
+            logger.debug(f"[ModWatcher] Папка модов не найдена, наблюдение не запущено: {game.mods_path}")
+            return
+        observer = Observer()
+        try:
+            # Рекурсивно: archive - подпапка mods_path, а изменения файлов внутри модов тоже нужны
+            observer.schedule(_ModsFolderHandler(self), game.mods_path, recursive=True)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            logger.error(f"[ModWatcher] Не удалось начать наблюдение за {game.mods_path}: {e}")
+            return
+        with self._lock:
+            self._observer = observer
+            self._game = game
+            self._on_delta = on_delta
+        logger.info(f"[ModWatcher] Наблюдение за папкой модов '{game.name}': {game.mods_path}")
+
+    def stop(self):
+        """Останавливает наблюдение; накопленные, но не примененные изменения отбрасываются"""
+        with self._lock:
+            observer = self._observer
+            self._observer = None
+            self._game = None
+            self._on_delta = None
+            self._pending.clear()
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if observer:
+            observer.stop()
+            if observer is not threading.current_thread():
+                observer.join(timeout=2.0)
+            logger.debug("[ModWatcher] Наблюдение остановлено")
+
+    # --- События ---
+    def _mod_folder_for(self, path: str) -> Optional[str]:
+        """Папка мода (в mods_path или archive), к которой относится путь события"""
+        game = self._game
+        if not game:
+            return None
+        rel_path = os.path.relpath(path, game.mods_path)
+        if rel_path == "." or rel_path.startswith(".."):
+            return None
+        parts = rel_path.split(os.sep)
+        if parts[0] == "archive":
+            if len(parts) < 2:
+                return None
+            return os.path.join(game.mods_path, "archive", parts[1])
+        return os.path.join(game.mods_path, parts[0])
+
+    def _on_path_changed(self, path: str):
+        with self._lock:
+            folder = self._mod_folder_for(path)
+            if folder is None:
+                return
+            inside = os.path.normpath(path) != os.path.normpath(folder)
+            self._pending[folder] = self._pending.get(folder, False) or inside
+            now = time.monotonic()
+            if self._timer is None:
+                self._first_event_at = now
+            elif now - self._first_event_at < self.MAX_DELAY_SECONDS:
+                self._timer.cancel()
+            else:
+                return  # Уже ждем слишком долго: не откладываем запущенный таймер
+            self._timer = threading.Timer(self.debounce, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+            game, on_delta = self._game, self._on_delta
+        if not pending or not game:
+            return
+        try:
+            delta = self.mod_manager.apply_folder_changes(game, pending)
+        except Exception as e:
+            logger.error(f"[ModWatcher] Ошибка применения изменений папки модов: {e}")
+            return
+        if delta.is_empty:
+            return
+        logger.info(f"[ModWatcher] Изменения в папке модов '{game.name}': добавлено {len(delta.added)}, "
+                    f"удалено {len(delta.removed)}, изменено {len(delta.modified)}")
+        if on_delta:
+            try:
+                on_delta(game, delta)
+            except Exception as e:
+                logger.error(f"[ModWatcher] Ошибка в обработчике изменений: {e}")
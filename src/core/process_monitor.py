@@ -153,6 +153,14 @@ class CacheManager:
         logger.debug(f"Данные сохранены в кэш: {key} (TTL: {ttl}с)")
         self._save_cache()
     
+    def set_many(self, items: Dict[str, dict], ttl: float = 300.0):
+        """Сохранение нескольких записей в кэш с одной записью файла"""
+        timestamp = time.time()
+        for key, data in items.items():
+            self._cache[key] = CacheEntry(data=data, timestamp=timestamp, ttl=ttl)
+        logger.debug(f"Сохранено записей в кэш: {len(items)} (TTL: {ttl}с)")
+        self._save_cache()
+
     def invalidate(self, key: str):
         """Инвалидация конкретного ключа кэша"""
         if key in self._cache:
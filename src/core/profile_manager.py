@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Профили наборов модов.
+Папки модов хранятся в постоянном хранилище рядом с папкой модов (<mods_path>.store), а каждый профиль -
+это готовое представление (<mods_path>.profiles/<имя>) из символических ссылок: включенные моды в корне,
+остальные - в archive, как ожидает ModManager. Сама папка модов игры становится символической ссылкой
+на представление активного профиля, поэтому переключение профиля - это одна атомарная замена ссылки,
+независимо от количества модов.
+"""
+import os
+import re
+import sys
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+from loguru import logger
+from src.models.game import Game
+
+
+@dataclass
+class ModProfile:
+    """Профиль: представление папки модов"""
+    name: str
+    path: str                                           # Папка представления
+    enabled: List[str] = field(default_factory=list)    # Имена папок включенных модов
+    is_active: bool = False
+
+
+class ProfileManager:
+    """
+    Профили модов одной игры.
+
+    Включение профилей (enable) переносит все папки модов из mods_path и archive в хранилище
+    (переименованием - хранилище лежит на том же диске) и заменяет mods_path ссылкой на профиль.
+    disable возвращает папки на место по активному профилю.
+    Ссылки указывают на абсолютные пути в хранилище, поэтому ModManager может перемещать их
+    между корнем представления и archive как обычные папки. При этом ModManager называет ссылку
+    по ID мода, поэтому мод представления определяется по цели ссылки, а не по ее имени.
+    В Windows для символических ссылок нужен режим разработчика или права администратора.
+    """
+
+    STORE_SUFFIX = ".store"
+    PROFILES_SUFFIX = ".profiles"
+    ARCHIVE_DIR = "archive"
+    DEFAULT_PROFILE = "default"
+    _NAME_PATTERN = re.compile(r"^\w[\w .\-]{0,63}$")
+
+    def __init__(self, game: Game):
+        self.game = game
+        base = os.path.normpath(game.mods_path)
+        self.mods_path = base
+        self.store_path = base + self.STORE_SUFFIX
+        self.profiles_path = base + self.PROFILES_SUFFIX
+
+    # --- Состояние ---
+    @property
+    def is_enabled(self) -> bool:
+        """mods_path - ссылка на представление профиля"""
+        return os.path.islink(self.mods_path) and os.path.isdir(self.store_path)
+
+    def active_profile_name(self) -> Optional[str]:
+        if not os.path.islink(self.mods_path):
+            return None
+        target = os.path.normpath(os.path.join(os.path.dirname(self.mods_path), os.readlink(self.mods_path)))
+        if os.path.dirname(target) != os.path.normpath(self.profiles_path):
+            return None
+        return os.path.basename(target)
+
+    def view_path(self, name: str) -> str:
+        return os.path.join(self.profiles_path, name)
+
+    def list_profiles(self) -> List[ModProfile]:
+        active = self.active_profile_name()
+        profiles = []
+        try:
+            with os.scandir(self.profiles_path) as entries:
+                names = sorted(entry.name for entry in entries
+                               if not entry.name.startswith('.') and entry.is_dir(follow_symlinks=False))
+        except FileNotFoundError:
+            return profiles
+        for name in names:
+            profiles.append(ModProfile(name=name, path=self.view_path(name),
+                                       enabled=self._enabled_names(self.view_path(name)),
+                                       is_active=name == active))
+        return profiles
+
+    def get_profile(self, name: str) -> Optional[ModProfile]:
+        return next((profile for profile in self.list_profiles() if profile.name == name), None)
+
+    def _store_name(self, link_path: str) -> Optional[str]:
+        """Имя папки хранилища, на которую указывает ссылка; None - ссылка ведет не в хранилище"""
+        try:
+            target = os.readlink(link_path)
+        except OSError:
+            return None
+        target = os.path.normpath(os.path.join(os.path.dirname(link_path), target))
+        if os.path.dirname(target) == os.path.normpath(self.store_path):
+            return os.path.basename(target)
+        real_target = os.path.realpath(link_path)
+        if os.path.dirname(real_target) == os.path.realpath(self.store_path):
+            return os.path.basename(real_target)
+        return None
+
+    def _view_entries(self, folder: str) -> Dict[str, str]:
+        """
+        Моды папки представления: {имя папки хранилища: путь элемента}.
+        Для ссылок имя берется из цели, для настоящих папок - собственное имя.
+        """
+        result: Dict[str, str] = {}
+        try:
+            with os.scandir(folder) as entries:
+                items = [(entry.name, entry.path, entry.is_symlink(), entry.is_dir(follow_symlinks=False))
+                         for entry in entries]
+        except OSError:
+            return result
+        for name, path, is_link, is_dir in items:
+            if name.startswith('.') or name == self.ARCHIVE_DIR:
+                continue
+            store_name = self._store_name(path) if is_link else (name if is_dir else None)
+            if store_name:
+                result.setdefault(store_name, path)
+        return result
+
+    def _enabled_names(self, view_path: str) -> List[str]:
+        return sorted(self._view_entries(view_path))
+
+    def _store_names(self) -> List[str]:
+        try:
+            with os.scandir(self.store_path) as entries:
+                return [entry.name for entry in entries
+                        if not entry.name.startswith('.') and entry.is_dir(follow_symlinks=False)]
+        except FileNotFoundError:
+            return []
+
+    def _validate_name(self, name: str):
+        if not self._NAME_PATTERN.match(name or "") or name == self.ARCHIVE_DIR:
+            raise ValueError(f"Недопустимое имя профиля: '{name}'")
+
+    # --- Ссылки ---
+    @staticmethod
+    def _remove_link(path: str):
+        try:
+            os.unlink(path)
+        except (IsADirectoryError, PermissionError):
+            os.rmdir(path)      # Windows: ссылка на папку удаляется как папка
+
+    def _link(self, name: str, link_path: str):
+        os.symlink(os.path.join(self.store_path, name), link_path, target_is_directory=True)
+
+    def _build_view(self, name: str, enabled: Iterable[str]) -> ModProfile:
+        """Создает представление во временной папке и переименовывает ее - профиль появляется целиком"""
+        view_path = self.view_path(name)
+        tmp_path = os.path.join(self.profiles_path, f".{name}.tmp")
+        if os.path.lexists(tmp_path):
+            shutil.rmtree(tmp_path)
+        store_names = set(self._store_names())
+        enabled_set = set(enabled)
+        unknown = enabled_set - store_names
+        if unknown:
+            logger.warning(f"[ProfileManager] Моды не найдены в хранилище и пропущены: {sorted(unknown)}")
+        os.makedirs(os.path.join(tmp_path, self.ARCHIVE_DIR))
+        for mod_name in store_names:
+            if mod_name in enabled_set:
+                self._link(mod_name, os.path.join(tmp_path, mod_name))
+            else:
+                self._link(mod_name, os.path.join(tmp_path, self.ARCHIVE_DIR, mod_name))
+        os.rename(tmp_path, view_path)
+        return ModProfile(name=name, path=view_path, enabled=sorted(enabled_set & store_names))
+
+    def _swap_link(self, view_path: str):
+        """Атомарно направляет mods_path на представление (новая ссылка + os.replace)"""
+        tmp_link = self.mods_path + ".swap"
+        if os.path.lexists(tmp_link):
+            self._remove_link(tmp_link)
+        os.symlink(view_path, tmp_link, target_is_directory=True)
+        try:
+            os.replace(tmp_link, self.mods_path)
+        except OSError:
+            if not sys.platform.startswith("win"):
+                raise
+            # Windows не заменяет ссылку на папку переименованием: короткое окно без mods_path
+            self._remove_link(self.mods_path)
+            os.rename(tmp_link, self.mods_path)
+
+    # --- Операции ---
+    def enable(self, profile_name: str = DEFAULT_PROFILE) -> ModProfile:
+        """
+        Переводит игру на профили: папки модов переносятся в хранилище, текущий набор
+        включенных модов становится профилем profile_name. Повторный вызов после сбоя
+        продолжает перенос.
+        :raises ValueError: Профили уже включены, папки модов нет или имя профиля недопустимо.
+        """
+        self._validate_name(profile_name)
+        if self.is_enabled:
+            raise ValueError("Профили уже включены")
+        if os.path.islink(self.mods_path) or not os.path.isdir(self.mods_path):
+            raise ValueError(f"Папка модов не найдена: {self.mods_path}")
+        if os.path.lexists(self.view_path(profile_name)):
+            raise ValueError(f"Профиль '{profile_name}' уже существует")
+        os.makedirs(self.store_path, exist_ok=True)
+        os.makedirs(self.profiles_path, exist_ok=True)
+        archive_path = os.path.join(self.mods_path, self.ARCHIVE_DIR)
+
+        # После прерванного переноса часть включенных модов уже в хранилище - их не отличить
+        # от отключенных, поэтому они попадут в archive профиля
+        enabled: List[str] = []
+        leftovers: List[str] = []
+        for folder, is_enabled in ((self.mods_path, True), (archive_path, False)):
+            try:
+                with os.scandir(folder) as entries:
+                    items = [(entry.name, entry.path, entry.is_dir(follow_symlinks=False)) for entry in entries]
+            except FileNotFoundError:
+                continue
+            for name, path, is_dir in items:
+                if is_enabled and name == self.ARCHIVE_DIR:
+                    continue
+                target = os.path.join(self.store_path, name)
+                if not is_dir or name.startswith('.') or os.path.lexists(target):
+                    leftovers.append(path)
+                    continue
+                os.rename(path, target)
+                if is_enabled:
+                    enabled.append(name)
+
+        profile = self._build_view(profile_name, enabled)
+        for path in leftovers:
+            # Файлы и дубликаты папок остаются в представлении как есть
+            rel_path = os.path.relpath(path, self.mods_path)
+            destination = os.path.join(profile.path, rel_path)
+            if os.path.lexists(destination):
+                logger.warning(f"[ProfileManager] Пропущен элемент, уже есть в профиле: {path}")
+                continue
+            os.rename(path, destination)
+        if os.path.isdir(archive_path):
+            os.rmdir(archive_path)
+        os.rmdir(self.mods_path)
+        self._swap_link(profile.path)
+        profile.is_active = True
+        logger.info(f"[ProfileManager] Профили включены для '{self.game.name}': в хранилище "
+                    f"{len(self._store_names())} модов, активный профиль '{profile_name}' ({len(enabled)} включено)")
+        return profile
+
+    def disable(self):
+        """Возвращает папки модов в mods_path и archive по активному профилю и удаляет профили"""
+        if not self.is_enabled:
+            raise ValueError("Профили не включены")
+        active = self.active_profile_name()
+        self.sync()
+        enabled = set(self._enabled_names(self.view_path(active))) if active else set()
+        view = self.view_path(active) if active else None
+
+        self._remove_link(self.mods_path)
+        archive_path = os.path.join(self.mods_path, self.ARCHIVE_DIR)
+        os.makedirs(archive_path)
+        for name in self._store_names():
+            target = self.mods_path if name in enabled else archive_path
+            os.rename(os.path.join(self.store_path, name), os.path.join(target, name))
+        if view:
+            # Файлы, которые лежали в представлении как есть (не ссылки)
+            for rel_dir in ("", self.ARCHIVE_DIR):
+                with os.scandir(os.path.join(view, rel_dir)) as entries:
+                    items = [(entry.name, entry.path) for entry in entries if not entry.is_symlink()]
+                for name, path in items:
+                    if not rel_dir and name == self.ARCHIVE_DIR:
+                        continue
+                    destination = os.path.join(self.mods_path, rel_dir, name)
+                    if not os.path.lexists(destination):
+                        os.rename(path, destination)
+        shutil.rmtree(self.profiles_path)   # Ссылки удаляются без перехода по ним
+        os.rmdir(self.store_path)
+        logger.info(f"[ProfileManager] Профили отключены для '{self.game.name}', папки модов возвращены в {self.mods_path}")
+
+    def create_profile(self, name: str, enabled: Optional[Iterable[str]] = None,
+                       copy_from: Optional[str] = None) -> ModProfile:
+        """
+        Новый профиль. Включенные моды - enabled (имена папок в хранилище) или набор профиля copy_from;
+        по умолчанию все моды отключены.
+        """
+        self._validate_name(name)
+        if not self.is_enabled:
+            raise ValueError("Профили не включены")
+        if os.path.lexists(self.view_path(name)):
+            raise ValueError(f"Профиль '{name}' уже существует")
+        self.sync()
+        if copy_from is not None:
+            enabled = self._enabled_names(self.view_path(copy_from))
+        profile = self._build_view(name, enabled or [])
+        logger.info(f"[ProfileManager] Создан профиль '{name}' ({len(profile.enabled)} включено)")
+        return profile
+
+    def delete_profile(self, name: str):
+        if name == self.active_profile_name():
+            raise ValueError("Нельзя удалить активный профиль")
+        view_path = self.view_path(name)
+        if not os.path.isdir(view_path):
+            raise ValueError(f"Профиль '{name}' не найден")
+        self.sync()     # Папки, скачанные прямо в представление, сначала переносятся в хранилище
+        shutil.rmtree(view_path)
+        logger.info(f"[ProfileManager] Удален профиль '{name}'")
+
+    def activate(self, name: str) -> ModProfile:
+        """Делает профиль активным: синхронизация представлений и атомарная замена ссылки mods_path"""
+        profile = self.get_profile(name)
+        if profile is None:
+            raise ValueError(f"Профиль '{name}' не найден")
+        self.sync()
+        self._swap_link(profile.path)
+        profile.is_active = True
+        profile.enabled = self._enabled_names(profile.path)
+        logger.info(f"[ProfileManager] Активирован профиль '{name}' ({len(profile.enabled)} включено)")
+        return profile
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Приводит представления к хранилищу:
+        - настоящие папки в представлениях (моды, скачанные прямо в папку модов) переносятся
+          в хранилище и заменяются ссылками;
+        - моды хранилища, которых нет в представлении, добавляются в его archive;
+        - ссылки на удаленные из хранилища моды удаляются.
+        :return: Счетчики {'ingested', 'added', 'pruned'}.
+        """
+        stats = {'ingested': 0, 'added': 0, 'pruned': 0}
+        store_names = set(self._store_names())
+        views = [profile.path for profile in self.list_profiles()]
+        for view in views:
+            for folder in (view, os.path.join(view, self.ARCHIVE_DIR)):
+                try:
+                    with os.scandir(folder) as entries:
+                        items = [(entry.name, entry.path, entry.is_symlink(), entry.is_dir(follow_symlinks=False))
+                                 for entry in entries]
+                except FileNotFoundError:
+                    os.makedirs(folder)
+                    continue
+                for name, path, is_link, is_dir in items:
+                    if name.startswith('.') or (folder == view and name == self.ARCHIVE_DIR):
+                        continue
+                    if is_link:
+                        if not os.path.exists(path):
+                            self._remove_link(path)
+                            stats['pruned'] += 1
+                        continue
+                    if not is_dir:
+                        continue
+                    if name in store_names:
+                        logger.warning(f"[ProfileManager] Папка {path} уже есть в хранилище, оставлена как есть")
+                        continue
+                    os.rename(path, os.path.join(self.store_path, name))
+                    self._link(name, path)
+                    store_names.add(name)
+                    stats['ingested'] += 1
+        for view in views:
+            enabled = self._view_entries(view)
+            archived = self._view_entries(os.path.join(view, self.ARCHIVE_DIR))
+            # Мод и в корне, и в archive (ссылка включенного мода переименована по ID) - включенный важнее
+            for name in set(enabled) & set(archived):
+                if os.path.islink(archived[name]):
+                    self._remove_link(archived[name])
+                    stats['pruned'] += 1
+            for name in store_names - set(enabled) - set(archived):
+                link_path = os.path.join(view, self.ARCHIVE_DIR, name)
+                if os.path.lexists(link_path):
+                    logger.warning(f"[ProfileManager] Имя {link_path} занято, мод {name} не добавлен в профиль")
+                    continue
+                self._link(name, link_path)
+                stats['added'] += 1
+        if any(stats.values()):
+            logger.info(f"[ProfileManager] Синхронизация профилей '{self.game.name}': {stats}")
+        return stats
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс сканирования папок модов: для каждой папки хранится ее отпечаток (mtime, inode)
+и уже прочитанные метаданные (Steam ID, поля About.xml), чтобы при повторном сканировании
+не перечитывать файлы неизменившихся модов.
+"""
+import os
+import json
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from src.data.config import SCAN_INDEX_DIR
+
+
+@dataclass
+class ScanIndexEntry:
+    """Запись индекса для одной папки мода"""
+    path: str
+    steam_id: str = ""
+    mtime_ns: int = 0
+    inode: int = 0
+    # Файл, из которого прочитаны метаданные (About.xml или manifest.json). Изменение файла внутри
+    # подпапки About не меняет время изменения папки мода, поэтому его mtime проверяется отдельно
+    metadata_path: str = ""
+    metadata_mtime_ns: int = 0
+    name: str = ""
+    author: str = ""
+    description: str = ""
+    package_id: str = ""
+    supported_versions: List[str] = field(default_factory=list)
+    dependencies: List[Dict[str, str]] = field(default_factory=list)   # AboutDependency.to_dict()
+    load_after: List[str] = field(default_factory=list)
+    load_before: List[str] = field(default_factory=list)
+
+    def set_fingerprint(self, stat_result: os.stat_result):
+        self.mtime_ns = stat_result.st_mtime_ns
+        self.inode = stat_result.st_ino
+
+    def matches(self, stat_result: os.stat_result) -> bool:
+        """Папка не изменилась с момента записи (файл метаданных проверяется отдельным stat)"""
+        if (self.mtime_ns, self.inode) != (stat_result.st_mtime_ns, stat_result.st_ino):
+            return False
+        if self.metadata_path:
+            try:
+                return os.stat(self.metadata_path).st_mtime_ns == self.metadata_mtime_ns
+            except OSError:
+                return False
+        return True
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScanIndexEntry':
+        return cls(
+            path=data['path'],
+            steam_id=data.get('steam_id', ''),
+            mtime_ns=data.get('mtime_ns', 0),
+            inode=data.get('inode', 0),
+            metadata_path=data.get('metadata_path', ''),
+            metadata_mtime_ns=data.get('metadata_mtime_ns', 0),
+            name=data.get('name', ''),
+            author=data.get('author', ''),
+            description=data.get('description', ''),
+            package_id=data.get('package_id', ''),
+            supported_versions=data.get('supported_versions', []),
+            dependencies=data.get('dependencies', []),
+            load_after=data.get('load_after', []),
+            load_before=data.get('load_before', []),
+        )
+
+
+class ScanIndex:
+    """
+    Индексы сканирования по играм (<index_dir>/<steam_id игры>.json).
+    Индекс игры загружается при первом обращении и остается в памяти; к нему обращаются
+    потоки сканирования ModManager, поэтому все операции выполняются под блокировкой.
+    """
+
+    # 2: метаданные About.xml читаются для всех папок, а не только для папок с нечисловым именем
+    VERSION = 2
+
+    def __init__(self, index_dir: str = None):
+        self.index_dir = index_dir or SCAN_INDEX_DIR
+        self._lock = threading.Lock()
+        self._games: Dict[str, Dict[str, ScanIndexEntry]] = {}
+        self._dirty: set = set()
+        self._hits = 0
+        self._misses = 0
+
+    def _index_path(self, game_id: str) -> str:
+        return os.path.join(self.index_dir, f"{game_id}.json")
+
+    def _entries(self, game_id: str) -> Dict[str, ScanIndexEntry]:
+        """Записи игры (загружаются с диска при первом обращении). Вызывается под блокировкой."""
+        entries = self._games.get(game_id)
+        if entries is not None:
+            return entries
+        entries = {}
+        path = self._index_path(game_id)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.VERSION:
+                    entries = {item['path']: ScanIndexEntry.from_dict(item) for item in data.get('entries', [])}
+                else:
+                    logger.info(f"[ScanIndex] Устаревшая версия индекса {path}, индекс будет создан заново")
+            except Exception as e:
+                logger.error(f"[ScanIndex] Ошибка чтения индекса {path}: {e}")
+                entries = {}
+        self._games[game_id] = entries
+        return entries
+
+    # --- Сканирование ---
+    def begin_scan(self, game_id: str):
+        """Подготовка к сканированию игры: загрузка индекса и сброс счетчиков"""
+        with self._lock:
+            self._entries(game_id)
+            self._hits = 0
+            self._misses = 0
+
+    def lookup(self, game_id: str, path: str, stat_result: os.stat_result) -> Optional[ScanIndexEntry]:
+        """Запись для папки, если папка не изменилась; иначе None"""
+        with self._lock:
+            entry = self._entries(game_id).get(path)
+        if entry is not None and entry.matches(stat_result):
+            with self._lock:
+                self._hits += 1
+            return entry
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def store(self, game_id: str, entry: ScanIndexEntry):
+        with self._lock:
+            self._entries(game_id)[entry.path] = entry
+            self._dirty.add(game_id)
+
+    def move(self, game_id: str, moves: Iterable[Tuple[str, str]]):
+        """
+        Переносит записи перемещенных папок (включение/отключение мода) на новые пути.
+        При переименовании папки ее mtime и inode не меняются, поэтому запись остается верной.
+        """
+        with self._lock:
+            entries = self._entries(game_id)
+            for src, dst in moves:
+                entry = entries.pop(src, None)
+                if entry is None:
+                    continue
+                entry.path = dst
+                if entry.metadata_path.startswith(os.path.join(src, "")):
+                    entry.metadata_path = os.path.join(dst, os.path.relpath(entry.metadata_path, src))
+                entries[dst] = entry
+                self._dirty.add(game_id)
+
+    def finish_scan(self, game_id: str, seen_paths: Iterable[str]) -> Tuple[int, int]:
+        """
+        Завершение сканирования: удаляет записи папок, которых больше нет, и сохраняет индекс.
+        :return: (папок из индекса, перечитанных папок)
+        """
+        seen = set(seen_paths)
+        with self._lock:
+            entries = self._entries(game_id)
+            stale = [path for path in entries if path not in seen]
+            for path in stale:
+                del entries[path]
+            if stale:
+                self._dirty.add(game_id)
+            hits, misses = self._hits, self._misses
+        self.save(game_id)
+        return hits, misses
+
+    # --- Хранение ---
+    def save(self, game_id: str):
+        """Сохраняет индекс игры, если он изменился"""
+        with self._lock:
+            if game_id not in self._dirty:
+                return
+            data = {'version': self.VERSION,
+                    'entries': [entry.to_dict() for entry in self._games.get(game_id, {}).values()]}
+            self._dirty.discard(game_id)
+        path = self._index_path(game_id)
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"[ScanIndex] Ошибка сохранения индекса {path}: {e}")
+
+    def clear(self, game_id: str):
+        """Удаляет индекс игры (следующее сканирование перечитает все папки)"""
+        with self._lock:
+            self._games.pop(game_id, None)
+            self._dirty.discard(game_id)
+        path = self._index_path(game_id)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+Снимки состояния модов игры и откат к ним.
+Снимок - это компактный JSON (какие моды включены, порядок загрузки из ModsConfig.xml, даты модов)
+и сохраненное содержимое модов в виде жестких ссылок на их файлы: пока файл не заменен,
+снимок не занимает места на диске. Установщик загрузок заменяет папку мода целиком, поэтому
+прежние файлы продолжают жить в снимке и после обновления.
+
+Жесткая ссылка - тот же файл, поэтому правка файла мода "на месте" (без замены) меняет и снимок.
+Такие правки не защищены; они обнаруживаются по размеру и времени изменения, записанным при создании
+снимка, и откат такого мода завершается ошибкой, а не восстанавливает измененные данные.
+"""
+import os
+import json
+import shutil
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from src.data.config import SNAPSHOTS_DIR
+from src.core.content_manifest import ContentManifestService
+from src.core.content_store import remove_tree
+from src.core.load_order import default_mods_config_path, read_mods_config, write_mods_config
+from src.core.mod_manager import ModManager
+from src.models.game import Game
+
+
+@dataclass
+class SnapshotMod:
+    """Мод в снимке; папка мода определяется ее именем и разделом (включен / archive)"""
+    mod_id: str
+    folder: str
+    enabled: bool
+    name: str = ""
+    package_id: str = ""
+    local_update_date: str = ""     # ISO-дата изменения папки на момент снимка
+
+    def to_dict(self) -> Dict:
+        return {'mod_id': self.mod_id, 'folder': self.folder, 'enabled': self.enabled, 'name': self.name,
+                'package_id': self.package_id, 'local_update_date': self.local_update_date}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SnapshotMod':
+        return cls(mod_id=data['mod_id'], folder=data['folder'], enabled=data.get('enabled', True),
+                   name=data.get('name', ''), package_id=data.get('package_id', ''),
+                   local_update_date=data.get('local_update_date', ''))
+
+
+@dataclass
+class GameSnapshot:
+    """Снимок состояния модов игры"""
+    snapshot_id: str
+    game_id: str
+    created_at: str
+    label: str = ""
+    auto: bool = False                                      # Создан автоматически (перед обновлением)
+    mods: List[SnapshotMod] = field(default_factory=list)
+    load_order: List[str] = field(default_factory=list)     # packageId из ModsConfig.xml (RimWorld)
+    files: int = 0                                          # Файлов модов в снимке
+    copied_bytes: int = 0                                   # Файлы, которые пришлось скопировать (другой диск)
+    partial: bool = False                                   # Только часть модов: остальные откат не трогает
+
+    @property
+    def enabled_count(self) -> int:
+        return sum(1 for mod in self.mods if mod.enabled)
+
+    def to_dict(self) -> Dict:
+        return {'version': SnapshotManager.VERSION, 'snapshot_id': self.snapshot_id, 'game_id': self.game_id,
+                'created_at': self.created_at, 'label': self.label, 'auto': self.auto,
+                'mods': [mod.to_dict() for mod in self.mods], 'load_order': self.load_order,
+                'files': self.files, 'copied_bytes': self.copied_bytes, 'partial': self.partial}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GameSnapshot':
+        return cls(snapshot_id=data['snapshot_id'], game_id=data['game_id'], created_at=data.get('created_at', ''),
+                   label=data.get('label', ''), auto=data.get('auto', False),
+                   mods=[SnapshotMod.from_dict(mod) for mod in data.get('mods', [])],
+                   load_order=data.get('load_order', []), files=data.get('files', 0),
+                   copied_bytes=data.get('copied_bytes', 0), partial=data.get('partial', False))
+
+
+@dataclass
+class RollbackResult:
+    """Итог отката к снимку"""
+    restored: List[str] = field(default_factory=list)       # ID модов, содержимое которых восстановлено
+    toggled: List[str] = field(default_factory=list)        # ID модов, у которых изменено состояние
+    new_mods: List[str] = field(default_factory=list)       # Моды, которых не было в снимке (отключены или удалены)
+    failed: Dict[str, str] = field(default_factory=dict)
+    load_order_written: bool = False
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+
+class SnapshotManager:
+    """
+    Снимки модов игры.
+
+    Описание снимка, размеры и время изменения файлов на момент снимка и жесткие ссылки на манифесты
+    содержимого хранятся в <snapshot_dir>/<steam_id игры>/, а содержимое модов - рядом с папкой модов
+    (<mods_path>.snapshots/<ID снимка>/enabled|archive/<папка>), чтобы жесткие ссылки не пересекали
+    границу диска. Если ссылка невозможна, файл копируется.
+    Откат восстанавливает измененные и удаленные моды копированием из снимка (после отката папка мода
+    не делит файлы со снимком), затем включает и отключает моды через ModManager.set_mods_enabled
+    и записывает сохраненный порядок загрузки.
+    """
+
+    VERSION = 1
+    CONTENT_SUFFIX = ".snapshots"
+    # Сколько автоматических снимков (перед обновлением) хранится для игры
+    MAX_AUTO_SNAPSHOTS = 3
+
+    def __init__(self, mod_manager: ModManager, snapshot_dir: str = None,
+                 manifest_service: Optional[ContentManifestService] = None):
+        self.mod_manager = mod_manager
+        self.snapshot_dir = snapshot_dir or SNAPSHOTS_DIR
+        self.manifest_service = manifest_service or ContentManifestService()
+
+    # --- Пути ---
+    def _game_dir(self, game: Game) -> str:
+        return os.path.join(self.snapshot_dir, game.steam_id)
+
+    def _snapshot_file(self, game: Game, snapshot_id: str) -> str:
+        return os.path.join(self._game_dir(game), f"{snapshot_id}.json")
+
+    def _manifests_dir(self, game: Game, snapshot_id: str) -> str:
+        return os.path.join(self._game_dir(game), snapshot_id, "manifests")
+
+    def _file_stats_path(self, game: Game, snapshot_id: str) -> str:
+        return os.path.join(self._game_dir(game), snapshot_id, "files.json")
+
+    @staticmethod
+    def _mod_key(mod: SnapshotMod) -> str:
+        return f"{'enabled' if mod.enabled else 'archive'}/{mod.folder}"
+
+    def content_path(self, game: Game, snapshot_id: str) -> str:
+        return os.path.join(os.path.normpath(game.mods_path) + self.CONTENT_SUFFIX, snapshot_id)
+
+    def _mod_content_path(self, game: Game, snapshot_id: str, mod: SnapshotMod) -> str:
+        return os.path.join(self.content_path(game, snapshot_id), "enabled" if mod.enabled else "archive", mod.folder)
+
+    # --- Ссылки ---
+    @staticmethod
+    def _link_tree(src: str, dst: str, link: bool = True) -> Tuple[int, int]:
+        """
+        Повторяет дерево src в dst жесткими ссылками (при невозможности или link=False - копиями).
+        :return: (файлов, скопировано байт)
+        """
+        files = copied = 0
+        stack = [(src, dst)]
+        while stack:
+            src_dir, dst_dir = stack.pop()
+            os.makedirs(dst_dir, exist_ok=True)
+            with os.scandir(src_dir) as entries:
+                for entry in entries:
+                    target = os.path.join(dst_dir, entry.name)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, target))
+                        continue
+                    try:
+                        if not link:
+                            raise OSError("copy requested")
+                        os.link(entry.path, target)
+                    except OSError:
+                        shutil.copy2(entry.path, target, follow_symlinks=False)
+                        copied += entry.stat(follow_symlinks=False).st_size
+                    files += 1
+        return files, copied
+
+    @staticmethod
+    def _tree_stats(root: str) -> Dict[str, List[int]]:
+        """{относительный путь через '/': [размер, mtime_ns]} файлов дерева"""
+        result = {}
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        stat_result = entry.stat(follow_symlinks=False)
+                        rel_path = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                        result[rel_path] = [stat_result.st_size, stat_result.st_mtime_ns]
+        return result
+
+    def _restore_tree(self, src: str, dest: str):
+        """
+        Копирует папку из снимка рядом с dest и подменяет ею dest двумя переименованиями.
+        Копирование (а не ссылки) нужно, чтобы последующие правки мода не меняли снимок.
+        """
+        parent, name = os.path.split(dest)
+        tmp_path = os.path.join(parent, f".{name}.restore")
+        old_path = os.path.join(parent, f".{name}.old")
+        for path in (tmp_path, old_path):
+            if os.path.lexists(path):
+                remove_tree(path)
+        self._link_tree(src, tmp_path, link=False)
+        if os.path.lexists(dest):
+            os.rename(dest, old_path)
+            os.rename(tmp_path, dest)
+            remove_tree(old_path)
+        else:
+            os.rename(tmp_path, dest)
+
+    # --- Снимки ---
+    def list_snapshots(self, game: Game) -> List[GameSnapshot]:
+        """Снимки игры, новые первыми"""
+        snapshots = []
+        try:
+            names = [name for name in os.listdir(self._game_dir(game)) if name.endswith(".json")]
+        except FileNotFoundError:
+            return snapshots
+        for name in names:
+            try:
+                with open(os.path.join(self._game_dir(game), name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.VERSION:
+                    snapshots.append(GameSnapshot.from_dict(data))
+            except Exception as e:
+                logger.error(f"[SnapshotManager] Ошибка чтения снимка {name}: {e}")
+        snapshots.sort(key=lambda snapshot: snapshot.created_at, reverse=True)
+        return snapshots
+
+    def get_snapshot(self, game: Game, snapshot_id: str) -> Optional[GameSnapshot]:
+        return next((snapshot for snapshot in self.list_snapshots(game) if snapshot.snapshot_id == snapshot_id), None)
+
+    def create_snapshot(self, game: Game, label: str = "", auto: bool = False,
+                        mod_ids: Optional[Iterable[str]] = None) -> GameSnapshot:
+        """
+        Снимок текущего состояния модов игры (моды берутся из ModManager; если загружена
+        другая игра, моды загружаются).
+        :param mod_ids: Сохранить только эти моды (например, устаревшие перед обновлением).
+            Откат такого снимка не отключает и не удаляет остальные моды.
+        """
+        if not self.mod_manager.current_game or self.mod_manager.current_game.steam_id != game.steam_id:
+            self.mod_manager.load_mods_for_game(game)
+        now = datetime.now()
+        base_id = snapshot_id = now.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(self._snapshot_file(game, snapshot_id)):
+            snapshot_id = f"{base_id}-{suffix}"
+            suffix += 1
+        selected = set(mod_ids) if mod_ids is not None else None
+        snapshot = GameSnapshot(snapshot_id=snapshot_id, game_id=game.steam_id, created_at=now.isoformat(),
+                                label=label, auto=auto, partial=selected is not None)
+        file_stats: Dict[str, Dict[str, List[int]]] = {}
+
+        for mod in self.mod_manager.get_installed_mods(game.steam_id):
+            if not mod.local_path or not os.path.isdir(mod.local_path):
+                continue
+            if selected is not None and mod.mod_id not in selected:
+                continue
+            entry = SnapshotMod(mod_id=mod.mod_id, folder=os.path.basename(os.path.normpath(mod.local_path)),
+                                enabled=mod.is_enabled, name=mod.name, package_id=mod.package_id,
+                                local_update_date=mod.local_update_date.isoformat() if mod.local_update_date else "")
+            # Для профилей (ProfileManager) папка мода - ссылка на хранилище
+            real_path = os.path.realpath(mod.local_path)
+            file_stats[self._mod_key(entry)] = self._tree_stats(real_path)
+            files, copied = self._link_tree(real_path, self._mod_content_path(game, snapshot_id, entry))
+            snapshot.files += files
+            snapshot.copied_bytes += copied
+            snapshot.mods.append(entry)
+
+            manifest_path = self.manifest_service.manifest_path(game.steam_id, mod.mod_id)
+            if os.path.exists(manifest_path):
+                self._link_file(manifest_path, os.path.join(self._manifests_dir(game, snapshot_id), f"{mod.mod_id}.json"))
+
+        config_path = default_mods_config_path(game)
+        if config_path:
+            snapshot.load_order = read_mods_config(config_path)
+
+        self._write_json(self._file_stats_path(game, snapshot_id), file_stats)
+        self._save(game, snapshot)
+        logger.info(f"[SnapshotManager] Создан снимок {snapshot_id} игры '{game.name}': модов {len(snapshot.mods)}, "
+                    f"файлов {snapshot.files}, скопировано {snapshot.copied_bytes} байт")
+        if auto:
+            self._prune_auto(game)
+        return snapshot
+
+    @staticmethod
+    def _link_file(src: str, dst: str):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    @staticmethod
+    def _write_json(path: str, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _save(self, game: Game, snapshot: GameSnapshot):
+        self._write_json(self._snapshot_file(game, snapshot.snapshot_id), snapshot.to_dict())
+
+    def _load_file_stats(self, game: Game, snapshot_id: str) -> Dict[str, Dict[str, List[int]]]:
+        """Размеры и время изменения файлов на момент снимка; пусто для снимков без этих данных"""
+        try:
+            with open(self._file_stats_path(game, snapshot_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"[SnapshotManager] Ошибка чтения файлов снимка {snapshot_id}: {e}")
+            return {}
+
+    def _prune_auto(self, game: Game):
+        auto_snapshots = [snapshot for snapshot in self.list_snapshots(game) if snapshot.auto]
+        for snapshot in auto_snapshots[self.MAX_AUTO_SNAPSHOTS:]:
+            self.delete_snapshot(game, snapshot.snapshot_id)
+
+    def delete_snapshot(self, game: Game, snapshot_id: str):
+        """Удаляет снимок; файлы модов освобождаются, если на них больше нет ссылок"""
+        for path in (self.content_path(game, snapshot_id), os.path.join(self._game_dir(game), snapshot_id)):
+            if os.path.isdir(path):
+                remove_tree(path)
+        snapshot_file = self._snapshot_file(game, snapshot_id)
+        if os.path.exists(snapshot_file):
+            os.remove(snapshot_file)
+        logger.info(f"[SnapshotManager] Удален снимок {snapshot_id} игры '{game.name}'")
+
+    # --- Откат ---
+    def rollback(self, game: Game, snapshot_id: str, remove_new: bool = False) -> RollbackResult:
+        """
+        Возвращает моды игры к состоянию снимка.
+        Моды, файлы которых отличаются от записанных при создании снимка (обновлены, изменены или удалены),
+        копируются из снимка; совпадающие не трогаются. Если изменилось содержимое самого снимка
+        (файл правили на месте через общую жесткую ссылку), мод не восстанавливается и попадает в failed.
+        :param remove_new: Удалить моды, появившиеся после снимка (по умолчанию они только отключаются).
+            Для частичного снимка остальные моды не трогаются.
+        :raises ValueError: Снимок не найден.
+        """
+        snapshot = self.get_snapshot(game, snapshot_id)
+        if snapshot is None:
+            raise ValueError(f"Снимок не найден: {snapshot_id}")
+        result = RollbackResult()
+        archive_path = os.path.join(game.mods_path, "archive")
+        file_stats = self._load_file_stats(game, snapshot_id)
+
+        self.mod_manager.load_mods_for_game(game, force_rescan=True)
+        current = {os.path.basename(os.path.normpath(mod.local_path)): mod
+                   for mod in self.mod_manager.get_installed_mods(game.steam_id) if mod.local_path}
+        for entry in snapshot.mods:
+            source = self._mod_content_path(game, snapshot_id, entry)
+            mod = current.get(entry.folder)
+            if mod is not None:
+                target = os.path.realpath(mod.local_path)
+            else:
+                target = os.path.join(game.mods_path if entry.enabled else archive_path, entry.folder)
+            recorded = file_stats.get(self._mod_key(entry))
+            try:
+                if recorded is not None:
+                    if self._tree_stats(source) != recorded:
+                        raise ValueError("содержимое снимка изменено на месте (общая жесткая ссылка с папкой мода)")
+                    if mod is not None and self._tree_stats(target) == recorded:
+                        continue
+                self._restore_tree(source, target)
+                result.restored.append(entry.mod_id)
+                manifest_path = os.path.join(self._manifests_dir(game, snapshot_id), f"{entry.mod_id}.json")
+                if os.path.exists(manifest_path):
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        self.manifest_service.save(game.steam_id, entry.mod_id, json.load(f))
+            except Exception as e:
+                logger.error(f"[SnapshotManager] Не удалось восстановить мод {entry.mod_id}: {e}")
+                result.failed[entry.mod_id] = str(e)
+
+        # Состояние включения - через ModManager (транзакционное перемещение папок)
+        self.mod_manager.load_mods_for_game(game, force_rescan=True)
+        wanted = {entry.folder: entry.enabled for entry in snapshot.mods}
+        to_enable, to_disable = [], []
+        for mod in self.mod_manager.get_installed_mods(game.steam_id):
+            folder = os.path.basename(os.path.normpath(mod.local_path))
+            if folder not in wanted:
+                if snapshot.partial:
+                    continue
+                result.new_mods.append(mod.mod_id)
+                if remove_new:
+                    if not self.mod_manager.remove_mod(game.steam_id, mod.mod_id):
+                        result.failed[mod.mod_id] = "remove failed"
+                elif mod.is_enabled:
+                    to_disable.append(mod.mod_id)
+            elif wanted[folder] != mod.is_enabled:
+                (to_enable if wanted[folder] else to_disable).append(mod.mod_id)
+        for mod_ids, enabled in ((to_enable, True), (to_disable, False)):
+            if not mod_ids:
+                continue
+            toggle = self.mod_manager.set_mods_enabled(mod_ids, enabled)
+            result.toggled.extend(mod.mod_id for mod in toggle.changed)
+            result.failed.update(toggle.failed)
+
+        config_path = default_mods_config_path(game)
+        if snapshot.load_order and config_path and os.path.exists(config_path):
+            try:
+                write_mods_config(config_path, snapshot.load_order)
+                result.load_order_written = True
+            except Exception as e:
+                result.failed["ModsConfig.xml"] = str(e)
+
+        logger.info(f"[SnapshotManager] Откат '{game.name}' к снимку {snapshot_id}: восстановлено {len(result.restored)}, "
+                    f"переключено {len(result.toggled)}, новых модов {len(result.new_mods)}, ошибок {len(result.failed)}")
+        return result
@@ -4,9 +4,11 @@ import subprocess
 import tempfile
 import shutil
 import time
-from typing import List, Callable, Optional
+from typing import List, Callable, Optional, Iterable
 from loguru import logger
 from src.core.process_monitor import CacheManager
+from src.core.download_telemetry import SteamCMDSessionTimer, SessionTimings
+from src.core.acf_reader import WorkshopStateStore
 
 class SteamHandler:
     """Обработчик SteamCMD"""
@@ -15,6 +17,10 @@ class SteamHandler:
         self.steamcmd_path = steamcmd_path
         self.is_initialized = self._check_steamcmd()
         self.cache_manager = CacheManager()
+        # Время фаз последнего запуска SteamCMD (None, если SteamCMD не запускался)
+        self.last_session: Optional[SessionTimings] = None
+        # appworkshop_<app>.acf удаляется при очистке кэша, поэтому его элементы сохраняются после каждого сеанса
+        self.workshop_state = WorkshopStateStore()
 
     def _check_steamcmd(self) -> bool:
         """Проверка доступности SteamCMD"""
@@ -29,8 +35,13 @@ class SteamHandler:
         """Проверка, инициализирован ли SteamCMD (для совместимости)"""
         return self.is_initialized
 
-    def create_download_script(self, app_id: str, mod_ids: List[str]) -> str:
-        """Создание скрипта для скачивания модов"""
+    def create_download_script(self, app_id: str, mod_ids: List[str], validate_ids: Optional[Iterable[str]] = None) -> str:
+        """
+        Создание скрипта для скачивания модов.
+        validate (полная перепроверка файлов SteamCMD) добавляется только для модов из validate_ids -
+        целостность установленных модов проверяется локально по манифестам.
+        """
+        validate_ids = set(validate_ids or ())
         # Используем force_install_dir, чтобы быть уверенным в пути
         # Хотя для workshop это может не применяться напрямую, хорошая практика
         script_content = f"""@ShutdownOnFailedCommand 1
@@ -38,12 +49,14 @@ class SteamHandler:
 login anonymous
 """
         for mod_id in mod_ids:
-            script_content += f"workshop_download_item {app_id} {mod_id} validate\n" # Добавляем validate
+            suffix = " validate" if mod_id in validate_ids else ""
+            script_content += f"workshop_download_item {app_id} {mod_id}{suffix}\n"
         script_content += "quit\n"
         return script_content
 
     # Модифицируем download_mods для поддержки log_callback и кэширования
-    def download_mods(self, app_id: str, mod_ids: List[str], log_callback: Optional[Callable[[str], None]] = None) -> bool:
+    def download_mods(self, app_id: str, mod_ids: List[str], log_callback: Optional[Callable[[str], None]] = None,
+                      validate_ids: Optional[Iterable[str]] = None, clean_cache: bool = True) -> bool:
         """
         Скачивание модов через SteamCMD с поддержкой кэширования.
 
@@ -51,8 +64,12 @@ login anonymous
         :param mod_ids: Список ID модов для загрузки.
         :param log_callback: Опциональная функция обратного вызова для передачи строк лога.
                              Вызывается как log_callback(line).
+        :param validate_ids: ID модов, для которых нужна проверка файлов (validate).
+        :param clean_cache: Очистить кэш SteamCMD перед загрузкой. False - для следующих запусков
+                            той же загрузки очереди, кэш которых уже очищен.
         :return: True, если процесс завершился успешно (код 0), иначе False.
         """
+        self.last_session = None
         if not self.is_initialized:
             logger.error("SteamCMD не инициализирован")
             if log_callback:
@@ -82,21 +99,24 @@ login anonymous
         # --- ДОПОЛНИТЕЛЬНАЯ ОЧИСТКА КЭША ПЕРЕД ЗАГРУЗКОЙ ---
         # Выполняем очистку перед каждой загрузкой для минимизации проблем с кэшем
         steamcmd_base_path = os.path.dirname(self.steamcmd_path)
-        self.clean_cache(steamcmd_base_path, app_id, log_callback=log_callback)
+        if clean_cache:
+            self.clean_cache(steamcmd_base_path, app_id, log_callback=log_callback)
         # --- КОНЕЦ ДОПОЛНИТЕЛЬНОЙ ОЧИСТКИ ---
 
-        script_content = self.create_download_script(app_id, mod_ids)
+        script_content = self.create_download_script(app_id, mod_ids, validate_ids)
         # Используем кодировку, совместимую с Windows
         with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as script_file:
             script_file.write(script_content)
             script_path = script_file.name
 
+        timer = SteamCMDSessionTimer(app_id)
         try:
             cmd = [self.steamcmd_path, f"+runscript {script_path}"]
             logger.info(f"Запуск SteamCMD с командой: {' '.join(cmd)}")
             if log_callback:
                 log_callback(f"-> Запуск SteamCMD: {' '.join(cmd)}")
 
+            timer.start()
             process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -113,6 +133,7 @@ login anonymous
                 for line in iter(process.stdout.readline, ''):
                     line = line.rstrip('\n\r')
                     if line:
+                        timer.feed(line)
                         logger.debug(f"[SteamCMD] {line}")
                         if log_callback:
                             try:
@@ -122,7 +143,10 @@ login anonymous
                                 logger.error(f"Ошибка в log_callback: {cb_e}")
 
             process.wait()
+            self.last_session = timer.finish()
             success = process.returncode == 0
+            # Даже при ошибке часть модов могла установиться - их состояние тоже сохраняется
+            self.workshop_state.merge_acf(app_id, self._acf_path(steamcmd_base_path, app_id))
             
             # Сохраняем результат в кэш на 5 минут (300 секунд)
             self.cache_manager.set(cache_key, {'success': success}, ttl=300.0)
@@ -198,6 +222,10 @@ login anonymous
             self.cache_manager.invalidate(cache_key)
             logger.info(f"Кэш инвалидирован для игры {app_id}")
 
+    @staticmethod
+    def _acf_path(steamcmd_base_path: str, app_id: str) -> str:
+        return os.path.join(steamcmd_base_path, "steamapps", "workshop", f"appworkshop_{app_id}.acf")
+
     # Модифицируем clean_cache для удаления дополнительных файлов/папок
     def clean_cache(self, steamcmd_base_path: str, app_id: str, log_callback: Optional[Callable[[str], None]] = None):
         """
@@ -220,8 +248,10 @@ login anonymous
                 if log_callback:
                     log_callback("-> Очищена папка temp")
 
-            acf_path = os.path.join(steamcmd_base_path, "steamapps", "workshop", f"appworkshop_{app_id}.acf")
+            acf_path = self._acf_path(steamcmd_base_path, app_id)
             if os.path.exists(acf_path):
+                # ACF мог остаться от сеанса вне приложения - его элементы сохраняются перед удалением
+                self.workshop_state.merge_acf(app_id, acf_path)
                 os.remove(acf_path)
                 logger.debug("Удален файл appworkshop.acf")
                 if log_callback:
@@ -17,6 +17,8 @@ class SteamWorkshopService:
     """Сервис для взаимодействия со Steam Workshop."""
 
     _SURROGATE_PATTERN = re.compile(r"[\ud800-\udfff]")
+    PUBLISHED_FILE_DETAILS_URL = "https://api.steampowered.com/ISteamRemoteStorage/GetPublishedFileDetails/v1/"
+    PUBLISHED_FILE_DETAILS_BATCH = 100
 
     def __init__(self):
         self.session = requests.Session()
@@ -576,6 +578,58 @@ class SteamWorkshopService:
             dependency_items.append(ModDependency(mod_id=dep_id, name=dep_name, is_installed=is_installed))
         return dependency_items
 
+    def get_published_file_details(self, mod_ids: List[str], force_refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Пакетно получает метаданные модов через Steam Web API (один запрос на PUBLISHED_FILE_DETAILS_BATCH модов).
+        :param mod_ids: Список ID модов (нечисловые ID пропускаются).
+        :param force_refresh: Игнорировать кэш.
+        :return: Словарь {mod_id: {'title', 'file_size', 'time_updated', 'time_created', 'manifest'}} только для найденных модов.
+                 Время - Unix timestamp, размер - в байтах.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        to_fetch = []
+        for mod_id in dict.fromkeys(mod_ids):
+            if not mod_id or not mod_id.isdigit():
+                continue
+            cached_data = None if force_refresh else self.cache_manager.get(f"mod_file_details_{mod_id}")
+            if cached_data:
+                results[mod_id] = cached_data
+            else:
+                to_fetch.append(mod_id)
+
+        fetched: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(to_fetch), self.PUBLISHED_FILE_DETAILS_BATCH):
+            batch = to_fetch[start:start + self.PUBLISHED_FILE_DETAILS_BATCH]
+            payload = {'itemcount': len(batch)}
+            for index, mod_id in enumerate(batch):
+                payload[f'publishedfileids[{index}]'] = mod_id
+            try:
+                self._wait_for_rate_limit()
+                response = self.session.post(self.PUBLISHED_FILE_DETAILS_URL, data=payload, timeout=30)
+                response.raise_for_status()
+                for entry in response.json().get('response', {}).get('publishedfiledetails', []):
+                    # result != 1 - мод удален, скрыт или не существует
+                    if entry.get('result') != 1:
+                        continue
+                    fetched[str(entry['publishedfileid'])] = {
+                        'title': self._sanitize_text(entry.get('title'), default=str(entry['publishedfileid'])),
+                        'file_size': int(entry.get('file_size') or 0),
+                        'time_updated': int(entry.get('time_updated') or 0),
+                        'time_created': int(entry.get('time_created') or 0),
+                        # ID манифеста текущей версии; совпадает с manifest в appworkshop_<app>.acf
+                        'manifest': str(entry.get('hcontent_file') or "")
+                    }
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"[SteamWorkshopService/FileDetails] Ошибка пакетного запроса ({len(batch)} модов): {e}")
+
+        if fetched:
+            # Кэшируем на 10 минут, одной записью на диск
+            self.cache_manager.set_many({f"mod_file_details_{mod_id}": data for mod_id, data in fetched.items()}, ttl=600.0)
+            results.update(fetched)
+        logger.info(f"[SteamWorkshopService/FileDetails] Метаданные получены для {len(results)} из {len(mod_ids)} модов "
+                    f"(запросов к API: {(len(to_fetch) + self.PUBLISHED_FILE_DETAILS_BATCH - 1) // self.PUBLISHED_FILE_DETAILS_BATCH})")
+        return results
+
     def invalidate_cache(self, mod_id: str = None):
         """
         Инвалидация кэша для конкретного мода или всего кэша.
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Конвейер обновления модов: загружаются только моды, у которых в Workshop есть более новая версия
+"""
+import os
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
+from loguru import logger
+from src.models.mod import Mod
+from src.models.game import Game
+from src.core.acf_reader import AcfItem, WorkshopStateStore, appworkshop_acf_paths, load_installed_items
+
+
+@dataclass
+class ModUpdateStatus:
+    """Результат сравнения локальной и удаленной версии мода"""
+    mod_id: str
+    name: str
+    local_time: Optional[int] = None      # Unix timestamp локальной версии
+    local_source: str = ""                # 'acf' или 'folder'
+    remote_time: Optional[int] = None     # time_updated из Workshop
+    remote_size: int = 0
+    local_manifest: str = ""              # ID манифеста установленной версии (из ACF)
+    remote_manifest: str = ""             # hcontent_file из Workshop
+
+    @property
+    def is_stale(self) -> bool:
+        # Манифесты точнее времени: время папки меняется при любом копировании
+        if self.local_manifest and self.remote_manifest:
+            return self.local_manifest != self.remote_manifest
+        return self.local_time is not None and self.remote_time is not None and self.remote_time > self.local_time
+
+
+@dataclass
+class UpdatePlan:
+    """Минимальный набор модов для обновления"""
+    stale: List[Mod] = field(default_factory=list)
+    statuses: Dict[str, ModUpdateStatus] = field(default_factory=dict)
+    unknown: List[str] = field(default_factory=list)   # Нет локальных или удаленных данных
+    bytes_to_download: int = 0
+    bytes_full_download: int = 0                       # Объем полной перезагрузки всех модов
+
+    @property
+    def bytes_saved(self) -> int:
+        return max(self.bytes_full_download - self.bytes_to_download, 0)
+
+
+class UpdatePipeline:
+    """Строит план обновления и передает устаревшие моды в очередь загрузки"""
+
+    def __init__(self, steam_workshop_service, download_manager=None, workshop_state: Optional[WorkshopStateStore] = None):
+        self.steam_workshop_service = steam_workshop_service
+        self.download_manager = download_manager
+        # Состояние прошлых сеансов SteamCMD: их ACF удаляется перед каждым новым сеансом
+        self.workshop_state = workshop_state or WorkshopStateStore()
+
+    @property
+    def steamcmd_path(self) -> str:
+        if self.download_manager and self.download_manager.steam_handler:
+            return self.download_manager.steam_handler.steamcmd_path or ""
+        return ""
+
+    def _load_acf_items(self, game: Game) -> Dict[str, AcfItem]:
+        """Состояние установленных элементов: накопленное по сеансам SteamCMD, дополненное текущими ACF"""
+        return load_installed_items(appworkshop_acf_paths(game, self.steamcmd_path),
+                                    base=self.workshop_state.load(game.steam_id))
+
+    def _get_local_time(self, mod: Mod, acf_items: Dict[str, AcfItem]) -> Tuple[Optional[int], str]:
+        """Время локальной версии: из ACF, иначе время изменения папки мода"""
+        item = acf_items.get(mod.mod_id)
+        if item is not None and item.time_updated:
+            return item.time_updated, 'acf'
+        if mod.local_update_date:
+            return int(mod.local_update_date.timestamp()), 'folder'
+        if mod.local_path and os.path.exists(mod.local_path):
+            try:
+                return int(os.path.getmtime(mod.local_path)), 'folder'
+            except OSError:
+                pass
+        return None, ''
+
+    def build_plan(self, game: Game, mods: List[Mod]) -> UpdatePlan:
+        """
+        Сравнивает time_updated из Workshop с локальным временем установки
+        и возвращает минимальный набор устаревших модов.
+        """
+        plan = UpdatePlan()
+        workshop_mods = [mod for mod in mods if mod.mod_id.isdigit()]
+        plan.unknown.extend(mod.mod_id for mod in mods if not mod.mod_id.isdigit())
+        if not workshop_mods:
+            return plan
+
+        acf_items = self._load_acf_items(game)
+        remote = self.steam_workshop_service.get_published_file_details([mod.mod_id for mod in workshop_mods],
+                                                                       force_refresh=True)
+
+        for mod in workshop_mods:
+            local_time, local_source = self._get_local_time(mod, acf_items)
+            remote_data = remote.get(mod.mod_id, {})
+            acf_item = acf_items.get(mod.mod_id)
+            status = ModUpdateStatus(
+                mod_id=mod.mod_id,
+                name=mod.name or mod.mod_id,
+                local_time=local_time,
+                local_source=local_source,
+                remote_time=remote_data.get('time_updated') or None,
+                remote_size=remote_data.get('file_size', 0) or mod.file_size,
+                local_manifest=acf_item.manifest if acf_item else "",
+                remote_manifest=remote_data.get('manifest', "")
+            )
+            plan.statuses[mod.mod_id] = status
+            plan.bytes_full_download += status.remote_size
+            if status.is_stale:
+                if status.remote_size:
+                    mod.file_size = status.remote_size
+                plan.stale.append(mod)
+                plan.bytes_to_download += status.remote_size
+            elif status.local_time is None or status.remote_time is None:
+                plan.unknown.append(mod.mod_id)
+
+        logger.info(f"[UpdatePipeline] План обновления для '{game.name}': устарело {len(plan.stale)} из {len(mods)}, "
+                    f"без данных {len(plan.unknown)}, экономия {plan.bytes_saved} байт")
+        return plan
+
+    def enqueue(self, plan: UpdatePlan) -> int:
+        """Добавляет устаревшие моды в очередь загрузки. Возвращает количество добавленных."""
+        if not self.download_manager:
+            logger.error("[UpdatePipeline] DownloadManager не задан")
+            return 0
+        return len(self.download_manager.add_many_to_queue(plan.stale))
@@ -16,6 +16,16 @@ else:
 SETTINGS_CONFIG_FILE = os.path.join(DATA_DIR, "settings.json")
 GAMES_CONFIG_FILE = os.path.join(DATA_DIR, "games.json")
 PROCESS_CACHE_FILE = os.path.join(DATA_DIR, "process_cache.json")
+DOWNLOAD_QUEUE_FILE = os.path.join(DATA_DIR, "download_queue.json")
+DOWNLOAD_TELEMETRY_FILE = os.path.join(DATA_DIR, "download_telemetry.json")
+CONTENT_MANIFEST_DIR = os.path.join(DATA_DIR, "manifests")
+CONTENT_STORE_DIR = os.path.join(DATA_DIR, "content_store")
+SCAN_INDEX_DIR = os.path.join(DATA_DIR, "scan_index")
+MOD_TOGGLE_JOURNAL_FILE = os.path.join(DATA_DIR, "mod_toggle_journal.json")
+MOD_SIZE_CACHE_FILE = os.path.join(DATA_DIR, "mod_size_cache.json")
+CONFLICT_INDEX_DIR = os.path.join(DATA_DIR, "conflict_index")
+SNAPSHOTS_DIR = os.path.join(DATA_DIR, "snapshots")
+WORKSHOP_STATE_DIR = os.path.join(DATA_DIR, "workshop_state")
 
 DEFAULT_SETTINGS = {
     "steamcmd_path": "",
@@ -28,7 +38,8 @@ DEFAULT_SETTINGS = {
     },
     "auto_update_check": True,
     "download_timeout": 300,
-    "max_concurrent_downloads": 3
+    "max_concurrent_downloads": 3,
+    "use_content_store": False
 }
 
 DEFAULT_GAMES = []
@@ -6,7 +6,6 @@
 import functools
 import time
 from loguru import logger
-import wx
 
 def log_method_calls(func):
     """Декоратор для логирования вызовов методов"""
@@ -36,6 +35,7 @@ def wx_call_after(func):
     """Декоратор для вызова в главном потоке wx"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        import wx  # Импорт при вызове: модули с декораторами должны загружаться и без wx (cli.py)
         if wx.IsMainThread():
             return func(*args, **kwargs)
         else:
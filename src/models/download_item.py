@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Модель элемента очереди загрузки"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+from src.models.mod import Mod
+
+
+class DownloadState:
+    """Состояния элемента очереди загрузки"""
+    PENDING = "pending"
+    DOWNLOADING = "downloading"
+    DOWNLOADED = "downloaded"
+    INSTALLED = "installed"
+    FAILED = "failed"
+    BLOCKED = "blocked"                 # Не загружен, так как не установилась зависимость
+
+    ALL = (PENDING, DOWNLOADING, DOWNLOADED, INSTALLED, FAILED, BLOCKED)
+
+
+@dataclass
+class DownloadItem:
+    """Элемент очереди загрузки: мод и состояние его загрузки"""
+
+    mod: Mod
+    state: str = DownloadState.PENDING
+    attempts: int = 0                   # Количество неудачных попыток
+    last_error: str = ""
+    next_retry_at: float = 0.0          # Время (time.time()), раньше которого повтор не выполняется
+    updated_at: float = 0.0
+    validate: bool = False              # Запросить у SteamCMD проверку файлов (validate) при загрузке
+
+    @property
+    def mod_id(self) -> str:
+        return self.mod.mod_id
+
+    def is_ready(self, now: Optional[float] = None) -> bool:
+        """Проверяет, можно ли загружать элемент прямо сейчас."""
+        if self.state in (DownloadState.PENDING, DownloadState.BLOCKED):
+            return True
+        if self.state == DownloadState.FAILED:
+            return (now if now is not None else time.time()) >= self.next_retry_at
+        return False
+
+    def set_state(self, state: str, error: str = ""):
+        """Переводит элемент в новое состояние."""
+        self.state = state
+        self.last_error = error
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразует элемент в словарь для сериализации."""
+        return {
+            'mod': self.mod.to_dict(),
+            'state': self.state,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_retry_at': self.next_retry_at,
+            'updated_at': self.updated_at,
+            'validate': self.validate
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DownloadItem':
+        """Создает элемент из словаря."""
+        state = data.get('state', DownloadState.PENDING)
+        if state not in DownloadState.ALL:
+            state = DownloadState.PENDING
+        return cls(
+            mod=Mod.from_dict(data['mod']),
+            state=state,
+            attempts=data.get('attempts', 0),
+            last_error=data.get('last_error', ''),
+            next_retry_at=data.get('next_retry_at', 0.0),
+            updated_at=data.get('updated_at', 0.0),
+            validate=data.get('validate', False)
+        )
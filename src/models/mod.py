@@ -6,19 +6,29 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+def format_size(size: float) -> str:
+    """Возвращает размер в байтах в удобочитаемом формате."""
+    for unit in ['Б', 'КБ', 'МБ', 'ГБ']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} ТБ"
+
 @dataclass
 class ModDependency:
     """Зависимость мода"""
     mod_id: str
     name: str = ""
     is_installed: bool = False
+    package_id: str = ""        # packageId из About.xml (RimWorld)
 
     def to_dict(self) -> Dict[str, Any]:
         """Преобразует объект зависимости в словарь для сериализации."""
         return {
             'mod_id': self.mod_id,
             'name': self.name,
-            'is_installed': self.is_installed
+            'is_installed': self.is_installed,
+            'package_id': self.package_id
         }
 
     @classmethod
@@ -27,7 +37,8 @@ class ModDependency:
         return cls(
             mod_id=data['mod_id'],
             name=data.get('name', ''), # name может отсутствовать
-            is_installed=data.get('is_installed', False)
+            is_installed=data.get('is_installed', False),
+            package_id=data.get('package_id', '')
         )
 
 @dataclass
@@ -47,6 +58,11 @@ class Mod:
     is_enabled: bool = True
     local_path: str = ""
     workshop_url: str = ""
+    # Метаданные из About.xml (RimWorld), доступные без запроса к Workshop
+    package_id: str = ""
+    supported_versions: List[str] = field(default_factory=list)
+    load_after: List[str] = field(default_factory=list)
+    load_before: List[str] = field(default_factory=list)
 
     # Убрали __post_init__, так как default_factory делает то же самое
 
@@ -60,13 +76,7 @@ class Mod:
         """Возвращает размер файла в удобочитаемом формате."""
         if self.file_size == 0:
             return "Неизвестно"
-        
-        size = self.file_size
-        for unit in ['Б', 'КБ', 'МБ', 'ГБ']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} ТБ"
+        return format_size(self.file_size)
     
     @property 
     def formatted_install_date(self) -> str:
@@ -122,7 +132,11 @@ class Mod:
             'dependencies': [dep.to_dict() for dep in self.dependencies],
             'is_enabled': self.is_enabled,
             'local_path': self.local_path,
-            'workshop_url': self.workshop_url
+            'workshop_url': self.workshop_url,
+            'package_id': self.package_id,
+            'supported_versions': self.supported_versions,
+            'load_after': self.load_after,
+            'load_before': self.load_before
         }
 
     @classmethod
@@ -154,7 +168,11 @@ class Mod:
             dependencies=dependencies,
             is_enabled=data.get('is_enabled', True),
             local_path=data.get('local_path', ''),
-            workshop_url=data.get('workshop_url', '')
+            workshop_url=data.get('workshop_url', ''),
+            package_id=data.get('package_id', ''),
+            supported_versions=data.get('supported_versions', []),
+            load_after=data.get('load_after', []),
+            load_before=data.get('load_before', [])
         )
 
     def __repr__(self) -> str:
@@ -6,6 +6,7 @@ import threading
 import time
 import re # Импортируем re для парсинга логов
 from loguru import logger
+from src.models.mod import format_size
 
 class DownloadProgressDialog(wx.Dialog):
     """Модальный диалог для отображения прогресса и логов загрузки модов."""
@@ -23,8 +24,8 @@ class DownloadProgressDialog(wx.Dialog):
         self.is_cancelled = False
         self.success = False
 
-        # Счетчики для парсинга логов
-        self.total_mods = len(self.download_manager._download_queue)
+        # Счетчики для парсинга логов: только моды, которые этот запуск будет скачивать
+        self.total_mods = len(self.download_manager.get_run_items())
         self.downloaded_mods = 0
         self.error_mods = 0
 
@@ -60,6 +61,10 @@ class DownloadProgressDialog(wx.Dialog):
 
         # Кнопки
         btn_sizer = wx.StdDialogButtonSizer()
+        # Экспорт истории загрузок (телеметрии) для анализа
+        self.export_stats_btn = wx.Button(self, label="Экспорт статистики...")
+        self.export_stats_btn.Bind(wx.EVT_BUTTON, self._on_export_stats)
+        btn_sizer.Add(self.export_stats_btn, 0, wx.RIGHT, 5)
         self.cancel_btn = wx.Button(self, wx.ID_CANCEL, "Отмена")
         self.cancel_btn.Bind(wx.EVT_BUTTON, self._on_cancel)
         btn_sizer.AddButton(self.cancel_btn)
@@ -200,11 +205,50 @@ class DownloadProgressDialog(wx.Dialog):
                 self.status_text.SetLabel("Загрузка завершена успешно!")
             else:
                 self.status_text.SetLabel("Загрузка завершена с ошибками или отменена.")
+        self._show_telemetry_summary()
         # Убедимся, что прогресс 100% в конце
         wx.CallAfter(self._update_progress_ui, 100)
         # Финальное обновление счетчиков
         wx.CallAfter(self._update_counters_ui)
 
+    def _show_telemetry_summary(self):
+        """Вывод в лог статистики загрузок для игры: медиана и p90 по фазам и текущая скорость"""
+        telemetry = getattr(self.download_manager, 'telemetry', None)
+        if not telemetry:
+            return
+        summary = telemetry.summary(self.game.steam_id)
+        phase_names = {
+            'startup': "запуск SteamCMD",
+            'login': "вход",
+            'download': "скачивание мода",
+            'validate': "проверка",
+            'install': "установка",
+        }
+        parts = [f"{name} {summary[phase][50]:.1f}/{summary[phase][90]:.1f} с"
+                 for phase, name in phase_names.items() if phase in summary]
+        if parts:
+            self._append_log_line("-> Статистика загрузок (медиана/p90): " + ", ".join(parts))
+        if summary.get('throughput'):
+            self._append_log_line(f"-> Скорость за последние 24 ч: {format_size(int(summary['throughput']))}/с")
+
+    def _on_export_stats(self, event):
+        """Сохранение истории загрузок в CSV (записи о модах) или JSON (вся история)"""
+        telemetry = getattr(self.download_manager, 'telemetry', None)
+        if not telemetry:
+            return
+        with wx.FileDialog(self, "Экспорт статистики загрузок", wildcard="CSV (*.csv)|*.csv|JSON (*.json)|*.json",
+                           defaultFile="download_telemetry.csv",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as file_dialog:
+            if file_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = file_dialog.GetPath()
+        try:
+            telemetry.export(path)
+            self._append_log_line(f"-> Статистика экспортирована: {path}")
+        except Exception as e:
+            logger.error(f"[DownloadProgress] Ошибка экспорта статистики: {e}")
+            wx.MessageBox(f"Ошибка экспорта статистики: {e}", "Ошибка", wx.OK | wx.ICON_ERROR)
+
     def _on_cancel(self, event):
         """Обработчик нажатия кнопки Отмена/Закрыть."""
         if self.cancel_btn.GetLabel() == "Отмена":
@@ -2,17 +2,22 @@
 """
 Диалог настроек
 """
+from typing import List
 import wx
 from loguru import logger
 from src.core.i18n import _
+from src.core.content_store import ContentStore, StoreReport, store_roots
+from src.models.mod import format_size
 
 class SettingsDialog(wx.Dialog):
     """Диалог настроек приложения"""
 
-    def __init__(self, parent, settings_manager, language_manager):
-        super().__init__(parent, title=_("dialogs.settings.title"), size=(500, 400))
+    def __init__(self, parent, settings_manager, language_manager, game_manager, task_manager):
+        super().__init__(parent, title=_("dialogs.settings.title"), size=(520, 460))
         self.settings_manager = settings_manager
         self.language_manager = language_manager
+        self.game_manager = game_manager
+        self.task_manager = task_manager
         self._create_ui()
         self._load_settings()
         self.CenterOnParent()
@@ -54,6 +59,17 @@ class SettingsDialog(wx.Dialog):
         self.auto_update_cb = wx.CheckBox(panel, label=_("dialogs.settings.auto_update"))
         main_sizer.Add(self.auto_update_cb, 0, wx.ALL, 5)
 
+        # Общее хранилище модов (дедупликация одинаковых файлов между играми и профилями)
+        self.content_store_cb = wx.CheckBox(panel, label=_("dialogs.settings.content_store"))
+        main_sizer.Add(self.content_store_cb, 0, wx.ALL, 5)
+        store_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.store_report_text = wx.StaticText(panel, label="")
+        self.store_gc_btn = wx.Button(panel, label=_("dialogs.settings.content_store_gc"))
+        self.store_gc_btn.Bind(wx.EVT_BUTTON, self._on_store_gc)
+        store_sizer.Add(self.store_report_text, 1, wx.ALL | wx.CENTER, 5)
+        store_sizer.Add(self.store_gc_btn, 0, wx.ALL, 5)
+        main_sizer.Add(store_sizer, 0, wx.EXPAND | wx.LEFT, 20)
+
         # Кнопки
         button_sizer = wx.BoxSizer(wx.HORIZONTAL)
         ok_btn = wx.Button(panel, wx.ID_OK, _("dialogs.add_game.ok"))
@@ -81,6 +97,44 @@ class SettingsDialog(wx.Dialog):
         self.steamcmd_text.SetValue(steamcmd_path)
         auto_update = self.settings_manager.get("auto_update_check", True)
         self.auto_update_cb.SetValue(auto_update)
+        self.content_store_cb.SetValue(self.settings_manager.get("use_content_store", False))
+        self._update_store_report()
+
+    def _update_store_report(self):
+        """
+        Показывает, сколько места сэкономило общее хранилище. Отчет обходит папки модов всех игр,
+        поэтому считается в фоновой задаче; если хранилище не используется и пусто, не считается вовсе.
+        """
+        store = ContentStore()
+        self.store_gc_btn.Enable(False)
+        if not self.settings_manager.get("use_content_store", False) and not store.has_blobs():
+            self.store_report_text.SetLabel("")
+            return
+        self.store_report_text.SetLabel(_("dialogs.settings.content_store_counting"))
+        self.task_manager.submit_task(self._store_report_task, store, store_roots(self.game_manager.get_games()),
+                                      description=_("dialogs.settings.content_store_counting"))
+
+    def _store_report_task(self, store: ContentStore, roots: List[str], collect: bool = False):
+        if collect:
+            removed, freed = store.collect_garbage(roots)
+            logger.info(f"[Settings] Очистка хранилища: удалено {removed} файлов ({format_size(freed)})")
+        report = store.space_report(roots)
+        wx.CallAfter(self._on_store_report, report)
+
+    def _on_store_report(self, report: StoreReport):
+        if not self: return     # Диалог закрыт до окончания подсчета
+        self.store_report_text.SetLabel(_("dialogs.settings.content_store_report",
+                                          saved=format_size(report.saved_bytes),
+                                          size=format_size(report.store_bytes),
+                                          garbage=format_size(report.garbage_bytes)))
+        self.store_gc_btn.Enable(report.garbage_blobs > 0)
+
+    def _on_store_gc(self, event):
+        self.store_gc_btn.Enable(False)
+        self.store_report_text.SetLabel(_("dialogs.settings.content_store_counting"))
+        self.task_manager.submit_task(self._store_report_task, ContentStore(),
+                                      store_roots(self.game_manager.get_games()), collect=True,
+                                      description=_("dialogs.settings.content_store_gc"))
 
     def _on_browse_steamcmd(self, event):
         with wx.FileDialog(
@@ -98,6 +152,7 @@ class SettingsDialog(wx.Dialog):
         auto_update = self.auto_update_cb.GetValue()
         self.settings_manager.set("steamcmd_path", steamcmd_path)
         self.settings_manager.set("auto_update_check", auto_update)
+        self.settings_manager.set("use_content_store", self.content_store_cb.GetValue())
         selection = self.language_choice.GetSelection()
         if selection != wx.NOT_FOUND:
             languages = self.language_manager.get_available_languages()
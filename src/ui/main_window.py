@@ -11,6 +11,7 @@ from loguru import logger
 from src.event_bus import event_bus
 from src.core.game_manager import GameManager
 from src.core.mod_manager import ModManager
+from src.core.mod_watcher import ModWatcher
 from src.core.settings_manager import SettingsManager
 from src.core.language_manager import LanguageManager
 from src.core.i18n import _
@@ -25,6 +26,7 @@ from src.ui.dialogs.settings_dialog import SettingsDialog
 # --- Импорт новых сервисов ---
 from src.core.steam_workshop_service import SteamWorkshopService
 from src.core.task_manager import TaskManager
+from src.core.content_store import ContentStore
 # ----------------------------
 from src.ui.tabs.mods_tab import ModsTab
 from src.ui.tabs.browser_tab import BrowserTab
@@ -48,14 +50,19 @@ class MainWindow(wx.Frame):
         # Инициализация менеджеров
         self.game_manager = GameManager()
         self.mod_manager = ModManager()
+        self.mod_watcher = ModWatcher(self.mod_manager)
 
         # Инициализация SteamCMD
         steamcmd_path = self.settings_manager.get("steamcmd_path", "")
         self.steam_handler = SteamHandler(steamcmd_path)
-        self.download_manager = DownloadManager(self.steam_handler)
-
         # --- Инициализация новых сервисов ---
         self.steam_workshop_service = SteamWorkshopService()
+        self.download_manager = DownloadManager(
+            self.steam_handler,
+            max_workers=self.settings_manager.get("max_concurrent_downloads", 3),
+            steam_workshop_service=self.steam_workshop_service,
+            content_store=ContentStore() if self.settings_manager.get("use_content_store", False) else None
+        )
         self.task_manager = TaskManager()
         self.status_monitor = StatusMonitor(self.game_manager, update_interval=3.0)
         # -----------------------------------
@@ -133,7 +140,9 @@ class MainWindow(wx.Frame):
             self.mod_manager,
             self.language_manager,
             self.steam_workshop_service,
-            self.task_manager
+            self.task_manager,
+            self.download_manager,
+            self.mod_watcher
         )
         # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
         self.notebook.AddPage(self.mods_tab, _("ui.mods"))
@@ -290,6 +299,7 @@ class MainWindow(wx.Frame):
             # Сохраняем индекс текущей игры, чтобы потом выбрать следующую/предыдущую
             # current_index = self.game_choice.GetSelection() # Не используется напрямую
             self.game_manager.remove_game(steam_id_to_remove)
+            self.mod_manager.drop_snapshot(steam_id_to_remove)
             # _update_game_list будет вызван через событие game_removed
             # Логика выбора новой игры теперь в _update_game_list
 
@@ -495,9 +505,16 @@ class MainWindow(wx.Frame):
     # --- Добавлен недостающий метод _on_settings ---
     def _on_settings(self, event):
         """Обработчик нажатия кнопки 'Настройки'."""
-        dialog = SettingsDialog(self, self.settings_manager, self.language_manager)
+        dialog = SettingsDialog(self, self.settings_manager, self.language_manager, self.game_manager,
+                                self.task_manager)
         dialog.ShowModal()
         dialog.Destroy()
+        # Общее хранилище включается и выключается без перезапуска
+        use_store = self.settings_manager.get("use_content_store", False)
+        if use_store and not self.download_manager.content_store:
+            self.download_manager.content_store = ContentStore()
+        elif not use_store:
+            self.download_manager.content_store = None
         logger.debug("[MainWindow] Диалог настроек закрыт.")
 
     # ---------------------------------------------
@@ -557,6 +574,11 @@ class MainWindow(wx.Frame):
         # Останавливаем мониторинг статуса
         if hasattr(self, 'status_monitor'):
             self.status_monitor.stop()
+        if hasattr(self, 'mod_watcher'):
+            self.mod_watcher.stop()
+        # Отложенные изменения очереди загрузки записываются до выхода
+        if hasattr(self, 'download_manager'):
+            self.download_manager.flush()
         
         # Завершаем работу TaskManager при закрытии приложения
         if hasattr(self, 'task_manager'):
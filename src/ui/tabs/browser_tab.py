@@ -27,6 +27,7 @@ from src.ui.dialogs.dependency_confirmation_dialog import DependencyConfirmation
 from src.ui.dialogs.collection_confirmation_dialog import CollectionConfirmationDialog
 # --------------------------------------
 from src.constants import STEAM_WORKSHOP_HOMEPAGE
+from src.core.download_queue import QueueEvents
 
 class BrowserTab(wx.Panel):
     """Вкладка браузера Steam Workshop"""
@@ -41,7 +42,13 @@ class BrowserTab(wx.Panel):
         self.current_game = None
         # Кэш установленных mod_id для текущей игры
         self.installed_mod_ids = set()
+        # Ключи строк списка очереди (ItemData) по ID мода - для точечного обновления строк
+        self._queue_row_keys = {}
+        self._next_queue_row_key = 0
         self._create_ui()
+        # Список очереди обновляется по уведомлениям очереди, а не полной перестройкой
+        self.download_manager.queue.subscribe(self._on_queue_event)
+        self._rebuild_queue_list()
         # Подписываемся на событие обновления модов, чтобы обновить кэш
         if HAS_EVENT_BUS:
             event_bus.subscribe("mods_updated", self._on_mods_updated)
@@ -78,6 +85,7 @@ class BrowserTab(wx.Panel):
         self.queue_list = wx.ListCtrl(self.queue_panel, style=wx.LC_REPORT)
         self.queue_list.AppendColumn(_("mod.name"), width=200)
         self.queue_list.AppendColumn(_("mod.id"), width=150)
+        self.queue_list.AppendColumn(_("browser.queue_status"), width=120)
         queue_sizer.Add(self.queue_list, 1, wx.ALL | wx.EXPAND, 5)
         # --- Добавляем кнопки импорта и очистки ---
         top_row_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -105,31 +113,83 @@ class BrowserTab(wx.Panel):
 
     # --- ОБНОВЛЕННЫЙ _update_queue_list с отображением количества и состоянием кнопки очистки ---
     def _update_queue_list(self):
-        """Обновляет список очереди и связанный UI."""
-        self.queue_list.DeleteAllItems()
-        queue = self.download_manager.download_queue
-        for mod in queue:
-            index = self.queue_list.InsertItem(
-                self.queue_list.GetItemCount(), mod.name
-            )
-            self.queue_list.SetItem(index, 1, mod.mod_id)
-        has_items = len(queue) > 0
+        """Обновляет заголовок и кнопки очереди. Строки списка обновляются по событиям очереди."""
+        count = len(self.download_manager.queue)
+        has_items = count > 0
         self.remove_from_queue_btn.Enable(has_items)
         self.download_btn.Enable(has_items)
         # --- Обновляем заголовок с количеством ---
-        self.queue_title.SetLabel(_("browser.download_queue_title", count=len(queue)))
+        self.queue_title.SetLabel(_("browser.download_queue_title", count=count))
         # --- Обновляем состояние кнопки очистки ---
         self.clear_queue_btn.Enable(has_items)
         # ----------------------------------------
 
+    def _rebuild_queue_list(self):
+        """Полная перестройка списка очереди (при создании и смене языка)."""
+        self.queue_list.DeleteAllItems()
+        self._queue_row_keys.clear()
+        self._append_queue_rows(self.download_manager.get_queue_items())
+        self._update_queue_list()
+
+    def _queue_state_label(self, item) -> str:
+        label = _(f"browser.state_{item.state}")
+        if item.attempts:
+            label += f" ({item.attempts})"
+        return label
+
+    def _append_queue_rows(self, items):
+        for item in items:
+            index = self.queue_list.InsertItem(self.queue_list.GetItemCount(), item.mod.name)
+            self.queue_list.SetItem(index, 1, item.mod_id)
+            self.queue_list.SetItem(index, 2, self._queue_state_label(item))
+            key = self._next_queue_row_key
+            self._next_queue_row_key += 1
+            self.queue_list.SetItemData(index, key)
+            self._queue_row_keys[item.mod_id] = key
+
+    def _find_queue_row(self, mod_id: str) -> int:
+        key = self._queue_row_keys.get(mod_id)
+        return self.queue_list.FindItem(-1, key) if key is not None else -1
+
+    def _on_queue_event(self, event: str, items):
+        """Уведомление очереди; может прийти из потока загрузки."""
+        if wx.IsMainThread():
+            self._apply_queue_event(event, items)
+        else:
+            wx.CallAfter(self._apply_queue_event, event, items)
+
+    def _apply_queue_event(self, event: str, items):
+        """Точечное обновление строк списка очереди."""
+        if not self or not self.queue_list:
+            return
+        try:
+            if event == QueueEvents.ADDED:
+                self._append_queue_rows(items)
+            elif event == QueueEvents.REMOVED:
+                for item in items:
+                    row = self._find_queue_row(item.mod_id)
+                    if row >= 0:
+                        self.queue_list.DeleteItem(row)
+                    self._queue_row_keys.pop(item.mod_id, None)
+            elif event == QueueEvents.CHANGED:
+                for item in items:
+                    row = self._find_queue_row(item.mod_id)
+                    if row >= 0:
+                        self.queue_list.SetItem(row, 2, self._queue_state_label(item))
+            elif event == QueueEvents.CLEARED:
+                self.queue_list.DeleteAllItems()
+                self._queue_row_keys.clear()
+            self._update_queue_list()
+        except RuntimeError:
+            pass  # Панель уже уничтожена
+
     # --- КОНЕЦ ОБНОВЛЕННОГО _update_queue_list ---
 
     def _update_ui_texts(self):
         """Обновляет все тексты в UI при смене языка"""
         # Обновляем заголовок очереди
         if hasattr(self, 'queue_title'):
-            queue = self.download_manager.download_queue
-            self.queue_title.SetLabel(_("browser.download_queue_title", count=len(queue)))
+            self.queue_title.SetLabel(_("browser.download_queue_title", count=len(self.download_manager.queue)))
         
         # Обновляем кнопки очереди
         if hasattr(self, 'import_btn'):
@@ -160,7 +220,8 @@ class BrowserTab(wx.Panel):
             self.queue_list.ClearAll()
             self.queue_list.AppendColumn(_("mod.name"), width=200)
             self.queue_list.AppendColumn(_("mod.id"), width=150)
-            self._update_queue_list()  # Пересобрать список с новыми заголовками
+            self.queue_list.AppendColumn(_("browser.queue_status"), width=120)
+            self._rebuild_queue_list()  # Пересобрать список с новыми заголовками
 
     def _create_browser_panel(self, parent):
         # Теперь parent - это splitter
@@ -225,11 +286,8 @@ class BrowserTab(wx.Panel):
         self.installed_mod_ids.clear()
         if self.current_game and self.mod_manager:
             try:
-                # Получаем все моды (включая отключенные)
-                # installed_mods = self.mod_manager.get_installed_mods() # Только включенные
-                all_mods = self.mod_manager._mods # Предполагаем доступ к внутреннему списку
-                # Или лучше: добавить метод get_all_mods в ModManager
-                self.installed_mod_ids = {mod.mod_id for mod in all_mods}
+                # Все моды (включая отключенные)
+                self.installed_mod_ids = self.mod_manager.get_installed_mod_ids()
                 logger.debug(f"[Browser] Кэш установленных модов обновлен: {len(self.installed_mod_ids)} модов")
             except Exception as e:
                 logger.error(f"[Browser] Ошибка обновления кэша установленных модов: {e}")
@@ -751,8 +809,7 @@ class BrowserTab(wx.Panel):
             match = re.search(r'id=(\d+)', url)
             if match:
                 mod_id = match.group(1)
-                queue = self.download_manager.download_queue
-                if any(mod.mod_id == mod_id for mod in queue):
+                if self.download_manager.is_in_queue(mod_id):
                     wx.MessageBox("Мод уже находится в очереди загрузки", "Информация", wx.OK | wx.ICON_INFORMATION)
                     return
                 # - Получаем данные мода -
@@ -1071,8 +1128,9 @@ class BrowserTab(wx.Panel):
                 message = f"Импортировано из файла '{os.path.basename(pathname)}' ({game_name}):\nНайдено модов: {num_mods}\nДобавить их в очередь загрузки?"
                 res = wx.MessageBox(message, "Импорт", wx.YES_NO | wx.ICON_QUESTION)
                 if res == wx.YES:
-                    added_count = 0
+                    from src.models.mod import Mod
                     skipped_count = 0
+                    mods_to_add = []
                     for mod_data in imported_mods:
                         mod_id = str(mod_data.get('mod_id', ''))
                         # Проверка: ID не должен быть пустым, но может быть нечисловым (для кастомных модов)
@@ -1080,24 +1138,17 @@ class BrowserTab(wx.Panel):
                             logger.warning(f"[Browser/Import] Пропущен мод с пустым ID: {mod_data}")
                             skipped_count += 1
                             continue
-                        # Проверка на наличие в очереди
-                        if any(m.mod_id == mod_id for m in self.download_manager.download_queue):
-                            logger.debug(f"[Browser/Import] Мод {mod_id} уже в очереди, пропущен.")
-                            skipped_count += 1
-                            continue
                         mod_name = mod_data.get('name', f'Импортированный мод {mod_id}')
                         mod_author = mod_data.get('author', 'Неизвестен')
-
-                        from src.models.mod import Mod
-                        mod = Mod(
+                        mods_to_add.append(Mod(
                             mod_id=mod_id,
                             name=mod_name,
                             author=mod_author,
                             workshop_url=f"https://steamcommunity.com/sharedfiles/filedetails/?id={mod_id}"
-                        )
-                        self.download_manager.add_to_queue(mod)
-                        added_count += 1
-                    self._update_queue_list()
+                        ))
+                    # Одна операция над очередью: дубликаты (в очереди и в самом файле) отсекаются по индексу
+                    added_count = len(self.download_manager.add_many_to_queue(mods_to_add))
+                    skipped_count += len(mods_to_add) - added_count
                     result_msg = f"Добавлено в очередь: {added_count}"
                     if skipped_count > 0:
                         result_msg += f"\nПропущено (уже в очереди): {skipped_count}"
@@ -1115,7 +1166,7 @@ class BrowserTab(wx.Panel):
     # --- НОВЫЙ МЕТОД: Очистка очереди ---
     def _on_clear_queue(self, event):
         """Обработчик нажатия кнопки 'Очистить очередь'."""
-        if self.download_manager.download_queue: # Проверяем, не пустая ли очередь
+        if self.download_manager.queue: # Проверяем, не пустая ли очередь
             res = wx.MessageBox("Вы уверены, что хотите очистить всю очередь загрузки?", "Подтверждение", wx.YES_NO | wx.ICON_QUESTION)
             if res == wx.YES:
                 self.download_manager.clear_queue()
@@ -1127,14 +1178,14 @@ class BrowserTab(wx.Panel):
     # --- КОНЕЦ НОВОГО МЕТОДА ---
 
     def _on_remove_from_queue(self, event):
+        mod_ids = []
         selection = self.queue_list.GetFirstSelected()
-        if selection >= 0:
-            queue = self.download_manager.download_queue
-            if 0 <= selection < len(queue):
-                mod = queue[selection]
-                self.download_manager.remove_from_queue(mod.mod_id)
-                self._update_queue_list()
-                logger.info(f"Мод {mod.name} удален из очереди загрузки")
+        while selection >= 0:
+            mod_ids.append(self.queue_list.GetItemText(selection, 1))
+            selection = self.queue_list.GetNextSelected(selection)
+        if mod_ids:
+            removed = self.download_manager.remove_many_from_queue(mod_ids)
+            logger.info(f"Из очереди загрузки удалено модов: {removed}")
 
     # --- ИЗМЕНЕННЫЙ _on_download_queue ---
     def _on_download_queue(self, event):
@@ -1143,7 +1194,7 @@ class BrowserTab(wx.Panel):
             wx.MessageBox("Сначала выберите игру", "Ошибка", wx.OK | wx.ICON_WARNING)
             return
         # --- ИСПРАВЛЕНИЕ ОШИБКИ: Правильный вызов свойства ---
-        if not self.download_manager.download_queue:
+        if not self.download_manager.queue:
             wx.MessageBox("Очередь загрузки пуста", "Информация", wx.OK | wx.ICON_INFORMATION)
             return
         # --- КОНЕЦ ИСПРАВЛЕНИЯ ОШИБКИ ---
@@ -1163,7 +1214,10 @@ class BrowserTab(wx.Panel):
         else:
             # Ошибки или отмена уже залогированы в диалоге
             logger.info("[Browser] Загрузка через диалог завершена (возможно, с ошибками или отменой).")
-            # Queue list обновлять не нужно, если не успешно
+            # Успешно установленные моды уже убраны из очереди, неудачные остались для повтора
+            self._update_queue_list()
+            if HAS_EVENT_BUS:
+                event_bus.emit("mods_updated", self.current_game)
         dlg.Destroy()
 
     # --- КОНЕЦ ИЗМЕНЕННОГО _on_download_queue ---
@@ -1172,4 +1226,5 @@ class BrowserTab(wx.Panel):
         # Отписываемся от событий при уничтожении панели
         if HAS_EVENT_BUS:
             event_bus.unsubscribe("mods_updated", self._on_mods_updated)
+        self.download_manager.queue.unsubscribe(self._on_queue_event)
         super().Destroy()
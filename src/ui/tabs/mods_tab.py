@@ -10,16 +10,17 @@ import time
 from datetime import datetime
 from pathlib import Path
 from loguru import logger
-from typing import List, Dict, Optional, Any, Set
+from typing import Callable, List, Dict, Optional, Any, Set
 import requests
 from io import BytesIO
 # Импорт функции перевода
 from src.core.i18n import _
 # Импорт моделей
-from src.models.mod import Mod
+from src.models.mod import Mod, format_size
 from src.models.game import Game
 # Импорт менеджеров
-from src.core.mod_manager import ModManager
+from src.core.mod_manager import ModManager, ModDelta
+from src.core.mod_size_service import ModSizeService, GameDiskUsage
 # Попытка импорта event_bus
 try:
     from src.event_bus import event_bus
@@ -30,6 +31,14 @@ except ImportError:
 # Импортируем новые сервисы
 from src.core.steam_workshop_service import SteamWorkshopService
 from src.core.task_manager import TaskManager
+from src.core.update_pipeline import UpdatePipeline, UpdatePlan
+from src.core.content_manifest import ManifestStatus, ManifestCheck
+from src.core.conflict_index import ConflictIndex
+from src.core.profile_manager import ProfileManager
+from src.core.snapshot_manager import SnapshotManager, RollbackResult
+from src.core.duplicate_analyzer import DuplicateAnalyzer, ReclaimPlan
+from src.core.load_order import LoadOrderSolver, LoadOrderResult, default_mods_config_path, read_mods_config, write_mods_config
+from src.ui.dialogs.download_progress_dialog import DownloadProgressDialog
 # Импортируем HyperLinkCtrl для кликабельных ссылок
 import wx.lib.agw.hyperlink as hl
 
@@ -42,15 +51,33 @@ class ModsTab(wx.Panel):
     COL_INSTALL = 3
     COL_UPDATE = 4
     COL_SIZE = 5
+    MAX_SNAPSHOTS_IN_MENU = 10
 
     def __init__(self, parent, mod_manager: ModManager, language_manager,
                  steam_workshop_service: SteamWorkshopService = None,
-                 task_manager: TaskManager = None):
+                 task_manager: TaskManager = None,
+                 download_manager=None,
+                 mod_watcher=None,
+                 mod_size_service: ModSizeService = None):
         super().__init__(parent)
         self.mod_manager = mod_manager
         self.language_manager = language_manager
         self.steam_workshop_service = steam_workshop_service or SteamWorkshopService()
         self.task_manager = task_manager or TaskManager()
+        self.download_manager = download_manager
+        # Наблюдение за папкой модов: внешние изменения применяются без полной перезагрузки
+        self.mod_watcher = mod_watcher
+        # Размеры папок модов считаются в фоне и подставляются в колонку размера по мере готовности
+        self.mod_size_service = mod_size_service or ModSizeService()
+        self.disk_usage: Optional[GameDiskUsage] = None
+        # Последний подсчет по играм: при возврате к игре без изменений на диске размеры не пересчитываются
+        self._disk_usage_by_game: Dict[str, GameDiskUsage] = {}
+        self.conflict_index: Optional[ConflictIndex] = None     # Создается для игры при первом запросе
+        # Снимки состояния модов: вручную и автоматически перед обновлением всех модов
+        self.snapshot_manager = SnapshotManager(mod_manager)
+        # Поиск дубликатов по содержимому и модов в archive без элемента Workshop
+        self.duplicate_analyzer = DuplicateAnalyzer(mod_manager, self.steam_workshop_service)
+        self.update_pipeline = UpdatePipeline(self.steam_workshop_service, download_manager)
         self.current_game: Optional[Game] = None
         self.mod_details: Dict[str, Dict[str, Any]] = {}
         self.mod_versions: Dict[str, Dict[str, str]] = {}
@@ -108,6 +135,7 @@ class ModsTab(wx.Panel):
         if HAS_EVENT_BUS and event_bus:
             event_bus.subscribe("mods_updated", self._on_mods_updated_event)
             event_bus.subscribe("language_changed", self._on_language_changed)
+            event_bus.subscribe("mods_state_changed", self._on_mods_state_changed_event)
 
     def _create_ui(self):
         main_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -119,13 +147,28 @@ class ModsTab(wx.Panel):
         self.check_updates_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.check_updates"))
         self.update_all_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.update_all"))
         self.export_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.export"))
+        self.verify_files_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.verify_files"))
+        self.load_order_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.sort_load_order"))
+        self.profiles_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.profiles"))
+        self.snapshots_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.snapshots"))
+        self.duplicates_btn = wx.Button(control_panel, label=self.language_manager.get_text("mod.find_duplicates"))
         self.check_updates_btn.Bind(wx.EVT_BUTTON, self._on_check_updates)
         self.update_all_btn.Bind(wx.EVT_BUTTON, self._on_update_all_mods)
         self.export_btn.Bind(wx.EVT_BUTTON, self._on_export)
+        self.verify_files_btn.Bind(wx.EVT_BUTTON, self._on_verify_files)
+        self.load_order_btn.Bind(wx.EVT_BUTTON, self._on_sort_load_order)
+        self.profiles_btn.Bind(wx.EVT_BUTTON, self._on_profiles)
+        self.snapshots_btn.Bind(wx.EVT_BUTTON, self._on_snapshots)
+        self.duplicates_btn.Bind(wx.EVT_BUTTON, self._on_find_duplicates)
 
         control_sizer.Add(self.check_updates_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
         control_sizer.Add(self.update_all_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
         control_sizer.Add(self.export_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
+        control_sizer.Add(self.verify_files_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
+        control_sizer.Add(self.load_order_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
+        control_sizer.Add(self.profiles_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
+        control_sizer.Add(self.snapshots_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
+        control_sizer.Add(self.duplicates_btn, 0, wx.RIGHT | wx.TOP | wx.BOTTOM, 5)
         control_sizer.AddStretchSpacer(1)  # Растягиваемый spacer для прижатия к левому краю
         
         control_panel.SetSizer(control_sizer)
@@ -260,6 +303,9 @@ class ModsTab(wx.Panel):
         logger.debug("[ModsTab] " + _("system.set_game_called", name=game.name if game else 'None'))
         self.current_game = game
         self.selected_mod_id = None
+        self.disk_usage = None
+        if self.mod_watcher:
+            self.mod_watcher.stop()
         self._clear_mod_info()
         self._clear_lists()
         self._update_panel_titles(0, 0)
@@ -288,32 +334,134 @@ class ModsTab(wx.Panel):
             logger.debug(f"[ModsTab/LoadAsync] Path exists: {Path(self.current_game.mods_path).exists()}")
             logger.debug(f"[ModsTab/LoadAsync] Path isdir: {Path(self.current_game.mods_path).is_dir()}")
             
-            self.mod_manager.load_mods_for_game(self.current_game)
+            game = self.current_game
+            self.mod_manager.load_mods_for_game(
+                game, progress_callback=lambda mods: wx.CallAfter(self._on_mods_scanned, game, mods))
+            from_snapshot = self.mod_manager.last_load_from_snapshot
             enabled_mods = self.mod_manager.get_enabled_mods(steam_id)
             disabled_mods = self.mod_manager.get_disabled_mods(steam_id)
-            wx.CallAfter(self._on_mods_loaded, enabled_mods, disabled_mods)
+            if self.mod_watcher and self.current_game is game:
+                self.mod_watcher.watch(game, self._on_mod_folder_delta)
+            wx.CallAfter(self._on_mods_loaded, enabled_mods, disabled_mods, from_snapshot)
             wx.CallAfter(self._update_panel_titles, len(enabled_mods), len(disabled_mods))
             logger.info("[ModsTab] " + _("system.mods_loaded_count", enabled=len(enabled_mods), disabled=len(disabled_mods)))
         except Exception as e:
             logger.error("[ModsTab/LoadAsync] " + _("system.mods_load_error", error=e))
             wx.CallAfter(wx.MessageBox, _("system.mods_load_list_error", error=e), _("messages.error"), wx.OK | wx.ICON_ERROR)
 
-    def _on_mods_loaded(self, enabled_mods: List[Mod], disabled_mods: List[Mod]):
+    def _on_mods_scanned(self, game: Game, mods: List[Mod]):
+        """Промежуточная пачка модов во время сканирования: строки появляются до окончания загрузки"""
+        if not self or self.current_game is not game: return
+        for mod in mods:
+            self._add_mod_to_list(self.enabled_list if mod.is_enabled else self.disabled_list, mod)
+        self._update_panel_titles(self.enabled_list.GetItemCount(), self.disabled_list.GetItemCount())
+
+    def _on_mod_folder_delta(self, game: Game, delta: ModDelta):
+        """Изменения папки модов от ModWatcher (вызывается из потока наблюдателя)"""
+        wx.CallAfter(self._apply_mod_delta, game, delta)
+
+    def _apply_mod_delta(self, game: Game, delta: ModDelta):
+        """Точечно обновляет списки после внешнего изменения папки модов"""
+        if not self or self.current_game is not game: return
+        try:
+            for mod in delta.removed:
+                # Мод с тем же ID мог остаться в другой папке (например, перемещен в archive вручную)
+                if not any(m.mod_id == mod.mod_id for m in delta.added + delta.modified):
+                    self._remove_mod_from_lists(mod.mod_id)
+            for mod in delta.added + delta.modified:
+                for list_ctrl in (self.enabled_list, self.disabled_list):
+                    index = self._find_mod_item_index_by_id(list_ctrl, mod.mod_id)
+                    if index != wx.NOT_FOUND:
+                        list_ctrl.DeleteItem(index)
+                self._add_mod_to_list(self.enabled_list if mod.is_enabled else self.disabled_list, mod)
+            self._update_panel_titles(self.enabled_list.GetItemCount(), self.disabled_list.GetItemCount())
+            if self.search_term_enabled:
+                self._filter_list(self.enabled_list, self.search_term_enabled)
+            if self.search_term_disabled:
+                self._filter_list(self.disabled_list, self.search_term_disabled)
+            if self.selected_mod_id and any(m.mod_id == self.selected_mod_id for m in delta.modified):
+                details = self.mod_details.get(self.selected_mod_id)
+                if details:
+                    self._display_mod_info(self.selected_mod_id, details)
+            new_mods = [mod for mod in delta.added if mod.mod_id not in self.mod_details]
+            if new_mods:
+                self.task_manager.submit_task(self._load_mod_list_names_task, new_mods, description=_("system.loading_mod_names"))
+            self._refresh_disk_usage()
+        except Exception as e:
+            logger.error(f"[ModsTab/Delta] Ошибка применения изменений папки модов: {e}")
+
+    def _on_mods_loaded(self, enabled_mods: List[Mod], disabled_mods: List[Mod], from_snapshot: bool = False):
+        """
+        :param from_snapshot: Список восстановлен из памяти ModManager без изменений на диске -
+            названия уже известных модов и размеры берутся из прошлой загрузки.
+        """
         if not self: return
         logger.debug("[ModsTab] _on_mods_loaded: " + _("system.updating_ui_lists"))
         try:
-            self._clear_lists()
-            for mod in disabled_mods:
-                self._add_mod_to_list(self.disabled_list, mod)
-            for mod in enabled_mods:
-                self._add_mod_to_list(self.enabled_list, mod)
+            # Промежуточные строки добавлялись в порядке готовности - пересобираем в итоговом порядке
+            self.enabled_list.Freeze()
+            self.disabled_list.Freeze()
+            try:
+                self._clear_lists()
+                for mod in disabled_mods:
+                    self._add_mod_to_list(self.disabled_list, mod)
+                for mod in enabled_mods:
+                    self._add_mod_to_list(self.enabled_list, mod)
+            finally:
+                self.enabled_list.Thaw()
+                self.disabled_list.Thaw()
             logger.debug("[ModsTab] _on_mods_loaded: " + _("system.ui_lists_updated"))
             all_mods = enabled_mods + disabled_mods
+            if from_snapshot:
+                all_mods = [mod for mod in all_mods if mod.mod_id not in self.mod_details]
             if all_mods:
                 self.task_manager.submit_task(self._load_mod_list_names_task, all_mods, description=_("system.loading_mod_names"))
+            cached_usage = self._disk_usage_by_game.get(self.current_game.steam_id) if self.current_game else None
+            if from_snapshot and cached_usage is not None:
+                self.disk_usage = cached_usage
+                self._update_panel_titles(self.enabled_list.GetItemCount(), self.disabled_list.GetItemCount())
+            else:
+                self._refresh_disk_usage()
         except Exception as e:
             logger.error("[ModsTab/OnLoaded] " + _("system.ui_update_error", error=e))
 
+    # --- Размеры модов ---
+    def _refresh_disk_usage(self):
+        """Пересчитывает размеры модов текущей игры в фоне (неизменившиеся папки берутся из кэша)"""
+        if not self or not self.current_game: return
+        game = self.current_game
+        mods = self.mod_manager.get_installed_mods(game.steam_id)
+        if mods:
+            self.task_manager.submit_task(self._compute_mod_sizes_task, game, mods, description=_("system.computing_mod_sizes"))
+
+    def _compute_mod_sizes_task(self, game: Game, mods: List[Mod]):
+        if self.current_game is not game:
+            return
+        try:
+            usage = self.mod_size_service.get_disk_usage(
+                game, mods, on_result=lambda batch: wx.CallAfter(self._on_mod_sizes, game, batch))
+            wx.CallAfter(self._on_disk_usage, game, usage)
+        except Exception as e:
+            logger.error(f"[ModsTab/Sizes] Ошибка подсчета размеров модов: {e}")
+
+    def _on_mod_sizes(self, game: Game, batch: List[Any]):
+        """Пачка посчитанных размеров: обновляет колонку размера"""
+        if not self or self.current_game is not game: return
+        sizes = {mod.mod_id: mod.formatted_file_size for mod, _size in batch}
+        for list_ctrl in (self.enabled_list, self.disabled_list):
+            for i in range(list_ctrl.GetItemCount()):
+                text = sizes.get(list_ctrl.GetItemText(i, self.COL_ID))
+                if text is not None and list_ctrl.GetItemText(i, self.COL_SIZE) != text:
+                    list_ctrl.SetItem(i, self.COL_SIZE, text)
+
+    def _on_disk_usage(self, game: Game, usage: GameDiskUsage):
+        if not self or self.current_game is not game: return
+        self.disk_usage = usage
+        self._disk_usage_by_game[game.steam_id] = usage
+        logger.info(f"[ModsTab/Sizes] Включенные: {format_size(usage.enabled_bytes)}, отключенные: "
+                    f"{format_size(usage.disabled_bytes)}, archive: {format_size(usage.archive_bytes)}")
+        self._update_panel_titles(self.enabled_list.GetItemCount(), self.disabled_list.GetItemCount())
+
     def _add_mod_to_list(self, list_ctrl: wx.ListCtrl, mod: Mod):
         if not self: return
         try:
@@ -356,11 +504,25 @@ class ModsTab(wx.Panel):
                 self._update_mod_name_in_lists(mod.mod_id, cached_data.get('title', mod.mod_id))
                 cached_count += 1
 
+        # Моды с About.xml (RimWorld) показываются по локальным метаданным - без запроса к Workshop
+        offline_ids = []
+        for mod in mod_list:
+            if mod.mod_id in cached_mods:
+                continue
+            details = self._offline_mod_details(mod)
+            if details:
+                self.mod_details[mod.mod_id] = details
+                offline_ids.append(mod.mod_id)
+        if offline_ids:
+            logger.info(f"[ModsTab/ListNames] Данные {len(offline_ids)} модов взяты из About.xml")
+            wx.CallAfter(self._update_mod_names_in_lists, offline_ids)
+
         # Обновляем счётчик один раз для всех кэшированных
-        self.names_loaded = cached_count
+        self.names_loaded = cached_count + len(offline_ids)
         current = self.names_loaded
         total = self.names_total
-        mods_to_load = [mod for mod in mod_list if mod.mod_id not in cached_mods]
+        offline = set(offline_ids)
+        mods_to_load = [mod for mod in mod_list if mod.mod_id not in cached_mods and mod.mod_id not in offline]
 
         if mods_to_load:
             logger.info("[ModsTab/ListNames] " + _("mod.mods_to_load_count", count=len(mods_to_load), total=total))
@@ -396,7 +558,7 @@ class ModsTab(wx.Panel):
                 # Если ID не числовой, не делаем запрос к Steam - используем имя папки как название
                 if not mod.mod_id.isdigit():
                     logger.debug(f"[ModsTab/ListName/Task] [{mod.mod_id}] Пропущен запрос к Steam (нечисловой ID)")
-                    details = {'title': mod.name if mod.name else mod.mod_id, 'author': mod.author if mod.author else 'Неизвестен', 'description': 'Мод с кастомной папкой', 'tags': [], 'dependencies': []}
+                    details = self._offline_mod_details(mod) or {'title': mod.name if mod.name else mod.mod_id, 'author': mod.author if mod.author else 'Неизвестен', 'description': 'Мод с кастомной папкой', 'tags': [], 'dependencies': []}
                     self.mod_details[mod.mod_id] = details
                     wx.CallAfter(self._refresh_single_mod_in_lists, mod.mod_id)
                 else:
@@ -436,6 +598,34 @@ class ModsTab(wx.Panel):
         except Exception as e:
             logger.error("[ModsTab/Refresh] " + _("mod.mod_refresh_error_log", mod_id=mod_id, error=e))
 
+    def _offline_mod_details(self, mod: Mod) -> Optional[Dict[str, Any]]:
+        """Данные мода для панели информации из About.xml (None, если About.xml не прочитан)"""
+        if not mod.package_id:
+            return None
+        dependency_ids = self.mod_manager.get_dependency_ids(mod)
+        return {
+            'title': mod.name or mod.mod_id,
+            'author': mod.author,
+            'description': mod.description,
+            'tags': list(mod.supported_versions),
+            'dependencies': dependency_ids,
+            # Названия зависимостей из About.xml: для неустановленных не нужен запрос к Workshop
+            'dependency_names': {dep_id: dep.name for dep_id, dep in zip(dependency_ids, mod.dependencies) if dep.name},
+            'offline': True,
+        }
+
+    def _update_mod_names_in_lists(self, mod_ids: List[str]):
+        """Обновляет названия нескольких модов за один проход по спискам"""
+        if not self: return
+        titles = {mod_id: self.mod_details.get(mod_id, {}).get('title', mod_id) for mod_id in mod_ids}
+        for list_ctrl in (self.enabled_list, self.disabled_list):
+            if not list_ctrl:
+                continue
+            for i in range(list_ctrl.GetItemCount()):
+                title = titles.get(list_ctrl.GetItemText(i, self.COL_ID))
+                if title is not None:
+                    list_ctrl.SetItem(i, self.COL_NAME, title)
+
     def _update_mod_name_in_lists(self, mod_id: str, title: str):
         """Обновляет название мода в обоих списках"""
         if not self: return
@@ -597,11 +787,17 @@ class ModsTab(wx.Panel):
                         dep_status_text = wx.StaticText(self.mod_deps_panel, label="[Установлен] " if dep_id in installed_mod_ids else "[Не установлен] ")
                         dep_sizer.Add(dep_status_text, 0, wx.ALIGN_CENTER_VERTICAL)
                         
-                        # Получаем название зависимости из кэша
+                        # Название зависимости: установленный мод или About.xml, иначе кэш Workshop
                         dep_name = dep_id  # По умолчанию используем ID
-                        dep_details = self.steam_workshop_service.get_mod_details(dep_id)
-                        if dep_details and dep_details.get('title'):
-                            dep_name = dep_details['title']
+                        dep_mod = self.mod_manager.get_mod_by_id(dep_id)
+                        if dep_mod and dep_mod.name and dep_mod.name != dep_id:
+                            dep_name = dep_mod.name
+                        elif details.get('dependency_names', {}).get(dep_id):
+                            dep_name = details['dependency_names'][dep_id]
+                        elif dep_id.isdigit():
+                            dep_details = self.steam_workshop_service.get_mod_details(dep_id)
+                            if dep_details and dep_details.get('title'):
+                                dep_name = dep_details['title']
                         
                         # Временное логирование для отладки
                         logger.info("[ModsTab/DisplayInfo] " + _("mod.mod_dependency_debug", dep_id=dep_id, name=dep_name, status=_("mod.dependency_installed") if dep_id in installed_mod_ids else _("mod.dependency_not_installed")))
@@ -848,13 +1044,19 @@ class ModsTab(wx.Panel):
         logger.debug(f"[ModsTab] _update_panel_titles: Вкл={enabled_count}, Откл={disabled_count}")
         if not self: return
         try:
+            # Занятое место показывается, когда посчитаны размеры модов (_on_disk_usage)
+            usage = self.disk_usage
+            enabled_size = f" — {format_size(usage.enabled_bytes)}" if usage else ""
+            disabled_size = f" — {format_size(usage.disabled_bytes)}" if usage else ""
+            if usage and usage.archive_bytes > usage.disabled_bytes:
+                disabled_size += f" (archive: {format_size(usage.archive_bytes)})"
             if self.disabled_title:
-                self.disabled_title.SetLabel(f"Отключённые моды ({disabled_count})")
+                self.disabled_title.SetLabel(f"Отключённые моды ({disabled_count}){disabled_size}")
                 logger.debug(f"[ModsTab] Заголовок отключённых обновлён: {self.disabled_title.GetLabel()}")
             else:
                 logger.warning("[ModsTab] disabled_title равен None при попытке обновления.")
             if self.enabled_title:
-                self.enabled_title.SetLabel(f"Включённые моды ({enabled_count})")
+                self.enabled_title.SetLabel(f"Включённые моды ({enabled_count}){enabled_size}")
                 logger.debug(f"[ModsTab] Заголовок включённых обновлён: {self.enabled_title.GetLabel()}")
             else:
                 logger.warning("[ModsTab] enabled_title равен None при попытке обновления.")
@@ -1044,11 +1246,11 @@ class ModsTab(wx.Panel):
             mod_id = list_ctrl.GetItemText(index, self.COL_ID)
             mod = self.mod_manager.get_mod_by_id(mod_id)
             if mod:
+                # Строки переносятся между списками по событию mods_state_changed
                 if mod.is_enabled:
                     self._disable_mod([mod_id])
                 else:
                     self._enable_mod([mod_id])
-                self._refresh_single_mod_in_lists_after_action(mod_id, "disable" if mod.is_enabled else "enable")
 
     def _load_selected_mod_details_task(self, mod_id: str):
         if not self or self.selected_mod_id != mod_id:
@@ -1116,6 +1318,8 @@ class ModsTab(wx.Panel):
         remove_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.remove"))
         update_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.update"))
         check_update_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.check_updates"))
+        verify_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.verify_files"))
+        conflicts_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.file_conflicts"))
         mod_objs = []
         if self.current_game:
             mods = self.mod_manager.get_installed_mods(self.current_game.steam_id)
@@ -1128,15 +1332,9 @@ class ModsTab(wx.Panel):
             for mod_id in mod_ids:
                 self._on_open_mod_in_browser(mod_id)
         def on_menu_enable(event):
-            success = self._enable_mod(mod_ids)
-            if success:
-                for mod_id in mod_ids:
-                    self._refresh_single_mod_in_lists_after_action(mod_id, "enable")
+            self._enable_mod(mod_ids)
         def on_menu_disable(event):
-            success = self._disable_mod(mod_ids)
-            if success:
-                for mod_id in mod_ids:
-                    self._refresh_single_mod_in_lists_after_action(mod_id, "disable")
+            self._disable_mod(mod_ids)
         def on_menu_remove(event):
             res = wx.MessageBox(_("system.confirm_remove_multiple", count=len(mod_ids)), _("messages.confirmation"), wx.YES_NO | wx.NO_DEFAULT | wx.ICON_QUESTION)
             if res == wx.YES:
@@ -1154,34 +1352,11 @@ class ModsTab(wx.Panel):
         menu.Bind(wx.EVT_MENU, on_menu_remove, remove_item)
         menu.Bind(wx.EVT_MENU, on_menu_update, update_item)
         menu.Bind(wx.EVT_MENU, on_menu_check_update, check_update_item)
+        menu.Bind(wx.EVT_MENU, lambda event: self._verify_mods(mod_ids), verify_item)
+        menu.Bind(wx.EVT_MENU, lambda event: self._show_file_conflicts(mod_ids), conflicts_item)
         self.PopupMenu(menu)
         menu.Destroy()
 
-    def _refresh_single_mod_in_lists_after_action(self, mod_id: str, action: str):
-        if not self or not self.current_game: return
-        updated_mod = self.mod_manager.get_mod_by_id(mod_id)
-        if not updated_mod:
-            logger.warning(f"[ModsTab/RefreshAfterAction] Мод {mod_id} не найден после действия {action}.")
-            return
-        target_list = self.enabled_list if updated_mod.is_enabled else self.disabled_list
-        source_list = self.disabled_list if updated_mod.is_enabled else self.enabled_list
-        source_index = self._find_mod_item_index_by_id(source_list, mod_id)
-        if source_index != wx.NOT_FOUND:
-            source_list.DeleteItem(source_index)
-            logger.debug(f"[ModsTab/RefreshAfterAction] Мод {mod_id} удален из {'отключенных' if updated_mod.is_enabled else 'включенных'}.")
-        self._add_mod_to_list(target_list, updated_mod)
-        logger.debug(f"[ModsTab/RefreshAfterAction] Мод {mod_id} добавлен в {'включенные' if updated_mod.is_enabled else 'отключенные'}.")
-        enabled_count = self.enabled_list.GetItemCount()
-        disabled_count = self.disabled_list.GetItemCount()
-        self._update_panel_titles(enabled_count, disabled_count)
-        if self.selected_mod_id == mod_id:
-            details = self.mod_details.get(mod_id, {'title': mod_id, 'author': '...', 'description': '...', 'tags': [], 'dependencies': []})
-            self._display_mod_info(mod_id, details)
-        if target_list == self.disabled_list and self.search_term_disabled:
-            self._filter_list(self.disabled_list, self.search_term_disabled)
-        elif target_list == self.enabled_list and self.search_term_enabled:
-            self._filter_list(self.enabled_list, self.search_term_enabled)
-
     def _remove_mod_from_lists(self, mod_id: str):
         if not self: return
         try:
@@ -1207,77 +1382,46 @@ class ModsTab(wx.Panel):
         else:
             wx.LaunchDefaultBrowser(url)
 
-    def _get_mod_folder_update_time(self, mod: Mod) -> Optional[datetime]:
-        """Получает дату последнего изменения папки мода"""
-        try:
-            if not mod.local_path or not os.path.exists(mod.local_path):
-                logger.debug(f"[ModsTab/UpdateTime] Папка мода {mod.mod_id} не найдена: {mod.local_path}")
-                return None
-            
-            # Получаем время последнего изменения папки
-            folder_time = os.path.getmtime(mod.local_path)
-            return datetime.fromtimestamp(folder_time)
-        except Exception as e:
-            logger.error(f"[ModsTab/UpdateTime] Ошибка получения времени папки для {mod.mod_id}: {e}")
-            return None
-
     def _check_mod_updates_with_local_data(self) -> Dict[str, Dict[str, Any]]:
-        """Проверяет обновления модов сравнивая локальные данные с Steam"""
+        """
+        Проверяет обновления модов: локальное состояние берется из appworkshop_<app>.acf (или времени папки),
+        данные Steam - пакетными запросами через UpdatePipeline вместо запроса на каждый мод
+        """
         if not self.current_game:
             return {}
         
         all_mods = self.mod_manager.get_installed_mods(self.current_game.steam_id)
-        update_info = {}
-        
         logger.info(f"[ModsTab/CheckUpdates] Проверка {len(all_mods)} модов на обновления")
+        plan = self.update_pipeline.build_plan(self.current_game, all_mods)
+        update_info = {}
         
         for mod in all_mods:
-            try:
-                mod_update_info = {
-                    'mod_id': mod.mod_id,
-                    'name': mod.name or mod.mod_id,
-                    'local_update': mod.local_update_date,
-                    'steam_update': mod.updated_date,
-                    'folder_update': self._get_mod_folder_update_time(mod),
-                    'needs_update': False,
-                    'status': 'unknown'
-                }
-                
-                # Детальное логирование для одного мода
-                logger.debug(f"[ModsTab/CheckUpdates] Мод {mod.mod_id}:")
-                logger.debug(f"  - local_update: {mod.local_update_date}")
-                logger.debug(f"  - steam_update: {mod.updated_date}")
-                logger.debug(f"  - folder_update: {mod_update_info['folder_update']}")
-                
-                # Получаем данные из Steam для актуальной информации
-                details = self.steam_workshop_service.get_mod_details(mod.mod_id, force_refresh=True)
-                
-                if details:
-                    steam_updated_date = details.get('updated_date')
-                    logger.debug(f"[ModsTab/CheckUpdates] Мод {mod.mod_id}: Steam дата обновления = {steam_updated_date}")
-                    
-                    # Сравниваем даты для определения необходимости обновления
-                    if mod_update_info['folder_update'] and steam_updated_date:
-                        if steam_updated_date > mod_update_info['folder_update']:
-                            mod_update_info['needs_update'] = True
-                            mod_update_info['status'] = 'needs_update'
-                            logger.info(f"[ModsTab/CheckUpdates] Мод {mod.mod_id} требует обновления (Steam: {steam_updated_date} > Local: {mod_update_info['folder_update']})")
-                        else:
-                            mod_update_info['status'] = 'up_to_date'
-                            logger.debug(f"[ModsTab/CheckUpdates] Мод {mod.mod_id} актуален (Steam: {steam_updated_date} <= Local: {mod_update_info['folder_update']})")
-                    else:
-                        mod_update_info['status'] = 'missing_data'
-                        logger.warning(f"[ModsTab/CheckUpdates] Мод {mod.mod_id}: отсутствуют данные для сравнения (local={mod_update_info['folder_update']}, steam={steam_updated_date})")
-                else:
-                    mod_update_info['status'] = 'no_steam_data'
-                    logger.warning(f"[ModsTab/CheckUpdates] Мод {mod.mod_id}: не удалось получить данные из Steam")
-                
-                update_info[mod.mod_id] = mod_update_info
-                    
-            except Exception as e:
-                logger.error(f"[ModsTab/CheckUpdates] Ошибка при проверке мода {mod.mod_id}: {e}")
+            status = plan.statuses.get(mod.mod_id)
+            mod_update_info = {
+                'mod_id': mod.mod_id,
+                'name': mod.name or mod.mod_id,
+                'local_update': mod.local_update_date,
+                'steam_update': datetime.fromtimestamp(status.remote_time) if status and status.remote_time else mod.updated_date,
+                'folder_update': datetime.fromtimestamp(status.local_time) if status and status.local_time else None,
+                'needs_update': False,
+                'status': 'unknown'
+            }
+            if status is None or status.remote_time is None:
+                mod_update_info['status'] = 'no_steam_data'
+                logger.warning(f"[ModsTab/CheckUpdates] Мод {mod.mod_id}: не удалось получить данные из Steam")
+            elif status.is_stale:
+                mod_update_info['needs_update'] = True
+                mod_update_info['status'] = 'needs_update'
+                logger.info(f"[ModsTab/CheckUpdates] Мод {mod.mod_id} требует обновления "
+                            f"(Steam: {status.remote_time} > Local: {status.local_time}, источник: {status.local_source})")
+            elif status.local_time is None:
+                mod_update_info['status'] = 'missing_data'
+                logger.warning(f"[ModsTab/CheckUpdates] Мод {mod.mod_id}: отсутствуют локальные данные для сравнения")
+            else:
+                mod_update_info['status'] = 'up_to_date'
+            update_info[mod.mod_id] = mod_update_info
         
-        logger.info(f"[ModsTab/CheckUpdates] Проверка завершена. Найдено обновлений: {sum(1 for info in update_info.values() if info.get('needs_update', False))}")
+        logger.info(f"[ModsTab/CheckUpdates] Проверка завершена. Найдено обновлений: {len(plan.stale)}")
         return update_info
 
     def _on_check_updates(self, event):
@@ -1385,8 +1529,526 @@ class ModsTab(wx.Panel):
             logger.error(f"[ModsTab/Refresh] Ошибка обновления интерфейса: {e}")
 
     def _on_update_all_mods(self, event):
-        """Обновление всех модов (пока просто проверка)"""
-        wx.MessageBox(_("system.update_all_not_implemented"), _("messages.in_development"), wx.OK | wx.ICON_INFORMATION)
+        """Обновление модов: в очередь загрузки попадают только моды с более новой версией в Workshop"""
+        if not self.current_game:
+            wx.MessageBox(_("system.select_game_first"), _("messages.error"), wx.OK | wx.ICON_WARNING)
+            return
+        if not self.download_manager:
+            wx.MessageBox(_("system.update_all_not_implemented"), _("messages.in_development"), wx.OK | wx.ICON_INFORMATION)
+            return
+        game = self.current_game
+        mods = self.mod_manager.get_installed_mods(game.steam_id)
+        self.update_all_btn.Enable(False)
+        self.task_manager.submit_task(self._build_update_plan_task, game, mods,
+                                      description=self.language_manager.get_text("mod.building_update_plan"))
+
+    def _build_update_plan_task(self, game: Game, mods: List[Mod]):
+        """Построение плана обновления (в фоновом потоке)"""
+        plan = None
+        try:
+            plan = self.update_pipeline.build_plan(game, mods)
+        except Exception as e:
+            logger.error(f"[ModsTab/UpdateAll] Ошибка построения плана обновления: {e}")
+            wx.CallAfter(wx.MessageBox, f"{self.language_manager.get_text('mod.error')}: {e}",
+                         self.language_manager.get_text("mod.error"), wx.OK | wx.ICON_ERROR)
+        wx.CallAfter(self._on_update_plan_ready, game, plan)
+
+    def _on_update_plan_ready(self, game: Game, plan: Optional[UpdatePlan]):
+        """Показывает план обновления и запускает загрузку устаревших модов"""
+        if not self: return
+        self.update_all_btn.Enable(True)
+        if plan is None or game is not self.current_game:
+            return
+        if not plan.stale:
+            wx.MessageBox(self.language_manager.get_text("mod.no_updates_available"),
+                          self.language_manager.get_text("mod.update_all"), wx.OK | wx.ICON_INFORMATION)
+            return
+        message = self.language_manager.get_text(
+            "mod.update_plan_summary",
+            count=len(plan.stale),
+            total=len(plan.statuses),
+            unknown=len(plan.unknown),
+            size=format_size(plan.bytes_to_download),
+            saved=format_size(plan.bytes_saved)
+        )
+        if wx.MessageBox(message, self.language_manager.get_text("mod.update_all"), wx.YES_NO | wx.ICON_QUESTION) != wx.YES:
+            return
+        self.update_all_btn.Enable(False)
+        self.task_manager.submit_task(self._auto_snapshot_task, game, plan,
+                                      description=self.language_manager.get_text("mod.snapshot_creating"))
+
+    def _auto_snapshot_task(self, game: Game, plan: UpdatePlan):
+        """Снимок устаревших модов перед обновлением: установщик заменяет их папки, прежние файлы остаются в снимке"""
+        try:
+            self.snapshot_manager.create_snapshot(game, label=self.language_manager.get_text("mod.snapshot_auto_label"),
+                                                  auto=True, mod_ids=[mod.mod_id for mod in plan.stale])
+        except Exception as e:
+            logger.error(f"[ModsTab/UpdateAll] Не удалось создать снимок перед обновлением: {e}")
+        wx.CallAfter(self._enqueue_update_plan, game, plan)
+
+    def _enqueue_update_plan(self, game: Game, plan: UpdatePlan):
+        if not self: return
+        self.update_all_btn.Enable(True)
+        added = self.update_pipeline.enqueue(plan)
+        logger.info(f"[ModsTab/UpdateAll] В очередь добавлено {added} устаревших модов.")
+        dlg = DownloadProgressDialog(self, self.download_manager, game)
+        dlg.ShowModal()
+        dlg.Destroy()
+        if HAS_EVENT_BUS and event_bus:
+            event_bus.emit("mods_updated", game)
+        # Перечитываем список, чтобы показать новые даты обновления
+        self.set_game(game)
+
+    # --- Проверка целостности по манифестам ---
+    def _on_verify_files(self, event):
+        self._verify_mods()
+
+    def _verify_mods(self, mod_ids: Optional[List[str]] = None):
+        """Проверка файлов установленных модов (всех или выбранных) по манифестам"""
+        if not self.current_game:
+            wx.MessageBox(_("system.select_game_first"), _("messages.error"), wx.OK | wx.ICON_WARNING)
+            return
+        if not self.download_manager:
+            return
+        game = self.current_game
+        mods = self.mod_manager.get_installed_mods(game.steam_id)
+        if mod_ids is not None:
+            mods = [mod for mod in mods if mod.mod_id in mod_ids]
+        self.verify_files_btn.Enable(False)
+        self.task_manager.submit_task(self._verify_files_task, game, mods,
+                                      description=self.language_manager.get_text("mod.verifying_files"))
+
+    def _verify_files_task(self, game: Game, mods: List[Mod]):
+        """Проверка в фоновом потоке. Для модов без манифеста текущие файлы становятся эталоном."""
+        manifests = self.download_manager.manifests
+        results: Dict[str, ManifestCheck] = {}
+        try:
+            mod_paths = {mod.mod_id: mod.local_path for mod in mods if mod.local_path}
+            results = manifests.verify_many(
+                game.steam_id, mod_paths,
+                progress_callback=lambda done, total: wx.CallAfter(self._on_verify_progress, done, total))
+            baseline = {mod_id: mod_paths[mod_id] for mod_id, check in results.items()
+                        if check.status == ManifestStatus.NO_MANIFEST}
+            if baseline:
+                manifests.build_many(game.steam_id, baseline)
+        except Exception as e:
+            logger.error(f"[ModsTab/Verify] Ошибка проверки файлов: {e}")
+        wx.CallAfter(self._on_verify_files_done, game, mods, results)
+
+    def _on_verify_progress(self, done: int, total: int):
+        if not self or self.verify_files_btn.IsEnabled():
+            return  # Проверка уже завершилась
+        self.verify_files_btn.SetLabel(f"{self.language_manager.get_text('mod.verify_files')} ({done}/{total})")
+
+    def _on_verify_files_done(self, game: Game, mods: List[Mod], results: Dict[str, ManifestCheck]):
+        """Показывает результат проверки и предлагает перекачать поврежденные моды с validate"""
+        if not self: return
+        self.verify_files_btn.Enable(True)
+        self.verify_files_btn.SetLabel(self.language_manager.get_text("mod.verify_files"))
+        damaged = [mod for mod in mods if mod.mod_id in results
+                   and results[mod.mod_id].status in (ManifestStatus.DAMAGED, ManifestStatus.MISSING)]
+        message = self.language_manager.get_text(
+            "mod.verify_summary",
+            ok=sum(1 for check in results.values() if check.ok),
+            damaged=len(damaged),
+            baseline=sum(1 for check in results.values() if check.status == ManifestStatus.NO_MANIFEST)
+        )
+        logger.info(f"[ModsTab/Verify] Проверено {len(results)} модов, повреждено {len(damaged)}")
+        # Перекачать через SteamCMD можно только моды Workshop; локальные моды лишь перечисляются
+        redownload = [mod for mod in damaged if mod.mod_id.isdigit()]
+        local = [mod for mod in damaged if not mod.mod_id.isdigit()]
+        if local:
+            message += "\n\n" + self.language_manager.get_text(
+                "mod.verify_cannot_redownload", names=", ".join(mod.name or mod.mod_id for mod in local))
+        title = self.language_manager.get_text("mod.verify_files")
+        if not redownload or not self.download_manager:
+            wx.MessageBox(message, title, wx.OK | (wx.ICON_WARNING if damaged else wx.ICON_INFORMATION))
+            return
+        message += "\n\n" + self.language_manager.get_text("mod.verify_redownload", count=len(redownload))
+        if wx.MessageBox(message, title, wx.YES_NO | wx.ICON_WARNING) != wx.YES:
+            return
+        self.download_manager.add_many_to_queue(redownload, validate=True)
+        dlg = DownloadProgressDialog(self, self.download_manager, game)
+        dlg.ShowModal()
+        dlg.Destroy()
+        if HAS_EVENT_BUS and event_bus:
+            event_bus.emit("mods_updated", game)
+        self.set_game(game)
+
+    # --- Конфликты файлов ---
+    def _show_file_conflicts(self, mod_ids: List[str]):
+        """Моды, с которыми выбранные моды пересекаются по файлам (среди включенных)"""
+        if not self.current_game:
+            return
+        game = self.current_game
+        if self.conflict_index is None or self.conflict_index.game_id != game.steam_id:
+            self.conflict_index = ConflictIndex(game.steam_id)
+        self.task_manager.submit_task(self._file_conflicts_task, game, self.conflict_index, mod_ids,
+                                      description=self.language_manager.get_text("mod.finding_file_conflicts"))
+
+    def _file_conflicts_task(self, game: Game, conflict_index: ConflictIndex, mod_ids: List[str]):
+        try:
+            # Неизменившиеся папки берутся из индекса, поэтому повторный запрос почти мгновенный
+            enabled_mods = self.mod_manager.get_enabled_mods(game.steam_id)
+            selected = [mod for mod in self.mod_manager.get_installed_mods(game.steam_id) if mod.mod_id in mod_ids]
+            conflict_index.update(enabled_mods + [mod for mod in selected if not mod.is_enabled])
+            results = {mod_id: conflict_index.colliding_mods(mod_id) for mod_id in mod_ids}
+            wx.CallAfter(self._on_file_conflicts, game, results)
+        except Exception as e:
+            logger.error(f"[ModsTab/Conflicts] Ошибка поиска конфликтов: {e}")
+
+    def _on_file_conflicts(self, game: Game, results: Dict[str, Dict[str, List[str]]]):
+        if not self or self.current_game is not game: return
+        lines = []
+        for mod_id, colliding in results.items():
+            mod = self.mod_manager.get_mod_by_id(mod_id)
+            name = self.mod_details.get(mod_id, {}).get('title') or (mod.name if mod else mod_id)
+            if not colliding:
+                lines.append(self.language_manager.get_text("mod.no_file_conflicts", name=name))
+                continue
+            lines.append(self.language_manager.get_text("mod.file_conflicts_with", name=name, count=len(colliding)))
+            ranked = sorted(colliding.items(), key=lambda item: len(item[1]), reverse=True)
+            for other_id, paths in ranked[:15]:
+                other = self.mod_manager.get_mod_by_id(other_id)
+                other_name = self.mod_details.get(other_id, {}).get('title') or (other.name if other else other_id)
+                lines.append(f"  • {other_name} ({len(paths)}): {', '.join(paths[:3])}{', ...' if len(paths) > 3 else ''}")
+            if len(ranked) > 15:
+                lines.append("  " + self.language_manager.get_text("mod.file_conflicts_more", count=len(ranked) - 15))
+            lines.append("")
+        wx.MessageBox("\n".join(lines).strip(), self.language_manager.get_text("mod.file_conflicts"), wx.OK | wx.ICON_INFORMATION)
+
+    # --- Порядок загрузки ---
+    def _on_sort_load_order(self, event):
+        if not self.current_game:
+            wx.MessageBox(_("system.select_game_first"), _("messages.error"), wx.OK | wx.ICON_WARNING)
+            return
+        game = self.current_game
+        config_path = default_mods_config_path(game)
+        if not config_path:
+            wx.MessageBox(self.language_manager.get_text("mod.load_order_not_supported"),
+                          self.language_manager.get_text("mod.sort_load_order"), wx.OK | wx.ICON_INFORMATION)
+            return
+        if not os.path.exists(config_path):
+            wx.MessageBox(self.language_manager.get_text("mod.load_order_config_not_found", path=config_path),
+                          self.language_manager.get_text("mod.sort_load_order"), wx.OK | wx.ICON_WARNING)
+            return
+        self.load_order_btn.Enable(False)
+        self.task_manager.submit_task(self._sort_load_order_task, game, config_path,
+                                      description=self.language_manager.get_text("mod.sorting_load_order"))
+
+    def _sort_load_order_task(self, game: Game, config_path: str):
+        try:
+            mods = self.mod_manager.get_enabled_mods(game.steam_id)
+            result = LoadOrderSolver().solve(mods, read_mods_config(config_path))
+            wx.CallAfter(self._on_load_order_solved, game, config_path, result)
+        except Exception as e:
+            logger.error(f"[ModsTab/LoadOrder] Ошибка построения порядка загрузки: {e}")
+            wx.CallAfter(self._on_load_order_error, e)
+
+    def _on_load_order_error(self, error: Exception):
+        if not self: return
+        self.load_order_btn.Enable(True)
+        wx.MessageBox(self.language_manager.get_text("mod.load_order_error", error=error), _("messages.error"), wx.OK | wx.ICON_ERROR)
+
+    def _on_load_order_solved(self, game: Game, config_path: str, result: LoadOrderResult):
+        """Показывает найденные проблемы и после подтверждения записывает ModsConfig.xml"""
+        if not self: return
+        self.load_order_btn.Enable(True)
+        title = self.language_manager.get_text("mod.sort_load_order")
+        message = self.language_manager.get_text(
+            "mod.load_order_summary", count=len(result.order), cycles=len(result.cycles),
+            missing=len(result.missing), unordered=len(result.unordered))
+        details = [" → ".join(cycle + cycle[:1]) for cycle in result.cycles[:5]]
+        for mod_id, package_ids in list(result.missing.items())[:10]:
+            mod = self.mod_manager.get_mod_by_id(mod_id)
+            details.append(f"{mod.name if mod else mod_id}: {', '.join(package_ids)}")
+        if details:
+            message += "\n\n" + "\n".join(details)
+        message += "\n\n" + self.language_manager.get_text("mod.load_order_write")
+        style = wx.YES_NO | (wx.ICON_INFORMATION if result.is_clean else wx.ICON_WARNING)
+        if wx.MessageBox(message, title, style) != wx.YES:
+            return
+        try:
+            write_mods_config(config_path, [mod.package_id for mod in result.order if mod.package_id])
+        except Exception as e:
+            self._on_load_order_error(e)
+            return
+        wx.MessageBox(self.language_manager.get_text("mod.load_order_written", path=config_path), title, wx.OK | wx.ICON_INFORMATION)
+
+    # --- Профили ---
+    def _on_profiles(self, event):
+        """Меню профилей: переключение, сохранение текущего набора, удаление"""
+        if not self.current_game:
+            wx.MessageBox(_("system.select_game_first"), _("messages.error"), wx.OK | wx.ICON_WARNING)
+            return
+        profiles = ProfileManager(self.current_game)
+        menu = wx.Menu()
+        if not profiles.is_enabled:
+            enable_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.profiles_enable"))
+            menu.Bind(wx.EVT_MENU, lambda e: self._enable_profiles(profiles), enable_item)
+        else:
+            active = profiles.active_profile_name()
+            for profile in profiles.list_profiles():
+                item = menu.AppendRadioItem(wx.ID_ANY, f"{profile.name} ({len(profile.enabled)})")
+                item.Check(profile.is_active)
+                menu.Bind(wx.EVT_MENU, lambda e, name=profile.name: self._run_profile_action(
+                    lambda: profiles.activate(name)), item)
+            menu.AppendSeparator()
+            save_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.profile_save_as"))
+            delete_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.profile_delete"))
+            disable_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.profiles_disable"))
+            menu.Bind(wx.EVT_MENU, lambda e: self._save_profile_as(profiles, active), save_item)
+            menu.Bind(wx.EVT_MENU, lambda e: self._delete_profile(profiles), delete_item)
+            menu.Bind(wx.EVT_MENU, lambda e: self._disable_profiles(profiles), disable_item)
+        self.profiles_btn.PopupMenu(menu)
+        menu.Destroy()
+
+    def _enable_profiles(self, profiles: ProfileManager):
+        message = self.language_manager.get_text("mod.profiles_enable_confirm", store=profiles.store_path)
+        if wx.MessageBox(message, self.language_manager.get_text("mod.profiles"), wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+            self._run_profile_action(profiles.enable)
+
+    def _disable_profiles(self, profiles: ProfileManager):
+        message = self.language_manager.get_text("mod.profiles_disable_confirm")
+        if wx.MessageBox(message, self.language_manager.get_text("mod.profiles"), wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+            self._run_profile_action(profiles.disable)
+
+    def _save_profile_as(self, profiles: ProfileManager, active: Optional[str]):
+        dialog = wx.TextEntryDialog(self, self.language_manager.get_text("mod.profile_name_prompt"),
+                                    self.language_manager.get_text("mod.profile_save_as"))
+        try:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            name = dialog.GetValue().strip()
+        finally:
+            dialog.Destroy()
+        # Новый профиль повторяет текущий набор включенных модов и сразу становится активным
+        self._run_profile_action(lambda: (profiles.create_profile(name, copy_from=active), profiles.activate(name)))
+
+    def _delete_profile(self, profiles: ProfileManager):
+        names = [profile.name for profile in profiles.list_profiles() if not profile.is_active]
+        if not names:
+            wx.MessageBox(self.language_manager.get_text("mod.profile_none_to_delete"),
+                          self.language_manager.get_text("mod.profiles"), wx.OK | wx.ICON_INFORMATION)
+            return
+        dialog = wx.SingleChoiceDialog(self, self.language_manager.get_text("mod.profile_delete"),
+                                       self.language_manager.get_text("mod.profiles"), names)
+        try:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            name = dialog.GetStringSelection()
+        finally:
+            dialog.Destroy()
+        self._run_profile_action(lambda: profiles.delete_profile(name))
+
+    def _run_profile_action(self, action: Callable[[], Any]):
+        """Выполняет операцию с профилями в фоне и перезагружает список модов"""
+        game = self.current_game
+        if not game:
+            return
+        # Наблюдатель смотрит в папку прежнего профиля - перезапускается после перезагрузки
+        if self.mod_watcher:
+            self.mod_watcher.stop()
+        self.profiles_btn.Enable(False)
+        self.task_manager.submit_task(self._profile_action_task, game, action,
+                                      description=self.language_manager.get_text("mod.profile_switching"))
+
+    def _profile_action_task(self, game: Game, action: Callable[[], Any]):
+        try:
+            action()
+            wx.CallAfter(self._on_profile_action_done, game, None)
+        except Exception as e:
+            logger.error(f"[ModsTab/Profiles] Ошибка операции с профилями: {e}")
+            wx.CallAfter(self._on_profile_action_done, game, e)
+
+    def _on_profile_action_done(self, game: Game, error: Optional[Exception]):
+        if not self: return
+        self.profiles_btn.Enable(True)
+        if error is not None:
+            wx.MessageBox(self.language_manager.get_text("mod.profile_error", error=error), _("messages.error"), wx.OK | wx.ICON_ERROR)
+        if self.current_game is game:
+            self.set_game(game)
+
+    # --- Снимки ---
+    def _on_snapshots(self, event):
+        """Меню снимков: создать, откатиться к одному из последних, удалить"""
+        if not self.current_game:
+            wx.MessageBox(_("system.select_game_first"), _("messages.error"), wx.OK | wx.ICON_WARNING)
+            return
+        game = self.current_game
+        snapshots = self.snapshot_manager.list_snapshots(game)
+        menu = wx.Menu()
+        create_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.snapshot_create"))
+        menu.Bind(wx.EVT_MENU, lambda e: self._create_snapshot(game), create_item)
+        if snapshots:
+            menu.AppendSeparator()
+            for snapshot in snapshots[:self.MAX_SNAPSHOTS_IN_MENU]:
+                item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.snapshot_rollback_to", name=self._snapshot_title(snapshot)))
+                menu.Bind(wx.EVT_MENU, lambda e, snapshot_id=snapshot.snapshot_id: self._rollback_snapshot(game, snapshot_id), item)
+            menu.AppendSeparator()
+            delete_item = menu.Append(wx.ID_ANY, self.language_manager.get_text("mod.snapshot_delete"))
+            menu.Bind(wx.EVT_MENU, lambda e: self._delete_snapshot(game, snapshots), delete_item)
+        self.snapshots_btn.PopupMenu(menu)
+        menu.Destroy()
+
+    def _snapshot_title(self, snapshot) -> str:
+        created = snapshot.created_at[:19].replace("T", " ")
+        label = f" - {snapshot.label}" if snapshot.label else ""
+        return f"{created}{label} ({snapshot.enabled_count}/{len(snapshot.mods)})"
+
+    def _create_snapshot(self, game: Game):
+        dialog = wx.TextEntryDialog(self, self.language_manager.get_text("mod.snapshot_label_prompt"),
+                                    self.language_manager.get_text("mod.snapshot_create"))
+        try:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            label = dialog.GetValue().strip()
+        finally:
+            dialog.Destroy()
+        self.snapshots_btn.Enable(False)
+        self.task_manager.submit_task(self._create_snapshot_task, game, label,
+                                      description=self.language_manager.get_text("mod.snapshot_creating"))
+
+    def _create_snapshot_task(self, game: Game, label: str):
+        try:
+            snapshot = self.snapshot_manager.create_snapshot(game, label=label)
+            message = self.language_manager.get_text("mod.snapshot_created", name=self._snapshot_title(snapshot), files=snapshot.files)
+            wx.CallAfter(self._on_snapshot_action_done, game, message, None, False)
+        except Exception as e:
+            logger.error(f"[ModsTab/Snapshots] Ошибка создания снимка: {e}")
+            wx.CallAfter(self._on_snapshot_action_done, game, None, e, False)
+
+    def _rollback_snapshot(self, game: Game, snapshot_id: str):
+        if wx.MessageBox(self.language_manager.get_text("mod.snapshot_rollback_confirm"),
+                         self.language_manager.get_text("mod.snapshots"), wx.YES_NO | wx.ICON_QUESTION) != wx.YES:
+            return
+        if self.mod_watcher:
+            self.mod_watcher.stop()
+        self.snapshots_btn.Enable(False)
+        self.task_manager.submit_task(self._rollback_snapshot_task, game, snapshot_id,
+                                      description=self.language_manager.get_text("mod.snapshot_rolling_back"))
+
+    def _rollback_snapshot_task(self, game: Game, snapshot_id: str):
+        try:
+            result: RollbackResult = self.snapshot_manager.rollback(game, snapshot_id)
+            message = self.language_manager.get_text(
+                "mod.snapshot_rolled_back", restored=len(result.restored), toggled=len(result.toggled),
+                new=len(result.new_mods), failed=len(result.failed))
+            if result.failed:
+                message += "\n\n" + "\n".join(f"{key}: {error}" for key, error in list(result.failed.items())[:10])
+            wx.CallAfter(self._on_snapshot_action_done, game, message, None, True)
+        except Exception as e:
+            logger.error(f"[ModsTab/Snapshots] Ошибка отката к снимку: {e}")
+            wx.CallAfter(self._on_snapshot_action_done, game, None, e, True)
+
+    def _delete_snapshot(self, game: Game, snapshots):
+        titles = [self._snapshot_title(snapshot) for snapshot in snapshots]
+        dialog = wx.SingleChoiceDialog(self, self.language_manager.get_text("mod.snapshot_delete"),
+                                       self.language_manager.get_text("mod.snapshots"), titles)
+        try:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            snapshot = snapshots[dialog.GetSelection()]
+        finally:
+            dialog.Destroy()
+        try:
+            self.snapshot_manager.delete_snapshot(game, snapshot.snapshot_id)
+        except Exception as e:
+            wx.MessageBox(self.language_manager.get_text("mod.snapshot_error", error=e), _("messages.error"), wx.OK | wx.ICON_ERROR)
+
+    def _on_snapshot_action_done(self, game: Game, message: Optional[str], error: Optional[Exception], reload: bool):
+        if not self: return
+        self.snapshots_btn.Enable(True)
+        if error is not None:
+            wx.MessageBox(self.language_manager.get_text("mod.snapshot_error", error=error), _("messages.error"), wx.OK | wx.ICON_ERROR)
+        elif message:
+            wx.MessageBox(message, self.language_manager.get_text("mod.snapshots"), wx.OK | wx.ICON_INFORMATION)
+        if reload and self.current_game is game:
+            self.set_game(game)
+
+    # --- Дубликаты и моды без Workshop ---
+    def _on_find_duplicates(self, event):
+        if not self.current_game:
+            wx.MessageBox(_("system.select_game_first"), _("messages.error"), wx.OK | wx.ICON_WARNING)
+            return
+        game = self.current_game
+        mods = self.mod_manager.get_installed_mods(game.steam_id)
+        self.duplicates_btn.Enable(False)
+        self.task_manager.submit_task(self._find_duplicates_task, game, mods,
+                                      description=self.language_manager.get_text("mod.finding_duplicates"))
+
+    def _find_duplicates_task(self, game: Game, mods: List[Mod]):
+        try:
+            plan = self.duplicate_analyzer.analyze(mods)
+            wx.CallAfter(self._on_duplicates_found, game, plan, None)
+        except Exception as e:
+            logger.error(f"[ModsTab/Duplicates] Ошибка поиска дубликатов: {e}")
+            wx.CallAfter(self._on_duplicates_found, game, None, e)
+
+    def _on_duplicates_found(self, game: Game, plan: Optional[ReclaimPlan], error: Optional[Exception]):
+        """План освобождения места: копии отмечены сразу, моды без Workshop - по выбору пользователя"""
+        if not self: return
+        self.duplicates_btn.Enable(True)
+        if error is not None:
+            wx.MessageBox(self.language_manager.get_text("mod.duplicates_error", error=error), _("messages.error"), wx.OK | wx.ICON_ERROR)
+            return
+        if plan is None or self.current_game is not game:
+            return
+        if not plan.groups and not plan.orphans:
+            wx.MessageBox(self.language_manager.get_text("mod.no_duplicates"),
+                          self.language_manager.get_text("mod.find_duplicates"), wx.OK | wx.ICON_INFORMATION)
+            return
+        candidates: List[Mod] = []
+        labels: List[str] = []
+        for group in plan.groups:
+            for mod in group.duplicates:
+                candidates.append(mod)
+                labels.append(self.language_manager.get_text(
+                    "mod.duplicate_item", keep=group.keep.name or group.keep.mod_id, path=mod.local_path,
+                    size=format_size(plan.reclaimable.get(mod.local_path, 0))))
+        for mod in plan.orphans:
+            candidates.append(mod)
+            labels.append(self.language_manager.get_text(
+                "mod.orphan_item", name=mod.name or mod.mod_id, path=mod.local_path,
+                size=format_size(plan.reclaimable.get(mod.local_path, 0))))
+        message = self.language_manager.get_text(
+            "mod.duplicates_summary", duplicates=len(plan.duplicate_mods), groups=len(plan.groups),
+            dup_size=format_size(plan.duplicate_bytes), orphans=len(plan.orphans), orphan_size=format_size(plan.orphan_bytes))
+        dialog = wx.MultiChoiceDialog(self, message, self.language_manager.get_text("mod.find_duplicates"), labels)
+        try:
+            dialog.SetSelections(list(range(len(plan.duplicate_mods))))
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            selected = [candidates[index] for index in dialog.GetSelections()]
+        finally:
+            dialog.Destroy()
+        if not selected:
+            return
+        self.duplicates_btn.Enable(False)
+        self.task_manager.submit_task(self._reclaim_duplicates_task, game, plan, selected,
+                                      description=self.language_manager.get_text("mod.reclaiming_duplicates"))
+
+    def _reclaim_duplicates_task(self, game: Game, plan: ReclaimPlan, selected: List[Mod]):
+        try:
+            result = self.duplicate_analyzer.reclaim(selected, plan)
+            message = self.language_manager.get_text("mod.duplicates_reclaimed", count=len(result.removed),
+                                                     size=format_size(result.freed), skipped=len(result.skipped))
+            if result.skipped:
+                message += "\n\n" + "\n".join(f"{path}: {reason}" for path, reason in list(result.skipped.items())[:10])
+            wx.CallAfter(self._on_duplicates_reclaimed, game, message, None)
+        except Exception as e:
+            logger.error(f"[ModsTab/Duplicates] Ошибка удаления дубликатов: {e}")
+            wx.CallAfter(self._on_duplicates_reclaimed, game, None, e)
+
+    def _on_duplicates_reclaimed(self, game: Game, message: Optional[str], error: Optional[Exception]):
+        if not self: return
+        self.duplicates_btn.Enable(True)
+        if error is not None:
+            wx.MessageBox(self.language_manager.get_text("mod.duplicates_error", error=error), _("messages.error"), wx.OK | wx.ICON_ERROR)
+        elif message:
+            wx.MessageBox(message, self.language_manager.get_text("mod.find_duplicates"), wx.OK | wx.ICON_INFORMATION)
+        if self.current_game is game:
+            self.set_game(game)
 
     def _refresh_all_mod_data(self, results: Dict[str, bool]):
         """Обновляет данные всех модов после проверки"""
@@ -1410,36 +2072,66 @@ class ModsTab(wx.Panel):
             logger.error(f"[ModsTab/Refresh] Ошибка обновления данных: {e}")
 
     def _enable_mod(self, mod_ids: List[str]) -> bool:
-        if not self or not self.current_game: return False
-        success = True
-        for mod_id in mod_ids:
-            try:
-                if not self.mod_manager.enable_mod(self.current_game.steam_id, mod_id):
-                    success = False
-                    logger.error(f"[ModsTab/Enable] [{mod_id}] Не удалось включить мод.")
-                else:
-                    logger.info(f"[ModsTab/Enable] Мод {mod_id} включён.")
-            except Exception as e:
-                success = False
-                logger.error(f"[ModsTab/Enable] [{mod_id}] Ошибка: {e}")
-                wx.MessageBox(_("system.enable_mod_error", mod_id=mod_id, error=e), _("messages.error"), wx.OK | wx.ICON_ERROR)
-        return success
+        return self._set_mods_enabled(mod_ids, True)
 
     def _disable_mod(self, mod_ids: List[str]) -> bool:
+        return self._set_mods_enabled(mod_ids, False)
+
+    def _set_mods_enabled(self, mod_ids: List[str], enabled: bool) -> bool:
+        """Включает/отключает моды одной операцией: при ошибке ни один мод не меняет состояние"""
         if not self or not self.current_game: return False
-        success = True
-        for mod_id in mod_ids:
-            try:
-                if not self.mod_manager.disable_mod(self.current_game.steam_id, mod_id):
-                    success = False
-                    logger.error(f"[ModsTab/Disable] [{mod_id}] Не удалось отключить мод.")
-                else:
-                    logger.info(f"[ModsTab/Disable] Мод {mod_id} отключён.")
-            except Exception as e:
-                success = False
-                logger.error(f"[ModsTab/Disable] [{mod_id}] Ошибка: {e}")
-                wx.MessageBox(_("system.disable_mod_error", mod_id=mod_id, error=e), _("messages.error"), wx.OK | wx.ICON_ERROR)
-        return success
+        error_key = "system.enable_mod_error" if enabled else "system.disable_mod_error"
+        try:
+            result = self.mod_manager.set_mods_enabled(mod_ids, enabled)
+        except Exception as e:
+            logger.error(f"[ModsTab/Toggle] Ошибка: {e}")
+            wx.MessageBox(_(error_key, mod_id=", ".join(mod_ids), error=e), _("messages.error"), wx.OK | wx.ICON_ERROR)
+            return False
+        if not result.success:
+            mod_id, error = next(iter(result.failed.items()))
+            logger.error(f"[ModsTab/Toggle] Не удалось {'включить' if enabled else 'отключить'} моды: {result.failed}")
+            message = _(error_key, mod_id=mod_id, error=error)
+            if result.rolled_back:
+                message += "\n\n" + _("system.mods_toggle_rolled_back", count=len(mod_ids))
+            wx.MessageBox(message, _("messages.error"), wx.OK | wx.ICON_ERROR)
+            return False
+        return True
+
+    def _on_mods_state_changed_event(self, data: Dict[str, Any]):
+        """Событие ModManager.set_mods_enabled (может прийти не из UI-потока)"""
+        wx.CallAfter(self._move_mods_between_lists, data)
+
+    def _move_mods_between_lists(self, data: Dict[str, Any]):
+        """Переносит строки модов в список нового состояния одним обновлением"""
+        if not self or not self.current_game or data.get('game_id') != self.current_game.steam_id: return
+        enabled = data.get('enabled', False)
+        target_list = self.enabled_list if enabled else self.disabled_list
+        source_list = self.disabled_list if enabled else self.enabled_list
+        self.enabled_list.Freeze()
+        self.disabled_list.Freeze()
+        try:
+            for mod_id in data.get('mod_ids', []):
+                mod = self.mod_manager.get_mod_by_id(mod_id)
+                if not mod:
+                    continue
+                source_index = self._find_mod_item_index_by_id(source_list, mod_id)
+                if source_index != wx.NOT_FOUND:
+                    source_list.DeleteItem(source_index)
+                if self._find_mod_item_index_by_id(target_list, mod_id) == wx.NOT_FOUND:
+                    self._add_mod_to_list(target_list, mod)
+            search_term = self.search_term_enabled if enabled else self.search_term_disabled
+            if search_term:
+                self._filter_list(target_list, search_term)
+        except Exception as e:
+            logger.error(f"[ModsTab/Toggle] Ошибка обновления списков: {e}")
+        finally:
+            self.enabled_list.Thaw()
+            self.disabled_list.Thaw()
+        self._update_panel_titles(self.enabled_list.GetItemCount(), self.disabled_list.GetItemCount())
+        self._refresh_disk_usage()
+        if self.selected_mod_id in data.get('mod_ids', []):
+            details = self.mod_details.get(self.selected_mod_id, {'title': self.selected_mod_id, 'author': '...', 'description': '...', 'tags': [], 'dependencies': []})
+            self._display_mod_info(self.selected_mod_id, details)
 
     def _remove_mod(self, mod_id: str) -> bool:
         if not self or not self.current_game: return False
@@ -1610,6 +2302,16 @@ class ModsTab(wx.Panel):
                 self.update_all_btn.SetLabel(self.language_manager.get_text("mod.update_all"))
             if hasattr(self, 'export_btn'):
                 self.export_btn.SetLabel(self.language_manager.get_text("mod.export"))
+            if hasattr(self, 'verify_files_btn'):
+                self.verify_files_btn.SetLabel(self.language_manager.get_text("mod.verify_files"))
+            if hasattr(self, 'load_order_btn'):
+                self.load_order_btn.SetLabel(self.language_manager.get_text("mod.sort_load_order"))
+            if hasattr(self, 'profiles_btn'):
+                self.profiles_btn.SetLabel(self.language_manager.get_text("mod.profiles"))
+            if hasattr(self, 'snapshots_btn'):
+                self.snapshots_btn.SetLabel(self.language_manager.get_text("mod.snapshots"))
+            if hasattr(self, 'duplicates_btn'):
+                self.duplicates_btn.SetLabel(self.language_manager.get_text("mod.find_duplicates"))
 
             # Обновляем заголовки панелей
             if hasattr(self, 'disabled_title'):
@@ -1643,5 +2345,8 @@ class ModsTab(wx.Panel):
         self._clear_all_dependency_highlights()
         if HAS_EVENT_BUS and event_bus:
             event_bus.unsubscribe("mods_updated", self._on_mods_updated_event)
+            event_bus.unsubscribe("mods_state_changed", self._on_mods_state_changed_event)
+        if self.mod_watcher:
+            self.mod_watcher.stop()
         self._hide_names_loading_dialog()
         return super().Destroy()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Общие фикстуры: игра с папкой модов во временном каталоге и ModManager,
+индекс сканирования и журнал которого тоже лежат во временном каталоге.
+"""
+import os
+import sys
+from typing import Dict, Optional
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.mod_manager import ModManager  # noqa: E402
+from src.core.scan_index import ScanIndex  # noqa: E402
+from src.models.game import Game  # noqa: E402
+
+# Не RimWorld: тесты не должны трогать ModsConfig.xml пользователя
+TEST_APP_ID = "480"
+
+
+def make_mod(parent: str, folder: str, files: Dict[str, bytes], published_file_id: Optional[str] = None) -> str:
+    """Создает папку мода с файлами {относительный путь: содержимое}"""
+    mod_path = os.path.join(parent, folder)
+    for rel_path, content in files.items():
+        path = os.path.join(mod_path, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+    if published_file_id:
+        about_dir = os.path.join(mod_path, "About")
+        os.makedirs(about_dir, exist_ok=True)
+        with open(os.path.join(about_dir, "About.xml"), 'w', encoding='utf-8') as f:
+            f.write(f"<ModMetaData><name>{folder}</name><packageId>test.{folder.lower()}</packageId></ModMetaData>")
+        with open(os.path.join(about_dir, "PublishedFileId.txt"), 'w', encoding='utf-8') as f:
+            f.write(published_file_id)
+    return mod_path
+
+
+def read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def game(tmp_path) -> Game:
+    mods_path = tmp_path / "mods"
+    (mods_path / "archive").mkdir(parents=True)
+    return Game(name="Test Game", steam_id=TEST_APP_ID, executable_path=str(tmp_path / "game.exe"),
+                mods_path=str(mods_path))
+
+
+@pytest.fixture
+def mod_manager(tmp_path) -> ModManager:
+    return ModManager(max_scan_workers=2, scan_index=ScanIndex(index_dir=str(tmp_path / "scan_index")),
+                      journal_file=str(tmp_path / "mod_toggle_journal.json"))
+
+
+@pytest.fixture
+def requires_symlinks(tmp_path):
+    """Профили и хранилище содержимого используют символические ссылки (в Windows нужны права)"""
+    probe = tmp_path / ".symlink_probe"
+    try:
+        os.symlink(str(tmp_path / "game.exe"), str(probe))
+    except (OSError, NotImplementedError):
+        pytest.skip("Символические ссылки недоступны")
+    os.remove(str(probe))
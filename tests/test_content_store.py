@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Общее хранилище содержимого: дедупликация, защита от правок и очистка по обходу папок модов"""
+import os
+import stat
+
+import pytest
+
+from src.core.content_manifest import hash_file
+from src.core.content_store import ContentStore, LinkResult, remove_tree, store_roots
+from src.core.profile_manager import ProfileManager
+from tests.conftest import make_mod, read_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(str(tmp_path / "content_store"))
+
+
+def _two_copies(game):
+    for mod_id in ("101", "102"):
+        make_mod(game.mods_path, mod_id, {"Textures/shared.dds": b"shared texture", "own.txt": mod_id.encode()})
+
+
+def test_ingest_links_identical_files_and_makes_them_read_only(game, store):
+    _two_copies(game)
+
+    first = store.ingest_mod(os.path.join(game.mods_path, "101"))
+    second = store.ingest_mod(os.path.join(game.mods_path, "102"))
+
+    assert (first.stored, second.linked, second.stored) == (2, 1, 1)
+    shared = [os.path.join(game.mods_path, mod_id, "Textures", "shared.dds") for mod_id in ("101", "102")]
+    assert os.path.samefile(*shared)
+    assert not stat.S_IMODE(os.stat(shared[0]).st_mode) & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+    assert store.ingest_file(shared[0], hash_file(shared[0])) == LinkResult.ALREADY
+
+
+def test_remove_tree_deletes_read_only_store_files(game, store):
+    _two_copies(game)
+    store.ingest_mod(os.path.join(game.mods_path, "101"))
+
+    remove_tree(os.path.join(game.mods_path, "101"))
+
+    assert not os.path.exists(os.path.join(game.mods_path, "101"))
+
+
+def test_gc_ignores_hardlinks_outside_mod_folders(game, store, tmp_path):
+    _two_copies(game)
+    for mod_id in ("101", "102"):
+        store.ingest_mod(os.path.join(game.mods_path, mod_id))
+    roots = store_roots([game])
+    # Снимок держит свою жесткую ссылку, но папкой мода не является
+    snapshot_copy = tmp_path / "mods.snapshots" / "shared.dds"
+    snapshot_copy.parent.mkdir()
+    os.link(os.path.join(game.mods_path, "101", "Textures", "shared.dds"), str(snapshot_copy))
+
+    assert store.space_report(roots).garbage_blobs == 0
+    assert store.collect_garbage(roots) == (0, 0)
+
+    remove_tree(os.path.join(game.mods_path, "101"))
+    report = store.space_report(roots)
+    assert (report.blobs, report.garbage_blobs) == (3, 1)   # Остался только own.txt мода 101
+
+    remove_tree(os.path.join(game.mods_path, "102"))
+    removed, freed = store.collect_garbage(roots)
+
+    assert removed == 3
+    assert freed == len(b"shared texture") + len(b"101") + len(b"102")
+    assert list(store._iter_blobs()) == []
+    assert read_file(str(snapshot_copy)) == b"shared texture"
+
+
+@pytest.mark.usefixtures("requires_symlinks")
+def test_gc_follows_profile_links_into_store(game, store):
+    _two_copies(game)
+    for mod_id in ("101", "102"):
+        store.ingest_mod(os.path.join(game.mods_path, mod_id))
+    profiles = ProfileManager(game)
+    profiles.enable()
+    profiles.create_profile("empty")
+    profiles.activate("empty")
+    # Папка модов - ссылка на представление, моды в нем - ссылки на хранилище профилей
+    assert store.collect_garbage(store_roots([game])) == (0, 0)
+    assert len(list(store._iter_blobs())) == 3
+
+
+def test_gc_ignores_same_inode_number_on_another_device(game, store, monkeypatch):
+    _two_copies(game)
+    store.ingest_mod(os.path.join(game.mods_path, "101"))
+    remove_tree(os.path.join(game.mods_path, "101"))
+    blob_inodes = {os.stat(path).st_ino for _, path in store._iter_blobs()}
+    real_stat = os.stat
+
+    def other_device_stat(path, *args, **kwargs):
+        # Файлы мода 102 - на другом диске с теми же номерами inode, что у файлов хранилища
+        result = real_stat(path, *args, **kwargs)
+        if os.path.join(game.mods_path, "102") in str(path):
+            fields = list(result)
+            fields[1] = min(blob_inodes)            # st_ino
+            fields[2] = result.st_dev + 1           # st_dev
+            return os.stat_result(fields)
+        return result
+
+    monkeypatch.setattr(os, "stat", other_device_stat)
+    report = store.space_report(store_roots([game]))
+
+    assert report.garbage_blobs == report.blobs == 2
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Очередь загрузки: этапы по зависимостям, блокировка и повтор, партии по месту и сохранение состояния"""
+import os
+import time
+from typing import Iterable, List, Optional, Set
+
+import pytest
+
+from src.core.content_manifest import ContentManifestService
+from src.core.download_manager import DownloadManager
+from src.core.download_telemetry import DownloadTelemetry
+from src.models.download_item import DownloadItem, DownloadState
+from src.models.mod import Mod, ModDependency
+
+
+class RecordingSteamHandler:
+    """Вместо SteamCMD: создает папки скачанных модов и запоминает каждый запуск"""
+
+    def __init__(self, base_path: str):
+        self.steamcmd_path = os.path.join(base_path, "steamcmd.exe")
+        self.is_initialized = True
+        self.last_session = None
+        self.fail_ids: Set[str] = set()
+        self.sessions: List[dict] = []
+
+    def invalidate_cache(self, app_id: str, mod_ids: Iterable[str]):
+        pass
+
+    def download_mods(self, app_id: str, mod_ids: List[str], log_callback=None,
+                      validate_ids: Optional[Iterable[str]] = None, clean_cache: bool = True) -> bool:
+        self.sessions.append({'mod_ids': list(mod_ids), 'clean_cache': clean_cache})
+        content_path = os.path.join(os.path.dirname(self.steamcmd_path), "steamapps", "workshop", "content", app_id)
+        for mod_id in mod_ids:
+            if mod_id in self.fail_ids:
+                if log_callback:
+                    log_callback(f"ERROR! Download item {mod_id} failed (Failure).")
+                continue
+            os.makedirs(os.path.join(content_path, mod_id), exist_ok=True)
+            with open(os.path.join(content_path, mod_id, "data.txt"), 'w', encoding='utf-8') as f:
+                f.write(mod_id)
+        return not self.fail_ids
+
+    @property
+    def downloaded_ids(self) -> List[str]:
+        return [mod_id for session in self.sessions for mod_id in session['mod_ids']]
+
+
+def _mod(mod_id: str, *deps: str, size: int = 0) -> Mod:
+    mod = Mod(mod_id=mod_id, name=mod_id)
+    mod.dependencies = [ModDependency(mod_id=dep_id, name=dep_id) for dep_id in deps]
+    mod.file_size = size
+    return mod
+
+
+@pytest.fixture
+def steam(tmp_path):
+    return RecordingSteamHandler(str(tmp_path / "steamcmd"))
+
+
+def _manager(tmp_path, steam) -> DownloadManager:
+    return DownloadManager(steam, queue_file=str(tmp_path / "queue.json"),
+                           telemetry=DownloadTelemetry(str(tmp_path / "telemetry.json")),
+                           manifests=ContentManifestService(str(tmp_path / "manifests")))
+
+
+@pytest.fixture
+def manager(tmp_path, steam) -> DownloadManager:
+    return _manager(tmp_path, steam)
+
+
+def _fail(item: DownloadItem):
+    """Неудачная попытка в прошлом запуске, время повтора уже наступило"""
+    item.attempts = 1
+    item.next_retry_at = time.time() - 1
+    item.set_state(DownloadState.FAILED, "SteamCMD не скачал мод")
+
+
+# --- Этапы ---
+def test_waves_follow_dependencies_and_isolate_cycles(manager):
+    mods = [_mod("1"), _mod("2", "3"), _mod("3", "2", "1"), _mod("4", "2"), _mod("5")]
+    manager.add_many_to_queue(mods)
+
+    waves = manager._build_waves(manager.get_queue_items())
+
+    assert [[item.mod_id for item in wave] for wave in waves] == [["1", "5"], ["2", "3"], ["4"]]
+
+
+def test_dependents_of_failed_mod_are_blocked(manager, steam, game):
+    manager.add_many_to_queue([_mod("1"), _mod("2", "1"), _mod("3", "2"), _mod("4")])
+    steam.fail_ids = {"1"}
+
+    assert not manager.download_mods_queue(game)
+
+    states = {item.mod_id: item.state for item in manager.get_queue_items()}
+    assert states == {"1": DownloadState.FAILED, "2": DownloadState.BLOCKED, "3": DownloadState.BLOCKED}
+    assert os.path.isdir(os.path.join(game.mods_path, "4"))
+    assert steam.downloaded_ids == ["1", "4"]
+
+
+def test_failed_cycle_is_downloaded_again_on_retry(manager, steam, game):
+    manager.add_many_to_queue([_mod("1", "2"), _mod("2", "1")])
+    for item in manager.get_queue_items():
+        _fail(item)
+
+    assert manager.download_mods_queue(game)
+
+    assert sorted(steam.downloaded_ids) == ["1", "2"]
+    assert manager.get_queue_items() == []
+
+
+def test_retry_failed_resets_blocked_items(manager, steam, game):
+    manager.add_many_to_queue([_mod("1"), _mod("2", "1")])
+    steam.fail_ids = {"1"}
+    manager.download_mods_queue(game)
+    # Следующая попытка мода 1 отложена; без сброса мод 2 остался бы заблокированным
+    assert manager.get_item("1").next_retry_at > time.time()
+
+    manager.retry_failed()
+    steam.fail_ids = set()
+
+    assert {item.state for item in manager.get_queue_items()} == {DownloadState.PENDING}
+    assert manager.download_mods_queue(game)
+    assert steam.downloaded_ids[-2:] == ["1", "2"]
+
+
+def test_postponed_failure_blocks_dependents_and_is_not_counted(manager, steam, game):
+    manager.add_many_to_queue([_mod("1"), _mod("2", "1"), _mod("3")])
+    failed = manager.get_item("1")
+    _fail(failed)
+    failed.next_retry_at = time.time() + 3600
+
+    assert [item.mod_id for item in manager.get_run_items()] == ["3"]
+    manager.download_mods_queue(game)
+
+    assert steam.downloaded_ids == ["3"]
+    assert manager.get_item("2").state == DownloadState.BLOCKED
+
+
+def test_cache_is_cleaned_only_before_first_session(manager, steam, game):
+    manager.add_many_to_queue([_mod("1"), _mod("2", "1")])
+
+    manager.download_mods_queue(game)
+
+    assert [session['clean_cache'] for session in steam.sessions] == [True, False]
+
+
+# --- Партии по свободному месту ---
+def test_disk_batches_fit_free_space(manager, monkeypatch):
+    mb = 1024 * 1024
+    items = [DownloadItem(mod=_mod(str(index), size=10 * mb)) for index in range(5)]
+    free = manager.DISK_SPACE_RESERVE + 35 * mb * manager.STEAMCMD_SPACE_FACTOR // 2
+    monkeypatch.setattr(manager, "_get_free_space", lambda path: free)
+
+    batch = manager._take_disk_batch(items, "content", same_volume=False, remaining_bytes=0)
+
+    assert 0 < len(batch) < len(items)
+    assert sum(item.mod.file_size for item in batch) * manager.STEAMCMD_SPACE_FACTOR <= free - manager.DISK_SPACE_RESERVE
+
+
+def test_blocked_mods_release_disk_reservation(manager, steam, game, monkeypatch):
+    mb = 1024 * 1024
+    manager.add_many_to_queue([_mod("1", size=mb), _mod("2", "1", size=100 * mb), _mod("3", size=mb)])
+    steam.fail_ids = {"1"}
+    budgets = []
+    original = manager._take_disk_batch
+
+    def recording_batch(pending, content_path, same_volume, remaining_bytes):
+        budgets.append(remaining_bytes)
+        return original(pending, content_path, same_volume, remaining_bytes)
+
+    monkeypatch.setattr(manager, "_take_disk_batch", recording_batch)
+    manager.download_mods_queue(game)
+
+    # Этап 1 - моды 1 и 3, этап 2 - заблокированный мод 2: его размер не резервируется
+    assert budgets == [102 * mb]
+    assert manager.get_item("2").state == DownloadState.BLOCKED
+
+
+# --- Сохранение очереди ---
+def test_states_survive_reload(tmp_path, manager, steam, game):
+    manager.add_many_to_queue([_mod("1"), _mod("2", "1")])
+    steam.fail_ids = {"1"}
+    manager.download_mods_queue(game)
+    manager.add_to_queue(_mod("3"))
+    manager.flush()
+
+    reloaded = _manager(tmp_path, steam)
+
+    items = {item.mod_id: item for item in reloaded.get_queue_items()}
+    assert list(items) == ["1", "2", "3"]
+    assert (items["1"].state, items["1"].attempts) == (DownloadState.FAILED, 1)
+    assert items["1"].next_retry_at == manager.get_item("1").next_retry_at
+    assert items["2"].state == DownloadState.BLOCKED
+    assert items["3"].state == DownloadState.PENDING
+
+
+def test_interrupted_download_restarts_after_reload(tmp_path, manager, steam):
+    manager.add_to_queue(_mod("1"))
+    item = manager.get_item("1")
+    item.set_state(DownloadState.DOWNLOADING)
+    manager._commit_states([item])
+    manager.flush()
+
+    reloaded = _manager(tmp_path, steam)
+
+    assert reloaded.get_item("1").state == DownloadState.PENDING
+
+
+def test_series_of_changes_is_saved_once(manager, monkeypatch):
+    saves = []
+    monkeypatch.setattr(manager, "_save_queue", lambda: saves.append(len(manager.queue)))
+
+    for index in range(20):
+        manager.add_to_queue(_mod(str(index)))
+    manager.flush()
+    manager.flush()
+
+    assert saves == [20]
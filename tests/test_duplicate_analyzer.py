@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Поиск дубликатов модов и удаление копий"""
+import os
+
+from src.core.duplicate_analyzer import DuplicateAnalyzer
+from tests.conftest import make_mod
+
+# Больше трех фрагментов выборки: файл хэшируется не целиком
+LARGE_SIZE = 300 * 1024
+UNSAMPLED_OFFSET = 70 * 1024
+
+
+def _large_content() -> bytes:
+    return bytes(index % 251 for index in range(LARGE_SIZE))
+
+
+def _setup(game, mod_manager, duplicate_content: bytes):
+    make_mod(game.mods_path, "101", {"Textures/big.dds": _large_content(), "About/info.txt": b"same"})
+    make_mod(os.path.join(game.mods_path, "archive"), "CopyOf101",
+             {"Textures/big.dds": duplicate_content, "About/info.txt": b"same"})
+    mods = mod_manager.load_mods_for_game(game)
+    return DuplicateAnalyzer(mod_manager, max_workers=2), mods
+
+
+def test_reclaim_removes_identical_copy_and_keeps_original(game, mod_manager):
+    analyzer, mods = _setup(game, mod_manager, _large_content())
+    plan = analyzer.analyze(mods)
+
+    assert len(plan.groups) == 1
+    group = plan.groups[0]
+    assert group.keep.mod_id == "101"
+    result = analyzer.reclaim(plan.duplicate_mods + [group.keep], plan)
+
+    assert [mod.local_path for mod in result.removed] == [group.duplicates[0].local_path]
+    assert result.freed == LARGE_SIZE + len(b"same")
+    assert result.skipped == {group.keep.local_path: "kept copy"}
+    assert not os.path.exists(os.path.join(game.mods_path, "archive", "CopyOf101"))
+    assert os.path.isdir(os.path.join(game.mods_path, "101"))
+
+
+def test_reclaim_skips_copy_that_differs_outside_sampled_ranges(game, mod_manager):
+    content = bytearray(_large_content())
+    content[UNSAMPLED_OFFSET] ^= 0xFF
+    analyzer, mods = _setup(game, mod_manager, bytes(content))
+    plan = analyzer.analyze(mods)
+    # Выборочные хэши совпадают - копия попадает в план
+    assert len(plan.groups) == 1
+
+    result = analyzer.reclaim(plan.duplicate_mods, plan)
+
+    assert result.removed == []
+    assert "content differs" in next(iter(result.skipped.values()))
+    assert os.path.isdir(os.path.join(game.mods_path, "archive", "CopyOf101"))
+
+
+def test_reclaim_skips_copy_changed_after_analysis(game, mod_manager):
+    analyzer, mods = _setup(game, mod_manager, _large_content())
+    plan = analyzer.analyze(mods)
+    duplicate = plan.groups[0].duplicates[0]
+    with open(os.path.join(duplicate.local_path, "About", "extra.txt"), 'wb') as f:
+        f.write(b"added later")
+
+    result = analyzer.reclaim(plan.duplicate_mods, plan)
+
+    assert result.removed == []
+    assert result.skipped == {duplicate.local_path: "file list differs"}
+    assert os.path.isdir(duplicate.local_path)
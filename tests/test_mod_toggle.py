@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Массовое включение/отключение модов: журнал, откат при ошибке и восстановление после сбоя"""
+import os
+import threading
+import time
+
+from src.core.mod_manager import ModManager
+from tests.conftest import make_mod
+
+
+def _setup(game, mod_manager, ids=("101", "102", "103")):
+    for mod_id in ids:
+        make_mod(game.mods_path, mod_id, {"Defs/data.xml": mod_id.encode()})
+    mod_manager.load_mods_for_game(game)
+    return list(ids)
+
+
+def _enabled_folders(game):
+    return sorted(name for name in os.listdir(game.mods_path) if name != "archive")
+
+
+def test_disable_moves_all_folders_and_clears_journal(game, mod_manager):
+    ids = _setup(game, mod_manager)
+
+    result = mod_manager.set_mods_enabled(ids[:2], False)
+
+    assert result.success
+    assert sorted(mod.mod_id for mod in result.changed) == ids[:2]
+    assert _enabled_folders(game) == ["103"]
+    assert sorted(os.listdir(os.path.join(game.mods_path, "archive"))) == ids[:2]
+    assert not os.path.exists(mod_manager.journal_file)
+    assert not mod_manager.get_mod_by_id("101").is_enabled
+
+
+def test_failed_move_rolls_back_completed_moves(game, mod_manager, monkeypatch):
+    ids = _setup(game, mod_manager)
+    original_move = ModManager._move_folder
+
+    def failing_move(src, dst):
+        if os.path.basename(src) == "102":
+            raise OSError("disk error")
+        original_move(src, dst)
+
+    monkeypatch.setattr(ModManager, "_move_folder", staticmethod(failing_move))
+    result = mod_manager.set_mods_enabled(ids, False)
+
+    assert result.rolled_back
+    assert set(result.failed) == {"102"}
+    assert _enabled_folders(game) == ids
+    assert os.listdir(os.path.join(game.mods_path, "archive")) == []
+    assert not os.path.exists(mod_manager.journal_file)
+    assert all(mod_manager.get_mod_by_id(mod_id).is_enabled for mod_id in ids)
+
+
+def _interrupted_disable(game, mod_manager, ids):
+    """Журнал записан, но перемещена только часть папок (сбой посреди операции)"""
+    archive = os.path.join(game.mods_path, "archive")
+    moves = [(os.path.join(game.mods_path, mod_id), os.path.join(archive, mod_id)) for mod_id in ids]
+    mod_manager._write_toggle_journal(game, moves)
+    src, dst = moves[0]
+    os.rename(src, dst)
+
+
+def test_recover_journal_rolls_back_interrupted_operation(game, mod_manager):
+    ids = _setup(game, mod_manager)
+    _interrupted_disable(game, mod_manager, ids)
+
+    recovered = ModManager(journal_file=mod_manager.journal_file,
+                           scan_index=mod_manager.scan_index).recover_toggle_journal()
+
+    assert recovered == 1
+    assert _enabled_folders(game) == ids
+    assert not os.path.exists(mod_manager.journal_file)
+
+
+def test_recover_journal_replay_completes_interrupted_operation(game, mod_manager):
+    ids = _setup(game, mod_manager)
+    _interrupted_disable(game, mod_manager, ids)
+
+    recovered = mod_manager.recover_toggle_journal(replay=True)
+
+    assert recovered == len(ids) - 1
+    assert _enabled_folders(game) == []
+    assert sorted(os.listdir(os.path.join(game.mods_path, "archive"))) == ids
+    assert not os.path.exists(mod_manager.journal_file)
+
+
+def test_load_recovers_journal_before_scanning(game, mod_manager):
+    ids = _setup(game, mod_manager)
+    _interrupted_disable(game, mod_manager, ids)
+
+    mods = mod_manager.load_mods_for_game(game, force_rescan=True)
+
+    assert all(mod.is_enabled for mod in mods)
+    assert sorted(mod.mod_id for mod in mods) == ids
+
+
+def test_scan_during_bulk_toggle_does_not_roll_it_back(game, mod_manager, monkeypatch):
+    ids = _setup(game, mod_manager)
+    original_move = ModManager._move_folder
+    moving = threading.Event()
+    release = threading.Event()
+
+    def slow_move(src, dst):
+        if os.path.basename(src) == "103":
+            moving.set()
+            release.wait(5)
+        original_move(src, dst)
+
+    monkeypatch.setattr(ModManager, "_move_folder", staticmethod(slow_move))
+    results = {}
+    toggle = threading.Thread(target=lambda: results.update(toggle=mod_manager.set_mods_enabled(ids, False)))
+    toggle.start()
+    assert moving.wait(5)
+    archive = os.path.join(game.mods_path, "archive")
+    deadline = time.monotonic() + 5
+    while len(os.listdir(archive)) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Часть папок уже перемещена и журнал записан; сканирование должно дождаться конца операции, а не откатывать ее
+    scan = threading.Thread(target=lambda: results.update(mods=mod_manager.load_mods_for_game(game, force_rescan=True)))
+    scan.start()
+    scan.join(0.2)
+    assert scan.is_alive()
+
+    release.set()
+    toggle.join(5)
+    scan.join(5)
+
+    assert results['toggle'].success
+    assert _enabled_folders(game) == []
+    assert sorted(os.listdir(os.path.join(game.mods_path, "archive"))) == ids
+    assert not any(mod.is_enabled for mod in results['mods'])
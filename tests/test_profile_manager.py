@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Профили модов: перенос в хранилище, переключение, синхронизация и возврат папок"""
+import os
+
+import pytest
+
+from src.core.profile_manager import ProfileManager
+from tests.conftest import make_mod
+
+pytestmark = pytest.mark.usefixtures("requires_symlinks")
+
+
+def _setup(game):
+    make_mod(game.mods_path, "101", {"a.txt": b"101"})
+    make_mod(game.mods_path, "102", {"a.txt": b"102"})
+    make_mod(os.path.join(game.mods_path, "archive"), "103", {"a.txt": b"103"})
+    return ProfileManager(game)
+
+
+def test_enable_moves_folders_to_store_and_keeps_enabled_set(game):
+    profiles = _setup(game)
+
+    profile = profiles.enable()
+
+    assert profiles.is_enabled
+    assert profile.enabled == ["101", "102"]
+    assert sorted(os.listdir(profiles.store_path)) == ["101", "102", "103"]
+    assert os.path.islink(game.mods_path)
+    assert sorted(name for name in os.listdir(game.mods_path) if name != "archive") == ["101", "102"]
+    assert os.listdir(os.path.join(game.mods_path, "archive")) == ["103"]
+    with open(os.path.join(game.mods_path, "archive", "103", "a.txt"), 'rb') as f:
+        assert f.read() == b"103"
+
+
+def test_activate_switches_enabled_mods(game):
+    profiles = _setup(game)
+    profiles.enable()
+    profiles.create_profile("minimal", enabled=["103"])
+
+    profile = profiles.activate("minimal")
+
+    assert profiles.active_profile_name() == "minimal"
+    assert profile.enabled == ["103"]
+    assert sorted(name for name in os.listdir(game.mods_path) if name != "archive") == ["103"]
+    assert sorted(os.listdir(os.path.join(game.mods_path, "archive"))) == ["101", "102"]
+
+
+def test_disable_restores_folders_by_active_profile(game):
+    profiles = _setup(game)
+    profiles.enable()
+    profiles.create_profile("minimal", enabled=["103"])
+    profiles.activate("minimal")
+
+    profiles.disable()
+
+    assert not os.path.islink(game.mods_path)
+    assert sorted(name for name in os.listdir(game.mods_path) if name != "archive") == ["103"]
+    assert sorted(os.listdir(os.path.join(game.mods_path, "archive"))) == ["101", "102"]
+    assert not os.path.exists(profiles.store_path)
+    assert not os.path.exists(profiles.profiles_path)
+
+
+def test_sync_ingests_folders_downloaded_into_view(game):
+    profiles = _setup(game)
+    profiles.enable()
+    profiles.create_profile("other")
+    make_mod(game.mods_path, "104", {"a.txt": b"104"})
+
+    stats = profiles.sync()
+
+    assert stats['ingested'] == 1
+    assert os.path.isdir(os.path.join(profiles.store_path, "104"))
+    assert os.path.islink(os.path.join(game.mods_path, "104"))
+    assert os.path.islink(os.path.join(profiles.view_path("other"), "archive", "104"))
+
+
+def test_sync_matches_links_renamed_by_mod_id(game, mod_manager):
+    """ModManager называет ссылку по ID мода: мод не должен появиться в профиле второй раз"""
+    make_mod(os.path.join(game.mods_path, "archive"), "CustomName", {"a.txt": b"x"}, published_file_id="123456")
+    profiles = ProfileManager(game)
+    profiles.enable()
+    mod_manager.load_mods_for_game(game)
+
+    assert mod_manager.set_mods_enabled(["123456"], True).success
+    stats = profiles.sync()
+
+    view = profiles.view_path(profiles.DEFAULT_PROFILE)
+    assert stats['added'] == 0
+    assert profiles._enabled_names(view) == ["CustomName"]
+    assert os.listdir(os.path.join(view, "archive")) == []
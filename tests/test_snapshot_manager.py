@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Снимки модов: откат обновлений, состояния модов и защита от правок содержимого снимка"""
+import os
+
+import pytest
+
+from src.core.content_manifest import ContentManifestService
+from src.core.snapshot_manager import SnapshotManager
+from tests.conftest import make_mod, read_file
+
+
+@pytest.fixture
+def snapshots(tmp_path, mod_manager):
+    return SnapshotManager(mod_manager, snapshot_dir=str(tmp_path / "snapshots"),
+                           manifest_service=ContentManifestService(str(tmp_path / "manifests")))
+
+
+def _setup(game, mod_manager):
+    make_mod(game.mods_path, "101", {"Defs/data.xml": b"version 1"})
+    make_mod(game.mods_path, "102", {"Defs/data.xml": b"other mod"})
+    mod_manager.load_mods_for_game(game)
+
+
+def _replace_file(path: str, content: bytes):
+    """Как при обновлении: старый файл удаляется, новый записывается на его место"""
+    os.remove(path)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def test_rollback_restores_updated_mod_by_copy(game, mod_manager, snapshots):
+    _setup(game, mod_manager)
+    snapshot = snapshots.create_snapshot(game, label="before update")
+    data_path = os.path.join(game.mods_path, "101", "Defs", "data.xml")
+    _replace_file(data_path, b"version 2 (updated)")
+
+    result = snapshots.rollback(game, snapshot.snapshot_id)
+
+    assert result.success
+    assert result.restored == ["101"]
+    assert read_file(data_path) == b"version 1"
+    snapshot_file = os.path.join(snapshots.content_path(game, snapshot.snapshot_id), "enabled", "101", "Defs", "data.xml")
+    # После отката папка мода не делит файлы со снимком
+    assert not os.path.samefile(data_path, snapshot_file)
+
+
+def test_rollback_refuses_snapshot_edited_in_place(game, mod_manager, snapshots):
+    _setup(game, mod_manager)
+    snapshot = snapshots.create_snapshot(game)
+    data_path = os.path.join(game.mods_path, "101", "Defs", "data.xml")
+    # Правка на месте меняет и файл снимка (общая жесткая ссылка)
+    with open(data_path, 'ab') as f:
+        f.write(b" edited in place")
+
+    result = snapshots.rollback(game, snapshot.snapshot_id)
+
+    assert "101" in result.failed
+    assert "101" not in result.restored
+    assert read_file(data_path) == b"version 1 edited in place"
+
+
+def test_rollback_restores_enabled_state_and_disables_new_mods(game, mod_manager, snapshots):
+    _setup(game, mod_manager)
+    snapshot = snapshots.create_snapshot(game)
+    assert mod_manager.set_mods_enabled(["102"], False).success
+    make_mod(game.mods_path, "103", {"Defs/data.xml": b"new mod"})
+
+    result = snapshots.rollback(game, snapshot.snapshot_id)
+
+    assert result.success
+    assert "102" in result.toggled
+    assert result.new_mods == ["103"]
+    assert os.path.isdir(os.path.join(game.mods_path, "102"))
+    assert os.path.isdir(os.path.join(game.mods_path, "archive", "103"))
+
+
+def test_partial_snapshot_leaves_other_mods_alone(game, mod_manager, snapshots):
+    _setup(game, mod_manager)
+    snapshot = snapshots.create_snapshot(game, auto=True, mod_ids=["101"])
+    _replace_file(os.path.join(game.mods_path, "101", "Defs", "data.xml"), b"version 2 (updated)")
+    _replace_file(os.path.join(game.mods_path, "102", "Defs", "data.xml"), b"other mod, changed")
+    make_mod(game.mods_path, "103", {"Defs/data.xml": b"new mod"})
+
+    result = snapshots.rollback(game, snapshot.snapshot_id, remove_new=True)
+
+    assert result.success
+    assert result.restored == ["101"]
+    assert result.new_mods == []
+    assert read_file(os.path.join(game.mods_path, "102", "Defs", "data.xml")) == b"other mod, changed"
+    assert os.path.isdir(os.path.join(game.mods_path, "103"))
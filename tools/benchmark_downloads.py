@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Замер производительности DownloadManager и SteamHandler с имитацией SteamCMD (tools/fake_steamcmd.py).
+
+Сценарии:
+    throughput  - полный проход очереди: время, моды/с и байт/с
+    scaling     - тот же проход при разном max_workers (параллельная установка)
+    move        - стоимость перемещения мода в папку игры (телеметрия фазы install)
+
+Пример:
+    python tools/benchmark_downloads.py --items 50 --size 4M --workers 1,2,4,8
+    python tools/benchmark_downloads.py --mods-dir /mnt/other/mods --json results.json
+
+Рассчитан на Linux: имитация запускается как исполняемый файл.
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from loguru import logger
+from src.core.steam_handler import SteamHandler
+from src.core.download_manager import DownloadManager
+from src.core.download_telemetry import DownloadTelemetry, DownloadPhases
+from src.core.content_manifest import ContentManifestService
+from src.models.game import Game
+from src.models.mod import Mod, format_size
+
+FAKE_STEAMCMD = os.path.join(ROOT_DIR, "tools", "fake_steamcmd.py")
+APP_ID = "294100"
+FIRST_MOD_ID = 3000000000
+
+
+def parse_size(value: str) -> int:
+    """Размер с необязательным суффиксом K/M/G"""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def run_pass(work_dir: str, args, workers: int) -> dict:
+    """Один проход очереди из args.items модов при заданном количестве потоков установки"""
+    steamcmd_dir = os.path.join(work_dir, f"steamcmd_w{workers}")
+    os.makedirs(steamcmd_dir, exist_ok=True)
+    steamcmd_path = os.path.join(steamcmd_dir, "steamcmd")
+    shutil.copy(FAKE_STEAMCMD, steamcmd_path)
+    os.chmod(steamcmd_path, 0o755)
+
+    mods_path = os.path.join(args.mods_dir or work_dir, f"mods_w{workers}")
+    telemetry = DownloadTelemetry(os.path.join(work_dir, f"telemetry_w{workers}.json"))
+    manager = DownloadManager(SteamHandler(steamcmd_path),
+                              queue_file=os.path.join(work_dir, f"queue_w{workers}.json"),
+                              max_workers=workers, telemetry=telemetry,
+                              manifests=ContentManifestService(os.path.join(work_dir, f"manifests_w{workers}")))
+    game = Game(name="Benchmark", steam_id=APP_ID, executable_path=steamcmd_path, mods_path=mods_path)
+    manager.add_many_to_queue([Mod(mod_id=str(FIRST_MOD_ID + index), name=f"Benchmark {index}",
+                                   file_size=args.size)
+                               for index in range(args.items)])
+
+    started = time.monotonic()
+    success = manager.download_mods_queue(game)
+    elapsed = time.monotonic() - started
+
+    installed = [r for r in telemetry.items if r['success']]
+    total_bytes = sum(r['bytes'] for r in installed)
+    result = {
+        'workers': workers,
+        'success': success,
+        'items': args.items,
+        'installed': len(installed),
+        'seconds': elapsed,
+        'items_per_second': len(installed) / elapsed if elapsed else 0.0,
+        'bytes_per_second': total_bytes / elapsed if elapsed else 0.0,
+        'install_seconds': sum(r['install'] or 0.0 for r in installed),
+        'phases': {phase: telemetry.percentiles(phase, APP_ID)
+                   for phase in DownloadPhases.SESSION + DownloadPhases.ITEM},
+    }
+    shutil.rmtree(mods_path, ignore_errors=True)
+    shutil.rmtree(steamcmd_dir, ignore_errors=True)
+    return result
+
+
+def print_report(results, args):
+    print(f"\nМодов: {args.items}, размер мода: {format_size(args.size)}, файлов в моде: {args.files}")
+    print(f"{'потоки':>7} {'время, с':>9} {'моды/с':>8} {'скорость/с':>11} {'установка, с':>13} {'успех':>6}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['seconds']:>9.2f} {r['items_per_second']:>8.2f} "
+              f"{format_size(int(r['bytes_per_second'])):>11} {r['install_seconds']:>13.3f} "
+              f"{r['installed']:>3}/{r['items']:<3}")
+
+    print("\nФазы (p50 / p90 / p99, секунды), первый проход:")
+    for phase, values in results[0]['phases'].items():
+        if values:
+            print(f"  {phase:<9} " + " / ".join(f"{values[point]:.4f}" for point in sorted(values)))
+
+    if len(results) > 1:
+        base = results[0]['seconds']
+        print("\nМасштабирование относительно первого прохода:")
+        for r in results:
+            print(f"  {r['workers']:>3} потоков: x{base / r['seconds']:.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Замер загрузки модов с имитацией SteamCMD")
+    parser.add_argument("--items", type=int, default=20, help="Количество модов в очереди")
+    parser.add_argument("--size", type=parse_size, default=parse_size("2M"), help="Размер мода (например 512K, 4M)")
+    parser.add_argument("--files", type=int, default=8, help="Количество файлов в моде")
+    parser.add_argument("--workers", default="1,2,4,8", help="Значения max_workers через запятую")
+    parser.add_argument("--bandwidth", type=parse_size, default=0, help="Ограничение скорости имитации, байт/с")
+    parser.add_argument("--startup-delay", type=float, default=0.2, help="Задержка запуска SteamCMD, с")
+    parser.add_argument("--login-delay", type=float, default=0.3, help="Задержка входа, с")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Доля неудачных загрузок")
+    parser.add_argument("--mods-dir", help="Папка модов (например, на другом диске для замера копирования)")
+    parser.add_argument("--work-dir", help="Рабочая папка (по умолчанию временная)")
+    parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON")
+    parser.add_argument("--verbose", action="store_true", help="Показывать журнал приложения")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    os.environ.update({
+        "FAKE_STEAMCMD_ITEM_SIZE": str(args.size),
+        "FAKE_STEAMCMD_FILES": str(args.files),
+        "FAKE_STEAMCMD_BANDWIDTH": str(args.bandwidth),
+        "FAKE_STEAMCMD_STARTUP_DELAY": str(args.startup_delay),
+        "FAKE_STEAMCMD_LOGIN_DELAY": str(args.login_delay),
+        "FAKE_STEAMCMD_FAIL_RATE": str(args.fail_rate),
+        "FAKE_STEAMCMD_SEED": "1",
+    })
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="gmm_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        results = [run_pass(work_dir, args, int(workers)) for workers in args.workers.split(",") if workers.strip()]
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results, args)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({'items': args.items, 'size': args.size, 'files': args.files, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+    return 0 if all(r['success'] for r in results) or args.fail_rate else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Замер сканирования библиотеки модов (ModManager.load_mods_for_game) на синтетической библиотеке.
+
+Сравниваются:
+    listdir  - прежний способ: os.listdir, os.path.isdir для каждого элемента, затем getctime/getmtime
+    scandir  - ModManager в одном потоке: os.scandir с повторным использованием данных DirEntry
+    parallel - ModManager с пулом потоков (max_scan_workers), моды поступают пачками
+    indexed  - то же с заполненным индексом сканирования (повторное сканирование без изменений)
+
+ModManager читает About.xml каждого мода (название, описание и зависимости без запросов к Workshop),
+а прежний способ - только папок с нечисловым именем, поэтому при первом сканировании он делает
+меньше работы; повторные сканирования (indexed) метаданные не перечитывают.
+
+Для медленного хранилища (сеть, HDD) можно добавить задержку (--latency) на stat каждой папки мода
+и на каждое чтение About.xml/manifest.json: она имитирует ожидание диска и, как настоящий
+ввод-вывод, не держит GIL.
+"первая пачка" - время до первых готовых модов (когда интерфейс может показать первые строки).
+
+Кроме времени считается количество вызовов os.stat на мод (os.path.isdir/getctime/getmtime
+вызывают os.stat; данные DirEntry в счетчик не попадают).
+
+Пример:
+    python tools/benchmark_scan.py --mods 5000 --repeat 5
+    python tools/benchmark_scan.py --mods 2000 --latency 2 --workers 16
+    python tools/benchmark_scan.py --library /mnt/share/gmm_bench --keep
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from loguru import logger
+from src.core.mod_manager import ModManager
+from src.core.scan_index import ScanIndex
+from src.models.game import Game
+from src.models.mod import Mod
+
+FIRST_MOD_ID = 2000000000
+ABOUT_XML = """<?xml version="1.0" encoding="utf-8"?>
+<ModMetaData>
+  <name>Synthetic {index}</name>
+  <author>Benchmark</author>
+  <packageId>bench.synthetic{index}</packageId>
+  <publishedFileId>{mod_id}</publishedFileId>
+</ModMetaData>
+"""
+
+
+def create_library(mods_path: str, count: int, disabled_share: float, named_share: float, files: int):
+    """
+    Создает библиотеку из count папок модов: часть в archive (отключенные),
+    часть с нечисловыми именами и About/About.xml (как локальные копии модов RimWorld).
+    """
+    archive_path = os.path.join(mods_path, "archive")
+    os.makedirs(archive_path, exist_ok=True)
+    disabled_every = int(1 / disabled_share) if disabled_share else 0
+    named_every = int(1 / named_share) if named_share else 0
+    for index in range(count):
+        mod_id = str(FIRST_MOD_ID + index)
+        named = named_every and index % named_every == 1
+        folder = f"Synthetic Mod {index}" if named else mod_id
+        parent = archive_path if disabled_every and index % disabled_every == 0 else mods_path
+        about_dir = os.path.join(parent, folder, "About")
+        os.makedirs(about_dir)
+        with open(os.path.join(about_dir, "About.xml"), "w", encoding="utf-8") as f:
+            f.write(ABOUT_XML.format(index=index, mod_id=mod_id))
+        for file_index in range(files):
+            open(os.path.join(parent, folder, f"file_{file_index}.dat"), "wb").close()
+        # Обычные файлы в корне папки модов, которые сканер должен пропустить
+        if index % 500 == 0:
+            open(os.path.join(mods_path, f"readme_{index}.txt"), "w").close()
+
+
+def _legacy_extract_steam_id(path: str):
+    """Прежний поиск Steam ID: проверки os.path.exists перед чтением"""
+    import xml.etree.ElementTree as ET
+    about_xml_path = os.path.join(path, "About", "About.xml")
+    if not os.path.exists(about_xml_path):
+        about_xml_path = os.path.join(path, "About.xml")
+    if os.path.exists(about_xml_path):
+        try:
+            for elem in ET.parse(about_xml_path).getroot().iter():
+                if elem.tag == 'publishedFileId' and elem.text and elem.text.strip().isdigit():
+                    return elem.text.strip()
+        except Exception:
+            pass
+    os.path.exists(os.path.join(path, "manifest.json"))  # Проверка manifest.json (в библиотеке его нет)
+    return None
+
+
+class NoScanIndex(ScanIndex):
+    """Индекс, который ничего не запоминает: каждое сканирование - как первое"""
+
+    def lookup(self, game_id, path, stat_result):
+        return None
+
+    def store(self, game_id, entry):
+        pass
+
+
+class SlowModManager(ModManager):
+    """ModManager с имитацией задержки хранилища на stat папки и чтение файлов метаданных"""
+
+    def __init__(self, latency: float, max_scan_workers: int = None, scan_index: ScanIndex = None):
+        super().__init__(max_scan_workers=max_scan_workers, scan_index=scan_index or NoScanIndex())
+        self.latency = latency
+
+    def _create_mod(self, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._create_mod(*args, **kwargs)
+
+    def _read_mod_metadata(self, path):
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._read_mod_metadata(path)
+
+
+def legacy_scan(game: Game, latency: float = 0.0):
+    """Прежняя реализация load_mods_for_game (os.listdir + os.path.isdir + getctime/getmtime)"""
+    mods = []
+    for folder, is_enabled in ((game.mods_path, True), (os.path.join(game.mods_path, "archive"), False)):
+        if not os.path.exists(folder) or not os.path.isdir(folder):
+            continue
+        for item in os.listdir(folder):
+            item_path = os.path.join(folder, item)
+            if not os.path.isdir(item_path) or (is_enabled and item == "archive") or item.startswith('.'):
+                continue
+            if latency:
+                time.sleep(latency * (1 if item.isdigit() else 2))
+            mod_id = item if item.isdigit() else (_legacy_extract_steam_id(item_path) or item)
+            mods.append(Mod(mod_id=mod_id, name=item, local_path=item_path, is_enabled=is_enabled,
+                            install_date=datetime.fromtimestamp(os.path.getctime(item_path)),
+                            local_update_date=datetime.fromtimestamp(os.path.getmtime(item_path))))
+    return mods
+
+
+class StatCounter:
+    """Считает вызовы os.stat на время замера"""
+
+    def __init__(self):
+        self.calls = 0
+        self._original = os.stat
+
+    def __enter__(self):
+        def counting_stat(*args, **kwargs):
+            self.calls += 1
+            return self._original(*args, **kwargs)
+        os.stat = counting_stat
+        return self
+
+    def __exit__(self, *exc):
+        os.stat = self._original
+
+
+def measure(name: str, scan, repeat: int) -> dict:
+    """
+    scan(on_batch) выполняет сканирование; on_batch вызывается с каждой пачкой модов
+    (способы без потоковой выдачи его не вызывают - первая пачка равна полному времени).
+    """
+    def ignore(_mods):
+        pass
+
+    scan(ignore)  # Прогрев кэша файловой системы, чтобы все способы были в равных условиях
+    timings = []
+    first_batch = []
+    for _ in range(repeat):
+        first = []
+        started = time.perf_counter()
+        mods = scan(lambda _mods: first.append(time.perf_counter()) if not first else None)
+        finished = time.perf_counter()
+        timings.append(finished - started)
+        first_batch.append((first[0] if first else finished) - started)
+    with StatCounter() as counter:
+        scan(ignore)
+    return {
+        'name': name,
+        'mods': sorted((mod.mod_id, mod.local_path) for mod in mods),
+        'median': statistics.median(timings),
+        'best': min(timings),
+        'first_batch': statistics.median(first_batch),
+        'stat_per_mod': counter.calls / max(len(mods), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Замер сканирования библиотеки модов")
+    parser.add_argument("--mods", type=int, default=5000, help="Количество папок модов")
+    parser.add_argument("--disabled", type=float, default=0.2, help="Доля отключенных модов (в archive)")
+    parser.add_argument("--named", type=float, default=0.05, help="Доля папок с нечисловым именем (поиск ID в About.xml)")
+    parser.add_argument("--files", type=int, default=2, help="Файлов в каждой папке мода")
+    parser.add_argument("--repeat", type=int, default=5, help="Количество повторов каждого способа")
+    parser.add_argument("--latency", type=float, default=0.0, help="Имитация задержки хранилища на папку мода, мс")
+    parser.add_argument("--workers", type=int, default=None, help="max_scan_workers для способа parallel")
+    parser.add_argument("--library", help="Папка библиотеки (по умолчанию временная); существующая используется как есть")
+    parser.add_argument("--keep", action="store_true", help="Не удалять созданную библиотеку")
+    parser.add_argument("--verbose", action="store_true", help="Показывать журнал приложения")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    library = args.library or tempfile.mkdtemp(prefix="gmm_scan_")
+    mods_path = os.path.join(library, "Mods")
+    created = not os.path.isdir(mods_path)
+    try:
+        if created:
+            started = time.perf_counter()
+            create_library(mods_path, args.mods, args.disabled, args.named, args.files)
+            print(f"Создана библиотека из {args.mods} модов за {time.perf_counter() - started:.1f} с: {mods_path}")
+
+        game = Game(name="Benchmark", steam_id="294100", executable_path=os.path.join(library, "game.exe"),
+                    mods_path=mods_path)
+        latency = args.latency / 1000
+        serial = SlowModManager(latency, max_scan_workers=1)
+        parallel = SlowModManager(latency, max_scan_workers=args.workers)
+        indexed = SlowModManager(latency, max_scan_workers=args.workers,
+                                 scan_index=ScanIndex(os.path.join(library, "scan_index")))
+        results = [
+            measure("listdir", lambda on_batch: legacy_scan(game, latency), args.repeat),
+            measure("scandir", lambda on_batch: serial.load_mods_for_game(game, on_batch), args.repeat),
+            measure("parallel", lambda on_batch: parallel.load_mods_for_game(game, on_batch), args.repeat),
+            measure("indexed", lambda on_batch: indexed.load_mods_for_game(game, on_batch), args.repeat),
+        ]
+    finally:
+        shutil.rmtree(os.path.join(library, "scan_index"), ignore_errors=True)
+        if created and not args.keep:
+            shutil.rmtree(mods_path, ignore_errors=True)
+            if not args.library:
+                shutil.rmtree(library, ignore_errors=True)
+
+    print(f"\nПотоков parallel: {parallel.max_scan_workers}, задержка на папку: {args.latency} мс")
+    print(f"{'способ':>8} {'модов':>7} {'медиана, мс':>12} {'лучшее, мс':>11} {'первая пачка, мс':>17} {'stat/мод':>9}")
+    for r in results:
+        print(f"{r['name']:>8} {len(r['mods']):>7} {r['median'] * 1000:>12.1f} {r['best'] * 1000:>11.1f} "
+              f"{r['first_batch'] * 1000:>17.1f} {r['stat_per_mod']:>9.2f}")
+    base = results[0]
+    for r in results[1:]:
+        if r['median']:
+            print(f"Ускорение {r['name']}: x{base['median'] / r['median']:.2f}")
+    # Все способы должны найти одни и те же моды
+    return 0 if all(r['mods'] == base['mods'] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
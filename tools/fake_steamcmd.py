@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Имитация SteamCMD для тестирования и замеров без Steam.
+
+Принимает те же аргументы, что и SteamCMD (+runscript <файл>, +login, +workshop_download_item ...),
+печатает похожий вывод и создает в steamapps/workshop/content/<app_id>/<mod_id> рядом с собой
+папку мода заданного размера.
+
+Настройка через переменные окружения:
+    FAKE_STEAMCMD_ITEM_SIZE      размер одного мода в байтах (по умолчанию 1 МБ)
+    FAKE_STEAMCMD_FILES          количество файлов в моде (по умолчанию 8)
+    FAKE_STEAMCMD_BANDWIDTH      скорость "сети" в байтах/с, 0 - без ограничения (по умолчанию 0)
+    FAKE_STEAMCMD_STARTUP_DELAY  задержка запуска в секундах (по умолчанию 0.2)
+    FAKE_STEAMCMD_LOGIN_DELAY    задержка входа в секундах (по умолчанию 0.3)
+    FAKE_STEAMCMD_VALIDATE_RATE  скорость проверки validate в байтах/с, 0 - мгновенно (по умолчанию 0)
+    FAKE_STEAMCMD_FAIL_IDS       ID модов через запятую, загрузка которых завершается ошибкой
+    FAKE_STEAMCMD_FAIL_RATE      доля случайных ошибок загрузки от 0 до 1 (по умолчанию 0)
+    FAKE_STEAMCMD_SEED           зерно генератора для FAIL_RATE
+
+Для использования укажите этот файл (с правами на выполнение) как путь к SteamCMD.
+Папка content создается рядом с файлом, поэтому его удобно копировать во временную папку.
+"""
+import os
+import sys
+import time
+import random
+import shlex
+
+BLOCK_SIZE = 64 * 1024
+PROGRESS_STEPS = 4
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class FakeSteamCMD:
+    """Исполнитель команд SteamCMD"""
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.item_size = int(_env_float("FAKE_STEAMCMD_ITEM_SIZE", 1024 * 1024))
+        self.file_count = max(1, int(_env_float("FAKE_STEAMCMD_FILES", 8)))
+        self.bandwidth = _env_float("FAKE_STEAMCMD_BANDWIDTH", 0)
+        self.startup_delay = _env_float("FAKE_STEAMCMD_STARTUP_DELAY", 0.2)
+        self.login_delay = _env_float("FAKE_STEAMCMD_LOGIN_DELAY", 0.3)
+        self.validate_rate = _env_float("FAKE_STEAMCMD_VALIDATE_RATE", 0)
+        self.fail_ids = {mod_id.strip() for mod_id in os.environ.get("FAKE_STEAMCMD_FAIL_IDS", "").split(",")
+                         if mod_id.strip()}
+        self.fail_rate = _env_float("FAKE_STEAMCMD_FAIL_RATE", 0)
+        self.random = random.Random(os.environ.get("FAKE_STEAMCMD_SEED"))
+        self.shutdown_on_failure = False
+        self.logged_in = False
+        self.installed = {}     # app_id -> {mod_id: (size, timeupdated)}
+        # Случайный блок данных; файлы модов собираются из него, чтобы не тратить время на генерацию
+        self._block = os.urandom(BLOCK_SIZE)
+
+    # --- Вывод ---
+    @staticmethod
+    def out(line: str):
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+    def startup(self):
+        self.out(f"Redirecting stderr to '{os.path.join(self.base_path, 'logs', 'stderr.txt')}'")
+        self.out("[  0%] Checking for available updates...")
+        self.out("[----] Verifying installation...")
+        time.sleep(self.startup_delay)
+        self.out("Steam Console Client (c) Valve Corporation - version 1700000000")
+        self.out("-- type 'quit' to exit --")
+        self.out("Loading Steam API...OK")
+
+    # --- Команды ---
+    def run(self, commands) -> int:
+        """Выполняет команды по порядку. Возвращает код завершения."""
+        for command in commands:
+            if not self.execute(command):
+                if self.shutdown_on_failure:
+                    self.out("Shutting down because of a failed command.")
+                    self.flush_acf()
+                    return 8
+        self.flush_acf()
+        return 0
+
+    def execute(self, command: str) -> bool:
+        args = shlex.split(command)
+        if not args:
+            return True
+        name = args[0].lower()
+        if name == "@shutdownonfailedcommand":
+            self.shutdown_on_failure = len(args) > 1 and args[1] == "1"
+        elif name in ("@nopromptforpassword", "force_install_dir"):
+            pass
+        elif name == "login":
+            return self.login(args[1] if len(args) > 1 else "anonymous")
+        elif name == "workshop_download_item":
+            if len(args) < 3:
+                self.out("ERROR! Usage: workshop_download_item <appid> <itemid> [validate]")
+                return False
+            return self.download_item(args[1], args[2], validate="validate" in args[3:])
+        elif name in ("quit", "exit"):
+            pass
+        else:
+            self.out(f"Command not found: {args[0]}")
+        return True
+
+    def login(self, user: str) -> bool:
+        self.out(f"Logging in user '{user}' to Steam Public...OK")
+        time.sleep(self.login_delay)
+        self.out("Waiting for client config...OK")
+        self.out("Waiting for user info...OK")
+        self.logged_in = True
+        return True
+
+    def download_item(self, app_id: str, mod_id: str, validate: bool) -> bool:
+        self.out(f"Downloading item {mod_id} ...")
+        if not self.logged_in:
+            self.out(f"ERROR! Download item {mod_id} failed (Not logged on).")
+            return False
+        fail = mod_id in self.fail_ids or (self.fail_rate and self.random.random() < self.fail_rate)
+
+        # Незавершенная загрузка остается в downloads, как у настоящего SteamCMD
+        folder = "downloads" if fail else "content"
+        item_path = os.path.join(self.base_path, "steamapps", "workshop", folder, app_id, mod_id)
+        written = self._write_content(item_path, stop_at=self.item_size // 2 if fail else None)
+        if fail:
+            self.out(f"ERROR! Download item {mod_id} failed (Timeout).")
+            return False
+        if validate:
+            self._progress("verifying install", self.item_size, self.validate_rate)
+        self.installed.setdefault(app_id, {})[mod_id] = (written, int(time.time()))
+        self.out(f'Success. Downloaded item {mod_id} to "{item_path}" ({written} bytes)')
+        return True
+
+    def _progress(self, state: str, total: int, rate: float):
+        """Строки прогресса в формате SteamCMD с задержкой, соответствующей скорости"""
+        for step in range(1, PROGRESS_STEPS + 1):
+            if rate:
+                time.sleep(total / rate / PROGRESS_STEPS)
+            done = total * step // PROGRESS_STEPS
+            self.out(f" Update state (0x61) {state}, progress: {done * 100.0 / max(total, 1):.2f} ({done} / {total})")
+
+    def _write_content(self, item_path: str, stop_at=None) -> int:
+        """Создает папку мода из file_count файлов общим размером item_size"""
+        if os.path.exists(item_path):
+            for name in os.listdir(item_path):
+                os.remove(os.path.join(item_path, name))
+        os.makedirs(item_path, exist_ok=True)
+        limit = self.item_size if stop_at is None else stop_at
+        file_size = self.item_size // self.file_count
+        written = 0
+        started = time.monotonic()
+        next_report = self.item_size // PROGRESS_STEPS
+        for index in range(self.file_count):
+            size = file_size if index < self.file_count - 1 else self.item_size - file_size * index
+            with open(os.path.join(item_path, f"data_{index:03d}.bin"), "wb") as f:
+                while size > 0 and written < limit:
+                    chunk = self._block[:min(size, BLOCK_SIZE, limit - written)]
+                    f.write(chunk)
+                    size -= len(chunk)
+                    written += len(chunk)
+                    if self.bandwidth:
+                        delay = written / self.bandwidth - (time.monotonic() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+                    if next_report and written >= next_report:
+                        self.out(f" Update state (0x61) downloading, progress: "
+                                 f"{written * 100.0 / self.item_size:.2f} ({written} / {self.item_size})")
+                        next_report += self.item_size // PROGRESS_STEPS
+            if written >= limit:
+                break
+        return written
+
+    def flush_acf(self):
+        """Записывает appworkshop_<app_id>.acf для скачанных модов, как это делает SteamCMD"""
+        for app_id, items in self.installed.items():
+            lines = ['"AppWorkshop"', '{', f'\t"appid"\t\t"{app_id}"', '\t"WorkshopItemsInstalled"', '\t{']
+            for mod_id, (size, time_updated) in items.items():
+                lines += [f'\t\t"{mod_id}"', '\t\t{', f'\t\t\t"size"\t\t"{size}"',
+                          f'\t\t\t"timeupdated"\t\t"{time_updated}"', '\t\t}']
+            lines += ['\t}', '}']
+            acf_path = os.path.join(self.base_path, "steamapps", "workshop", f"appworkshop_{app_id}.acf")
+            os.makedirs(os.path.dirname(acf_path), exist_ok=True)
+            with open(acf_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+def parse_commands(argv):
+    """
+    Разбирает аргументы вида "+команда арг ...". SteamHandler передает "+runscript <путь>"
+    одним аргументом, поэтому команда может быть как в одном, так и в нескольких аргументах.
+    """
+    parts = []
+    for arg in argv:
+        if arg.startswith("+"):
+            parts.append(arg[1:])
+        elif parts:
+            parts[-1] += " " + arg
+    commands = []
+    for part in parts:
+        part = part.strip()
+        if part.lower().startswith("runscript "):
+            script_path = part[len("runscript "):].strip().strip('"')
+            with open(script_path, "r", encoding="utf-8") as f:
+                commands.extend(line.strip() for line in f if line.strip() and not line.startswith("//"))
+        elif part:
+            commands.append(part)
+    return commands
+
+
+def main() -> int:
+    fake = FakeSteamCMD(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commands = parse_commands(sys.argv[1:])
+    except OSError as e:
+        fake.out(f"ERROR! Failed to load script: {e}")
+        return 1
+    fake.startup()
+    return fake.run(commands)
+
+
+if __name__ == "__main__":
+    sys.exit(main())